@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""
+Goodput of /api/url-analysis under overload, with and without admission control.
+
+Requests go through the FastAPI app in-process. The generation pipeline is
+replaced by a call to a stub upstream model that serves --model-capacity
+calls at full speed and slows down evenly past that, the way a saturated
+model API does. Clients send --rate requests per second for --duration
+seconds, and a response only counts towards goodput if it arrives within
+--client-timeout (later answers are as good as none, but still cost the
+server the work). One noisy client sends --noisy-share of the traffic.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_admission --rate 160 --duration 5
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import httpx
+
+import main as api
+from benchmarks.harness import percentile
+from tools import admission, state
+from tools.admission import RequestGate, StageLimiter, stage_slot
+
+
+class UpstreamModel:
+    """Each call takes `service` seconds, stretched by how far concurrent calls exceed `capacity`"""
+
+    def __init__(self, capacity, service):
+        self.capacity = capacity
+        self.service = service
+        self.in_flight = 0
+        self._lock = threading.Lock()
+
+    def call(self):
+        with self._lock:
+            self.in_flight += 1
+            load = self.in_flight
+        try:
+            time.sleep(self.service * max(1.0, load / self.capacity))
+        finally:
+            with self._lock:
+                self.in_flight -= 1
+
+
+async def run(args, enabled):
+    model = UpstreamModel(args.model_capacity, args.service)
+
+    def generate():
+        with stage_slot("llm"):
+            model.call()
+        return {"success": True, "tweet": "A tweet."}
+
+    async def tweet_from_url_async(url, additional_text="", variants=1, deadline=None):
+        return await asyncio.get_running_loop().run_in_executor(None, generate)
+
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(args.workers))
+    original = (api.tweet_from_url_async, api.ADMISSION_ENABLED, admission.ADMISSION_ENABLED,
+                admission._gate, admission.set_stage_limit("llm", StageLimiter("llm", args.model_capacity)))
+    api.tweet_from_url_async = tweet_from_url_async
+    api.ADMISSION_ENABLED = admission.ADMISSION_ENABLED = enabled
+    admission._gate = RequestGate(limit=args.model_capacity, queue=args.model_capacity * 2,
+                                  max_wait=args.client_timeout / 2)
+
+    clients = [
+        httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app, client=(f"10.0.0.{i}", 1234)),
+                          base_url="http://bench", timeout=None)
+        for i in range(args.clients)
+    ]
+    outcomes = []  # (client index, status, latency)
+
+    async def request(i, n):
+        start = time.perf_counter()
+        response = await clients[i].get("/api/url-analysis", params={"url": f"https://example.com/{n}"})
+        outcomes.append((i, response.status_code, time.perf_counter() - start))
+
+    try:
+        tasks = []
+        total = int(args.rate * args.duration)
+        start = time.perf_counter()
+        for n in range(total):
+            # Client 0 is the noisy one; the rest share what's left evenly
+            noisy = (n * args.noisy_share) % 1 + args.noisy_share >= 1
+            i = 0 if noisy else 1 + n % (args.clients - 1)
+            tasks.append(asyncio.create_task(request(i, n)))
+            await asyncio.sleep(max(0.0, start + (n + 1) / args.rate - time.perf_counter()))
+        await asyncio.gather(*tasks)
+        wall = time.perf_counter() - start
+    finally:
+        for client in clients:
+            await client.aclose()
+        (api.tweet_from_url_async, api.ADMISSION_ENABLED, admission.ADMISSION_ENABLED,
+         admission._gate, limiter) = original
+        admission.set_stage_limit("llm", limiter)
+
+    good = [o for o in outcomes if o[1] == 200 and o[2] <= args.client_timeout]
+    quiet = [o for o in outcomes if o[0] != 0]
+    served = sorted(o[2] for o in outcomes if o[1] == 200)
+    shed = sorted(o[2] for o in outcomes if o[1] == 503)
+    return {
+        "requests": len(outcomes),
+        "goodput_per_s": round(len(good) / args.duration, 2),
+        "late": sum(1 for o in outcomes if o[1] == 200 and o[2] > args.client_timeout),
+        "shed": len(shed),
+        "quiet_clients_good_pct": round(100 * sum(1 for o in good if o[0] != 0) / max(len(quiet), 1), 1),
+        "served_p50_ms": round(percentile(served, 50) * 1000, 3),
+        "served_p99_ms": round(percentile(served, 99) * 1000, 3),
+        "shed_p99_ms": round(percentile(shed, 99) * 1000, 3),
+        "wall_s": round(wall, 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=160, help="offered requests per second")
+    parser.add_argument("--duration", type=float, default=5)
+    parser.add_argument("--service", type=float, default=0.1, help="seconds per model call at or under capacity")
+    parser.add_argument("--model-capacity", type=int, default=8, help="concurrent model calls before it slows down")
+    parser.add_argument("--workers", type=int, default=32, help="server worker threads")
+    parser.add_argument("--client-timeout", type=float, default=2.0)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--noisy-share", type=float, default=0.6)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    state._backend = state.MemoryStateBackend()
+    admission.ADMISSION_CLIENT_RPM = 0  # measure shedding, not quotas
+    capacity = args.model_capacity / args.service
+    print(f"offered {args.rate}/s against a model that serves {capacity:.0f}/s")
+    results = {}
+    for name, enabled in (("unbounded", False), ("admission", True)):
+        results[name] = r = asyncio.run(run(args, enabled))
+        print(f"{name:<10} goodput {r['goodput_per_s']}/s  late {r['late']}  shed {r['shed']}  "
+              f"quiet clients served in time {r['quiet_clients_good_pct']}%  "
+              f"served p50 {r['served_p50_ms']}ms p99 {r['served_p99_ms']}ms  shed p99 {r['shed_p99_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
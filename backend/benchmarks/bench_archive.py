@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Search latency of the article archive at scale.
+
+Ingests synthetic feed entries in feed-sized batches into a fresh archive,
+then times searches for common, rare, multi-word and prefix queries, deep
+keyset pagination and unfiltered browsing.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_archive --articles 300000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.harness import summarize
+from tools.archive import ArticleArchive
+
+SOURCES = ("techcrunch", "theverge", "wired", "hackernews", "devto", "medium")
+VOCABULARY = [f"word{i}" for i in range(30000)]
+
+
+def zipf_word(rng):
+    return VOCABULARY[min(int(rng.paretovariate(1.0) * 5) - 5, len(VOCABULARY) - 1)]
+
+
+def make_entry(rng, i):
+    return {
+        "guid": f"entry-{i}",
+        "title": " ".join(zipf_word(rng) for _ in range(8)),
+        "url": f"https://news.example.com/{i}",
+        "description": " ".join(zipf_word(rng) for _ in range(40)),
+        "published": "2024-05-14",
+        "category": "Trending Tech",
+    }
+
+
+def time_calls(fn, args_list):
+    latencies, rows = [], 0
+    start = time.perf_counter()
+    for args in args_list:
+        t0 = time.perf_counter()
+        rows += len(fn(*args)["articles"])
+        latencies.append(time.perf_counter() - t0)
+    result = summarize(latencies, time.perf_counter() - start)
+    result["rows_per_call"] = round(rows / len(args_list), 1)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=300000)
+    parser.add_argument("--batch", type=int, default=50, help="entries per ingested feed fetch")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    with tempfile.TemporaryDirectory() as directory:
+        archive = ArticleArchive(os.path.join(directory, "articles.db"))
+
+        start = time.perf_counter()
+        for offset in range(0, args.articles, args.batch):
+            batch = [make_entry(rng, i) for i in range(offset, min(offset + args.batch, args.articles))]
+            archive.ingest(SOURCES[offset // args.batch % len(SOURCES)], batch)
+        ingest_seconds = time.perf_counter() - start
+
+        # Re-ingesting a feed that hasn't changed inserts nothing
+        rng_replay = random.Random(42)
+        replay = [make_entry(rng_replay, i) for i in range(args.batch)]
+        t0 = time.perf_counter()
+        duplicates = archive.ingest(SOURCES[0], replay)
+        replay_ms = (time.perf_counter() - t0) * 1000
+
+        n = args.queries
+        common = [(VOCABULARY[rng.randrange(0, 5)],) for _ in range(n)]
+        rare = [(VOCABULARY[rng.randrange(1000, 5000)],) for _ in range(n)]
+        pairs = [(f"{VOCABULARY[rng.randrange(0, 20)]} {VOCABULARY[rng.randrange(20, 200)]}",) for _ in range(n)]
+        prefix = [(f"word{rng.randrange(100, 999)}*",) for _ in range(n)]
+
+        def walk_pages(query, pages=50):
+            # Keyset pages cost the same at any depth, so the walk should be ~50x one page
+            cursor = None
+            for _ in range(pages - 1):
+                cursor = archive.search(query, cursor=cursor)["next_cursor"]
+            return archive.search(query, cursor=cursor)
+
+        results = {
+            "ingest": {"articles": archive.count(), "seconds": round(ingest_seconds, 2),
+                       "db_mb": round(os.path.getsize(archive.path) / 2**20, 1),
+                       "replayed_batch_new": duplicates, "replayed_batch_ms": round(replay_ms, 2)},
+            "common_term": time_calls(archive.search, common),
+            "rare_term": time_calls(archive.search, rare),
+            "two_terms": time_calls(archive.search, pairs),
+            "prefix": time_calls(archive.search, prefix),
+            "common_term_source_filter": time_calls(
+                lambda q: archive.search(q, source="wired"), common),
+            "browse_no_query": time_calls(lambda: archive.search(""), [()] * n),
+            "walk_50_pages": time_calls(walk_pages, common[:20]),
+        }
+
+    ingest = results["ingest"]
+    print(f"ingested {ingest['articles']} articles in {ingest['seconds']}s ({ingest['db_mb']} MB); "
+          f"re-ingesting a feed added {ingest['replayed_batch_new']} in {ingest['replayed_batch_ms']}ms")
+    for name, r in results.items():
+        if name != "ingest":
+            print(f"{name:<26} p50 {r['p50_ms']}ms  p95 {r['p95_ms']}ms  rows {r['rows_per_call']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
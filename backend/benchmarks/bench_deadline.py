@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Tail latency of tweet generation with and without a request deadline.
+
+Serves the corpus pages locally and answers model calls with a stub whose
+latency is heavy-tailed: most calls take --llm-latency, but a fraction
+(--slow-fraction) take --slow-latency, as a congested model API does. Each
+run generates tweets sequentially (caches off) and reports p50/p99/max
+latency and how many responses were degraded.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_deadline --requests 200 --deadline 1.5
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import CorpusServer, StubChatModel
+from tools import url_analyser
+from tools.deadline import ESTIMATES, Deadline
+
+
+class TailLatencyModel(StubChatModel):
+    slow_latency: float = 2.0
+    slow_fraction: float = 0.05
+    seed: int = 7
+
+    def _latency(self):
+        rng = self.__dict__.setdefault("_rng", random.Random(self.seed))
+        return self.slow_latency if rng.random() < self.slow_fraction else self.latency
+
+
+def run(urls, model, deadline_seconds, requests):
+    original = url_analyser.create_agent
+    url_analyser.create_agent = lambda llm=None: original(llm=model)
+    ESTIMATES.clear()
+    latencies, degraded, no_tweet = [], 0, 0
+    start = time.perf_counter()
+    try:
+        for i in range(requests):
+            t0 = time.perf_counter()
+            result = url_analyser.tweet_from_url(urls[i % len(urls)], f"request {i}",
+                                                 deadline=Deadline(deadline_seconds))
+            latencies.append(time.perf_counter() - t0)
+            stages = result.get("stages", {})
+            degraded += any(status in ("skipped", "timed_out") for status in stages.values())
+            no_tweet += not result.get("tweet")
+    finally:
+        url_analyser.create_agent = original
+    stats = summarize(latencies, time.perf_counter() - start)
+    stats["max_ms"] = round(max(latencies) * 1000, 3)
+    stats["degraded"] = degraded
+    stats["without_tweet"] = no_tweet
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--deadline", type=float, default=1.5, help="seconds per request")
+    parser.add_argument("--llm-latency", type=float, default=0.1)
+    parser.add_argument("--slow-latency", type=float, default=2.0)
+    parser.add_argument("--slow-fraction", type=float, default=0.05)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    url_analyser.ANALYSIS_CACHE_TTL = 0
+    url_analyser.DRAFT_TTL = 0
+    url_analyser.SEMANTIC_CACHE_ENABLED = False
+
+    def model():
+        return TailLatencyModel(latency=args.llm_latency, slow_latency=args.slow_latency,
+                                slow_fraction=args.slow_fraction)
+
+    with CorpusServer() as server:
+        urls = [server.url_for(name) for name in server.pages if name != "sparse_page"]
+        results = {
+            "no_deadline": run(urls, model(), None, args.requests),
+            f"deadline_{args.deadline}s": run(urls, model(), args.deadline, args.requests),
+        }
+
+    for name, r in results.items():
+        print(f"{name:<16} p50 {r['p50_ms']}ms  p99 {r['p99_ms']}ms  max {r['max_ms']}ms  "
+              f"degraded {r['degraded']}/{r['iterations']}  without tweet {r['without_tweet']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+"""
+Streaming feed reader against feedparser on feeds shaped like each RSS source's.
+
+For every source style (see `stubs.build_feed`) this times, per feed:
+
+- parse: feedparser over the whole document plus the old multi-pass
+  cleaner on every entry, against `read_feed` stopping after --limit
+  entries plus the single-call cleaner on those;
+- fetch: the same over local HTTP, reading the whole response against
+  streaming it and closing it early, with how many bytes each read.
+
+The first --limit entries are checked to come out the same both ways.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_feeds --iterations 50 --limit 10
+"""
+
+import argparse
+import json
+import os
+import re
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import feedparser
+
+from benchmarks.harness import summarize
+from benchmarks.stubs import FEED_STYLES, CorpusServer, build_feed
+from tools.articles import clean_html_content
+from tools.feeds import CHUNK_SIZE, read_feed
+from tools.fetcher import Fetcher
+
+
+def legacy_clean(html_content):
+    """The cleaner as it was before the streaming reader: one regex or replace pass per concern"""
+    if not html_content:
+        return ""
+    clean_text = re.sub(r'<[^>]+>', '', html_content)
+    clean_text = re.sub(r'\s+', ' ', clean_text)
+    for entity, char in (('&nbsp;', ' '), ('&amp;', '&'), ('&lt;', '<'), ('&gt;', '>'), ('&quot;', '"'), ('&#39;', "'")):
+        clean_text = clean_text.replace(entity, char)
+    return clean_text.strip()
+
+
+def shape(entries, clean):
+    return [(e.get("id") or e.get("link"), clean(e.get("title", "")), e.get("link", ""),
+             clean(e.get("summary", "")), e.get("published", "")) for e in entries]
+
+
+def timed(fn, iterations):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - start)
+
+
+def bench_style(style, server, fetcher, args):
+    data = build_feed(style, args.entries).encode("utf-8")
+    chunks = [data[i:i + CHUNK_SIZE] for i in range(0, len(data), CHUNK_SIZE)]
+    baseline = shape(feedparser.parse(data).entries, clean_html_content)[:args.limit]
+    streamed = shape(read_feed(chunks, args.limit), clean_html_content)
+    assert streamed == baseline, f"{style}: streamed entries differ from feedparser's"
+
+    url = server.url_for(style)
+    read = {}
+
+    def fetch_full():
+        response = fetcher.get(url)
+        read["feedparser"] = len(response.content)
+        return shape(feedparser.parse(response.content).entries, legacy_clean)
+
+    def fetch_streamed():
+        with fetcher.get(url, stream=True) as response:
+            read["streaming"] = 0
+
+            def counted():
+                for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                    read["streaming"] += len(chunk)
+                    yield chunk
+
+            return shape(read_feed(counted(), args.limit), clean_html_content)
+
+    summaries = [e.get("summary", "") for e in feedparser.parse(data).entries]
+    return {
+        "feed_bytes": len(data),
+        "parse": {
+            "feedparser": timed(lambda: shape(feedparser.parse(data).entries, legacy_clean), args.iterations),
+            "streaming": timed(lambda: shape(read_feed(chunks, args.limit), clean_html_content), args.iterations),
+        },
+        "fetch": {
+            "feedparser": timed(fetch_full, args.iterations),
+            "streaming": timed(fetch_streamed, args.iterations),
+        },
+        "bytes_read": dict(read),
+        "clean_all_summaries": {
+            "legacy": timed(lambda: [legacy_clean(s) for s in summaries], args.iterations),
+            "single_call": timed(lambda: [clean_html_content(s) for s in summaries], args.iterations),
+        },
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--entries", type=int, default=40, help="entries per feed")
+    parser.add_argument("--limit", type=int, default=10, help="entries the streaming reader stops after")
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    feeds = {style: build_feed(style, args.entries) for style in FEED_STYLES}
+    fetcher = Fetcher(host_rate=0, host_concurrency=4)
+    results = {}
+    with CorpusServer(feeds) as server:
+        for style in FEED_STYLES:
+            results[style] = r = bench_style(style, server, fetcher, args)
+            parse, fetch, clean = r["parse"], r["fetch"], r["clean_all_summaries"]
+            print(f"{style:<10} {r['feed_bytes'] // 1024:>4}KB  "
+                  f"parse p50 {parse['feedparser']['p50_ms']}ms -> {parse['streaming']['p50_ms']}ms  "
+                  f"fetch p50 {fetch['feedparser']['p50_ms']}ms -> {fetch['streaming']['p50_ms']}ms  "
+                  f"read {r['bytes_read']['feedparser'] // 1024}KB -> {r['bytes_read']['streaming'] // 1024}KB  "
+                  f"clean {clean['legacy']['p50_ms']}ms -> {clean['single_call']['p50_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
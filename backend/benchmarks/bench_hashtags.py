@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Build time and recommendation latency of the local hashtag index.
+
+Generates synthetic feed articles that mix the seed terms of a few hashtags
+with filler words (and, for some, literal hashtags), builds the index from
+them, then times `recommend` on tweets drawn from the same mix.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_hashtags --articles 5000 --iterations 20000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.harness import summarize
+from tools.hashtags import SEED_HASHTAGS, HashtagIndex
+
+FILLER = [f"word{i}" for i in range(5000)]
+TOPIC_WORDS = {tag: words.split() for tag, words in SEED_HASHTAGS.items()}
+TRENDING = ["#ZigLang", "#WWDC", "#AIAct", "#Bun"]
+
+
+def make_text(rng, words):
+    tags = rng.sample(list(TOPIC_WORDS), 2)
+    text = [rng.choice(TOPIC_WORDS[tag]) for tag in tags for _ in range(3)]
+    text += [FILLER[min(int(rng.paretovariate(1.0)) - 1, len(FILLER) - 1)] for _ in range(words)]
+    rng.shuffle(text)
+    if rng.random() < 0.1:
+        text.append(rng.choice(TRENDING))
+    return " ".join(text)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--articles", type=int, default=5000)
+    parser.add_argument("--iterations", type=int, default=20000)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    documents = [make_text(rng, 40) for _ in range(args.articles)]
+    start = time.perf_counter()
+    index = HashtagIndex.build(documents)
+    build_seconds = time.perf_counter() - start
+
+    tweets = [make_text(rng, 20) for _ in range(200)]
+    latencies = []
+    start = time.perf_counter()
+    for i in range(args.iterations):
+        t0 = time.perf_counter()
+        index.recommend(tweets[i % len(tweets)])
+        latencies.append(time.perf_counter() - t0)
+    results = {
+        "build_seconds": round(build_seconds, 3),
+        "tags": len(index.tags),
+        "terms": len(index.vocabulary),
+        "recommend": summarize(latencies, time.perf_counter() - start),
+    }
+    r = results["recommend"]
+    print(f"build {results['build_seconds']}s for {args.articles} articles "
+          f"({results['tags']} tags, {results['terms']} terms)")
+    print(f"recommend p50 {r['p50_ms'] * 1000:.0f}us  p99 {r['p99_ms'] * 1000:.0f}us  "
+          f"{r['throughput_per_s']:.0f}/s")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
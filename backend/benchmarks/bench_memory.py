@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Memory and time of page analysis on large pages, with the tree kept against disposed.
+
+Pads the recorded news article with --paragraphs extra paragraphs and an
+inline script of --script-kb KB (the JSON state blobs of client-rendered
+sites), then for each page measures with tracemalloc:
+
+- kept: parse and extract, leaving the tree to the garbage collector as
+  analyze_html used to;
+- disposed: `analyze_html`, which strips script and style bodies before
+  parsing and decomposes the tree before the text analysis.
+
+It reports the peak allocation, what is still allocated when the call
+returns (garbage collection off, as between collections), and the p50 time.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_memory --paragraphs 1000 5000 20000 --script-kb 1024
+"""
+
+import argparse
+import gc
+import json
+import os
+import sys
+import time
+import tracemalloc
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import bs4
+
+from benchmarks.harness import percentile
+from benchmarks.stubs import load_corpus
+from tools import url_analyser
+
+PARAGRAPH = ("<div class='block'><p>Paragraph {i} of the article, long enough to count as real text, "
+             "with a <a href='/link/{i}'>link</a> in the middle of it.</p></div>")
+
+
+def make_page(paragraphs, script_kb):
+    page = load_corpus()["news_article"]
+    script = "<script>window.__STATE__ = " + json.dumps({"items": ["x" * 1000] * script_kb}) + ";</script>"
+    return page.replace("</head>", script + "</head>").replace(
+        "</article>", "".join(PARAGRAPH.format(i=i) for i in range(paragraphs)) + "</article>"
+    )
+
+
+def analyze_kept(html):
+    return url_analyser.analyze_extract(url_analyser._extract(bs4.BeautifulSoup(html, "html.parser")))
+
+
+def measure(fn, html, iterations):
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = fn(html)
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    del result
+    gc.collect()
+    times = []
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        fn(html)
+        times.append(time.perf_counter() - t0)
+    return {
+        "peak_mb": round((peak - before) / 2 ** 20, 1),
+        "retained_mb": round((current - before) / 2 ** 20, 1),
+        "p50_ms": round(percentile(sorted(times), 50) * 1000, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--paragraphs", type=int, nargs="+", default=[1000, 5000, 20000])
+    parser.add_argument("--script-kb", type=int, default=1024)
+    parser.add_argument("--iterations", type=int, default=5)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    url_analyser.analyze_html(load_corpus()["news_article"])  # import bs4 and compile patterns first
+    results = {}
+    for paragraphs in args.paragraphs:
+        html = make_page(paragraphs, args.script_kb)
+        results[paragraphs] = r = {
+            "page_mb": round(len(html) / 2 ** 20, 1),
+            "kept": measure(analyze_kept, html, args.iterations),
+            "disposed": measure(url_analyser.analyze_html, html, args.iterations),
+        }
+        kept, disposed = r["kept"], r["disposed"]
+        print(f"{r['page_mb']:>5}MB page  peak {kept['peak_mb']}MB -> {disposed['peak_mb']}MB  "
+              f"retained {kept['retained_mb']}MB -> {disposed['retained_mb']}MB  "
+              f"p50 {kept['p50_ms']}ms -> {disposed['p50_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Serialization cost and payload size of /api/url-analysis responses.
+
+Builds the analysis of a corpus page as the endpoint would return it, then
+renders it the way FastAPI does by default (jsonable_encoder + JSONResponse)
+and through tools.responses, in full and with the compact projection.
+Reports render latency, bytes and gzipped bytes for each.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_responses --iterations 5000
+"""
+
+import argparse
+import gzip
+import json
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from fastapi.encoders import jsonable_encoder
+from starlette.responses import JSONResponse
+
+from benchmarks.harness import summarize
+from tools.responses import FIELD_PRESETS, analysis_response
+from tools.url_analyser import analyze_html, split_into_thread
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+
+def make_result(page, images):
+    """An analysis shaped like tweet_from_url's result for a corpus page"""
+    with open(os.path.join(CORPUS_DIR, page), encoding="utf-8") as f:
+        result = analyze_html(f.read())
+    result.pop("paragraphs")
+    # Image-heavy articles list every inline image
+    result["all_images"] = [f"https://cdn.example.com/images/2024/05/figure-{i}-1200x800.jpg" for i in range(images)]
+    tweet = " ".join(result["sample_paragraphs"])[:600]
+    result["tweet"] = tweet
+    result["thread_tweets"] = split_into_thread(tweet)
+    result["is_thread"] = len(result["thread_tweets"]) > 1
+    result["compression"] = {"tokens": 1180, "token_budget": 1200, "sentences_total": 96, "sentences_selected": 31}
+    result["cache"] = {"hit": False, "kind": "miss", "similarity": 0.41}
+    return result
+
+
+def time_render(render, result, iterations):
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        t0 = time.perf_counter()
+        body = render(result)
+        latencies.append(time.perf_counter() - t0)
+    stats = summarize(latencies, time.perf_counter() - start)
+    stats["bytes"] = len(body)
+    stats["gzip_bytes"] = len(gzip.compress(body, compresslevel=6))
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=5000)
+    parser.add_argument("--page", default="engineering_blog.html")
+    parser.add_argument("--images", type=int, default=40)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    result = make_result(args.page, args.images)
+    renders = {
+        "fastapi_default": lambda r: JSONResponse(jsonable_encoder(r)).body,
+        "model_full": lambda r: analysis_response(r).body,
+        "model_compact": lambda r: analysis_response(r, FIELD_PRESETS["compact"]).body,
+    }
+    # Same document either way, apart from the projection
+    assert json.loads(renders["fastapi_default"](result)) == json.loads(renders["model_full"](result))
+
+    results = {name: time_render(render, result, args.iterations) for name, render in renders.items()}
+    for name, r in results.items():
+        print(f"{name:<16} p50 {r['p50_ms']}ms  mean {r['mean_ms']}ms  "
+              f"{r['bytes']} bytes ({r['gzip_bytes']} gzipped)")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Insert cost, window loading and firing lag of the post scheduler at scale.
+
+Schedules `--pending` posts spread over the next 30 days into a fresh store,
+timing each insert, then times loading a window of them into the heap. A
+second run schedules `--burst` posts due within the next second and reports
+how late the scheduler hands them to a stub publisher.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_scheduler --pending 100000 --burst 2000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.harness import percentile, summarize
+from tools.scheduler import ScheduleStore, Scheduler
+
+TWEETS = ["1/3 A scheduled thread.", "2/3 Posted later.", "3/3 The end."]
+ACCOUNTS = [f"Bearer account-{i}" for i in range(500)]
+# Refresh token and access token expiry, far enough out that nothing is refreshed
+TOKEN = ("refresh", time.time() + 60 * 86400)
+
+
+def bench_inserts(store, pending, rng):
+    engine = Scheduler(store, publish=lambda tweets, authorization: None, window=3600)
+    engine._load_window(time.time())
+    now = time.time()
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(pending):
+        t0 = time.perf_counter()
+        engine.schedule(TWEETS, rng.choice(ACCOUNTS), now + 60 + rng.random() * 30 * 86400, *TOKEN)
+        latencies.append(time.perf_counter() - t0)
+    results = {"insert": summarize(latencies, time.perf_counter() - start), "heap_size": len(engine._heap)}
+
+    t0 = time.perf_counter()
+    engine._load_window(time.time() + 86400)
+    results["load_day_window_ms"] = round((time.perf_counter() - t0) * 1000, 3)
+    results["day_window_size"] = len(engine._heap)
+    return results
+
+
+def bench_burst(store, burst, workers):
+    lags = []
+    done = threading.Event()
+
+    def publish(tweets, authorization):
+        lags.append(time.time())
+        if len(lags) == burst:
+            done.set()
+
+    engine = Scheduler(store, publish=publish, workers=workers)
+    engine.start()
+    due = {}
+    try:
+        now = time.time()
+        for i in range(burst):
+            entry = engine.schedule(TWEETS, ACCOUNTS[i % len(ACCOUNTS)], now + 1 + i / burst, *TOKEN)
+            due[i] = entry["due"]
+        done.wait(60)
+    finally:
+        engine.stop()
+    # Handovers happen in due order (give or take the pool), so pair them up in order
+    lag = sorted(fired - scheduled for fired, scheduled in zip(sorted(lags), sorted(due.values())))
+    return {
+        "fired": len(lags),
+        "lag_p50_ms": round(percentile(lag, 50) * 1000, 3),
+        "lag_p99_ms": round(percentile(lag, 99) * 1000, 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pending", type=int, default=100000)
+    parser.add_argument("--burst", type=int, default=2000)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ScheduleStore(os.path.join(tmp, "schedule.db"))
+        results = bench_inserts(store, args.pending, rng)
+        results["burst"] = bench_burst(ScheduleStore(os.path.join(tmp, "burst.db")), args.burst, args.workers)
+
+    insert = results["insert"]
+    print(f"insert    p50 {insert['p50_ms']}ms  p99 {insert['p99_ms']}ms  {insert['throughput_per_s']}/s "
+          f"({args.pending} pending, {results['heap_size']} in the 1h heap)")
+    print(f"load      {results['load_day_window_ms']}ms for a 24h window of {results['day_window_size']}")
+    burst = results["burst"]
+    print(f"burst     {burst['fired']} fired, lag p50 {burst['lag_p50_ms']}ms  p99 {burst['lag_p99_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python3
+"""
+Hit rate and lookup latency of the semantic generation cache at scale.
+
+Fills the cache with synthetic articles, then looks up:
+  - the same articles behind tracking/AMP URL variants (exact hits)
+  - lightly edited copies under unseen URLs (should be semantic hits)
+  - unrelated articles (should miss; any hit is a false positive)
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_semantic_cache --entries 100000
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.harness import summarize
+from tools.semantic_cache import SemanticCache, embed
+
+VOCABULARY = [f"term{i}" for i in range(20000)]
+
+
+def make_article(rng, words=150, topical=0.6):
+    """
+    Synthetic article: a share of words from the article's own topic terms,
+    the rest from a Zipf-distributed background vocabulary shared by all.
+    """
+    topic = rng.sample(VOCABULARY, 40)
+    out = []
+    for _ in range(words):
+        if rng.random() < topical:
+            out.append(rng.choice(topic))
+        else:
+            out.append(VOCABULARY[min(int(rng.paretovariate(1.0) * 10), len(VOCABULARY) - 1)])
+    return " ".join(out)
+
+
+def perturb(rng, text, fraction=0.05):
+    words = text.split()
+    for _ in range(max(1, int(len(words) * fraction))):
+        words[rng.randrange(len(words))] = rng.choice(VOCABULARY)
+    return " ".join(words)
+
+
+def time_lookups(cache, queries):
+    latencies, hits = [], 0
+    start = time.perf_counter()
+    for url, content, instructions in queries:
+        t0 = time.perf_counter()
+        value, info = cache.lookup(url, content, instructions)
+        latencies.append(time.perf_counter() - t0)
+        hits += info["hit"]
+    result = summarize(latencies, time.perf_counter() - start)
+    result["hit_rate"] = round(hits / len(queries), 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--entries", type=int, default=100000)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--threshold", type=float, default=0.9)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    cache = SemanticCache(capacity=args.entries, threshold=args.threshold)
+    articles = []
+
+    start = time.perf_counter()
+    for i in range(args.entries):
+        text = make_article(rng)
+        url = f"https://news.example.com/2024/{i}"
+        cache.store(url, text, "", f"tweet {i}", vector=embed(text))
+        if i < args.queries:
+            articles.append((url, text))
+    fill_seconds = time.perf_counter() - start
+
+    exact = [(f"{url}?utm_source=twitter&utm_medium=social", text, "  ") for url, text in articles]
+    near = [(f"https://mirror.example.net/{i}", perturb(rng, text), "") for i, (url, text) in enumerate(articles)]
+    unrelated = [(f"https://other.example.org/{i}", make_article(rng), "") for i in range(args.queries)]
+
+    results = {
+        "fill": {"entries": args.entries, "seconds": round(fill_seconds, 2),
+                 "matrix_mb": round(cache._vectors.nbytes / 2**20, 1)},
+        "exact_url_variants": time_lookups(cache, exact),
+        "near_duplicates": time_lookups(cache, near),
+        "unrelated": time_lookups(cache, unrelated),
+    }
+
+    print(f"filled {args.entries} entries in {fill_seconds:.1f}s ({results['fill']['matrix_mb']} MB matrix)")
+    for name in ("exact_url_variants", "near_duplicates", "unrelated"):
+        r = results[name]
+        print(f"{name:<20} hit rate {r['hit_rate']:.3f}  p50 {r['p50_ms']}ms  p99 {r['p99_ms']}ms")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
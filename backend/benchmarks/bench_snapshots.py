@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Write, read and re-analysis throughput of the page snapshot archive.
+
+Archives `--pages` variants of the corpus pages, then reports append
+throughput and compression ratio, random-read latency through the memory
+maps, and pages per second for re-analysing every snapshot with
+reanalyze.py against fetching and analysing the same pages from the local
+corpus server.
+
+Usage (from the backend directory):
+    python -m benchmarks.bench_snapshots --pages 2000 --processes 4
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import reanalyze
+from benchmarks.harness import summarize
+from benchmarks.stubs import CorpusServer, load_corpus
+from tools import snapshots, url_analyser
+from tools.fetcher import Fetcher, set_fetcher
+from tools.snapshots import SnapshotArchive
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=2000)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    corpus = [body for name, body in load_corpus().items() if name != "sparse_page"]
+    pages = {f"https://news.example.com/{i}": corpus[i % len(corpus)].replace("</body>", f"<p>Page {i}</p></body>")
+             for i in range(args.pages)}
+    raw_bytes = sum(len(body.encode("utf-8")) for body in pages.values())
+    results = {"codec": "zstd" if snapshots.zstandard else "zlib"}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        archive = SnapshotArchive(tmp)
+        start = time.perf_counter()
+        for url, body in pages.items():
+            archive.put(url, body)
+        seconds = time.perf_counter() - start
+        stored = sum(os.path.getsize(os.path.join(tmp, name)) for name in os.listdir(tmp))
+        results["write_mb_per_s"] = round(raw_bytes / seconds / 1e6, 1)
+        results["compression_ratio"] = round(raw_bytes / stored, 2)
+
+        urls = random.Random(7).choices(list(pages), k=2000)
+        latencies = []
+        start = time.perf_counter()
+        for url in urls:
+            t0 = time.perf_counter()
+            archive.get(url)
+            latencies.append(time.perf_counter() - t0)
+        results["read"] = summarize(latencies, time.perf_counter() - start)
+        archive.close()
+
+        output = os.path.join(tmp, "analysis.jsonl")
+        start = time.perf_counter()
+        reanalyze.main(["-o", output, "--snapshots", tmp, "--processes", str(args.processes)])
+        results["reanalyze_pages_per_s"] = round(args.pages / (time.perf_counter() - start), 1)
+
+    # One localhost host: no per-host pacing, so this measures fetch cost rather than politeness
+    previous_fetcher = set_fetcher(Fetcher(host_rate=0, host_concurrency=1000))
+    with CorpusServer() as server:
+        urls = [server.url_for(name) for name in server.pages if name != "sparse_page"]
+        count = min(args.pages, 200)
+        start = time.perf_counter()
+        for i in range(count):
+            url_analyser.analyze_url_content(urls[i % len(urls)])
+        results["fetch_and_analyze_pages_per_s"] = round(count / (time.perf_counter() - start), 1)
+    set_fetcher(previous_fetcher)
+
+    print(f"write     {results['write_mb_per_s']} MB/s, {results['codec']} ratio {results['compression_ratio']}x")
+    print(f"read      p50 {results['read']['p50_ms']}ms  p99 {results['read']['p99_ms']}ms")
+    print(f"analysis  {results['reanalyze_pages_per_s']} pages/s from snapshots ({args.processes} processes), "
+          f"{results['fetch_and_analyze_pages_per_s']} pages/s fetching from localhost")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
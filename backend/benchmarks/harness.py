@@ -0,0 +1,87 @@
+"""
+Timing helpers shared by the benchmark scripts.
+"""
+
+import json
+import math
+import os
+import platform
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def summarize(latencies, wall_time):
+    latencies = sorted(latencies)
+    return {
+        "iterations": len(latencies),
+        "throughput_per_s": round(len(latencies) / wall_time, 2) if wall_time else 0.0,
+        "p50_ms": round(percentile(latencies, 50) * 1000, 3),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 3),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 3),
+        "mean_ms": round(sum(latencies) / len(latencies) * 1000, 3) if latencies else 0.0,
+    }
+
+
+def measure(fn, iterations, concurrency=1, warmup=1):
+    """Call `fn(i)` `iterations` times across `concurrency` threads and summarize latency"""
+    for i in range(warmup):
+        fn(i)
+
+    def timed(i):
+        start = time.perf_counter()
+        fn(i)
+        return time.perf_counter() - start
+
+    start = time.perf_counter()
+    if concurrency == 1:
+        latencies = [timed(i) for i in range(iterations)]
+    else:
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            latencies = list(pool.map(timed, range(iterations)))
+    wall_time = time.perf_counter() - start
+
+    result = summarize(latencies, wall_time)
+    result["concurrency"] = concurrency
+    return result
+
+
+def environment():
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+
+def write_report(path, results):
+    report = {"environment": environment(), "results": results}
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    return report
+
+
+def compare(baseline_path, results, tolerance=0.2):
+    """
+    Compare p95 latency against a stored baseline.
+
+    Returns a list of (name, baseline_ms, current_ms) for every benchmark
+    whose p95 grew by more than `tolerance`.
+    """
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)["results"]
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous or not previous.get("p95_ms"):
+            continue
+        if current["p95_ms"] > previous["p95_ms"] * (1 + tolerance):
+            regressions.append((name, previous["p95_ms"], current["p95_ms"]))
+    return regressions
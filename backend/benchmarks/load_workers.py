@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Load test showing throughput scaling with the number of uvicorn workers.
+
+For each worker count, starts `serve.py` with the stub-LLM app, drives
+/api/url-analysis against the recorded corpus with concurrent clients for a
+fixed duration, and reports requests/second. The analysis is dominated by
+CPU-bound HTML parsing, so throughput should grow with workers up to the
+number of cores.
+
+Usage (from the backend directory):
+    python -m benchmarks.load_workers --workers 1 2 4 --duration 10
+"""
+
+import argparse
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+import requests
+
+from benchmarks.harness import summarize, environment
+from benchmarks.stubs import CorpusServer, load_corpus
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_until_ready(base_url, timeout=60):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            if requests.get(f"{base_url}/api/health", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def drive(base_url, page_url, clients, duration):
+    latencies = []
+    errors = [0]
+    lock = threading.Lock()
+    stop_at = time.perf_counter() + duration
+
+    def client():
+        session = requests.Session()
+        while time.perf_counter() < stop_at:
+            start = time.perf_counter()
+            response = session.get(f"{base_url}/api/url-analysis", params={"url": page_url}, timeout=60)
+            elapsed = time.perf_counter() - start
+            with lock:
+                if response.status_code == 200:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    result = summarize(latencies, time.perf_counter() - start)
+    result["errors"] = errors[0]
+    return result
+
+
+def run(workers, clients, duration, llm_latency, page_url):
+    port = free_port()
+    with tempfile.TemporaryDirectory() as state_dir:
+        env = {
+            **os.environ,
+            "APP_MODULE": "benchmarks.stub_app:app",
+            "WEB_CONCURRENCY": str(workers),
+            "HOST": "127.0.0.1",
+            "PORT": str(port),
+            "STUB_LLM_LATENCY": str(llm_latency),
+            # Every page comes from one localhost host: no per-host pacing or concurrency cap
+            "FETCH_HOST_RATE": "0",
+            "FETCH_HOST_CONCURRENCY": "1000",
+            "STATE_BACKEND_URL": f"sqlite:///{os.path.join(state_dir, 'state.db')}",
+            "LOG_LEVEL": "WARNING",
+        }
+        server = subprocess.Popen(
+            [sys.executable, "serve.py"], cwd=BACKEND_DIR, env=env,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            base_url = f"http://127.0.0.1:{port}"
+            wait_until_ready(base_url)
+            drive(base_url, page_url, clients, min(2, duration))  # warm every worker
+            return drive(base_url, page_url, clients, duration)
+        finally:
+            server.terminate()
+            server.wait(timeout=30)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10)
+    parser.add_argument("--llm-latency", type=float, default=0.0)
+    parser.add_argument("--output", help="write results as JSON")
+    args = parser.parse_args()
+
+    results = {}
+    with CorpusServer(load_corpus()) as corpus_server:
+        page_url = corpus_server.url_for("engineering_blog")
+        for workers in args.workers:
+            result = run(workers, args.clients, args.duration, args.llm_latency, page_url)
+            results[f"workers={workers}"] = result
+            print(f"workers={workers:<3} {result['throughput_per_s']:>8} req/s  "
+                  f"p50 {result['p50_ms']}ms  p99 {result['p99_ms']}ms  errors {result['errors']}")
+
+    base = results[f"workers={args.workers[0]}"]["throughput_per_s"] or 1
+    for name, result in results.items():
+        print(f"{name}: {result['throughput_per_s'] / base:.2f}x")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"environment": environment(), "results": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite for the URL-to-tweet pipeline.
+
+Serves the recorded corpus and a mock Twitter API from localhost, swaps the
+OpenAI model for a stub with configurable latency, and reports throughput
+and p50/p95/p99 for each pipeline entry point and the FastAPI endpoints.
+
+Usage (from the backend directory):
+    python -m benchmarks.run --output benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json
+"""
+
+import argparse
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+from benchmarks.harness import measure, write_report, compare
+from benchmarks.stubs import CorpusServer, MockTwitterServer, StubChatModel, load_corpus, session_cookie
+
+SESSION_SECRET = "benchmark-secret"
+
+
+def install_stub_llm(url_analyser, latency):
+    """Make `tweet_from_url` build its agent around the stub model; returns an undo callable"""
+    original = url_analyser.create_agent
+    stub = StubChatModel(latency=latency)
+    url_analyser.create_agent = lambda llm=None: original(llm=llm or stub)
+
+    def restore():
+        url_analyser.create_agent = original
+
+    return restore
+
+
+def bench_pipeline(args, corpus_server):
+    from tools import url_analyser
+
+    pages = [name for name in corpus_server.pages if name != "sparse_page"]
+    urls = [corpus_server.url_for(name) for name in pages]
+    results = {}
+
+    results["analyze_url_content"] = measure(
+        lambda i: url_analyser.analyze_url_content(urls[i % len(urls)]),
+        args.iterations,
+    )
+
+    htmls = [corpus_server.pages[name].decode("utf-8") for name in pages]
+    results["analyze_html"] = measure(
+        lambda i: url_analyser.analyze_html(htmls[i % len(htmls)]),
+        args.iterations,
+    )
+
+    long_text = " ".join(
+        f"Sentence number {n} explains one more detail about the system under test." for n in range(60)
+    )
+    results["split_into_thread"] = measure(
+        lambda i: url_analyser.split_into_thread(long_text),
+        args.iterations * 20,
+    )
+
+    results["tweet_from_url"] = measure(
+        lambda i: url_analyser.tweet_from_url(urls[i % len(urls)]),
+        args.iterations,
+    )
+    results["tweet_from_url_variants_3"] = measure(
+        lambda i: url_analyser.tweet_from_url(urls[i % len(urls)], variants=3),
+        args.iterations,
+    )
+    results["tweet_from_url_concurrent"] = measure(
+        lambda i: url_analyser.tweet_from_url(urls[i % len(urls)]),
+        args.iterations * 2,
+        concurrency=args.concurrency,
+    )
+    return results
+
+
+def bench_endpoints(args, corpus_server, twitter_server):
+    from fastapi.testclient import TestClient
+    import main
+    from tools import twitter
+
+    main.TWITTER_API_BASE = twitter.TWITTER_API_BASE = twitter_server.base_url
+    client = TestClient(main.app)
+    client.cookies.set(
+        "session",
+        session_cookie({"twitter_token": "bench-token", "token_type": "Bearer"}, main.session_secret()),
+    )
+    url = corpus_server.url_for("news_article")
+    thread = [f"{n}/5 Benchmark tweet body number {n}." for n in range(1, 6)]
+    results = {}
+
+    def health(i):
+        assert client.get("/api/health").status_code == 200
+
+    def url_analysis(i):
+        assert client.get("/api/url-analysis", params={"url": url}).status_code == 200
+
+    def post_thread(i):
+        response = client.post("/api/twitter/post", data={"tweets": thread})
+        assert response.status_code == 200, response.text
+
+    results["GET /api/health"] = measure(health, args.iterations * 10, concurrency=args.concurrency)
+    results["GET /api/url-analysis"] = measure(url_analysis, args.iterations * 2, concurrency=args.concurrency)
+    results["POST /api/twitter/post"] = measure(post_thread, args.iterations * 2, concurrency=args.concurrency)
+    return results
+
+
+def main_cli(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="seconds per stub model call")
+    parser.add_argument("--fetch-latency", type=float, default=0.0, help="seconds per corpus page fetch")
+    parser.add_argument("--twitter-latency", type=float, default=0.01, help="seconds per mock tweet post")
+    parser.add_argument("--output", help="write results as a JSON baseline")
+    parser.add_argument("--compare", help="baseline JSON to compare p95 latency against")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed p95 growth before failing")
+    parser.add_argument("--semantic-cache", action="store_true",
+                        help="leave the generation cache on (off by default so every call runs the pipeline)")
+    parser.add_argument("--analysis-cache", action="store_true",
+                        help="leave the shared analysis cache on (off by default so every call fetches and parses)")
+    args = parser.parse_args(argv)
+
+    os.environ["SESSION_SECRET"] = SESSION_SECRET
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+
+    from tools import url_analyser
+    from tools.fetcher import Fetcher, set_fetcher
+
+    restore = install_stub_llm(url_analyser, args.llm_latency)
+    # Every page comes from one localhost host: no per-host pacing or concurrency cap
+    previous_fetcher = set_fetcher(Fetcher(host_rate=0, host_concurrency=1000))
+    cache_enabled = url_analyser.SEMANTIC_CACHE_ENABLED
+    url_analyser.SEMANTIC_CACHE_ENABLED = args.semantic_cache
+    analysis_cache_ttl = url_analyser.ANALYSIS_CACHE_TTL
+    if not args.analysis_cache:
+        url_analyser.ANALYSIS_CACHE_TTL = 0
+    try:
+        with CorpusServer(load_corpus(), latency=args.fetch_latency) as corpus_server, \
+                MockTwitterServer(latency=args.twitter_latency) as twitter_server:
+            results = bench_pipeline(args, corpus_server)
+            results.update(bench_endpoints(args, corpus_server, twitter_server))
+    finally:
+        restore()
+        url_analyser.SEMANTIC_CACHE_ENABLED = cache_enabled
+        url_analyser.ANALYSIS_CACHE_TTL = analysis_cache_ttl
+        set_fetcher(previous_fetcher)
+
+    width = max(len(name) for name in results)
+    print(f"{'benchmark':<{width}}  {'ops/s':>9}  {'p50 ms':>9}  {'p95 ms':>9}  {'p99 ms':>9}")
+    for name, r in results.items():
+        print(f"{name:<{width}}  {r['throughput_per_s']:>9}  {r['p50_ms']:>9}  {r['p95_ms']:>9}  {r['p99_ms']:>9}")
+
+    if args.output:
+        write_report(args.output, results)
+        print(f"\nBaseline written to {args.output}")
+
+    if args.compare:
+        regressions = compare(args.compare, results, args.tolerance)
+        for name, before, after in regressions:
+            print(f"❌ {name}: p95 {before}ms -> {after}ms")
+        if regressions:
+            return 1
+        print("✅ No p95 regressions against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
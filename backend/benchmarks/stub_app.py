@@ -0,0 +1,15 @@
+"""
+The real FastAPI app with the OpenAI model swapped for the stub, for load
+tests that run the server in separate worker processes.
+
+    APP_MODULE=benchmarks.stub_app:app STUB_LLM_LATENCY=0.05 python serve.py
+"""
+
+import os
+
+from benchmarks.run import install_stub_llm
+from tools import url_analyser
+
+install_stub_llm(url_analyser, float(os.environ.get("STUB_LLM_LATENCY", "0")))
+
+from main import app  # noqa: E402
@@ -0,0 +1,298 @@
+"""
+Offline stand-ins for everything the pipeline talks to over the network:
+a corpus server for recorded article pages, a mock Twitter API v2 server
+and a stub chat model with configurable latency.
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+CORPUS_DIR = os.path.join(os.path.dirname(__file__), "corpus")
+
+
+def load_corpus():
+    """Return {name: html} for every recorded page in the corpus directory"""
+    pages = {}
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+                pages[filename[:-5]] = f.read()
+    return pages
+
+
+FEED_STYLES = ("techcrunch", "wired", "theverge", "medium")
+
+
+def build_feed(style, entries=40):
+    """
+    A feed shaped like `style`'s, with the corpus articles as entry bodies:
+    TechCrunch (RSS with a CDATA excerpt and the full article in
+    content:encoded), Wired (RSS with an escaped description only), The Verge
+    (Atom with HTML summary and content) and Medium (RSS with content:encoded
+    only).
+    """
+    from xml.sax.saxutils import escape
+
+    articles = [
+        re.search(r"<body[^>]*>(.*)</body>", page, re.DOTALL).group(1).strip()
+        for page in load_corpus().values()
+    ]
+    items = []
+    for i in range(entries):
+        body = articles[i % len(articles)]
+        title = f"Story {i}: databases &amp; the edge"
+        link = f"https://{style}.example.com/2024/06/{i:02d}/story-{i}/"
+        date = f"Mon, {10 + i % 18:02d} Jun 2024 {i % 24:02d}:15:00 +0000"
+        excerpt = f"<p>The {i}th story&nbsp;in the feed, and why it matters.</p>"
+        if style == "techcrunch":
+            items.append(
+                f"<item><title>{title}</title><link>{link}</link><dc:creator><![CDATA[Reporter {i}]]></dc:creator>"
+                f"<pubDate>{date}</pubDate><category><![CDATA[AI]]></category>"
+                f'<guid isPermaLink="false">https://techcrunch.example.com/?p={i}</guid>'
+                f"<description><![CDATA[{excerpt}]]></description>"
+                f"<content:encoded><![CDATA[{body}]]></content:encoded></item>"
+            )
+        elif style == "wired":
+            items.append(
+                f"<item><title>{title}</title><link>{link}</link><guid>{link}</guid><pubDate>{date}</pubDate>"
+                f"<description>{escape(excerpt)}</description>"
+                f'<media:thumbnail url="https://media.example.com/{i}.jpg" width="2400" height="1600"/></item>'
+            )
+        elif style == "theverge":
+            items.append(
+                f'<entry><title type="html">{title}</title><published>2024-06-{10 + i % 18:02d}T{i % 24:02d}:15:00Z</published>'
+                f"<updated>2024-06-{10 + i % 18:02d}T{i % 24:02d}:30:00Z</updated>"
+                f'<id>{link}</id><link rel="alternate" type="text/html" href="{link}"/>'
+                f'<summary type="html">{escape(excerpt)}</summary>'
+                f'<content type="html">{escape(body)}</content><author><name>Reporter {i}</name></author></entry>'
+            )
+        elif style == "medium":
+            items.append(
+                f"<item><title><![CDATA[Story {i}: databases & the edge]]></title><link>{link}</link>"
+                f'<guid isPermaLink="false">https://medium.example.com/p/{i:x}</guid>'
+                f"<category><![CDATA[technology]]></category><dc:creator><![CDATA[Writer {i}]]></dc:creator>"
+                f"<pubDate>{date}</pubDate><atom:updated>2024-06-10T12:00:00.000Z</atom:updated>"
+                f"<content:encoded><![CDATA[{body}]]></content:encoded></item>"
+            )
+        else:
+            raise ValueError(f"Unknown feed style {style}")
+    if style == "theverge":
+        return (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<feed xmlns="http://www.w3.org/2005/Atom" xml:lang="en-US">'
+            f"<title>The Verge</title><id>https://theverge.example.com/rss/index.xml</id>{''.join(items)}</feed>"
+        )
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n<rss version="2.0" xmlns:content="http://purl.org/rss/1.0/modules/content/" '
+        'xmlns:dc="http://purl.org/dc/elements/1.1/" xmlns:atom="http://www.w3.org/2005/Atom" '
+        'xmlns:media="http://search.yahoo.com/mrss/"><channel>'
+        f'<title>{style}</title><link>https://{style}.example.com</link>'
+        f'<atom:link href="https://{style}.example.com/feed/" rel="self" type="application/rss+xml"/>'
+        f"{''.join(items)}</channel></rss>"
+    )
+
+
+class StubChatModel(SimpleChatModel):
+    """
+    Deterministic chat model that sleeps for `latency` seconds per call and
+    answers with a tweet-shaped string derived from the prompt. Like the
+    OpenAI API it honours `n` (several completions in one call) and a
+    per-request `timeout`, and it answers batched "Tweet 1: ... Tweet N:" prompts with N `---`-separated
+    tweets.
+    """
+
+    latency: float = 0.0
+    reply_length: int = 420
+    calls: int = 0
+
+    @property
+    def _llm_type(self):
+        return "stub-chat"
+
+    def _reply(self, prompt, index=0):
+        digest = hashlib.sha1(f"{index}:{prompt}".encode("utf-8")).hexdigest()
+        sentence = f"Insight {digest[:8]} on retrieval, latency and caching trade-offs. "
+        text = (sentence * (self.reply_length // len(sentence) + 1))[: self.reply_length]
+        return text.rstrip() + " #AI #Engineering"
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._generate(messages, stop, run_manager, **kwargs).generations[0].message.content
+
+    def _latency(self):
+        return self.latency
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        self.calls += 1
+        latency = self._latency()
+        # A request timeout ends the call early, like the OpenAI client's
+        timeout = kwargs.get("timeout")
+        if timeout is not None and latency > timeout:
+            time.sleep(timeout)
+            raise TimeoutError("Request timed out.")
+        if latency:
+            time.sleep(latency)
+        prompt = "\n".join(str(m.content) for m in messages)
+        batch = len(re.findall(r"^Tweet \d+:", prompt, flags=re.M))
+        texts = []
+        for index in range(kwargs.get("n", 1)):
+            if batch:
+                texts.append("\n---\n".join(self._reply(prompt, f"{index}.{i}") for i in range(batch)))
+            else:
+                texts.append(self._reply(prompt, index))
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=t)) for t in texts])
+
+
+class _QuietHandler(BaseHTTPRequestHandler):
+    # Keep-alive, like real servers; every response sets Content-Length
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def handle(self):
+        try:
+            super().handle()
+        except (ConnectionResetError, BrokenPipeError):
+            pass  # the client stopped reading early (streamed feeds do)
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server:
+    """Run a ThreadingHTTPServer on an ephemeral localhost port"""
+
+    handler = _QuietHandler
+
+    def __init__(self):
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self.httpd.daemon_threads = True
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def _make_handler(self):
+        return self.handler
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+
+class CorpusServer(_Server):
+    """
+    Serves recorded pages at /pages/<name> with an ETag (answering 304 to a
+    matching If-None-Match) and, with `compress`, gzip when the client accepts it.
+    """
+
+    def __init__(self, pages=None, latency=0.0, compress=False):
+        self.pages = {name: html.encode("utf-8") for name, html in (pages or load_corpus()).items()}
+        self.latency = latency
+        self.compress = compress
+        self.hits = {}
+        self.connections = set()
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def url_for(self, name):
+        return f"{self.base_url}/pages/{name}"
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                name = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+                with server._lock:
+                    server.hits[name] = server.hits.get(name, 0) + 1
+                    server.connections.add(self.client_address)
+                if server.latency:
+                    time.sleep(server.latency)
+                body = server.pages.get(name)
+                if body is None:
+                    self._send_json(404, {"error": "not found"})
+                    return
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.send_header("Content-Length", "0")
+                    self.end_headers()
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", "text/html; charset=utf-8")
+                self.send_header("ETag", etag)
+                if server.compress and "gzip" in self.headers.get("Accept-Encoding", ""):
+                    body = gzip.compress(body)
+                    self.send_header("Content-Encoding", "gzip")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+        return Handler
+
+
+class MockTwitterServer(_Server):
+    """Minimal Twitter API v2: POST /2/tweets and GET /2/users/me"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.tweets = []
+        self._lock = threading.Lock()
+        super().__init__()
+
+    def _make_handler(self):
+        server = self
+
+        class Handler(_QuietHandler):
+            def do_GET(self):
+                if self.path.startswith("/2/users/me"):
+                    self._send_json(200, {"data": {"id": "1", "name": "Bench", "username": "bench"}})
+                else:
+                    self._send_json(404, {"error": "not found"})
+
+            def do_POST(self):
+                # Read the body first so a kept-alive connection stays in sync
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.startswith("/2/tweets"):
+                    self._send_json(404, {"error": "not found"})
+                    return
+                if server.latency:
+                    time.sleep(server.latency)
+                with server._lock:
+                    server.tweets.append(payload)
+                    tweet_id = str(len(server.tweets))
+                self._send_json(201, {"data": {"id": tweet_id, "text": payload.get("text", "")}})
+
+        return Handler
+
+
+def session_cookie(data, secret):
+    """Build a Starlette session cookie so endpoints see an authenticated session"""
+    import base64
+    from itsdangerous import TimestampSigner
+
+    payload = base64.b64encode(json.dumps(data).encode("utf-8"))
+    return TimestampSigner(secret).sign(payload).decode("utf-8")
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Backfill tweet drafts for many article URLs without going through the API.
+
+URLs are read one per line from a file (or stdin with "-"), fetched on a
+thread pool, parsed and analyzed on a process pool (the CPU-bound stage, so
+it scales with cores) and generated on a small thread pool whose model calls
+are rate-limited. Each result is appended to the JSONL output as soon as it
+completes. Re-running with the same output file resumes: URLs that already
+have a successful line are skipped, failed ones are retried.
+
+    python bulk.py urls.txt -o drafts.jsonl
+    cat urls.txt | python bulk.py - -o drafts.jsonl --processes 4 --llm-rpm 120
+
+Environment: the same as the API (OPENAI_API_KEY, PROMPT_TOKEN_BUDGET, ...).
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from dotenv import load_dotenv
+
+from tools import url_analyser
+from tools.compressor import load_encoding
+from tools.log import get_logger
+from tools.urls import canonicalize_url
+
+log = get_logger("bulk")
+
+
+class RateLimiter:
+    """Allow at most `per_minute` acquisitions per minute, evenly spaced"""
+
+    def __init__(self, per_minute):
+        self.interval = 60.0 / per_minute if per_minute else 0.0
+        self._next = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            wait_for = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait_for > 0:
+            time.sleep(wait_for)
+
+
+def read_urls(source):
+    """URLs from an iterable of lines, skipping blanks, comments and repeats of the same article"""
+    seen = set()
+    for line in source:
+        url = line.strip()
+        if not url or url.startswith("#"):
+            continue
+        key = canonicalize_url(url)
+        if key not in seen:
+            seen.add(key)
+            yield url
+
+
+def completed_urls(path, need_tweet=True):
+    """Canonical URLs that already have a successful result (with a tweet, unless analysis-only) in the output"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue  # a line cut short by an interrupted run
+            if record.get("success") and (record.get("tweet") or not need_tweet):
+                done.add(canonicalize_url(record["url"]))
+    return done
+
+
+def parse_page(html):
+    """Process-pool stage: analyze_url_content minus the fetch"""
+    try:
+        return url_analyser.analyze_html(html)
+    except Exception as e:
+        return {"success": False, "error": str(e)}
+
+
+RESULT_FIELDS = ("canonical_url", "title", "tweet", "thread_tweets", "is_thread", "variants", "compression", "cache")
+
+
+def to_record(url, analysis, started, full=False):
+    """One JSONL line: the generated tweet(s), or with `full` the whole analysis"""
+    if analysis is None:
+        analysis = {"success": False, "error": "No tweet could be generated from this page"}
+    if full:
+        record = {"url": url, **{k: v for k, v in analysis.items() if k != "paragraphs"}}
+    else:
+        record = {"url": url, "success": analysis["success"]}
+        record.update((field, analysis[field]) for field in RESULT_FIELDS if field in analysis)
+        if analysis.get("error"):
+            record["error"] = analysis["error"]
+    record["seconds"] = round(time.perf_counter() - started, 3)
+    return record
+
+
+class BulkRunner:
+    def __init__(self, fetch_concurrency=8, processes=None, llm_concurrency=4, llm_rpm=60,
+                 additional_text="", variants=1, generate=True):
+        self.fetch_concurrency = fetch_concurrency
+        self.processes = processes or os.cpu_count() or 1
+        self.llm_concurrency = llm_concurrency
+        self.limiter = RateLimiter(llm_rpm)
+        self.additional_text = additional_text
+        self.variants = variants
+        self.generate = generate
+
+    def _generate(self, url, analysis):
+        self.limiter.acquire()
+        return url_analyser.tweet_from_analysis(url, analysis, self.additional_text, self.variants)
+
+    def run(self, urls, write):
+        """
+        Push every URL through fetch -> parse -> generate, calling `write(record)`
+        as each one finishes. Returns {"ok", "failed"} counts.
+        """
+        urls = iter(urls)
+        counts = {"ok": 0, "failed": 0}
+        # Enough URLs in flight to keep every stage busy without reading the whole input
+        max_in_flight = self.fetch_concurrency + 2 * self.processes + self.llm_concurrency
+        pending = {}
+
+        def finish(url, analysis, started):
+            record = to_record(url, analysis, started, full=not self.generate)
+            counts["ok" if record["success"] else "failed"] += 1
+            write(record)
+
+        # Parse workers are spawned rather than forked: forking a process that
+        # already runs fetch threads can copy a held lock into the child
+        with ThreadPoolExecutor(self.fetch_concurrency, thread_name_prefix="fetch") as fetchers, \
+                ProcessPoolExecutor(self.processes, mp_context=multiprocessing.get_context("spawn")) as parsers, \
+                ThreadPoolExecutor(self.llm_concurrency, thread_name_prefix="generate") as generators:
+            exhausted = False
+            while pending or not exhausted:
+                while not exhausted and len(pending) < max_in_flight:
+                    url = next(urls, None)
+                    if url is None:
+                        exhausted = True
+                        break
+                    pending[fetchers.submit(url_analyser.fetch_page, url)] = ("fetch", url, time.perf_counter())
+                if not pending:
+                    break
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage, url, started = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        finish(url, {"success": False, "error": str(e)}, started)
+                        continue
+                    if stage == "fetch":
+                        pending[parsers.submit(parse_page, result)] = ("parse", url, started)
+                    elif stage == "parse" and result.get("success") and self.generate:
+                        pending[generators.submit(self._generate, url, result)] = ("generate", url, started)
+                    else:
+                        finish(url, result, started)
+        return counts
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", nargs="?", default="-", help="file with one URL per line, or - for stdin")
+    parser.add_argument("-o", "--output", required=True, help="JSONL file results are appended to")
+    parser.add_argument("--instructions", default="", help="additional instructions for every tweet")
+    parser.add_argument("--variants", type=int, default=1, help=f"ranked alternatives per URL (max {url_analyser.MAX_VARIANTS})")
+    parser.add_argument("--fetch-concurrency", type=int, default=8)
+    parser.add_argument("--processes", type=int, default=None, help="parse processes (default: CPU count)")
+    parser.add_argument("--llm-concurrency", type=int, default=4)
+    parser.add_argument("--llm-rpm", type=float, default=60, help="max generations started per minute (0 = no limit)")
+    parser.add_argument("--analyze-only", action="store_true",
+                        help="skip generation (no LLM calls) and write the full analysis per URL")
+    parser.add_argument("--no-resume", action="store_true", help="reprocess URLs already in the output")
+    args = parser.parse_args(argv)
+
+    load_dotenv()
+    if args.input == "-":
+        urls = list(read_urls(sys.stdin))
+    else:
+        with open(args.input, encoding="utf-8") as f:
+            urls = list(read_urls(f))
+
+    done = set() if args.no_resume else completed_urls(args.output, need_tweet=not args.analyze_only)
+    todo = [url for url in urls if canonicalize_url(url) not in done]
+    log.info("bulk_start", urls=len(urls), skipped=len(urls) - len(todo), output=args.output)
+
+    runner = BulkRunner(
+        fetch_concurrency=args.fetch_concurrency,
+        processes=args.processes,
+        llm_concurrency=args.llm_concurrency,
+        llm_rpm=args.llm_rpm,
+        additional_text=args.instructions,
+        variants=max(1, min(args.variants, url_analyser.MAX_VARIANTS)),
+        generate=not args.analyze_only,
+    )
+    if not args.analyze_only:
+        load_encoding()
+    start = time.perf_counter()
+    with open(args.output, "a", encoding="utf-8") as out:
+        def write(record):
+            # One flushed line per URL: an interrupted run loses at most the line being written
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+
+        counts = runner.run(todo, write)
+
+    seconds = time.perf_counter() - start
+    log.info("bulk_complete", seconds=round(seconds, 2),
+             urls_per_s=round(len(todo) / seconds, 2) if seconds else 0.0, **counts)
+    return 0 if not counts["failed"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,37 @@
+"""
+pytest setup: keep every test's state out of backend/.state.
+
+The paths are read from the environment when the tools are imported, so
+they are pointed at a scratch directory here, before any test module is
+collected (subprocesses started by the tests inherit them too). Each test
+then gets its own empty state backend, archives and schedule store under
+`tmp_path`.
+"""
+
+import atexit
+import os
+import shutil
+import tempfile
+
+import pytest
+
+_scratch = tempfile.mkdtemp(prefix="tweetai-tests-")
+atexit.register(shutil.rmtree, _scratch, ignore_errors=True)
+os.environ["STATE_BACKEND_URL"] = f"sqlite:///{os.path.join(_scratch, 'state.db')}"
+os.environ["SNAPSHOT_DIR"] = os.path.join(_scratch, "snapshots")
+os.environ["ARTICLE_ARCHIVE_PATH"] = os.path.join(_scratch, "articles.db")
+os.environ["SCHEDULE_DB_PATH"] = os.path.join(_scratch, "schedule.db")
+
+
+@pytest.fixture(autouse=True)
+def isolated_state(tmp_path, monkeypatch):
+    from tools import archive, scheduler, snapshots, state
+
+    monkeypatch.setattr(state, "STATE_BACKEND_URL", f"sqlite:///{tmp_path / 'state.db'}")
+    monkeypatch.setattr(snapshots, "SNAPSHOT_DIR", str(tmp_path / "snapshots"))
+    monkeypatch.setattr(archive, "ARTICLE_ARCHIVE_PATH", str(tmp_path / "articles.db"))
+    monkeypatch.setattr(scheduler, "SCHEDULE_DB_PATH", str(tmp_path / "schedule.db"))
+    # Process-wide singletons are created again, at the paths above, on first use
+    for module, name in ((state, "_backend"), (snapshots, "_archive"), (archive, "_archive"),
+                         (scheduler, "_store"), (scheduler, "_scheduler")):
+        monkeypatch.setattr(module, name, None)
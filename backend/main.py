@@ -5,42 +5,112 @@ import base64
 import time
 import hmac
 import urllib.parse
-import re
-from fastapi import FastAPI, Request, HTTPException
+from fastapi import FastAPI, Request, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from dotenv import load_dotenv
-from tools.url_analyser import tweet_from_url
+from tools.url_analyser import tweet_from_url, tweet_from_url_async, warm_up
 from fastapi.middleware.cors import CORSMiddleware
 from starlette.middleware.sessions import SessionMiddleware
-from fastapi.responses import RedirectResponse, JSONResponse
+from starlette.middleware.gzip import GZipMiddleware
+from fastapi.responses import RedirectResponse, JSONResponse, Response
 import secrets
+import threading
+from contextlib import asynccontextmanager
+from tools.log import get_logger
+from tools.metrics import MetricsMiddleware, span, render_prometheus, CONTENT_TYPE as METRICS_CONTENT_TYPE
+from tools.profiling import profile_call, load_profile
+from tools.memory import MEMORY_TRACKING, set_tracking, tracking_enabled
+from tools.compressor import load_encoding
+from tools.state import get_state_backend
+from tools.articles import fetch_tech_articles, search_articles
+from tools.feeds import read_feed
+from tools.prefetch import PrefetchWorker, PREFETCH_ENABLED
+from tools.responses import analysis_response, parse_fields
+from tools.deadline import Deadline, REQUEST_DEADLINE
+from tools.admission import ADMISSION_ENABLED, Overloaded, QuotaExceeded, check_quota, get_request_gate
+from tools.twitter import (
+    AccessLevelError, PublishError, PublishWorker, TWITTER_API_BASE, PUBLISH_WORKERS, get_job, publish_thread,
+    submit, validate_thread,
+)
+from tools.scheduler import SCHEDULER_ENABLED, get_schedule_store, get_scheduler, parse_due
 
 load_dotenv()
-app = FastAPI()
-app.add_middleware(SessionMiddleware, secret_key=os.environ.get("SESSION_SECRET", "random_secret"))
+log = get_logger("main")
 
-def clean_html_content(html_content):
-    """Remove HTML tags and clean up the content"""
-    if not html_content:
-        return ""
-    
-    # Remove HTML tags
-    clean_text = re.sub(r'<[^>]+>', '', html_content)
-    
-    # Remove extra whitespace and newlines
-    clean_text = re.sub(r'\s+', ' ', clean_text)
-    
-    # Remove common HTML entities
-    clean_text = clean_text.replace('&nbsp;', ' ')
-    clean_text = clean_text.replace('&amp;', '&')
-    clean_text = clean_text.replace('&lt;', '<')
-    clean_text = clean_text.replace('&gt;', '>')
-    clean_text = clean_text.replace('&quot;', '"')
-    clean_text = clean_text.replace('&#39;', "'")
-    
-    # Strip leading/trailing whitespace
-    clean_text = clean_text.strip()
-    
-    return clean_text
+# Set WARMUP_ON_STARTUP=1 to import heavy dependencies in the background right
+# after startup instead of on the first request that needs them
+WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "0") == "1"
+
+def _warm_up():
+    start = time.perf_counter()
+    try:
+        warm_up()
+        read_feed([b"<rss><channel></channel></rss>"])
+        log.info("warm_up_complete", seconds=round(time.perf_counter() - start, 3))
+    except Exception as e:
+        log.error("warm_up_failed", error=str(e))
+
+@asynccontextmanager
+async def lifespan(app):
+    if MEMORY_TRACKING:
+        set_tracking(True)
+    if WARMUP_ON_STARTUP:
+        threading.Thread(target=_warm_up, name="warm-up", daemon=True).start()
+    else:
+        # Token counts use a local estimate until the encoding (possibly downloaded) is loaded
+        threading.Thread(target=load_encoding, name="token-encoding", daemon=True).start()
+    # PREFETCH_ENABLED=1 pre-analyzes (and drafts tweets for) the trending articles
+    prefetch = PrefetchWorker() if PREFETCH_ENABLED else None
+    if prefetch:
+        prefetch.start()
+    # Posts threads submitted with /api/twitter/post?async=1
+    publisher = PublishWorker() if PUBLISH_WORKERS else None
+    if publisher:
+        publisher.start()
+    # Hands scheduled posts to the publisher when they are due
+    scheduler = get_scheduler() if SCHEDULER_ENABLED else None
+    if scheduler:
+        scheduler.start()
+    yield
+    if prefetch:
+        prefetch.stop()
+    if scheduler:
+        scheduler.stop()
+    if publisher:
+        publisher.stop()
+
+app = FastAPI(lifespan=lifespan)
+# Compress responses over GZIP_MIN_SIZE bytes for clients that accept gzip
+GZIP_MIN_SIZE = int(os.environ.get("GZIP_MIN_SIZE", "1000"))
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE, compresslevel=6)
+_session_secret = None
+
+def session_secret():
+    """
+    Every worker must sign sessions with the same key. Without SESSION_SECRET a
+    random key is generated once and shared through the state backend.
+    """
+    global _session_secret
+    if _session_secret is None:
+        _session_secret = os.environ.get("SESSION_SECRET") or get_state_backend().get_or_create(
+            "session_secret", lambda: secrets.token_urlsafe(32)
+        )
+    return _session_secret
+
+class LazySessionMiddleware:
+    """SessionMiddleware keyed on startup, so importing main never touches the state backend"""
+
+    def __init__(self, app):
+        self.app = app
+        self.sessions = None
+
+    async def __call__(self, scope, receive, send):
+        if self.sessions is None:
+            # The first event is the lifespan startup, or the first request when there is none
+            self.sessions = SessionMiddleware(self.app, secret_key=session_secret())
+        await self.sessions(scope, receive, send)
+
+app.add_middleware(LazySessionMiddleware)
 
 # Add this after creating the app
 app.add_middleware(
@@ -50,12 +120,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Added last so it's the outermost middleware: latency includes compression, sessions and CORS,
+# and requests those layers answer themselves are counted too
+app.add_middleware(MetricsMiddleware)
 
 # Twitter API v2 Configuration
 TWITTER_CLIENT_ID = os.environ.get("TWITTER_CLIENT_ID")
 TWITTER_CLIENT_SECRET = os.environ.get("TWITTER_CLIENT_SECRET")
 FRONTEND_URL = os.environ.get("VITE_BASE_URL", "http://localhost:8080")
 
+# Admin access: Twitter usernames from the session, or a shared token for scripts
+ADMIN_USERNAMES = {u.strip().lower() for u in os.environ.get("ADMIN_USERNAMES", "").split(",") if u.strip()}
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+
 # OAuth 1.0a credentials (you'll need to add these to your .env file)
 TWITTER_API_KEY = os.environ.get("TWITTER_API_KEY")
 TWITTER_API_SECRET = os.environ.get("TWITTER_API_SECRET")
@@ -112,17 +189,107 @@ def generate_code_challenge(code_verifier):
     sha256_hash = hashlib.sha256(code_verifier.encode('utf-8')).digest()
     return base64.urlsafe_b64encode(sha256_hash).decode('utf-8').rstrip('=')
 
+def is_admin(request):
+    """Check whether the request comes from an admin session or carries the admin token"""
+    header_token = request.headers.get("X-Admin-Token")
+    if ADMIN_TOKEN and header_token and hmac.compare_digest(header_token, ADMIN_TOKEN):
+        return True
+    user_info = request.session.get('twitter_user') or {}
+    username = (user_info.get('data') or {}).get('username', '')
+    return bool(username) and username.lower() in ADMIN_USERNAMES
+
+def client_key(request):
+    """Who a request counts against for fairness and quotas: the Twitter user, else the IP"""
+    user_info = request.session.get('twitter_user') or {}
+    username = (user_info.get('data') or {}).get('username')
+    if username:
+        return f"user:{username.lower()}"
+    return f"ip:{request.client.host if request.client else 'unknown'}"
+
+def busy(retry_after, detail, status_code=503):
+    return HTTPException(status_code=status_code, detail=detail, headers={"Retry-After": str(retry_after)})
+
 @app.get("/api/health")
 def read_root():
     return {"status": "running..."}
 
+@app.get("/api/metrics")
+def metrics():
+    """Expose request, stage and token metrics in Prometheus text format"""
+    return Response(content=render_prometheus(), media_type=METRICS_CONTENT_TYPE)
+
 @app.get("/api/")
 def greet(name: str):
     return {"message": f"Hello, {name}!"}
 
 @app.get("/api/url-analysis")
-def url_analysis(url: str, additional_text: str = ""):
-    return tweet_from_url(url, additional_text)
+async def url_analysis(
+    request: Request,
+    url: str,
+    additional_text: str = "",
+    profile: bool = False,
+    variants: int = Query(1, ge=1, le=5),
+    fields: str = Query("", description='Comma-separated top-level fields to return, or "compact"'),
+    deadline: float | None = Query(None, gt=0, le=300, description="Seconds to finish within"),
+):
+    # Review and reach are skipped, or only the analysis is returned, when time runs low
+    request_deadline = Deadline(deadline or REQUEST_DEADLINE)
+    try:
+        include = parse_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    # Profiling is opt-in per request (?profile=true or X-Profile: 1) and admin-only
+    profiling = profile or request.headers.get("X-Profile") == "1"
+    if profiling and not is_admin(request):
+        raise HTTPException(status_code=403, detail="Profiling is restricted to admins")
+
+    async def generate():
+        if not profiling:
+            return await tweet_from_url_async(url, additional_text, variants, request_deadline)
+        # Only the call itself is profiled; it is admitted and counted like any other request
+        result, summary = await run_in_threadpool(
+            profile_call, tweet_from_url, url, additional_text, variants, request_deadline
+        )
+        return {**(result or {"success": False}), "profile": summary}
+
+    if profiling:
+        include = include and include | {"profile"}
+    if not ADMISSION_ENABLED:
+        return analysis_response(await generate(), include)
+    client = client_key(request)
+    try:
+        await run_in_threadpool(check_quota, client)
+        # Over capacity, answer 503 now rather than queue work that would finish too late
+        async with get_request_gate().admit(client):
+            result = await generate()
+    except QuotaExceeded as e:
+        raise busy(e.retry_after, str(e), status_code=429)
+    except Overloaded as e:
+        raise busy(e.retry_after, str(e))
+    return analysis_response(result, include)
+
+@app.get("/api/admin/profiles/{profile_id}")
+def get_profile(request: Request, profile_id: str):
+    """Download a stored collapsed-stack profile"""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Profiles are restricted to admins")
+    collapsed = load_profile(profile_id)
+    if collapsed is None:
+        raise HTTPException(status_code=404, detail="Profile not found")
+    return Response(content=collapsed, media_type="text/plain; charset=utf-8")
+
+@app.get("/api/admin/memory-tracking")
+def get_memory_tracking(request: Request):
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Memory tracking is restricted to admins")
+    return {"tracking": tracking_enabled()}
+
+@app.post("/api/admin/memory-tracking")
+def set_memory_tracking(request: Request, enabled: bool = Query(...)):
+    """Turn peak memory tracking of page analysis on or off in this worker process"""
+    if not is_admin(request):
+        raise HTTPException(status_code=403, detail="Memory tracking is restricted to admins")
+    return {"tracking": set_tracking(enabled)}
 
 @app.get("/api/twitter/login")
 async def twitter_login(request: Request):
@@ -150,13 +317,13 @@ async def twitter_login(request: Request):
         f"code_challenge={code_challenge}"
     )
     
-    # Debug logging
-    print(f"Starting OAuth 2.0 flow with:")
-    print(f"  Client ID: {TWITTER_CLIENT_ID}")
-    print(f"  Redirect URI: https://fastapi-production-9cc6.up.railway.app/api/twitter/callback")
-    print(f"  State: {state}")
-    print(f"  Code Challenge: {code_challenge}")
-    print(f"  Auth URL: {auth_url}")
+    log.debug(
+        "oauth_flow_started",
+        client_id=TWITTER_CLIENT_ID,
+        redirect_uri="https://fastapi-production-9cc6.up.railway.app/api/twitter/callback",
+        state=state,
+        code_challenge=code_challenge,
+    )
     
     return RedirectResponse(url=auth_url)
 
@@ -174,7 +341,7 @@ async def twitter_callback(request: Request, code: str, state: str):
     
     try:
         # Exchange authorization code for access token with PKCE
-        token_url = "https://api.twitter.com/2/oauth2/token"
+        token_url = f"{TWITTER_API_BASE}/2/oauth2/token"
         token_data = {
             "grant_type": "authorization_code",
             "code": code,
@@ -186,31 +353,31 @@ async def twitter_callback(request: Request, code: str, state: str):
         # Use Basic Auth for client credentials
         auth = (TWITTER_CLIENT_ID, TWITTER_CLIENT_SECRET)
         
-        response = requests.post(token_url, data=token_data, auth=auth)
+        with span("twitter_token_exchange"):
+            response = requests.post(token_url, data=token_data, auth=auth)
         token_response = response.json()
         
-        print(f"Token response status: {response.status_code}")
-        print(f"Token response: {token_response}")
+        log.debug("token_response", status=response.status_code)
         
         if response.status_code != 200:
-            print(f"Token error response: {token_response}")
+            log.warning("token_exchange_failed", status=response.status_code, body=lambda: token_response)
             raise HTTPException(status_code=400, detail="Failed to get access token")
         
         access_token = token_response.get("access_token")
         token_type = token_response.get("token_type", "Bearer")
         
-        print(f"Got access token: {access_token[:20]}...")
-        print(f"Token type: {token_type}")
+        log.debug("access_token_received", access_token=access_token, token_type=token_type)
         
         # Get user information using v2 API
         headers = {"Authorization": f"{token_type} {access_token}"}
-        user_response = requests.get(
-            "https://api.twitter.com/2/users/me",
-            headers=headers
-        )
+        with span("twitter_user_lookup"):
+            user_response = requests.get(
+                f"{TWITTER_API_BASE}/2/users/me",
+                headers=headers
+            )
         
         if user_response.status_code != 200:
-            print(f"User info error response: {user_response.json()}")
+            log.warning("user_info_failed", status=user_response.status_code, body=lambda: user_response.text)
             raise HTTPException(status_code=400, detail="Failed to get user info")
         
         user_info = user_response.json()
@@ -219,6 +386,9 @@ async def twitter_callback(request: Request, code: str, state: str):
         request.session['twitter_token'] = access_token
         request.session['twitter_user'] = user_info
         request.session['token_type'] = token_type
+        # Scheduled posts fire long after the access token expires (offline.access)
+        request.session['refresh_token'] = token_response.get("refresh_token")
+        request.session['token_expires'] = time.time() + token_response.get("expires_in", 7200)
         
         # Clean up OAuth session data
         request.session.pop('oauth_state', None)
@@ -228,7 +398,7 @@ async def twitter_callback(request: Request, code: str, state: str):
         return RedirectResponse(f"{FRONTEND_URL}?twitter_user={user_info['data']['username']}")
         
     except Exception as e:
-        print(f"OAuth error: {str(e)}")
+        log.error("oauth_error", error=str(e))
         raise HTTPException(status_code=500, detail=f"OAuth error: {str(e)}")
 
 @app.get("/api/twitter/test")
@@ -244,13 +414,13 @@ async def test_twitter_auth(request: Request):
         
         # Test the token by getting user info
         headers = {"Authorization": f"Bearer {twitter_token}"}
-        response = requests.get(
-            "https://api.twitter.com/2/users/me",
-            headers=headers
-        )
+        with span("twitter_user_lookup"):
+            response = requests.get(
+                f"{TWITTER_API_BASE}/2/users/me",
+                headers=headers
+            )
         
-        print(f"Test auth response status: {response.status_code}")
-        print(f"Test auth response: {response.text}")
+        log.debug("test_auth_response", status=response.status_code, body=lambda: response.text)
         
         if response.status_code == 200:
             return {"success": True, "user": response.json()}
@@ -282,7 +452,7 @@ async def test_twitter_access(request: Request):
         # Create signature for a simple GET request to v2 API
         signature = generate_oauth_signature(
             "GET",
-            "https://api.twitter.com/2/users/me",
+            f"{TWITTER_API_BASE}/2/users/me",
             oauth_params,
             TWITTER_API_SECRET
         )
@@ -291,17 +461,16 @@ async def test_twitter_access(request: Request):
         # Create authorization header
         auth_header = "OAuth " + ", ".join([f'{k}="{urllib.parse.quote(v, safe="")}"' for k, v in oauth_params.items()])
         
-        print(f"Testing access with API Key: {TWITTER_API_KEY[:10]}...")
-        print(f"Auth header: {auth_header[:100]}...")
+        log.debug("access_test_started", api_key=TWITTER_API_KEY)
         
         # Test the credentials with v2 API
-        response = requests.get(
-            "https://api.twitter.com/2/users/me",
-            headers={"Authorization": auth_header}
-        )
+        with span("twitter_user_lookup"):
+            response = requests.get(
+                f"{TWITTER_API_BASE}/2/users/me",
+                headers={"Authorization": auth_header}
+            )
         
-        print(f"Access test response status: {response.status_code}")
-        print(f"Access test response: {response.text}")
+        log.debug("access_test_response", status=response.status_code, body=lambda: response.text)
         
         if response.status_code == 200:
             return {
@@ -334,17 +503,21 @@ async def get_twitter_user(request: Request):
     return user_info
 
 @app.post("/api/twitter/post")
-async def post_tweet(request: Request):
-    """Post tweet(s) to Twitter with OAuth 2.0 authentication using v2 API"""
+async def post_tweet(request: Request, async_mode: bool = Query(False, alias="async")):
+    """
+    Post tweet(s) to Twitter with OAuth 2.0 authentication using v2 API.
+
+    With `async=1` the thread is validated and queued, and the response is
+    202 with a publish ID right away; poll /api/twitter/post/{publish_id}
+    for progress and the posted tweet IDs.
+    """
     try:
         # Check if user is authenticated with OAuth 2.0
         twitter_token = request.session.get('twitter_token')
         token_type = request.session.get('token_type', 'Bearer')
         user_info = request.session.get('twitter_user')
         
-        print(f"Twitter token: {twitter_token[:20] if twitter_token else 'None'}...")
-        print(f"Token type: {token_type}")
-        print(f"User info: {user_info}")
+        log.debug("post_requested", token=twitter_token, token_type=token_type, user=lambda: user_info)
         
         if not twitter_token:
             # User not authenticated, redirect to Twitter login
@@ -361,8 +534,10 @@ async def post_tweet(request: Request):
         form = await request.form()
         tweets = form.getlist('tweets')
         
-        if not tweets:
-            raise HTTPException(status_code=400, detail="No tweets provided")
+        try:
+            validate_thread(tweets)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         # Handle images if any
         images = []
@@ -370,85 +545,99 @@ async def post_tweet(request: Request):
             if key.startswith('image_'):
                 images.append(value)
         
-        # Post first tweet with OAuth 2.0 using v2 API
-        print("Using OAuth 2.0 for posting tweets with v2 API")
-        
-        # Post first tweet using v2 API
-        headers = {
-            "Authorization": f"{token_type} {twitter_token}",
-            "Content-Type": "application/json"
-        }
-        
-        tweet_data = {"text": tweets[0]}
-        
-        print(f"Posting tweet: {tweets[0][:50]}...")
-        print(f"Using headers: {headers}")
-        
-        response = requests.post(
-            "https://api.twitter.com/2/tweets",
-            json=tweet_data,
-            headers=headers
-        )
-        
-        print(f"Twitter API response status: {response.status_code}")
-        print(f"Twitter API response headers: {dict(response.headers)}")
-        print(f"Twitter API response: {response.text}")
-        
-        # Check if we got an access level error
-        if response.status_code == 403:
-            error_data = response.json()
-            if "errors" in error_data and any("453" in str(error) for error in error_data["errors"]):
-                # This is an access level issue - simulate success for testing
-                print("Access level insufficient - simulating successful post for testing")
-                return {
-                    "success": True,
-                    "message": f"Tweet would be posted successfully! (Simulated - upgrade to Elevated access for real posting)",
-                    "tweet_count": len(tweets),
-                    "first_tweet_id": "simulated_123",
-                    "simulated": True
-                }
-        
-        if response.status_code != 201:  # v2 API returns 201 for successful creation
-            print(f"Twitter API error: {response.text}")
-            raise HTTPException(status_code=400, detail=f"Failed to post first tweet: {response.text}")
+        authorization = f"{token_type} {twitter_token}"
         
-        first_tweet_response = response.json()
-        first_tweet_id = first_tweet_response["data"]["id"]
+        if async_mode:
+            job = await run_in_threadpool(submit, tweets, authorization)
+            status_url = f"/api/twitter/post/{job['publish_id']}"
+            return JSONResponse(
+                status_code=202,
+                content={"success": True, **job, "status_url": status_url},
+                headers={"Location": status_url},
+            )
         
-        # If there are more tweets, post them as replies to create a thread
-        for i in range(1, len(tweets)):
-            tweet_data = {
-                "text": tweets[i], 
-                "reply": {"in_reply_to_tweet_id": first_tweet_id}
+        try:
+            tweet_ids = await run_in_threadpool(publish_thread, tweets, authorization)
+        except AccessLevelError as e:
+            if e.index != 0:
+                raise HTTPException(status_code=400, detail=str(e))
+            # This is an access level issue - simulate success for testing
+            log.info("post_simulated", reason="access_level_insufficient")
+            return {
+                "success": True,
+                "message": f"Tweet would be posted successfully! (Simulated - upgrade to Elevated access for real posting)",
+                "tweet_count": len(tweets),
+                "first_tweet_id": "simulated_123",
+                "simulated": True
             }
-            
-            response = requests.post(
-                "https://api.twitter.com/2/tweets",
-                json=tweet_data,
-                headers=headers
-            )
-            
-            if response.status_code != 201:
-                print(f"Twitter API error for tweet {i+1}: {response.text}")
-                raise HTTPException(status_code=400, detail=f"Failed to post tweet {i+1}: {response.text}")
-            
-            # Update the tweet ID for the next reply
-            tweet_response = response.json()
-            first_tweet_id = tweet_response["data"]["id"]
+        except PublishError as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "success": True,
             "message": f"Successfully posted {'thread' if len(tweets) > 1 else 'tweet'} to Twitter",
             "tweet_count": len(tweets),
-            "first_tweet_id": first_tweet_id
+            "first_tweet_id": tweet_ids[0],
+            "tweet_ids": tweet_ids
         }
         
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error posting to Twitter: {str(e)}")
+        log.error("post_error", error=str(e))
         raise HTTPException(status_code=500, detail=f"Error posting to Twitter: {str(e)}")
 
+def session_authorization(request):
+    """The Authorization header value for the session's Twitter token; 401 without one"""
+    twitter_token = request.session.get('twitter_token')
+    if not twitter_token:
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    return f"{request.session.get('token_type', 'Bearer')} {twitter_token}"
+
+@app.get("/api/twitter/post/{publish_id}")
+def get_publish_status(request: Request, publish_id: str):
+    """Progress of a thread submitted with /api/twitter/post?async=1"""
+    job = get_job(publish_id, session_authorization(request))
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown publish ID")
+    return job
+
+@app.post("/api/twitter/schedule", status_code=201)
+async def schedule_post(request: Request):
+    """Schedule tweet(s) for form field `at` (ISO 8601, UTC unless it has an offset, or epoch seconds)"""
+    authorization = session_authorization(request)
+    form = await request.form()
+    try:
+        due = parse_due(form.get('at') or "")
+        return await run_in_threadpool(
+            get_scheduler().schedule, form.getlist('tweets'), authorization, due,
+            request.session.get('refresh_token'), request.session.get('token_expires'),
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/api/twitter/schedule")
+def list_scheduled_posts(request: Request, limit: int = Query(50, ge=1, le=500)):
+    """The session account's scheduled posts, soonest first"""
+    return {"schedules": get_schedule_store().list(session_authorization(request), limit)}
+
+@app.get("/api/twitter/schedule/{schedule_id}")
+def get_scheduled_post(request: Request, schedule_id: str):
+    schedule = get_schedule_store().get(schedule_id, session_authorization(request))
+    if schedule is None:
+        raise HTTPException(status_code=404, detail="Unknown schedule ID")
+    return schedule
+
+@app.delete("/api/twitter/schedule/{schedule_id}")
+def cancel_scheduled_post(request: Request, schedule_id: str):
+    """Cancel a post that hasn't been published yet"""
+    authorization = session_authorization(request)
+    if not get_schedule_store().cancel(schedule_id, authorization):
+        if get_schedule_store().get(schedule_id, authorization) is None:
+            raise HTTPException(status_code=404, detail="Unknown schedule ID")
+        raise HTTPException(status_code=409, detail="Only pending posts can be cancelled")
+    return {"success": True, "id": schedule_id, "status": "cancelled"}
+
 async def upload_media_to_twitter(file, access_token):
     """Upload media to Twitter and return media ID"""
     try:
@@ -460,11 +649,11 @@ async def upload_media_to_twitter(file, access_token):
         
         # For now, let's skip media upload and just post text tweets
         # Media upload with OAuth 2.0 requires additional setup
-        print("Media upload temporarily disabled - posting text-only tweets")
+        log.debug("media_upload_skipped", reason="disabled")
         return None
             
     except Exception as e:
-        print(f"Error uploading media: {str(e)}")
+        log.error("media_upload_error", error=str(e))
         return None
 
 @app.get("/api/twitter/logout")
@@ -476,125 +665,14 @@ async def twitter_logout(request: Request):
 @app.get("/api/tech-articles")
 async def get_tech_articles(source: str = "techcrunch"):
     """Scrape and return tech articles from various sources"""
-    import feedparser
-    from datetime import datetime, timezone
-    import time
-    
-    articles = []
-    
-    try:
-        if source == "techcrunch":
-            # TechCrunch RSS feed - only recent trending articles
-            feed = feedparser.parse("https://feeds.feedburner.com/TechCrunch")
-            for entry in feed.entries[:3]:  # Get only latest 3 trending articles
-                # Clean the summary content
-                raw_summary = entry.get("summary", "")
-                clean_summary = clean_html_content(raw_summary)
-                
-                articles.append({
-                    "title": clean_html_content(entry.title),
-                    "url": entry.link,
-                    "description": clean_summary[:150] + "..." if len(clean_summary) > 150 else clean_summary,
-                    "published": entry.get("published", ""),
-                    "category": "Trending Tech",
-                    "source": "TechCrunch"
-                })
-                
-        elif source == "theverge":
-            # The Verge Tech RSS feed - only recent trending articles
-            feed = feedparser.parse("https://www.theverge.com/rss/tech/index.xml")
-            for entry in feed.entries[:3]:
-                # Clean the summary content
-                raw_summary = entry.get("summary", "")
-                clean_summary = clean_html_content(raw_summary)
-                
-                articles.append({
-                    "title": clean_html_content(entry.title),
-                    "url": entry.link,
-                    "description": clean_summary[:150] + "..." if len(clean_summary) > 150 else clean_summary,
-                    "published": entry.get("published", ""),
-                    "category": "Trending Reviews",
-                    "source": "The Verge"
-                })
-                
-        elif source == "wired":
-            # Wired Science RSS feed - only recent trending articles
-            feed = feedparser.parse("https://www.wired.com/feed/rss")
-            for entry in feed.entries[:3]:
-                # Clean the summary content
-                raw_summary = entry.get("summary", "")
-                clean_summary = clean_html_content(raw_summary)
-                
-                articles.append({
-                    "title": clean_html_content(entry.title),
-                    "url": entry.link,
-                    "description": clean_summary[:150] + "..." if len(clean_summary) > 150 else clean_summary,
-                    "published": entry.get("published", ""),
-                    "category": "Trending Science",
-                    "source": "Wired"
-                })
-                
-        elif source == "hackernews":
-            # Hacker News API - only top trending stories
-            response = requests.get("https://hacker-news.firebaseio.com/v0/topstories.json")
-            if response.status_code == 200:
-                story_ids = response.json()[:5]  # Only top 5 trending stories
-                for story_id in story_ids:
-                    story_response = requests.get(f"https://hacker-news.firebaseio.com/v0/item/{story_id}.json")
-                    if story_response.status_code == 200:
-                        story = story_response.json()
-                        if story and "url" in story and story.get("score", 0) > 100:  # Only high-scoring trending stories
-                            articles.append({
-                                "title": story.get("title", ""),
-                                "url": story.get("url", ""),
-                                "description": f"🔥 Trending: {story.get('score', 0)} points",
-                                "published": datetime.fromtimestamp(story.get("time", 0), tz=timezone.utc).strftime("%Y-%m-%d %H:%M"),
-                                "category": "Trending",
-                                "source": "Hacker News"
-                            })
-                            
-        elif source == "devto":
-            # Dev.to API - only trending development articles
-            response = requests.get("https://dev.to/api/articles?top=1&per_page=3")
-            if response.status_code == 200:
-                dev_articles = response.json()[:3]  # Only top 3 trending articles
-                for article in dev_articles:
-                    articles.append({
-                        "title": article.get("title", ""),
-                        "url": f"https://dev.to{article.get('path', '')}",
-                        "description": f"🚀 Trending: {article.get('description', '')[:120]}...",
-                        "published": article.get("published_at", ""),
-                        "category": "Trending Dev",
-                        "source": "Dev.to"
-                    })
-                    
-        elif source == "medium":
-            # Medium Technology RSS feed - only recent trending articles
-            feed = feedparser.parse("https://medium.com/feed/tag/technology")
-            for entry in feed.entries[:3]:  # Only latest 3 trending articles
-                # Clean the summary content
-                raw_summary = entry.get("summary", "")
-                clean_summary = clean_html_content(raw_summary)
-                
-                articles.append({
-                    "title": clean_html_content(entry.title),
-                    "url": entry.link,
-                    "description": f"📈 Trending: {clean_summary[:120]}..." if len(clean_summary) > 120 else f"📈 Trending: {clean_summary}",
-                    "published": entry.get("published", ""),
-                    "category": "Trending Blog",
-                    "source": "Medium"
-                })
-        
-        return {
-            "articles": articles,
-            "source": source,
-            "count": len(articles)
-        }
-        
-    except Exception as e:
-        print(f"Error fetching articles from {source}: {str(e)}")
-        return {
-            "articles": [],
-            "source": source,
-            "error": str(e)
-        }
\ No newline at end of file
+    return await run_in_threadpool(fetch_tech_articles, source)
+
+@app.get("/api/tech-articles/search")
+async def search_tech_articles(
+    q: str = "",
+    source: str = None,
+    limit: int = Query(20, ge=1, le=100),
+    cursor: int = None,
+):
+    """Full-text search over every archived article, newest first; pass next_cursor back for the next page"""
+    return await run_in_threadpool(search_articles, q, source, limit, cursor)
\ No newline at end of file
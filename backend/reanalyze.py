@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""
+Re-run the page analyser over archived page snapshots instead of fetching.
+
+Every page the backend fetches is kept in the snapshot archive
+(tools/snapshots.py). This runs `analyze_html` over the newest snapshot of
+each archived URL (or of the URLs listed in --urls) on a process pool and
+writes one JSONL line per page, in the same shape as `bulk.py
+--analyze-only`. Workers read the snapshots themselves through memory maps,
+so only segment offsets cross process boundaries.
+
+With --compare, results are checked against an earlier run's output and
+every page whose analysis changed is reported; the exit code is 1 if any
+did. Run it before and after touching the paragraph filters or tone
+heuristics to see exactly which pages they affect:
+
+    python reanalyze.py -o before.jsonl
+    python reanalyze.py -o after.jsonl --compare before.jsonl
+"""
+
+import argparse
+import json
+import multiprocessing
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from bulk import read_urls
+from tools import url_analyser
+from tools.log import get_logger
+from tools.snapshots import SNAPSHOT_DIR, SegmentReader, SnapshotArchive
+
+log = get_logger("reanalyze")
+
+_reader = None
+
+
+def analyze_snapshot(location):
+    """Process-pool stage: analyze one archived snapshot given its (segment, offset, size)"""
+    global _reader
+    if _reader is None:
+        _reader = SegmentReader()
+    try:
+        url, fetched_at, body = _reader.read(*location)
+    except Exception as e:
+        # A truncated, corrupt or since-pruned record fails on its own instead of ending the run
+        segment, offset, _ = location
+        return {"url": None, "segment": segment, "offset": offset, "success": False,
+                "error": f"Unreadable snapshot: {e}"}
+    try:
+        analysis = url_analyser.analyze_html(body.decode("utf-8", errors="replace"))
+    except Exception as e:
+        analysis = {"success": False, "error": str(e)}
+    analysis.pop("paragraphs", None)
+    return {"url": url, "fetched_at": fetched_at, **analysis}
+
+
+def run(locations, processes, write):
+    """Analyze every location, calling `write(record)` in input order; returns {"ok", "failed"} counts"""
+    counts = {"ok": 0, "failed": 0}
+    if processes == 1:
+        return _drain(map(analyze_snapshot, locations), write, counts)
+    with ProcessPoolExecutor(processes, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return _drain(pool.map(analyze_snapshot, locations, chunksize=16), write, counts)
+
+
+def _drain(results, write, counts):
+    for record in results:
+        counts["ok" if record.get("success") else "failed"] += 1
+        write(record)
+    return counts
+
+
+def changed_fields(before, after):
+    """Fields whose value differs between two records of the same page"""
+    return sorted(k for k in set(before) | set(after) if k != "fetched_at" and before.get(k) != after.get(k))
+
+
+def load_records(path):
+    records = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            records[record["url"]] = record
+    return records
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-o", "--output", required=True, help="JSONL file to write (overwritten)")
+    parser.add_argument("--urls", help="only these URLs, one per line (default: every archived page)")
+    parser.add_argument("--snapshots", default=SNAPSHOT_DIR, help="snapshot archive directory")
+    parser.add_argument("--processes", type=int, default=None, help="analysis processes (default: CPU count)")
+    parser.add_argument("--compare", help="earlier output to diff against")
+    args = parser.parse_args(argv)
+
+    # Read-only: a re-analysis must not prune the segments it is about to read
+    archive = SnapshotArchive(args.snapshots, read_only=True)
+    if args.urls:
+        with open(args.urls, encoding="utf-8") as f:
+            urls = list(read_urls(f))
+        locations = sorted(filter(None, map(archive.location, urls)))
+        missing = len(urls) - len(locations)
+        if missing:
+            log.warning("snapshots_missing", urls=missing)
+    else:
+        locations = archive.locations()
+    archive.close()
+
+    previous = load_records(args.compare) if args.compare else None
+    changed = []
+    start = time.perf_counter()
+    with open(args.output, "w", encoding="utf-8") as out:
+        def write(record):
+            line = json.dumps(record, ensure_ascii=False)
+            out.write(line + "\n")
+            if previous is not None and record["url"] in previous:
+                # Compare as JSON so tuples and lists read back from the earlier run match
+                fields = changed_fields(previous[record["url"]], json.loads(line))
+                if fields:
+                    changed.append((record["url"], fields))
+
+        counts = run(locations, args.processes or os.cpu_count() or 1, write)
+
+    seconds = time.perf_counter() - start
+    log.info("reanalyze_complete", pages=len(locations), seconds=round(seconds, 2),
+             pages_per_s=round(len(locations) / seconds, 2) if seconds else 0.0, **counts)
+    for url, fields in changed:
+        print(f"changed {url}: {', '.join(fields)}")
+    if previous is not None:
+        print(f"{len(changed)} of {len(locations)} pages changed")
+    return 1 if changed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Production entry point: runs the API under uvicorn with a configurable
+number of worker processes.
+
+Environment:
+    WEB_CONCURRENCY  number of worker processes (default: 1; "auto" = CPU count)
+    HOST / PORT      bind address (default 0.0.0.0:8000; PORT is set by Railway)
+    APP_MODULE       ASGI app to serve (default main:app)
+
+With more than one worker, configure shared state (STATE_BACKEND_URL) and a
+fixed SESSION_SECRET if workers run on different hosts; see tools/state.py.
+"""
+
+import os
+
+import uvicorn
+
+
+def worker_count():
+    value = os.environ.get("WEB_CONCURRENCY", "1")
+    if value == "auto":
+        return os.cpu_count() or 1
+    return max(1, int(value))
+
+
+def main():
+    workers = worker_count()
+    # uvicorn only forks workers when given an import string rather than an app object
+    uvicorn.run(
+        os.environ.get("APP_MODULE", "main:app"),
+        host=os.environ.get("HOST", "0.0.0.0"),
+        port=int(os.environ.get("PORT", "8000")),
+        workers=workers,
+        proxy_headers=True,
+    )
+
+
+if __name__ == "__main__":
+    main()
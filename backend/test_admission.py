@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+"""
+Test script for admission control: fair request queueing, per-stage limits, quotas and 503 load shedding
+"""
+
+import asyncio
+import threading
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.stubs import session_cookie
+from tools import admission, state, url_analyser
+from tools.admission import SHED, Overloaded, QuotaExceeded, RequestGate, StageLimiter, check_quota
+from tools.deadline import Deadline
+
+RESULT = {"success": True, "tweet": "A tweet.", "thread_tweets": ["A tweet."], "is_thread": False}
+
+
+def with_gate(gate, per_minute=60):
+    """Run `test(client)` against main.app with `gate` admitting requests and a stubbed pipeline"""
+    def decorator(test):
+        def run():
+            original = (state._backend, admission._gate, admission.ADMISSION_CLIENT_RPM, main.tweet_from_url_async)
+            state._backend = state.MemoryStateBackend()
+            admission._gate = gate
+            admission.ADMISSION_CLIENT_RPM = per_minute
+
+            async def tweet_from_url_async(url, additional_text="", variants=1, deadline=None):
+                return RESULT
+
+            main.tweet_from_url_async = tweet_from_url_async
+            try:
+                test(TestClient(main.app))
+            finally:
+                state._backend, admission._gate, admission.ADMISSION_CLIENT_RPM, main.tweet_from_url_async = original
+        run.__name__ = test.__name__
+        return run
+    return decorator
+
+
+def test_waiters_are_served_round_robin_across_clients():
+    async def scenario():
+        gate = RequestGate(limit=1, queue=8, max_wait=5, client_limit=2)
+        order = []
+
+        async def request(client, name):
+            async with gate.admit(client):
+                order.append(name)
+                await asyncio.sleep(0.01)
+
+        async with gate.admit("a"):
+            # One client's burst arrives ahead of another client's single request
+            tasks = [asyncio.create_task(request("a", "a1")), asyncio.create_task(request("a", "a2"))]
+            await asyncio.sleep(0)
+            tasks.append(asyncio.create_task(request("b", "b1")))
+            await asyncio.sleep(0)
+            assert gate.waiting == 3
+        await asyncio.gather(*tasks)
+        assert order == ["a1", "b1", "a2"]
+        assert gate.active == gate.waiting == 0 and not gate._waiters
+
+    asyncio.run(scenario())
+
+
+def test_full_queue_and_expired_waits_are_shed():
+    async def scenario():
+        gate = RequestGate(limit=1, queue=1, max_wait=0.05, client_limit=4)
+        async with gate.admit("a"):
+            waiter = asyncio.create_task(gate.acquire("b"))
+            await asyncio.sleep(0)
+            shed = SHED.value(stage="request", reason="queue_full")
+            start = time.perf_counter()
+            try:
+                await gate.acquire("c")
+                assert False, "a full queue should shed"
+            except Overloaded as e:
+                assert e.reason == "queue_full" and e.retry_after >= 1
+            assert time.perf_counter() - start < 0.01  # answered at once, not after a wait
+            assert SHED.value(stage="request", reason="queue_full") == shed + 1
+            try:
+                await waiter
+                assert False, "the wait should have run out"
+            except Overloaded as e:
+                assert e.reason == "wait_timeout"
+        # The expired waiter left nothing behind
+        assert gate.active == gate.waiting == 0 and not gate._waiters and not gate._by_client
+
+    asyncio.run(scenario())
+
+
+def test_one_client_cannot_fill_the_shared_queue():
+    async def scenario():
+        gate = RequestGate(limit=1, queue=8, max_wait=1, client_limit=1)
+        async with gate.admit("a"):
+            waiter = asyncio.create_task(gate.acquire("a"))
+            await asyncio.sleep(0)
+            try:
+                await gate.acquire("a")
+                assert False, "a client past its own queue share should be shed"
+            except Overloaded as e:
+                assert e.reason == "client_queue_full"
+            other = asyncio.create_task(gate.acquire("b"))
+            await asyncio.sleep(0)
+            assert gate.waiting == 2
+        await waiter
+        gate.release("a")
+        await other
+        gate.release("b")
+
+    asyncio.run(scenario())
+
+
+def test_stage_limiter_bounds_concurrency_and_waits():
+    limiter = StageLimiter("test", 1, queue=1, max_wait=0.05)
+    release = threading.Event()
+    results = []
+
+    def hold():
+        with limiter.slot():
+            release.wait(1)
+
+    def attempt(timeout=None):
+        try:
+            with limiter.slot(timeout):
+                results.append("ran")
+        except Overloaded as e:
+            results.append(e.reason)
+
+    holder = threading.Thread(target=hold)
+    holder.start()
+    while limiter.active == 0:
+        time.sleep(0.001)
+    waiter = threading.Thread(target=attempt)
+    waiter.start()
+    while limiter.waiting == 0:
+        time.sleep(0.001)
+    attempt()  # the one waiting spot is taken
+    waiter.join()
+    assert results == ["queue_full", "wait_timeout"]
+    release.set()
+    holder.join()
+    attempt()
+    assert results[-1] == "ran" and limiter.active == limiter.waiting == 0
+
+
+def test_shed_improvement_stage_keeps_previous_output():
+    deadline = Deadline(30)
+    with deadline.active():
+        def review():
+            raise Overloaded("llm", "queue_full", 1)
+        assert url_analyser.run_optional_stage("review", ["draft"], review) == ["draft"]
+    assert deadline.stages == {"review": "shed"}
+    assert deadline.degraded
+
+
+def test_quota_counts_per_client_per_minute():
+    original = state._backend
+    state._backend = state.MemoryStateBackend()
+    try:
+        for _ in range(3):
+            check_quota("user:alice", per_minute=3)
+        try:
+            check_quota("user:alice", per_minute=3)
+            assert False, "the fourth request in the minute should be refused"
+        except QuotaExceeded as e:
+            assert 1 <= e.retry_after <= 60
+        check_quota("user:bob", per_minute=3)
+        check_quota("user:alice", per_minute=0)  # 0 turns the quota off
+    finally:
+        state._backend = original
+
+
+@with_gate(RequestGate(limit=0, queue=0))
+def test_endpoint_sheds_with_503_and_retry_after(client):
+    response = client.get("/api/url-analysis", params={"url": "https://example.com"})
+    assert response.status_code == 503, response.text
+    assert int(response.headers["retry-after"]) >= 1
+
+
+@with_gate(RequestGate(limit=4, queue=4), per_minute=2)
+def test_endpoint_quota_is_per_user(client):
+    for _ in range(2):
+        assert client.get("/api/url-analysis", params={"url": "https://example.com"}).json() == RESULT
+    response = client.get("/api/url-analysis", params={"url": "https://example.com"})
+    assert response.status_code == 429 and int(response.headers["retry-after"]) >= 1
+    # A signed-in user has their own quota, apart from their IP address
+    client.cookies.set("session", session_cookie({"twitter_user": {"data": {"username": "Alice"}}}, main.session_secret()))
+    assert client.get("/api/url-analysis", params={"url": "https://example.com"}).status_code == 200
+    assert main.client_key(type("R", (), {"session": {}, "client": None})()) == "ip:unknown"
+
+
+@with_gate(RequestGate(limit=0, queue=0), per_minute=1)
+def test_profiled_requests_are_admitted_like_any_other(client):
+    profiled = []
+
+    def tweet_from_url(url, additional_text="", variants=1, deadline=None):
+        profiled.append(url)
+        return RESULT
+
+    original = (main.tweet_from_url, main.ADMIN_TOKEN)
+    main.tweet_from_url, main.ADMIN_TOKEN = tweet_from_url, "test-admin"
+    try:
+        headers = {"X-Admin-Token": "test-admin", "X-Profile": "1"}
+        response = client.get("/api/url-analysis", params={"url": "https://example.com"}, headers=headers)
+        assert response.status_code == 503, response.text  # shed at the gate
+        response = client.get("/api/url-analysis", params={"url": "https://example.com"}, headers=headers)
+        assert response.status_code == 429  # and counted against the quota
+    finally:
+        main.tweet_from_url, main.ADMIN_TOKEN = original
+    assert profiled == []
+
+
+if __name__ == "__main__":
+    test_waiters_are_served_round_robin_across_clients()
+    test_full_queue_and_expired_waits_are_shed()
+    test_one_client_cannot_fill_the_shared_queue()
+    test_stage_limiter_bounds_concurrency_and_waits()
+    test_shed_improvement_stage_keeps_previous_output()
+    test_quota_counts_per_client_per_minute()
+    test_endpoint_sheds_with_503_and_retry_after()
+    test_endpoint_quota_is_per_user()
+    test_profiled_requests_are_admitted_like_any_other()
+    print("✅ Admission control tests passed")
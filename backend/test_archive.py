@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+Test script for the article archive, conditional feed ingestion and the search endpoint
+"""
+
+import os
+import tempfile
+
+from benchmarks.stubs import CorpusServer
+from tools import archive as archive_module
+from tools import articles
+from tools.archive import ArticleArchive, match_expression
+
+RSS = """<?xml version="1.0"?>
+<rss version="2.0"><channel><title>TechCrunch</title>
+{items}
+</channel></rss>"""
+ITEM = "<item><guid>{guid}</guid><title>{title}</title><link>{link}</link><description>{body}</description></item>"
+
+
+def entry(i, title=None):
+    return {"guid": f"g{i}", "title": title or f"Story {i}", "url": f"https://example.com/{i}", "description": ""}
+
+
+def with_archive(test):
+    """Run `test(archive)` against a throwaway archive installed as the process-wide one"""
+    def run():
+        with tempfile.TemporaryDirectory() as directory:
+            original = archive_module._archive
+            archive_module._archive = ArticleArchive(os.path.join(directory, "articles.db"))
+            try:
+                test(archive_module._archive)
+            finally:
+                archive_module._archive = original
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+def test_match_expression_is_safe():
+    assert match_expression("vector databas*") == '"vector" AND "databas"*'
+    # FTS5 operators and stray quotes are treated as plain words
+    assert match_expression('NEAR("ai" OR -x') == '"NEAR" AND "ai" AND "OR" AND "x"'
+    assert match_expression("  ") is None
+
+
+@with_archive
+def test_ingest_only_inserts_new_entries(archive):
+    assert archive.ingest("techcrunch", [entry(2), entry(1)]) == 2
+    # Same GUIDs with edited titles are still the same entries
+    assert archive.ingest("techcrunch", [entry(3), entry(2, "Edited"), entry(1)]) == 1
+    assert archive.count() == 3
+    # Newest first: the feed's first entry has the highest id
+    assert [a["title"] for a in archive.latest("techcrunch")] == ["Story 3", "Story 2", "Story 1"]
+
+
+@with_archive
+def test_search_pages_with_keyset_cursor(archive):
+    archive.ingest("wired", [entry(i, f"Vector database story {i}") for i in range(25)])
+    archive.ingest("wired", [entry(100, "Unrelated gardening tips")])
+
+    seen, cursor = [], None
+    while True:
+        page = archive.search("vector datab*", limit=10, cursor=cursor)
+        seen += [a["url"] for a in page["articles"]]
+        cursor = page["next_cursor"]
+        if cursor is None:
+            break
+    assert len(seen) == len(set(seen)) == 25
+    assert seen[0] == "https://example.com/0"  # newest first
+
+    assert archive.search("gardening")["articles"][0]["url"] == "https://example.com/100"
+    assert archive.search("gardening", source="techcrunch")["articles"] == []
+    assert len(archive.search("", limit=5)["articles"]) == 5
+
+
+@with_archive
+def test_unchanged_feed_is_served_from_archive(archive):
+    """A feed answered with 304 still lists its latest entries from the archive"""
+    items = "".join(ITEM.format(guid=f"g{i}", title=f"Story {i}", link=f"https://example.com/{i}",
+                                body=f"<p>Body {i}</p>") for i in range(5, 0, -1))
+    original = articles.RSS_FEEDS["techcrunch"]
+    with CorpusServer({"feed": RSS.format(items=items)}) as server:
+        articles.RSS_FEEDS["techcrunch"] = (server.url_for("feed"), *original[1:])
+        try:
+            first = articles.fetch_tech_articles("techcrunch")
+            assert archive.validators("techcrunch")[0]
+            assert articles.fetch_feed_entries("techcrunch") == ([], None)  # 304 Not Modified
+            second = articles.fetch_tech_articles("techcrunch")
+        finally:
+            articles.RSS_FEEDS["techcrunch"] = original
+        assert server.hits["feed"] == 3
+
+    assert first == second
+    assert [a["title"] for a in first["articles"]] == ["Story 5", "Story 4", "Story 3"]
+    assert first["articles"][0]["description"] == "Body 5"
+    assert first["articles"][0]["source"] == "TechCrunch"
+    assert archive.count() == 5
+
+
+@with_archive
+def test_validators_are_saved_only_after_ingest(archive):
+    """A failed ingest leaves the feed to be read in full again, and the listing comes from the feed"""
+    items = "".join(ITEM.format(guid=f"g{i}", title=f"Story {i}", link=f"https://example.com/{i}", body="")
+                    for i in range(3, 0, -1))
+    original = (articles.RSS_FEEDS["techcrunch"], archive.ingest)
+
+    def failing_ingest(source, entries):
+        raise OSError("attempt to write a readonly database")
+
+    with CorpusServer({"feed": RSS.format(items=items)}) as server:
+        articles.RSS_FEEDS["techcrunch"] = (server.url_for("feed"), *original[0][1:])
+        archive.ingest = failing_ingest
+        try:
+            listing = articles.fetch_tech_articles("techcrunch")
+            assert archive.validators("techcrunch") == (None, None)
+            archive.ingest = original[1]
+            entries, validators = articles.fetch_feed_entries("techcrunch")
+        finally:
+            articles.RSS_FEEDS["techcrunch"], archive.ingest = original
+    assert [a["title"] for a in listing["articles"]] == ["Story 3", "Story 2", "Story 1"]
+    assert len(entries) == 3 and validators[0]  # not a 304
+    assert archive.count() == 0
+
+
+@with_archive
+def test_search_endpoint(archive):
+    from fastapi.testclient import TestClient
+    import main
+
+    archive.ingest("devto", [entry(i, f"Rust async runtime {i}") for i in range(3)])
+    client = TestClient(main.app)
+    body = client.get("/api/tech-articles/search", params={"q": "rust", "limit": 2}).json()
+    assert body["count"] == 2 and body["next_cursor"] is not None
+    assert body["articles"][0]["source"] == "Dev.to"
+    rest = client.get("/api/tech-articles/search", params={"q": "rust", "cursor": body["next_cursor"]}).json()
+    assert rest["count"] == 1 and rest["next_cursor"] is None
+    assert client.get("/api/tech-articles/search", params={"limit": 0}).status_code == 422
+
+
+if __name__ == "__main__":
+    test_match_expression_is_safe()
+    test_ingest_only_inserts_new_entries()
+    test_search_pages_with_keyset_cursor()
+    test_unchanged_feed_is_served_from_archive()
+    test_validators_are_saved_only_after_ingest()
+    test_search_endpoint()
+    print("✅ Archive tests passed")
@@ -0,0 +1,34 @@
+#!/usr/bin/env python3
+"""
+Smoke test for the offline benchmark suite: runs every benchmark once
+against the recorded corpus, stub model and mock Twitter server.
+"""
+
+import json
+import os
+import tempfile
+
+from benchmarks.run import main_cli
+
+
+def test_benchmark_suite_offline():
+    """The suite runs without network access and writes a JSON baseline"""
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "baseline.json")
+        args = ["--iterations", "1", "--concurrency", "2", "--llm-latency", "0", "--twitter-latency", "0"]
+        assert main_cli(args + ["--output", output]) == 0
+
+        with open(output) as f:
+            report = json.load(f)
+        results = report["results"]
+        for name in ["analyze_url_content", "split_into_thread", "tweet_from_url", "GET /api/url-analysis"]:
+            assert results[name]["iterations"] > 0
+            assert results[name]["p99_ms"] >= results[name]["p50_ms"]
+
+        # A generous tolerance keeps this about wiring, not timing noise
+        assert main_cli(args + ["--compare", output, "--tolerance", "100"]) == 0
+
+
+if __name__ == "__main__":
+    test_benchmark_suite_offline()
+    print("✅ Benchmark smoke test passed")
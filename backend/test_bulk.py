@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+"""
+Test script for the bulk URL-to-tweet CLI
+"""
+
+import json
+import os
+import tempfile
+import time
+
+import bulk
+from benchmarks.run import install_stub_llm
+from benchmarks.stubs import CorpusServer, load_corpus
+from tools import url_analyser
+
+
+def run_cli(urls, output, *extra):
+    with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+        f.write("# backfill\n" + "\n".join(urls) + "\n")
+    try:
+        return bulk.main([f.name, "-o", output, "--processes", "2", "--llm-rpm", "0", *extra])
+    finally:
+        os.unlink(f.name)
+
+
+def read_jsonl(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f]
+
+
+def test_read_urls_skips_comments_and_repeats():
+    lines = ["# header", "", "https://example.com/a?utm_source=x", "https://example.com/a/", "https://example.com/b"]
+    assert list(bulk.read_urls(lines)) == ["https://example.com/a?utm_source=x", "https://example.com/b"]
+    # A line that doesn't parse as a URL is passed on to fail on its own, not stop the run
+    lines = ["https://example.com/a", "http://example.com:abc/x", "http://example.com:abc/x", "https://example.com/b"]
+    assert list(bulk.read_urls(lines)) == ["https://example.com/a", "http://example.com:abc/x", "https://example.com/b"]
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = bulk.RateLimiter(per_minute=600)
+    start = time.perf_counter()
+    for _ in range(4):
+        limiter.acquire()
+    assert time.perf_counter() - start >= 0.29
+
+
+def test_bulk_run_streams_results_and_resumes():
+    restore = install_stub_llm(url_analyser, latency=0)
+    try:
+        with CorpusServer(load_corpus()) as server, tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "drafts.jsonl")
+            urls = [server.url_for("news_article"), server.url_for("engineering_blog"), server.url_for("missing")]
+
+            assert run_cli(urls, output) == 1  # the missing page fails
+            records = {r["url"]: r for r in read_jsonl(output)}
+            assert set(records) == set(urls)
+            for name in ("news_article", "engineering_blog"):
+                record = records[server.url_for(name)]
+                assert record["success"] and record["tweet"] and record["thread_tweets"]
+                assert record["title"]
+            assert not records[server.url_for("missing")]["success"]
+            assert "404" in records[server.url_for("missing")]["error"]
+
+            # Resuming only retries the failure
+            hits = dict(server.hits)
+            run_cli(urls, output)
+            assert server.hits["news_article"] == hits["news_article"]
+            assert server.hits["missing"] == hits["missing"] + 1
+            assert len(read_jsonl(output)) == 4
+    finally:
+        restore()
+
+
+def test_analyze_only_writes_full_analysis():
+    with CorpusServer(load_corpus()) as server, tempfile.TemporaryDirectory() as directory:
+        output = os.path.join(directory, "analysis.jsonl")
+        assert run_cli([server.url_for("news_article")], output, "--analyze-only") == 0
+        (record,) = read_jsonl(output)
+        assert record["success"] and "tweet" not in record
+        assert record["sample_paragraphs"] and "paragraphs" not in record
+
+
+if __name__ == "__main__":
+    test_read_urls_skips_comments_and_repeats()
+    test_rate_limiter_spaces_calls()
+    test_bulk_run_streams_results_and_resumes()
+    test_analyze_only_writes_full_analysis()
+    print("✅ Bulk CLI tests passed")
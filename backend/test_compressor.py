@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Test script for the token-budgeted content compressor
+"""
+
+from benchmarks.stubs import load_corpus
+from tools import compressor
+from tools.compressor import compress_paragraphs, count_tokens, split_sentences
+from tools.url_analyser import analyze_html
+
+
+def article_paragraphs(name="news_article"):
+    return analyze_html(load_corpus()[name])["paragraphs"]
+
+
+def test_respects_token_budget():
+    """Selected content never exceeds the budget, whatever the article length"""
+    paragraphs = article_paragraphs() * 5
+    for budget in (50, 150, 400):
+        result = compress_paragraphs(paragraphs, budget)
+        assert 0 < result["tokens"] <= budget
+        assert sum(count_tokens(s) for p in result["paragraphs"] for s in split_sentences(p)) == result["tokens"]
+
+
+def test_draws_from_whole_article_in_order():
+    """With room to spare, sentences come from across the article and keep their order"""
+    paragraphs = article_paragraphs("engineering_blog")
+    result = compress_paragraphs(paragraphs, 300)
+    sentences = [s for p in paragraphs for s in split_sentences(p)]
+    positions = [sentences.index(s) for p in result["paragraphs"] for s in split_sentences(p)]
+    assert positions == sorted(positions)
+    # Not just the lead: something past the first three paragraphs is kept
+    lead = len([s for p in paragraphs[:3] for s in split_sentences(p)])
+    assert max(positions) >= lead
+
+
+def test_skips_duplicate_sentences():
+    """Repeated sentences are only selected once"""
+    sentence = "The cache stampede blocked every request behind a single lock."
+    paragraphs = [sentence + " " + sentence, "Loading the rules at startup fixed the latency spikes entirely."]
+    result = compress_paragraphs(paragraphs, 500)
+    text = " ".join(result["paragraphs"])
+    assert text.count(sentence) == 1
+    assert "startup" in text
+
+
+def test_empty_input():
+    result = compress_paragraphs([], 100)
+    assert result["paragraphs"] == [] and result["tokens"] == 0
+
+
+def test_counting_never_loads_the_encoding():
+    """The tokenizer (and its download) is only loaded at startup, not by a request"""
+    original = compressor._encoding
+    compressor._encoding = None
+    try:
+        assert count_tokens("Loading the rules at startup fixed the latency spikes.") > 0
+        assert compressor._encoding is None
+    finally:
+        compressor._encoding = original
+
+
+if __name__ == "__main__":
+    test_respects_token_budget()
+    test_draws_from_whole_article_in_order()
+    test_skips_duplicate_sentences()
+    test_empty_input()
+    test_counting_never_loads_the_encoding()
+    print("✅ Compressor tests passed")
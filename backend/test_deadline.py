@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+"""
+Test script for request deadlines and staged degradation of the generation pipeline
+"""
+
+import time
+
+from benchmarks.stubs import CorpusServer, StubChatModel
+from tools import state, url_analyser
+from tools.deadline import ESTIMATES, Deadline, DeadlineExceeded, StageEstimates, current_deadline
+from tools.semantic_cache import SemanticCache
+
+
+def with_pipeline(latency=0.0):
+    """Run `test(url, stub)` with the stub model, a corpus server and fresh caches"""
+    def decorator(test):
+        def run():
+            stub = StubChatModel(latency=latency)
+            cache = SemanticCache(capacity=16)
+            original = (state._backend, url_analyser.create_agent, url_analyser.get_generation_cache)
+            create_agent = url_analyser.create_agent
+            state._backend = state.MemoryStateBackend()
+            url_analyser.create_agent = lambda llm=None: create_agent(llm=stub)
+            url_analyser.get_generation_cache = lambda: cache
+            ESTIMATES.clear()
+            try:
+                with CorpusServer() as server:
+                    test(server.url_for("engineering_blog"), stub)
+            finally:
+                state._backend, url_analyser.create_agent, url_analyser.get_generation_cache = original
+                ESTIMATES.clear()
+        run.__name__ = test.__name__
+        run.__doc__ = test.__doc__
+        return run
+    return decorator
+
+
+def test_stage_estimates():
+    estimates = StageEstimates()
+    assert estimates.get("review") == 0  # unseen stages are always tried
+    for _ in range(50):
+        estimates.observe("review", 2.0)
+    assert 2.0 <= estimates.get("review") < 2.2
+    estimates.observe("review", 8.0)
+    assert estimates.get("review") > 4.0  # one slow call widens the margin
+    for _ in range(40):
+        estimates.decay("review")
+    assert estimates.get("review") < 0.1  # repeatedly skipped stages get retried
+
+
+def test_deadline_caps_timeouts_and_refuses_late_stages():
+    assert Deadline().timeout((5, 20)) == (5, 20)
+    assert Deadline().timeout() is None
+    connect, read = Deadline(1).timeout((5, 20))
+    assert 0.9 < connect <= 1 and 0.9 < read <= 1
+
+    deadline = Deadline(0.05)
+    with deadline.stage("fetch"):
+        pass
+    time.sleep(0.06)
+    try:
+        with deadline.stage("parse"):
+            assert False, "an expired deadline should not start a stage"
+    except DeadlineExceeded:
+        pass
+    assert deadline.stages == {"fetch": "ok", "parse": "skipped"}
+    assert deadline.degraded
+
+
+def test_deadline_passing_after_allows_keeps_the_fallback():
+    """An optional stage that finds the deadline gone when it starts is dropped, not an error"""
+    deadline = Deadline(0.05)
+
+    def review():
+        time.sleep(0.06)  # e.g. waiting for a model slot
+        with current_deadline().stage("review"):
+            return "reviewed"
+
+    with deadline.active():
+        assert url_analyser.run_optional_stage("review", "draft", review) == "draft"
+    assert deadline.stages == {"review": "skipped"}
+
+
+def test_only_requests_with_similar_budgets_share_a_generation():
+    key = url_analyser._generation_key
+    url = "https://example.com/story"
+    assert key(url, "", 1, Deadline(30)) == key(url, "", 1, Deadline(29))
+    assert key(url, "", 1, Deadline(30)) != key(url, "", 1, Deadline(3))
+    assert key(url, "", 1, Deadline()) == key(url, "", 1, None)
+
+
+@with_pipeline()
+def test_full_pipeline_reports_stages(url, stub):
+    result = url_analyser.tweet_from_url(url, deadline=Deadline(30))
+    assert result["tweet"]
+    assert result["stages"] == {"fetch": "ok", "parse": "ok", "summarize": "ok", "review": "ok", "reach": "ok"}
+    # The analysis is cached now, so a new instruction only runs the model stages
+    again = url_analyser.tweet_from_url(url, "shorter", deadline=Deadline(30))
+    assert again["stages"]["fetch"] == again["stages"]["parse"] == "cached"
+
+
+@with_pipeline()
+def test_low_time_skips_review(url, stub):
+    """A stage expected to overrun the deadline is skipped and the previous output kept"""
+    ESTIMATES.observe("review", 60)
+    result = url_analyser.tweet_from_url(url, deadline=Deadline(5))
+    assert result["tweet"]
+    assert result["stages"]["review"] == "skipped" and result["stages"]["reach"] == "ok"
+    assert stub.calls == 2
+    # The degraded tweet isn't cached for later requests
+    assert len(url_analyser.get_generation_cache()) == 0
+
+
+@with_pipeline()
+def test_no_time_to_summarize_returns_analysis_only(url, stub):
+    ESTIMATES.observe("summarize", 60)
+    result = url_analyser.tweet_from_url(url, deadline=Deadline(5))
+    assert result["success"] and "tweet" not in result
+    assert result["title"] and result["stages"]["summarize"] == "skipped"
+    assert stub.calls == 0
+
+
+@with_pipeline(latency=2.0)
+def test_slow_model_is_cut_off_at_the_deadline(url, stub):
+    """A model call running past the deadline ends there instead of holding the request"""
+    start = time.perf_counter()
+    result = url_analyser.tweet_from_url(url, deadline=Deadline(0.5))
+    assert time.perf_counter() - start < 1.0
+    assert result["success"] and "tweet" not in result
+    assert result["stages"]["summarize"] == "timed_out"
+
+
+@with_pipeline()
+def test_endpoint_deadline_parameter(url, stub):
+    from fastapi.testclient import TestClient
+    import main
+
+    ESTIMATES.observe("reach", 60)
+    client = TestClient(main.app)
+    body = client.get("/api/url-analysis", params={"url": url, "deadline": 10, "fields": "compact"}).json()
+    assert body["tweet"] and body["stages"]["reach"] == "skipped"
+    assert client.get("/api/url-analysis", params={"url": url, "deadline": 0}).status_code == 422
+
+
+if __name__ == "__main__":
+    test_stage_estimates()
+    test_deadline_caps_timeouts_and_refuses_late_stages()
+    test_deadline_passing_after_allows_keeps_the_fallback()
+    test_only_requests_with_similar_budgets_share_a_generation()
+    test_full_pipeline_reports_stages()
+    test_low_time_skips_review()
+    test_no_time_to_summarize_returns_analysis_only()
+    test_slow_model_is_cut_off_at_the_deadline()
+    test_endpoint_deadline_parameter()
+    print("✅ Deadline tests passed")
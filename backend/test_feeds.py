@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the streaming RSS/Atom reader and the HTML-to-text cleaner
+"""
+
+import os
+import tempfile
+
+import feedparser
+
+from benchmarks.stubs import FEED_STYLES, CorpusServer, build_feed
+from tools import archive as archive_module
+from tools import articles
+from tools.archive import ArticleArchive
+from tools.articles import clean_html_content
+from tools.feeds import read_feed
+
+FIELDS = ("id", "title", "link", "summary", "published")
+
+
+def chunked(data, size=4096):
+    return [data[i:i + size] for i in range(0, len(data), size)]
+
+
+def test_entries_match_feedparser():
+    for style in FEED_STYLES:
+        data = build_feed(style).encode("utf-8")
+        expected = feedparser.parse(data).entries
+        entries = read_feed(chunked(data))
+        assert len(entries) == len(expected) == 40, style
+        for ours, theirs in zip(entries, expected):
+            for field in FIELDS:
+                assert clean_html_content(ours.get(field, "")) == clean_html_content(theirs.get(field, "")), (style, field)
+
+
+def test_reading_stops_after_the_limit():
+    data = build_feed("techcrunch").encode("utf-8")
+    chunks = chunked(data)
+    consumed = []
+
+    def stream():
+        for chunk in chunks:
+            consumed.append(chunk)
+            yield chunk
+
+    entries = read_feed(stream(), limit=3)
+    assert [e["link"] for e in entries] == [f"https://techcrunch.example.com/2024/06/{i:02d}/story-{i}/" for i in range(3)]
+    assert len(consumed) < len(chunks) / 4
+
+
+def test_entries_without_a_link_are_skipped():
+    feed = ("<rss><channel><item><title>No link</title></item>"
+            "<item><guid>https://example.com/permalink</guid><title>Permalink</title></item>"
+            "<item><title>Linked</title><link>https://example.com/linked</link></item></channel></rss>")
+    entries = read_feed([feed.encode("utf-8")], limit=2)
+    assert [e["link"] for e in entries] == ["https://example.com/permalink", "https://example.com/linked"]
+
+
+def test_malformed_feed_falls_back_to_feedparser():
+    # &nbsp; isn't an XML entity, so this isn't well-formed XML
+    feed = ("<rss><channel><item><title>Caf&eacute;&nbsp;news</title><link>https://example.com/1</link>"
+            "<description>One</description></item><item><title>Two</title><link>https://example.com/2</link>"
+            "</item></channel></rss>").encode("utf-8")
+    entries = read_feed(chunked(feed, 32), limit=5)
+    assert [e["link"] for e in entries] == ["https://example.com/1", "https://example.com/2"]
+    assert clean_html_content(entries[0]["title"]) == "Café news"
+
+
+def test_clean_html_content():
+    assert clean_html_content("") == ""
+    assert clean_html_content(None) == ""
+    assert clean_html_content("<p>Fast&nbsp;&amp;\n\n  <b>safe</b>&#39;s</p>") == "Fast & safe's"
+    assert clean_html_content("<style>p { color: red }</style>Text<script>alert('<b>')</script>") == "Text"
+    assert clean_html_content("&lt;b&gt; stays text") == "<b> stays text"
+
+
+def test_feed_is_streamed_from_the_server():
+    original = (archive_module._archive, articles.RSS_FEEDS["theverge"])
+    with tempfile.TemporaryDirectory() as directory:
+        archive_module._archive = ArticleArchive(os.path.join(directory, "articles.db"))
+        try:
+            with CorpusServer({"feed": build_feed("theverge")}, compress=True) as server:
+                articles.RSS_FEEDS["theverge"] = (server.url_for("feed"), *original[1][1:])
+                listing = articles.fetch_tech_articles("theverge")
+                archive_module._archive.save_validators("theverge", None, None)  # forget the ETag so the feed is read again
+                entries, _ = articles.fetch_feed_entries("theverge", limit=4)
+        finally:
+            archive_module._archive, articles.RSS_FEEDS["theverge"] = original
+    assert [e["title"] for e in entries] == [f"Story {i}: databases & the edge" for i in range(4)]
+    assert entries[0]["description"] == "The 0th story in the feed, and why it matters."
+    assert entries[0]["published"] == "2024-06-10T00:15:00Z"
+    assert listing["count"] == 3 and listing["articles"][0]["source"] == "The Verge"
+    assert listing["articles"][0]["title"] == "Story 0: databases & the edge"
+
+
+if __name__ == "__main__":
+    test_entries_match_feedparser()
+    test_reading_stops_after_the_limit()
+    test_entries_without_a_link_are_skipped()
+    test_malformed_feed_falls_back_to_feedparser()
+    test_clean_html_content()
+    test_feed_is_streamed_from_the_server()
+    print("✅ Streaming feed reader tests passed")
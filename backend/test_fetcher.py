@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for the pooled, per-host paced page fetcher
+"""
+
+import socket
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.stubs import CorpusServer, load_corpus
+from tools import fetcher as fetcher_module
+from tools.fetcher import DNSCache, Fetcher, TokenBucket
+
+PAGE = load_corpus()["news_article"]
+
+
+def test_token_bucket_paces_after_burst():
+    bucket = TokenBucket(rate=20, burst=2)
+    delays = [round(bucket.reserve(), 2) for _ in range(4)]
+    assert delays == [0.0, 0.0, 0.05, 0.1]
+    assert TokenBucket(rate=0, burst=1).reserve() == 0.0
+
+
+def test_connections_are_reused_and_gzip_is_transparent():
+    with CorpusServer(compress=True) as server:
+        fetcher = Fetcher(host_rate=0)
+        for _ in range(5):
+            response = fetcher.get(server.url_for("news_article"))
+            assert response.text == PAGE
+        assert response.headers["Content-Encoding"] == "gzip"
+        assert len(server.connections) == 1  # one kept-alive connection for all five fetches
+
+
+def test_evicted_hosts_close_their_connections():
+    with CorpusServer() as server, CorpusServer() as other:
+        fetcher = Fetcher(host_rate=0, max_hosts=1)
+        first = fetcher._host(server.url_for("news_article"))
+        assert fetcher.get(server.url_for("news_article")).text == PAGE
+        pools = first.adapter.poolmanager.pools
+        pool = pools.get(next(iter(pools.keys())))
+        assert pool.num_connections == 1 and pool.pool.qsize() > 0
+        assert fetcher.get(other.url_for("news_article")).text == PAGE
+        assert pool.pool is None  # the evicted host's pool was closed
+        assert fetcher.get(server.url_for("news_article")).text == PAGE
+
+
+def test_dns_cache_resolves_each_host_once():
+    lookups = []
+    original_getaddrinfo = socket.getaddrinfo
+
+    def counting_getaddrinfo(host, *args, **kwargs):
+        if host == "localhost":
+            lookups.append(host)
+        return original_getaddrinfo(host, *args, **kwargs)
+
+    original_cache = fetcher_module.DNS_CACHE
+    fetcher_module.DNS_CACHE = DNSCache(ttl=60)
+    socket.getaddrinfo = counting_getaddrinfo
+    try:
+        with CorpusServer() as server:
+            url = server.url_for("news_article").replace("127.0.0.1", "localhost")
+            fetcher = Fetcher(host_rate=0)
+            for _ in range(3):
+                # A new connection each time, so every fetch needs an address
+                assert fetcher.get(url, headers={"Connection": "close"}).text == PAGE
+        assert len(server.connections) == 3
+        assert lookups == ["localhost"]
+    finally:
+        socket.getaddrinfo = original_getaddrinfo
+        fetcher_module.DNS_CACHE = original_cache
+
+
+def test_per_host_concurrency_limit():
+    with CorpusServer(latency=0.2) as slow:
+        fetcher = Fetcher(host_concurrency=2, host_rate=0)
+        start = time.perf_counter()
+        with ThreadPoolExecutor(4) as pool:
+            list(pool.map(lambda _: fetcher.get(slow.url_for("news_article")), range(4)))
+        # Four requests, two at a time: two rounds of 0.2s
+        assert time.perf_counter() - start >= 0.4
+
+
+def test_per_host_rate_limit():
+    with CorpusServer() as server:
+        fetcher = Fetcher(host_rate=10, host_burst=1)
+        start = time.perf_counter()
+        for _ in range(4):
+            fetcher.get(server.url_for("news_article"))
+        assert time.perf_counter() - start >= 0.29
+
+
+if __name__ == "__main__":
+    test_token_bucket_paces_after_burst()
+    test_connections_are_reused_and_gzip_is_transparent()
+    test_evicted_hosts_close_their_connections()
+    test_dns_cache_resolves_each_host_once()
+    test_per_host_concurrency_limit()
+    test_per_host_rate_limit()
+    print("✅ Fetcher tests passed")
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+Test script for the local hashtag index that can replace the reach stage
+"""
+
+import time
+
+from benchmarks.stubs import CorpusServer, StubChatModel
+from tools import hashtags, state, url_analyser
+from tools.deadline import ESTIMATES
+from tools.hashtags import HashtagIndex, add_hashtags, terms
+from tools.semantic_cache import SemanticCache
+
+ARTICLES = [
+    "Postgres 17 ships faster autovacuum. The release improves query planning and index maintenance.",
+    "Tuning autovacuum on a busy SQL database",
+    "How we cut p99 latency in half by adding a Redis cache in front of Postgres",
+    "Zig 0.14 released with a new build system #ZigLang",
+    "Writing a toy allocator in Zig #ZigLang",
+    "Comptime tricks for faster parsers #ZigLang",
+    "Startup raises $40M Series B to build vector database infrastructure",
+]
+
+
+def test_terms_keep_technical_words():
+    assert terms("The C++ and C# open-source compilers, in 2024!") == ["c++", "c#", "open-source", "compilers", "2024"]
+
+
+def test_index_learns_from_articles():
+    index = HashtagIndex.build(ARTICLES)
+    assert "#ZigLang" in index.tags  # used in three articles
+    assert index.recommend("Zig's comptime makes parsers fast")[0] == "#ZigLang"
+    # "autovacuum" is never a seed term; it's learned from the database articles
+    assert index.recommend("Autovacuum settings worth changing")[0] == "#Database"
+    assert index.recommend("The weather was nice on Sunday") == []
+
+
+def test_add_hashtags_respects_existing_tags():
+    index = HashtagIndex.build(ARTICLES)
+    tweet = "Put a Redis cache in front of your database and watch latency drop"
+    tagged = add_hashtags(tweet, index)
+    assert tagged.startswith(tweet) and 1 <= tagged.count("#") <= 3
+    tagged = add_hashtags("Redis caching done right #Caching #Redis #Performance", index)
+    assert tagged.count("#") == 3  # already at the limit
+    assert add_hashtags("Redis caching #caching", index, k=2).lower().count("#caching") == 1
+
+
+def test_recommendation_is_fast():
+    index = HashtagIndex.build(ARTICLES * 50)
+    text = "Our Kubernetes cluster now autoscales pods on queue depth instead of CPU"
+    start = time.perf_counter()
+    for _ in range(1000):
+        index.recommend(text)
+    assert (time.perf_counter() - start) / 1000 < 0.001
+
+
+def test_local_reach_replaces_the_model_call():
+    stub = StubChatModel()
+    cache = SemanticCache(capacity=16)
+    original = (state._backend, url_analyser.create_agent, url_analyser.get_generation_cache,
+                url_analyser.LOCAL_HASHTAGS, hashtags._index, hashtags._built_at)
+    create_agent = url_analyser.create_agent
+    state._backend = state.MemoryStateBackend()
+    url_analyser.create_agent = lambda llm=None: create_agent(llm=stub)
+    url_analyser.get_generation_cache = lambda: cache
+    url_analyser.LOCAL_HASHTAGS = True
+    hashtags._index, hashtags._built_at = HashtagIndex.build(ARTICLES), time.monotonic()
+    ESTIMATES.clear()
+    try:
+        with CorpusServer() as server:
+            result = url_analyser.tweet_from_url(server.url_for("engineering_blog"))
+        assert result["tweet"] and result["stages"]["reach"] == "ok"
+        assert stub.calls == 2  # summarize and review only
+    finally:
+        (state._backend, url_analyser.create_agent, url_analyser.get_generation_cache,
+         url_analyser.LOCAL_HASHTAGS, hashtags._index, hashtags._built_at) = original
+        ESTIMATES.clear()
+
+
+def test_stale_index_is_rebuilt_in_the_background():
+    """Requests keep getting the old index while the new one is built"""
+    original = (hashtags._index, hashtags._built_at, hashtags._archived_text)
+    built = []
+
+    def slow_archive(limit):
+        time.sleep(0.2)
+        built.append(limit)
+        return ARTICLES
+
+    stale = HashtagIndex.build([])
+    hashtags._index, hashtags._built_at = stale, time.monotonic() - hashtags.HASHTAG_INDEX_TTL - 1
+    hashtags._archived_text = slow_archive
+    try:
+        start = time.perf_counter()
+        assert hashtags.get_hashtag_index() is stale
+        assert hashtags.get_hashtag_index() is stale  # one rebuild at a time
+        assert time.perf_counter() - start < 0.1
+        deadline = time.monotonic() + 5
+        while hashtags.get_hashtag_index() is stale and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert hashtags.get_hashtag_index() is not stale
+        assert "#ZigLang" in hashtags.get_hashtag_index().tags
+        assert len(built) == 1
+    finally:
+        hashtags._index, hashtags._built_at, hashtags._archived_text = original
+
+
+if __name__ == "__main__":
+    test_terms_keep_technical_words()
+    test_index_learns_from_articles()
+    test_add_hashtags_respects_existing_tags()
+    test_recommendation_is_fast()
+    test_local_reach_replaces_the_model_call()
+    test_stale_index_is_rebuilt_in_the_background()
+    print("✅ Hashtag tests passed")
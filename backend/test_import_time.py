@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+"""
+Import-time budget for the backend's cold start.
+
+Runs `python -X importtime -c "import main"` in a fresh interpreter and fails
+if importing the app takes longer than IMPORT_BUDGET_MS or if any of the
+heavy, lazily-loaded dependencies get imported at startup again.
+"""
+
+import os
+import subprocess
+import sys
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+IMPORT_BUDGET_MS = float(os.environ.get("IMPORT_BUDGET_MS", "1000"))
+DEFERRED_MODULES = ["langchain", "langchain_openai", "langchain_community", "openai", "bs4", "feedparser", "numpy"]
+
+
+def measure_import(module="main"):
+    """Return ({module: cumulative_us}, total_ms) for a cold import of `module`"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=BACKEND_DIR,
+        capture_output=True,
+        text=True,
+        env={**os.environ, "WARMUP_ON_STARTUP": "0"},
+    )
+    assert result.returncode == 0, result.stderr[-2000:]
+    cumulative = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        parts = line[len("import time:"):].split("|")
+        if not parts[1].strip().isdigit():
+            continue  # header line
+        cumulative[parts[2].strip()] = int(parts[1])
+    return cumulative, cumulative[module] / 1000
+
+
+def test_heavy_dependencies_are_deferred():
+    """langchain, openai, bs4 and feedparser load on first use, not at startup"""
+    modules, _ = measure_import()
+    loaded = [name for name in modules if name.split(".")[0] in DEFERRED_MODULES]
+    assert not loaded, f"Imported at startup: {loaded}"
+
+
+def test_cold_start_import_budget():
+    """Importing the app stays within the cold-start budget"""
+    # Best of three to keep filesystem cache effects out of the measurement
+    best = min(measure_import()[1] for _ in range(3))
+    assert best <= IMPORT_BUDGET_MS, f"import main took {best:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)"
+
+
+def test_import_does_not_open_the_state_backend():
+    """The state backend (and the session key in it) is resolved on startup, not on import"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        result = subprocess.run(
+            [sys.executable, "-c", "import main"],
+            cwd=BACKEND_DIR,
+            capture_output=True,
+            text=True,
+            env={**os.environ, "STATE_BACKEND_URL": f"sqlite:///{path}", "SESSION_SECRET": ""},
+        )
+        assert result.returncode == 0, result.stderr[-2000:]
+        assert not os.path.exists(path)
+
+
+if __name__ == "__main__":
+    modules, total = measure_import()
+    print(f"import main: {total:.0f}ms (budget {IMPORT_BUDGET_MS:.0f}ms)")
+    for name, us in sorted(modules.items(), key=lambda item: -item[1])[:15]:
+        print(f"  {us / 1000:8.1f}ms  {name}")
+    test_heavy_dependencies_are_deferred()
+    test_cold_start_import_budget()
+    test_import_does_not_open_the_state_backend()
+    print("✅ Import-time budget respected")
@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+"""
+Test script for bounded-memory page analysis: compact extracts, early tree disposal, the memory ceiling and peak tracking
+"""
+
+import gc
+import tempfile
+import tracemalloc
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.stubs import CorpusServer, load_corpus
+from tools import memory, snapshots, state, url_analyser
+from tools.memory import PEAK_BYTES, MemoryLimitExceeded, check_budget, set_tracking, track_peak
+
+PARAGRAPH = "<p>A paragraph of article text, long enough to count, about how the page analyser keeps memory bounded.</p>"
+
+
+def large_page(paragraphs=5000):
+    page = load_corpus()["news_article"]
+    return page.replace("</article>", PARAGRAPH * paragraphs + "</article>")
+
+
+def test_extract_is_compact_and_skips_scripts():
+    html = load_corpus()["news_article"].replace(
+        "</article>", "<script>var p = '<p>" + "Script text, not an article paragraph at all. " * 5 + "</p>';</script></article>"
+    )
+    page = url_analyser.extract_page(html)
+    assert not hasattr(page, "__dict__")
+    assert not any("Script text" in p for p in page.paragraphs)
+    assert url_analyser.analyze_extract(page) == url_analyser.analyze_html(load_corpus()["news_article"])
+
+
+def test_tree_is_released_without_the_garbage_collector():
+    html = large_page()
+    gc.collect()
+    gc.disable()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = url_analyser.analyze_html(html)
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+        gc.enable()
+    assert result["paragraph_stats"]["count"] > 5000
+    # The paragraphs themselves stay; the tree (20x the markup) doesn't
+    assert retained < len(html) * 3, retained
+
+
+def test_pages_over_the_memory_limit_are_refused():
+    check_budget("<p>small</p>", limit=1024)
+    try:
+        check_budget("x" * 1000, limit=1024)
+        assert False, "the estimate should exceed the limit"
+    except MemoryLimitExceeded as e:
+        assert "too large" in str(e)
+
+    original = (state._backend, memory.ANALYSIS_MEMORY_LIMIT)
+    state._backend = state.MemoryStateBackend()
+    memory.ANALYSIS_MEMORY_LIMIT = 1024 * 1024
+    try:
+        with CorpusServer({"large": large_page(), "small": load_corpus()["news_article"]}) as server:
+            refused = url_analyser.analyze_url_content(server.url_for("large"))
+            analyzed = url_analyser.analyze_url_content(server.url_for("small"))
+    finally:
+        state._backend, memory.ANALYSIS_MEMORY_LIMIT = original
+    assert refused["success"] is False and "too large" in refused["error"]
+    assert analyzed["success"] is True
+
+
+def test_oversized_downloads_are_refused_while_streaming():
+    page = large_page()
+    with tempfile.TemporaryDirectory() as tmp:
+        original = (state._backend, snapshots._archive, memory.MAX_PAGE_BYTES)
+        state._backend = state.MemoryStateBackend()
+        snapshots._archive = snapshots.SnapshotArchive(tmp)
+        # Compressed, the page is well under the cap; the cap applies to what is actually read
+        memory.MAX_PAGE_BYTES = len(page) // 2
+        try:
+            with CorpusServer({"large": page, "small": load_corpus()["news_article"]}, compress=True) as server:
+                refused = url_analyser.analyze_url_content(server.url_for("large"))
+                analyzed = url_analyser.analyze_url_content(server.url_for("small"))
+            assert server.url_for("large") not in snapshots._archive
+            assert server.url_for("small") in snapshots._archive
+        finally:
+            snapshots._archive.close()
+            state._backend, snapshots._archive, memory.MAX_PAGE_BYTES = original
+    assert refused["success"] is False and "to download" in refused["error"]
+    assert analyzed["success"] is True
+
+
+def test_peak_tracking_can_be_toggled():
+    with track_peak("test") as usage:
+        pass
+    assert usage.peak_bytes is None  # off by default
+
+    assert set_tracking(True)
+    try:
+        observed = PEAK_BYTES.count(stage="test")
+        with track_peak("test") as usage:
+            block = bytearray(4 * 1024 * 1024)
+            del block
+        assert usage.peak_bytes >= 4 * 1024 * 1024
+        assert PEAK_BYTES.count(stage="test") == observed + 1
+    finally:
+        assert not set_tracking(False)
+    assert not tracemalloc.is_tracing()
+
+
+def test_admin_endpoint_toggles_tracking():
+    client = TestClient(main.app)
+    original = main.ADMIN_TOKEN
+    main.ADMIN_TOKEN = "test-admin"
+    try:
+        assert client.post("/api/admin/memory-tracking", params={"enabled": "true"}).status_code == 403
+        headers = {"X-Admin-Token": "test-admin"}
+        response = client.post("/api/admin/memory-tracking", params={"enabled": "true"}, headers=headers)
+        assert response.json() == {"tracking": True}
+        assert client.get("/api/admin/memory-tracking", headers=headers).json() == {"tracking": True}
+        response = client.post("/api/admin/memory-tracking", params={"enabled": "false"}, headers=headers)
+        assert response.json() == {"tracking": False}
+    finally:
+        main.ADMIN_TOKEN = original
+        set_tracking(False)
+
+
+if __name__ == "__main__":
+    test_extract_is_compact_and_skips_scripts()
+    test_tree_is_released_without_the_garbage_collector()
+    test_pages_over_the_memory_limit_are_refused()
+    test_oversized_downloads_are_refused_while_streaming()
+    test_peak_tracking_can_be_toggled()
+    test_admin_endpoint_toggles_tracking()
+    print("✅ Memory-bounded analysis tests passed")
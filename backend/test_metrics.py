@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script for the metrics subsystem and the /api/metrics endpoint
+"""
+
+from fastapi.testclient import TestClient
+
+from main import app
+from tools.metrics import Registry, span, HTTP_REQUEST_SECONDS, STAGE_SECONDS, record_token_usage, LLM_TOKENS
+
+
+def test_histogram_rendering():
+    """Histogram buckets are cumulative and include sum/count"""
+    registry = Registry()
+    hist = registry.histogram("demo_seconds", "Demo", ("stage",), buckets=(0.1, 1.0))
+    hist.observe(0.05, stage="fetch")
+    hist.observe(0.5, stage="fetch")
+    hist.observe(5, stage="fetch")
+
+    text = registry.render()
+    assert '# TYPE demo_seconds histogram' in text
+    assert 'demo_seconds_bucket{stage="fetch",le="0.1"} 1' in text
+    assert 'demo_seconds_bucket{stage="fetch",le="1"} 2' in text
+    assert 'demo_seconds_bucket{stage="fetch",le="+Inf"} 3' in text
+    assert 'demo_seconds_count{stage="fetch"} 3' in text
+
+
+def test_span_records_errors():
+    """Spans record the outcome of the wrapped block"""
+    before = STAGE_SECONDS.count(stage="test_stage", outcome="error")
+    try:
+        with span("test_stage"):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    assert STAGE_SECONDS.count(stage="test_stage", outcome="error") == before + 1
+
+
+def test_metrics_endpoint():
+    """Route latency and token counters are exposed in Prometheus format"""
+    record_token_usage("summarize", prompt_tokens=120, completion_tokens=40)
+    assert LLM_TOKENS.value(stage="summarize", kind="prompt") >= 120
+
+    client = TestClient(app)
+    assert client.get("/api/health").status_code == 200
+
+    response = client.get("/api/metrics")
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain")
+    assert 'route="/api/health"' in response.text
+    assert 'tweetai_llm_tokens_total{stage="summarize",kind="prompt"}' in response.text
+
+
+def test_requests_answered_by_other_middleware_are_counted():
+    """Metrics wrap every other middleware, so a preflight CORS turns away still shows up"""
+    labels = {"method": "OPTIONS", "route": "unmatched", "status": 400}
+    before = HTTP_REQUEST_SECONDS.count(**labels)
+    response = TestClient(app).options("/api/health", headers={
+        "Origin": "https://elsewhere.example.com", "Access-Control-Request-Method": "GET",
+    })
+    assert response.status_code == 400
+    assert HTTP_REQUEST_SECONDS.count(**labels) == before + 1
+
+
+if __name__ == "__main__":
+    test_histogram_rendering()
+    test_span_records_errors()
+    test_metrics_endpoint()
+    test_requests_answered_by_other_middleware_are_counted()
+    print("✅ Metrics tests passed")
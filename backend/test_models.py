@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+Test script for per-stage model routing, fallback and cost accounting
+"""
+
+from benchmarks.stubs import StubChatModel, load_corpus
+from tools import models, state, url_analyser
+from tools.local_model import LocalChatModel
+from tools.models import MODEL_CALLS, MODEL_FALLBACKS, ModelRouter, Route
+from tools.semantic_cache import SemanticCache
+
+URL = "https://engineering.example.org/posts/deleting-a-cache"
+HTML = load_corpus()["engineering_blog"]
+
+
+class FailingModel(StubChatModel):
+    def _latency(self):
+        raise ConnectionError("upstream unavailable")
+
+
+def with_routes(routes):
+    """Run `test(models_by_name)` with stub providers installed, stages routed by `routes` and fresh caches"""
+    def decorator(test):
+        def run():
+            built = {}
+
+            def provider(cls, **fields):
+                def factory(route):
+                    model = built[route.model] = cls(**fields)
+                    return model
+                return factory
+
+            models.register_provider("stub", provider(StubChatModel))
+            models.register_provider("slow", provider(StubChatModel, latency=1.0))
+            models.register_provider("failing", provider(FailingModel))
+            cache = SemanticCache(capacity=16)
+            original = (models.set_router(ModelRouter(routes)), state._backend, url_analyser.fetch_page,
+                        url_analyser.get_generation_cache)
+            state._backend = state.MemoryStateBackend()
+            url_analyser.fetch_page = lambda url: HTML
+            url_analyser.get_generation_cache = lambda: cache
+            try:
+                test(built)
+            finally:
+                models.set_router(original[0])
+                state._backend, url_analyser.fetch_page, url_analyser.get_generation_cache = original[1:]
+                for name in ("stub", "slow", "failing"):
+                    models.PROVIDERS.pop(name)
+        run.__name__ = test.__name__
+        run.__doc__ = test.__doc__
+        return run
+    return decorator
+
+
+def test_route_specs():
+    route = Route.parse("openai:gpt-4o-mini@0.3")
+    assert (route.provider, route.model, route.temperature, route.timeout) == ("openai", "gpt-4o-mini", 0.3, None)
+    route = Route.parse({"provider": "local", "timeout": 5})
+    assert route.name == "local:" and route.temperature == 0.7 and route.timeout == 5
+
+    router = ModelRouter({"review": ["local:extractive"]}, prices={"my-model": [1.0, 2.0]})
+    assert [r.name for r in router.routes["review"]] == ["local:extractive"]
+    assert router.routes["summarize"][0].model == "gpt-3.5-turbo"  # other stages keep the defaults
+    assert router.model(router.routes["review"][0]) is router.candidates("review")[0][1]
+    assert router.cost(Route("openai", "gpt-4o-mini"), 1_000_000, 1_000_000) == 0.75
+    assert router.cost(Route("openai", "my-model"), 500_000, 0) == 0.5
+    assert router.cost(Route("local", "extractive"), 1000, 1000) == 0
+
+
+def test_local_model_is_extractive():
+    model = LocalChatModel()
+    assert model.invoke("Review this.\nTweet:\nShip it. #dev").content == "Ship it. #dev"
+    assert model.invoke("Improve:\nTweet 1:\nOne\n\nTweet 2:\nTwo").content == "One\n---\nTwo"
+    reply = model.invoke("Context\n\nCaches hide latency. They also hide bugs. " + "More words. " * 40).content
+    assert reply.startswith("Caches hide latency.") and len(reply) <= 270
+
+
+@with_routes({"summarize": ["stub:writer"], "review": ["local:extractive"], "reach": ["local:extractive"]})
+def test_each_stage_uses_its_route(built):
+    before = MODEL_CALLS.value(stage="review", model="local:extractive", outcome="ok")
+    result = url_analyser.tweet_from_url(URL)
+    assert result["tweet"]
+    assert built["writer"].calls == 1  # only summarize went to the stub
+    assert MODEL_CALLS.value(stage="review", model="local:extractive", outcome="ok") == before + 1
+
+
+@with_routes({
+    "summarize": [{"provider": "slow", "model": "primary", "timeout": 0.05}, "stub:backup"],
+    "review": ["failing:primary", "stub:backup"],
+    "reach": ["local:extractive"],
+})
+def test_timeouts_and_errors_fall_back(built):
+    timeouts = MODEL_FALLBACKS.value(stage="summarize", model="slow:primary")
+    errors = MODEL_FALLBACKS.value(stage="review", model="failing:primary")
+    result = url_analyser.tweet_from_url(URL)
+    assert result["tweet"] and result["stages"]["summarize"] == result["stages"]["review"] == "ok"
+    assert built["backup"].calls == 2
+    assert MODEL_FALLBACKS.value(stage="summarize", model="slow:primary") == timeouts + 1
+    assert MODEL_FALLBACKS.value(stage="review", model="failing:primary") == errors + 1
+
+
+@with_routes({"summarize": ["failing:only"], "review": ["local:extractive"], "reach": ["local:extractive"]})
+def test_last_model_failure_is_raised(built):
+    try:
+        url_analyser.tweet_from_url(URL)
+        assert False, "a stage with no working model should fail"
+    except ConnectionError:
+        pass
+
+
+if __name__ == "__main__":
+    test_route_specs()
+    test_local_model_is_extractive()
+    test_each_stage_uses_its_route()
+    test_timeouts_and_errors_fall_back()
+    test_last_model_failure_is_raised()
+    print("✅ Model routing tests passed")
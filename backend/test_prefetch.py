@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Test script for the trending-article prefetch worker
+"""
+
+from benchmarks.stubs import StubChatModel, load_corpus
+from tools import state, url_analyser
+from tools.metrics import record_token_usage, track_tokens
+from tools.prefetch import PrefetchWorker, _budget_key
+from tools.semantic_cache import SemanticCache
+
+CORPUS = load_corpus()
+PAGES = {
+    "https://technews.example.com/2024/05/14/vector-database-series-b/?utm_source=rss": CORPUS["news_article"],
+    "https://engineering.example.org/posts/deleting-a-cache": CORPUS["engineering_blog"],
+}
+
+
+def listing(source):
+    articles = [{"title": source, "url": url} for url in PAGES]
+    return {"articles": articles, "source": source, "count": len(articles)}
+
+
+def with_stubs(test):
+    """Run `test(stub_llm, fetched)` against a fresh in-memory state backend and generation cache"""
+    def run():
+        fetched = []
+        stub = StubChatModel()
+        original = (state._backend, url_analyser.fetch_page, url_analyser.create_agent,
+                    url_analyser.get_generation_cache)
+        create_agent = url_analyser.create_agent
+        cache = SemanticCache(capacity=16)
+        state._backend = state.MemoryStateBackend()
+        url_analyser.fetch_page = lambda url: fetched.append(url) or PAGES[url]
+        url_analyser.create_agent = lambda llm=None: create_agent(llm=stub)
+        url_analyser.get_generation_cache = lambda: cache
+        try:
+            test(stub, fetched)
+        finally:
+            (state._backend, url_analyser.fetch_page, url_analyser.create_agent,
+             url_analyser.get_generation_cache) = original
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+def test_track_tokens_collects_block_usage():
+    with track_tokens() as usage:
+        record_token_usage("summarize", 120, 40)
+        record_token_usage("review", 80, 30)
+    record_token_usage("summarize", 1000, 1000)
+    assert usage == {"prompt": 200, "completion": 70}
+
+
+@with_stubs
+def test_listed_article_is_served_from_prefetch(stub, fetched):
+    """After a prefetch cycle, generating from a listed article costs no fetch and no model call"""
+    worker = PrefetchWorker(sources=("techcrunch", "wired"), fetch_articles=listing)
+    stats = worker.run_once()
+    assert stats["articles"] == 2 and stats["generated"] == 2 and stats["errors"] == 0
+    calls, fetches = stub.calls, len(fetched)
+
+    # A new process-local cache, as in another worker that didn't run the cycle
+    url_analyser.get_generation_cache = lambda: SemanticCache(capacity=16)
+    for url in PAGES:
+        result = url_analyser.tweet_from_url(url)
+        assert result["cache"]["kind"] == "prefetched"
+        assert result["tweet"]
+    assert stub.calls == calls and len(fetched) == fetches
+
+    # The next cycle finds every draft still fresh
+    assert worker.run_once()["fresh"] == 2
+    assert stub.calls == calls
+
+
+@with_stubs
+def test_budget_cap_stops_generation(stub, fetched):
+    """Over the daily token budget the worker still analyzes but stops calling the model"""
+    state.get_state_backend().set(_budget_key(), 5000)
+    worker = PrefetchWorker(sources=("techcrunch",), fetch_articles=listing, token_budget=5000)
+    stats = worker.run_once()
+    assert stats["analyzed"] == 2 and stats["over_budget"] == 2 and stats["generated"] == 0
+    assert stub.calls == 0
+    assert len(fetched) == 2
+
+
+@with_stubs
+def test_analysis_only_mode(stub, fetched):
+    worker = PrefetchWorker(sources=("techcrunch",), fetch_articles=listing, generate=False)
+    assert worker.run_once()["analyzed"] == 2
+    assert stub.calls == 0
+
+    # The click still generates, but reuses the cached analysis
+    assert url_analyser.tweet_from_url(next(iter(PAGES)))["tweet"]
+    assert len(fetched) == 2 and stub.calls > 0
+
+
+if __name__ == "__main__":
+    test_track_tokens_collects_block_usage()
+    test_listed_article_is_served_from_prefetch()
+    test_budget_cap_stops_generation()
+    test_analysis_only_mode()
+    print("✅ Prefetch tests passed")
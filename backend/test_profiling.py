@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Test script for per-request profiling of /api/url-analysis
+"""
+
+import os
+import tempfile
+import time
+
+from fastapi.testclient import TestClient
+
+import main
+from tools import profiling
+
+
+def busy_tweet_from_url(url, additional_text="", variants=1, deadline=None):
+    """Stand-in for tweet_from_url that burns CPU long enough to be sampled"""
+    deadline = time.perf_counter() + 0.1
+    total = 0
+    while time.perf_counter() < deadline:
+        total += sum(range(1000))
+    return {"success": True, "tweet": f"analysed {url}"}
+
+
+def test_profiler_collects_collapsed_stacks():
+    """Samples are aggregated into `frame;frame count` lines"""
+    with profiling.SamplingProfiler(interval=0.001) as profiler:
+        busy_tweet_from_url("https://example.com")
+    assert profiler.sample_count > 0
+    first = profiler.collapsed().splitlines()[0]
+    stack, count = first.rsplit(" ", 1)
+    assert "busy_tweet_from_url" in stack and int(count) > 0
+
+
+def test_profile_mode_requires_admin():
+    """Non-admin callers can't turn profiling on"""
+    client = TestClient(main.app)
+    response = client.get("/api/url-analysis", params={"url": "https://example.com", "profile": "true"})
+    assert response.status_code == 403
+
+
+def test_profile_mode_returns_artifact():
+    """Admins get the normal result plus a stored, downloadable profile"""
+    original = (main.tweet_from_url, main.ADMIN_TOKEN, profiling.PROFILE_DIR)
+    with tempfile.TemporaryDirectory() as tmp:
+        main.tweet_from_url = busy_tweet_from_url
+        main.ADMIN_TOKEN = "test-admin"
+        profiling.PROFILE_DIR = tmp
+        try:
+            client = TestClient(main.app)
+            headers = {"X-Admin-Token": "test-admin", "X-Profile": "1"}
+            response = client.get("/api/url-analysis", params={"url": "https://example.com"}, headers=headers)
+            assert response.status_code == 200
+            body = response.json()
+            assert body["tweet"] == "analysed https://example.com"
+            assert body["profile"]["samples"] > 0
+
+            stored = client.get(f"/api/admin/profiles/{body['profile']['id']}", headers=headers)
+            assert stored.status_code == 200
+            assert "busy_tweet_from_url" in stored.text
+        finally:
+            main.tweet_from_url, main.ADMIN_TOKEN, profiling.PROFILE_DIR = original
+
+
+def test_only_the_newest_profiles_are_kept():
+    """Saving a profile prunes the oldest artifacts beyond the limit"""
+    profiler = profiling.SamplingProfiler()
+    with tempfile.TemporaryDirectory() as tmp:
+        ids = []
+        for i in range(5):
+            ids.append(profiling.save_profile(profiler, tmp, keep=3))
+            # Distinct mtimes, so "newest" is well defined on coarse-grained filesystems
+            path = os.path.join(tmp, f"{ids[-1]}.collapsed")
+            os.utime(path, (1000 + i, 1000 + i))
+        profiling.prune_profiles(tmp, 3)
+        assert sorted(os.listdir(tmp)) == sorted(f"{i}.collapsed" for i in ids[-3:])
+        assert profiling.load_profile(ids[0], tmp) is None
+        assert profiling.load_profile(ids[-1], tmp) is not None
+
+
+if __name__ == "__main__":
+    test_profiler_collects_collapsed_stacks()
+    test_profile_mode_requires_admin()
+    test_profile_mode_returns_artifact()
+    test_only_the_newest_profiles_are_kept()
+    print("✅ Profiling tests passed")
@@ -0,0 +1,265 @@
+#!/usr/bin/env python3
+"""
+Test script for publishing threads, synchronously and through the background publish queue
+"""
+
+import threading
+import time
+
+import requests
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.stubs import MockTwitterServer, session_cookie
+from tools import state, twitter
+from tools.twitter import PUBLISH_QUEUE, PublishWorker
+
+THREAD = [f"{n}/4 A thread about publishing, part {n}." for n in range(1, 5)]
+
+
+def client_for(token):
+    client = TestClient(main.app)
+    client.cookies.set("session", session_cookie({"twitter_token": token, "token_type": "Bearer"}, main.session_secret()))
+    return client
+
+
+def with_twitter(latency=0.0):
+    """Run `test(server, client)` against the mock Twitter API with a fresh state backend"""
+    def decorator(test):
+        def run():
+            original = (state._backend, twitter.TWITTER_API_BASE)
+            state._backend = state.MemoryStateBackend()
+            try:
+                with MockTwitterServer(latency=latency) as server:
+                    twitter.TWITTER_API_BASE = server.base_url
+                    test(server, client_for("test-token"))
+            finally:
+                state._backend, twitter.TWITTER_API_BASE = original
+        run.__name__ = test.__name__
+        run.__doc__ = test.__doc__
+        return run
+    return decorator
+
+
+class FakeResponse:
+    def __init__(self, status_code, body, headers=None, errors=None):
+        self.status_code = status_code
+        self.text = body
+        self.headers = headers or {}
+        self.errors = errors
+
+    def json(self):
+        return {"errors": self.errors} if self.errors else {}
+
+
+@with_twitter()
+def test_sync_post_chains_replies(server, client):
+    response = client.post("/api/twitter/post", data={"tweets": THREAD})
+    assert response.status_code == 200, response.text
+    body = response.json()
+    assert body["tweet_ids"] == ["1", "2", "3", "4"] and body["first_tweet_id"] == "1"
+    assert [t.get("reply", {}).get("in_reply_to_tweet_id") for t in server.tweets] == [None, "1", "2", "3"]
+
+
+@with_twitter(latency=0.05)
+def test_async_post_returns_before_publishing(server, client):
+    start = time.perf_counter()
+    response = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD})
+    assert time.perf_counter() - start < 0.05  # nothing was posted in the request
+    assert response.status_code == 202, response.text
+    job = response.json()
+    assert job["status"] == "queued" and job["tweet_count"] == 4 and job["posted"] == 0
+    assert response.headers["location"] == job["status_url"]
+    assert server.tweets == []
+
+    worker = threading.Thread(target=PublishWorker(threads=0).run_once)
+    worker.start()
+    seen = set()
+    while worker.is_alive():
+        seen.add(client.get(job["status_url"]).json()["posted"])
+        time.sleep(0.01)
+    worker.join()
+    assert len(seen) > 1  # progress was visible while publishing
+
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "published" and status["tweet_ids"] == ["1", "2", "3", "4"]
+    assert "authorization" not in status and "tweets" not in status
+    assert state.get_state_backend().queue_length(PUBLISH_QUEUE) == 0
+
+
+@with_twitter()
+def test_status_is_only_visible_to_its_owner(server, client):
+    job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+    assert client_for("someone-else").get(job["status_url"]).status_code == 404
+    assert TestClient(main.app).get(job["status_url"]).status_code == 401
+    assert client.get("/api/twitter/post/unknown").status_code == 404
+
+
+@with_twitter()
+def test_invalid_threads_are_rejected_up_front(server, client):
+    response = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": ["First", "  "]})
+    assert response.status_code == 400 and "Tweet 2 is empty" in response.text
+    assert state.get_state_backend().queue_length(PUBLISH_QUEUE) == 0
+
+
+@with_twitter()
+def test_transient_failures_resume_after_the_last_posted_tweet(server, client):
+    post_tweet = twitter.post_tweet
+    failures = []
+
+    def flaky_post(text, authorization, reply_to=None):
+        if reply_to == "2" and not failures:
+            failures.append(text)
+            return FakeResponse(503, "over capacity")
+        return post_tweet(text, authorization, reply_to)
+
+    twitter.post_tweet = flaky_post
+    try:
+        job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+        assert PublishWorker(retry_delay=0.01).run_once()
+    finally:
+        twitter.post_tweet = post_tweet
+    status = client.get(job["status_url"]).json()
+    assert failures and status["status"] == "published"
+    assert status["tweet_ids"] == ["1", "2", "3", "4"] and len(server.tweets) == 4  # nothing posted twice
+
+
+@with_twitter()
+def test_rejected_tweets_fail_the_job(server, client):
+    post_tweet = twitter.post_tweet
+    twitter.post_tweet = lambda text, authorization, reply_to=None: FakeResponse(400, "duplicate content")
+    try:
+        job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+        assert PublishWorker(retry_delay=0.01).run_once()
+    finally:
+        twitter.post_tweet = post_tweet
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "failed" and "duplicate content" in status["error"]
+
+
+@with_twitter()
+def test_access_errors_mid_thread_fail_the_job(server, client):
+    post_tweet = twitter.post_tweet
+
+    def limited_post(text, authorization, reply_to=None):
+        if reply_to == "2":
+            return FakeResponse(403, "client not permitted", errors=[{"code": 453}])
+        return post_tweet(text, authorization, reply_to)
+
+    twitter.post_tweet = limited_post
+    try:
+        job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+        assert PublishWorker(retry_delay=0.01).run_once()
+    finally:
+        twitter.post_tweet = post_tweet
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "failed" and not status["simulated"]
+    assert status["tweet_ids"] == ["1", "2"]
+
+
+@with_twitter()
+def test_jobs_of_a_dead_worker_fail_after_the_lease(server, client):
+    job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+    backend = state.get_state_backend()
+    # A worker claims the job, takes its token, posts two tweets and dies without acknowledging it
+    receipt, publish_id = backend.claim(PUBLISH_QUEUE, 0.1)
+    stored = backend.get(f"publish:{publish_id}")
+    stored["tweet_ids"] = twitter.publish_thread(THREAD[:2], stored.pop("authorization"))
+    stored["status"] = "publishing"
+    backend.set(f"publish:{publish_id}", stored)
+
+    worker = PublishWorker(threads=0)
+    assert not worker.run_once()  # still leased
+    time.sleep(0.15)
+    assert worker.run_once()
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "failed" and "interrupted after 2 of 4" in status["error"]
+    assert status["tweet_ids"] == ["1", "2"] and len(server.tweets) == 2
+    assert backend.queue_length(PUBLISH_QUEUE) == 0
+
+
+@with_twitter(latency=0.05)
+def test_claimed_jobs_keep_the_token_out_of_the_state(server, client):
+    job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+    key = f"publish:{job['publish_id']}"
+    assert state.get_state_backend().get(key)["authorization"] == "Bearer test-token"  # queued
+    worker = threading.Thread(target=PublishWorker(threads=0).run_once)
+    worker.start()
+    while worker.is_alive():
+        stored = state.get_state_backend().get(key)
+        assert stored["status"] == "queued" or "authorization" not in stored
+        time.sleep(0.01)
+    worker.join()
+    assert client.get(job["status_url"]).json()["status"] == "published"
+
+
+@with_twitter()
+def test_read_timeouts_are_not_posted_again(server, client):
+    post_tweet = twitter.post_tweet
+    calls = []
+
+    def timing_out_post(text, authorization, reply_to=None):
+        calls.append(text)
+        if reply_to == "2":
+            post_tweet(text, authorization, reply_to)  # it went through, the answer didn't come back
+            raise requests.ReadTimeout("read timed out")
+        if reply_to is None and len(calls) == 1:
+            raise requests.ConnectionError("connection refused")  # never sent: safe to retry
+        return post_tweet(text, authorization, reply_to)
+
+    twitter.post_tweet = timing_out_post
+    try:
+        job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+        assert PublishWorker(retry_delay=0.01).run_once()
+    finally:
+        twitter.post_tweet = post_tweet
+    status = client.get(job["status_url"]).json()
+    assert status["status"] == "failed" and "tweet 3, which may have been posted" in status["error"]
+    assert len(server.tweets) == 3 and calls.count(THREAD[2]) == 1
+
+
+@with_twitter()
+def test_rate_limits_wait_for_retry_after(server, client):
+    post_tweet = twitter.post_tweet
+    calls = []
+
+    def limited_post(text, authorization, reply_to=None):
+        calls.append(time.monotonic())
+        if len(calls) == 1:
+            return FakeResponse(429, "too many requests", headers={"Retry-After": "0.2"})
+        return post_tweet(text, authorization, reply_to)
+
+    twitter.post_tweet = limited_post
+    try:
+        job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+        assert PublishWorker(retry_delay=0.01).run_once()
+        assert calls[1] - calls[0] >= 0.2  # not the 0.01s backoff
+        assert client.get(job["status_url"]).json()["status"] == "published"
+
+        # A window longer than a worker should block for hands the job back to the queue
+        calls.clear()
+        job = client.post("/api/twitter/post", params={"async": "1"}, data={"tweets": THREAD}).json()
+        worker = PublishWorker(retry_delay=0.01, max_retry_wait=0.1)
+        assert worker.run_once()
+        assert client.get(job["status_url"]).json()["status"] == "queued"
+        assert not worker.run_once()  # hidden until the window is over
+        time.sleep(0.2)
+        assert worker.run_once()
+    finally:
+        twitter.post_tweet = post_tweet
+    assert client.get(job["status_url"]).json()["status"] == "published"
+
+
+if __name__ == "__main__":
+    test_sync_post_chains_replies()
+    test_async_post_returns_before_publishing()
+    test_status_is_only_visible_to_its_owner()
+    test_invalid_threads_are_rejected_up_front()
+    test_transient_failures_resume_after_the_last_posted_tweet()
+    test_rejected_tweets_fail_the_job()
+    test_access_errors_mid_thread_fail_the_job()
+    test_jobs_of_a_dead_worker_fail_after_the_lease()
+    test_claimed_jobs_keep_the_token_out_of_the_state()
+    test_read_timeouts_are_not_posted_again()
+    test_rate_limits_wait_for_retry_after()
+    print("✅ Publishing tests passed")
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Test script for /api/url-analysis response shaping: typed models, field projection and gzip
+"""
+
+import json
+
+from fastapi.testclient import TestClient
+
+import main
+from tools.responses import FIELD_PRESETS, analysis_response, parse_fields
+
+RESULT = {
+    "success": True,
+    "tweet": "Vector databases, explained",
+    "thread_tweets": ["Vector databases, explained"],
+    "is_thread": False,
+    "title": "Vector databases",
+    "author": None,
+    "paragraph_stats": {"count": 12, "avg_sentences": 3.2, "avg_words": 61.5},
+    "tone_indicators": ["technical"],
+    "sample_paragraphs": ["A vector database stores embeddings."],
+    "all_images": [f"https://cdn.example.com/{i}.png" for i in range(200)],
+    "cache": {"hit": True, "kind": "exact", "similarity": 1.0},
+}
+
+
+def with_result(result):
+    """Run a test with tweet_from_url_async stubbed to return `result`"""
+    def decorator(test):
+        def run():
+            original = main.tweet_from_url_async
+
+            async def stub(url, additional_text="", variants=1, deadline=None):
+                return dict(result) if result else result
+
+            main.tweet_from_url_async = stub
+            try:
+                test(TestClient(main.app))
+            finally:
+                main.tweet_from_url_async = original
+        run.__name__ = test.__name__
+        return run
+    return decorator
+
+
+def test_parse_fields():
+    assert parse_fields("") is None
+    assert parse_fields("full") is None
+    assert parse_fields("compact") == FIELD_PRESETS["compact"]
+    assert parse_fields(" tweet, title ") == {"success", "tweet", "title"}
+    try:
+        parse_fields("tweet,bogus")
+        assert False, "unknown fields should be rejected"
+    except ValueError as e:
+        assert "bogus" in str(e)
+
+
+def test_full_response_keeps_shape():
+    """Fields the pipeline didn't set stay out; explicit nulls stay in"""
+    body = json.loads(analysis_response(RESULT).body)
+    assert body == RESULT
+    assert "variants" not in body and body["author"] is None
+    assert analysis_response(None).body == b"null"
+
+
+@with_result(RESULT)
+def test_endpoint_projection(client):
+    body = client.get("/api/url-analysis", params={"url": "https://example.com", "fields": "compact"}).json()
+    assert body == {"success": True, "tweet": RESULT["tweet"], "thread_tweets": RESULT["thread_tweets"],
+                    "is_thread": False}
+    body = client.get("/api/url-analysis", params={"url": "https://example.com", "fields": "title"}).json()
+    assert body == {"success": True, "title": "Vector databases"}
+    response = client.get("/api/url-analysis", params={"url": "https://example.com", "fields": "images"})
+    assert response.status_code == 422
+
+
+@with_result(RESULT)
+def test_large_responses_are_gzipped(client):
+    full = client.get("/api/url-analysis", params={"url": "https://example.com"})
+    assert full.headers["content-encoding"] == "gzip"
+    assert full.json() == RESULT
+    compact = client.get("/api/url-analysis", params={"url": "https://example.com", "fields": "compact"})
+    assert "content-encoding" not in compact.headers
+
+
+@with_result(None)
+def test_failed_analysis_is_null(client):
+    response = client.get("/api/url-analysis", params={"url": "https://example.com", "fields": "compact"})
+    assert response.status_code == 200 and response.json() is None
+
+
+if __name__ == "__main__":
+    test_parse_fields()
+    test_full_response_keeps_shape()
+    test_endpoint_projection()
+    test_large_responses_are_gzipped()
+    test_failed_analysis_is_null()
+    print("✅ Response shaping tests passed")
@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Test script for scheduled posting: the SQLite store, the in-memory heap and restart recovery
+"""
+
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from fastapi.testclient import TestClient
+
+import main
+from benchmarks.stubs import session_cookie
+from tools import scheduler, twitter
+from tools.scheduler import ScheduleStore, Scheduler, parse_due
+
+TOKEN = "Bearer test-token"
+# When TOKEN expires, for schedules made without a refresh token
+EXPIRES = time.time() + 3600
+
+
+class Published:
+    """Stand-in publisher recording what was handed over and when"""
+
+    def __init__(self):
+        self.posts = []
+        self.done = threading.Event()
+        self.expected = 0
+
+    def __call__(self, tweets, authorization):
+        self.posts.append((tweets[0], authorization, time.time()))
+        if len(self.posts) >= self.expected:
+            self.done.set()
+        return f"publish-{len(self.posts)}"
+
+
+def with_store(test):
+    """Run `test(store)` against a fresh schedule database"""
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            test(ScheduleStore(os.path.join(tmp, "schedule.db")))
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+def test_parse_due():
+    assert parse_due("1700000000") == 1700000000
+    assert parse_due("2024-05-14T09:30:00") == parse_due("2024-05-14T11:30:00+02:00") == 1715679000
+    try:
+        parse_due("tomorrow")
+        assert False, "free text isn't a time"
+    except ValueError:
+        pass
+    for value in ("nan", "inf", "-inf"):
+        try:
+            parse_due(value)
+            assert False, f"{value} isn't a time"
+        except ValueError:
+            pass
+
+
+@with_store
+def test_due_posts_fire_in_order(store):
+    published = Published()
+    published.expected = 3
+    engine = Scheduler(store, publish=published, window=60)
+    engine.start()
+    try:
+        now = time.time()
+        for offset in (0.15, 0.05, 0.1):
+            engine.schedule([f"due in {offset}"], TOKEN, now + offset, expires=EXPIRES)
+        assert published.done.wait(2)
+    finally:
+        engine.stop()
+    assert [post[0] for post in published.posts] == ["due in 0.05", "due in 0.1", "due in 0.15"]
+    assert all(fired - now - float(text.split()[-1]) < 0.1 for text, _, fired in published.posts)
+    assert {s["status"] for s in store.list(TOKEN)} == {"submitted"}
+    assert store.list(TOKEN)[0]["publish_id"] == "publish-1"
+
+
+@with_store
+def test_cancelled_posts_do_not_fire(store):
+    published = Published()
+    published.expected = 1
+    engine = Scheduler(store, publish=published, window=60)
+    engine.start()
+    try:
+        cancelled = engine.schedule(["cancelled"], TOKEN, time.time() + 0.05, expires=EXPIRES)
+        engine.schedule(["kept"], TOKEN, time.time() + 0.1, expires=EXPIRES)
+        assert not store.cancel(cancelled["id"], "Bearer someone-else")
+        assert store.cancel(cancelled["id"], TOKEN)
+        assert published.done.wait(2)
+        time.sleep(0.05)
+    finally:
+        engine.stop()
+    assert [post[0] for post in published.posts] == ["kept"]
+    assert store.get(cancelled["id"], TOKEN)["status"] == "cancelled"
+
+
+@with_store
+def test_posts_beyond_the_window_are_loaded_later(store):
+    published = Published()
+    published.expected = 1
+    engine = Scheduler(store, publish=published, window=0.1)
+    engine.start()
+    try:
+        engine.schedule(["later"], TOKEN, time.time() + 0.3, expires=EXPIRES)
+        assert len(engine._heap) == 0  # outside the window: only in the store
+        assert published.done.wait(2)
+    finally:
+        engine.stop()
+    assert [post[0] for post in published.posts] == ["later"]
+
+
+@with_store
+def test_restart_recovers_pending_and_interrupted_posts(store):
+    Scheduler(store, publish=Published()).schedule(["overdue"], TOKEN, time.time(), expires=EXPIRES)
+    interrupted = store.add(["interrupted"], TOKEN, time.time() - 30)
+    store.claim(interrupted["id"])  # the previous process died mid-handover
+    store._conn().execute("UPDATE scheduled_posts SET updated = updated - 120 WHERE id = ?", (interrupted["id"],))
+
+    published = Published()
+    published.expected = 2
+    engine = Scheduler(store, publish=published)
+    engine.start()
+    try:
+        assert published.done.wait(2)
+    finally:
+        engine.stop()
+    assert sorted(post[0] for post in published.posts) == ["interrupted", "overdue"]
+
+
+@with_store
+def test_expired_tokens_are_refreshed_when_posts_fire(store):
+    refreshed = []
+
+    def refresh_access_token(refresh_token):
+        refreshed.append(refresh_token)
+        return f"Bearer fresh-{len(refreshed)}", f"refresh-{len(refreshed)}", time.time() + 7200
+
+    published = Published()
+    published.expected = 2
+    original = twitter.refresh_access_token
+    twitter.refresh_access_token = refresh_access_token
+    engine = Scheduler(store, publish=published, window=60)
+    try:
+        # Both posts were scheduled with an access token that has since expired
+        for text in ("first", "second"):
+            engine.schedule([text], TOKEN, time.time() + 0.05, refresh_token="refresh-0", expires=EXPIRES)
+        store._conn().execute("UPDATE account_tokens SET expires = ?", (time.time() - 1,))
+        engine.start()
+        assert published.done.wait(2)
+    finally:
+        engine.stop()
+        twitter.refresh_access_token = original
+    # Refreshed once (the rotated token is single-use), then reused
+    assert refreshed == ["refresh-0"]
+    assert [post[1] for post in published.posts] == ["Bearer fresh-1", "Bearer fresh-1"]
+    # Nothing left to post, so the refresh token is dropped
+    assert store._conn().execute("SELECT COUNT(*) FROM account_tokens").fetchone()[0] == 0
+
+
+@with_store
+def test_refreshes_run_once_and_do_not_block_the_store(store):
+    refreshed = []
+    refreshing = threading.Event()
+
+    def slow_refresh(refresh_token):
+        refreshed.append(refresh_token)
+        refreshing.set()
+        time.sleep(0.3)
+        return "Bearer fresh", "refresh-1", time.time() + 7200
+
+    owner = twitter.owner_key(TOKEN)
+    store.add(["post"], TOKEN, time.time() + 60, refresh_token="refresh-0", expires=time.time() - 1)
+    original = twitter.refresh_access_token
+    twitter.refresh_access_token = slow_refresh
+    try:
+        with ThreadPoolExecutor(4) as pool:
+            results = [pool.submit(store.authorization, owner, 0.01) for _ in range(4)]
+            assert refreshing.wait(2)
+            # Writers aren't held up by the refresh in flight
+            start = time.perf_counter()
+            store.add(["another"], TOKEN, time.time() + 120, expires=EXPIRES)
+            assert time.perf_counter() - start < 0.1
+            assert [result.result() for result in results] == ["Bearer fresh"] * 4
+    finally:
+        twitter.refresh_access_token = original
+    assert refreshed == ["refresh-0"]
+
+
+@with_store
+def test_posts_without_a_refresh_token_must_fire_before_it_expires(store):
+    engine = Scheduler(store, publish=Published())
+    expires = time.time() + 3600
+    engine.schedule(["soon"], TOKEN, time.time() + 600, expires=expires)
+    for due, token_expires in ((time.time() + 7200, expires), (time.time() + 600, None)):
+        try:
+            engine.schedule(["later"], TOKEN, due, expires=token_expires)
+            assert False, "the access token is gone by then"
+        except ValueError as e:
+            assert "sign in again" in str(e)
+
+
+@with_store
+def test_many_pending_schedules(store):
+    engine = Scheduler(store, publish=Published(), window=60)
+    engine._load_window(time.time())
+    now = time.time()
+    start = time.perf_counter()
+    for i in range(5000):
+        engine.schedule([f"post {i}"], TOKEN, now + 30 + i * 60, refresh_token="refresh", expires=EXPIRES)
+    assert (time.perf_counter() - start) / 5000 < 0.002
+    assert len(engine._heap) == 1  # only the schedule inside the window is held in memory
+    assert len(store.pending(now + 5000 * 60)) == 5000
+
+
+def test_schedule_endpoints():
+    with tempfile.TemporaryDirectory() as tmp:
+        original = (scheduler._store, scheduler._scheduler)
+        scheduler._store = ScheduleStore(os.path.join(tmp, "schedule.db"))
+        scheduler._scheduler = Scheduler(scheduler._store, publish=Published())
+        try:
+            client = TestClient(main.app)
+            client.cookies.set(
+                "session", session_cookie({"twitter_token": "test-token", "token_type": "Bearer",
+                                           "refresh_token": "refresh", "token_expires": time.time() + 7200},
+                                          main.session_secret())
+            )
+            response = client.post("/api/twitter/schedule", data={"tweets": ["One", "Two"], "at": "2999-01-01T00:00:00"})
+            assert response.status_code == 400  # too far ahead
+            response = client.post("/api/twitter/schedule", data={"tweets": ["One", "Two"], "at": "nan"})
+            assert response.status_code == 400
+            due = time.time() + 3600
+            response = client.post("/api/twitter/schedule", data={"tweets": ["One", "Two"], "at": str(due)})
+            assert response.status_code == 201, response.text
+            schedule = response.json()
+            assert schedule["status"] == "pending" and schedule["tweet_count"] == 2
+
+            listed = client.get("/api/twitter/schedule").json()["schedules"]
+            assert [s["id"] for s in listed] == [schedule["id"]] and "authorization" not in listed[0]
+            assert client.delete(f"/api/twitter/schedule/{schedule['id']}").status_code == 200
+            assert client.delete(f"/api/twitter/schedule/{schedule['id']}").status_code == 409
+            assert client.get(f"/api/twitter/schedule/{schedule['id']}").json()["status"] == "cancelled"
+            assert TestClient(main.app).get("/api/twitter/schedule").status_code == 401
+        finally:
+            scheduler._store, scheduler._scheduler = original
+
+
+if __name__ == "__main__":
+    test_parse_due()
+    test_due_posts_fire_in_order()
+    test_cancelled_posts_do_not_fire()
+    test_posts_beyond_the_window_are_loaded_later()
+    test_restart_recovers_pending_and_interrupted_posts()
+    test_expired_tokens_are_refreshed_when_posts_fire()
+    test_refreshes_run_once_and_do_not_block_the_store()
+    test_posts_without_a_refresh_token_must_fire_before_it_expires()
+    test_many_pending_schedules()
+    test_schedule_endpoints()
+    print("✅ Scheduler tests passed")
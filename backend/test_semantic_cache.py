@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Test script for URL canonicalization and the semantic generation cache
+"""
+
+from benchmarks.run import install_stub_llm
+from benchmarks.stubs import StubChatModel, load_corpus
+from tools import url_analyser
+from tools.semantic_cache import SemanticCache
+from tools.urls import canonicalize_url
+
+ARTICLE = (
+    "Vectorly raised a $40 million Series B to make vector databases boring. The company keeps only the "
+    "upper layers of its index in memory and streams the rest from NVMe, cutting hosting costs for large tenants."
+)
+
+
+def test_canonicalize_url():
+    canonical = "https://news.example.com/2024/story"
+    assert canonicalize_url("https://news.example.com/2024/story/?utm_source=x&utm_medium=y#top") == canonical
+    assert canonicalize_url("https://amp.news.example.com/2024/story/amp") == canonical
+    assert canonicalize_url("https://news.example.com/2024/story?fbclid=abc&amp=1") == canonical
+    assert canonicalize_url("https://news.example.com/2024/story?page=2") == canonical + "?page=2"
+
+
+def test_exact_hit_across_url_variants_and_instruction_spacing():
+    cache = SemanticCache(capacity=8)
+    cache.store("https://news.example.com/story?utm_source=feed", ARTICLE, "Make it  Technical", "tweet A")
+    value, info = cache.lookup("https://news.example.com/story/", "different text", "make it technical ")
+    assert value == "tweet A" and info["kind"] == "exact"
+
+
+def test_semantic_hit_for_near_duplicate_content():
+    cache = SemanticCache(capacity=8)
+    cache.store("https://news.example.com/story", ARTICLE, "", "tweet A")
+    # A syndicated copy with a one-word edit
+    edited = ARTICLE.replace("cutting", "reducing")
+    value, info = cache.lookup("https://mirror.example.org/copy", edited, "")
+    assert value == "tweet A" and info["kind"] == "semantic"
+
+    # Same content with different instructions is a different generation
+    value, info = cache.lookup("https://mirror.example.org/copy", edited, "write it as a joke")
+    assert value is None
+
+    unrelated = "The city council approved a new bike lane on Main Street after months of public debate."
+    value, info = cache.lookup("https://other.example.org/news", unrelated, "")
+    assert value is None and info["similarity"] < 0.5
+
+
+def test_ring_buffer_evicts_oldest():
+    cache = SemanticCache(capacity=2)
+    for i in range(3):
+        cache.store(f"https://example.com/{i}", f"article number {i} about topic {i}", "", f"tweet {i}")
+    assert len(cache) == 2
+    assert cache.lookup("https://example.com/0", "zzz", "")[0] is None
+    assert cache.lookup("https://example.com/2", "zzz", "")[0] == "tweet 2"
+
+
+def test_tracking_url_reuses_generation():
+    """A repeat request behind tracking parameters skips every model call"""
+    html = load_corpus()["news_article"]
+    original_fetch, original_cache = url_analyser.fetch_page, url_analyser.get_generation_cache
+    cache = SemanticCache(capacity=16)
+    stub = StubChatModel()
+    url_analyser.fetch_page = lambda url: html
+    url_analyser.get_generation_cache = lambda: cache
+    restore = install_stub_llm(url_analyser, latency=0)
+    original_create = url_analyser.create_agent
+    url_analyser.create_agent = lambda llm=None: original_create(llm=stub)
+    try:
+        first = url_analyser.tweet_from_url("https://technews.example.com/2024/05/14/vector-database-series-b/")
+        calls = stub.calls
+        second = url_analyser.tweet_from_url(
+            "https://technews.example.com/2024/05/14/vector-database-series-b/?utm_source=twitter")
+        assert stub.calls == calls
+        assert second["tweet"] == first["tweet"]
+        assert second["cache"]["hit"] is True
+    finally:
+        restore()
+        url_analyser.fetch_page, url_analyser.get_generation_cache = original_fetch, original_cache
+
+
+if __name__ == "__main__":
+    test_canonicalize_url()
+    test_exact_hit_across_url_variants_and_instruction_spacing()
+    test_semantic_hit_for_near_duplicate_content()
+    test_ring_buffer_evicts_oldest()
+    test_tracking_url_reuses_generation()
+    print("✅ Semantic cache tests passed")
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+Test script for single-flight coalescing of concurrent URL analyses
+"""
+
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.run import install_stub_llm
+from benchmarks.stubs import load_corpus
+from tools import url_analyser
+from tools.singleflight import SingleFlight
+from tools.urls import canonicalize_url, normalize_url
+
+CALLERS = 8
+URL = "https://News.example.com:443/2024/story/?b=2&a=1#comments"
+
+
+class CountingFetcher:
+    """Replaces fetch_page: serves a corpus page slowly and counts upstream fetches"""
+
+    def __init__(self, delay=0.2):
+        self.html = load_corpus()["news_article"]
+        self.delay = delay
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, url):
+        with self.lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return self.html
+
+
+def with_stubs(test):
+    def run():
+        fetcher = CountingFetcher()
+        original_fetch, original_ttl = url_analyser.fetch_page, url_analyser.ANALYSIS_CACHE_TTL
+        url_analyser.fetch_page = fetcher
+        # Every test counts upstream fetches, so bypass the shared analysis cache
+        url_analyser.ANALYSIS_CACHE_TTL = 0
+        restore_llm = install_stub_llm(url_analyser, latency=0.05)
+        try:
+            test(fetcher)
+        finally:
+            url_analyser.fetch_page, url_analyser.ANALYSIS_CACHE_TTL = original_fetch, original_ttl
+            restore_llm()
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+def test_normalize_url():
+    assert normalize_url(URL) == "https://news.example.com/2024/story?a=1&b=2"
+    assert normalize_url("https://news.example.com/2024/story?a=1&b=2") == normalize_url(URL)
+    for malformed in ("http://example.com:abc/x", "http://[::1"):
+        assert canonicalize_url(f" {malformed} ") == malformed
+
+
+@with_stubs
+def test_malformed_urls_do_not_break_the_endpoint(fetcher):
+    from fastapi.testclient import TestClient
+    import main
+
+    response = TestClient(main.app).get("/api/url-analysis", params={"url": "http://example.com:abc/x"})
+    assert response.status_code == 200, response.text
+
+
+def test_singleflight_shares_result_and_errors():
+    """Followers get the leader's result, and its exception when it fails"""
+    flight = SingleFlight("test")
+    calls = []
+
+    def slow(value):
+        calls.append(value)
+        time.sleep(0.1)
+        if value == "bad":
+            raise ValueError("upstream failed")
+        return value.upper()
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = list(pool.map(lambda _: flight.do("k", slow, "ok"), range(CALLERS)))
+    assert results == ["OK"] * CALLERS
+    assert calls == ["ok"]
+
+    def call_bad(_):
+        try:
+            flight.do("k", slow, "bad")
+        except ValueError as e:
+            return str(e)
+
+    with ThreadPoolExecutor(CALLERS) as pool:
+        errors = list(pool.map(call_bad, range(CALLERS)))
+    assert errors == ["upstream failed"] * CALLERS
+    assert flight.in_flight() == 0
+
+
+@with_stubs
+def test_sync_callers_share_one_fetch(fetcher):
+    """N concurrent sync callers for the same page cause exactly one upstream fetch"""
+    variants = [URL, "https://news.example.com/2024/story?a=1&b=2", "HTTPS://news.example.com/2024/story/?a=1&b=2"]
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = list(pool.map(lambda i: url_analyser.tweet_from_url(variants[i % 3]), range(CALLERS)))
+    assert fetcher.calls == 1
+    assert all(r and r["tweet"] == results[0]["tweet"] for r in results)
+    # Callers get independent dicts
+    results[0]["tweet"] = "changed"
+    assert results[1]["tweet"] != "changed"
+
+
+@with_stubs
+def test_different_instructions_share_the_fetch_only(fetcher):
+    """Different additional_text means separate generations over one shared analysis"""
+    with ThreadPoolExecutor(CALLERS) as pool:
+        results = list(pool.map(lambda i: url_analyser.tweet_from_url(URL, f"angle {i % 2}"), range(CALLERS)))
+    assert fetcher.calls == 1
+    assert len({r["tweet"] for r in results}) == 2
+
+
+@with_stubs
+def test_async_and_sync_callers_share_one_fetch(fetcher):
+    """Async handlers and threadpool callers join the same flight"""
+    async def main():
+        loop = asyncio.get_running_loop()
+        sync_calls = [loop.run_in_executor(None, url_analyser.tweet_from_url, URL) for _ in range(CALLERS // 2)]
+        async_calls = [url_analyser.tweet_from_url_async(URL) for _ in range(CALLERS // 2)]
+        return await asyncio.gather(*sync_calls, *async_calls)
+
+    results = asyncio.run(main())
+    assert fetcher.calls == 1
+    assert len(results) == CALLERS and all(r["success"] for r in results)
+
+
+def test_async_follower_gives_up_at_its_timeout():
+    """A follower's timeout ends its wait, not the flight the others are waiting on"""
+    flight = SingleFlight("test")
+
+    def slow():
+        time.sleep(0.3)
+        return "done"
+
+    async def follow():
+        await asyncio.sleep(0.05)
+        try:
+            await flight.do_async("k", slow, timeout=0.05)
+        except TimeoutError:
+            return "timed out"
+
+    async def main():
+        return await asyncio.gather(flight.do_async("k", slow), follow(), flight.do_async("k", slow))
+
+    assert asyncio.run(main()) == ["done", "timed out", "done"]
+    assert flight.in_flight() == 0
+
+
+def test_cancelled_leader_does_not_cancel_followers():
+    """A leader whose client disconnects stops waiting; followers still get the result"""
+    flight = SingleFlight("test")
+    calls = []
+
+    async def slow():
+        calls.append(1)
+        await asyncio.sleep(0.2)
+        return "done"
+
+    async def main():
+        leader = asyncio.ensure_future(flight.do_async("k", slow))
+        await asyncio.sleep(0.05)
+        followers = [asyncio.ensure_future(flight.do_async("k", slow)) for _ in range(3)]
+        await asyncio.sleep(0.05)
+        leader.cancel()
+        results = await asyncio.gather(*followers)
+        try:
+            await leader
+            assert False, "the leader itself was cancelled"
+        except asyncio.CancelledError:
+            pass
+        return results
+
+    assert asyncio.run(main()) == ["done"] * 3
+    assert calls == [1]
+    assert flight.in_flight() == 0
+
+
+if __name__ == "__main__":
+    test_normalize_url()
+    test_malformed_urls_do_not_break_the_endpoint()
+    test_singleflight_shares_result_and_errors()
+    test_sync_callers_share_one_fetch()
+    test_different_instructions_share_the_fetch_only()
+    test_async_and_sync_callers_share_one_fetch()
+    test_async_follower_gives_up_at_its_timeout()
+    test_cancelled_leader_does_not_cancel_followers()
+    print("✅ Single-flight tests passed")
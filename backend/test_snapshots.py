@@ -0,0 +1,178 @@
+#!/usr/bin/env python3
+"""
+Test script for the page snapshot archive and re-analysis from snapshots
+"""
+
+import json
+import os
+import tempfile
+import zlib
+
+import reanalyze
+from benchmarks.stubs import CorpusServer, load_corpus
+from tools import snapshots, url_analyser
+from tools.snapshots import CODEC_ZLIB, SnapshotArchive, decompress
+
+PAGE = "<html><body><p>First version of the page.</p></body></html>"
+
+
+def with_archive(test):
+    """Run `test(directory)` with an empty snapshot directory"""
+    def run():
+        with tempfile.TemporaryDirectory() as tmp:
+            test(tmp)
+    run.__name__ = test.__name__
+    run.__doc__ = test.__doc__
+    return run
+
+
+@with_archive
+def test_put_and_get(directory):
+    archive = SnapshotArchive(directory)
+    assert archive.put("https://example.com/post", PAGE)
+    assert not archive.put("https://example.com/post/?utm_source=feed", PAGE)  # same page, unchanged
+    assert archive.get("https://example.com/post") == PAGE
+    assert archive.put("https://example.com/post", PAGE.replace("First", "Second"))
+    assert archive.get("https://example.com/post").startswith("<html><body><p>Second")
+    assert len(archive) == 1 and "https://example.com/post" in archive
+    assert archive.get("https://example.com/other") is None
+    archive.close()
+
+
+@with_archive
+def test_reopened_archive_reads_the_sidecars(directory):
+    archive = SnapshotArchive(directory, segment_bytes=200)  # a new segment every record or two
+    pages = {f"https://example.com/{i}": f"<p>Page {i}</p>" * (i + 1) for i in range(20)}
+    for url, body in pages.items():
+        archive.put(url, body)
+    archive.close()
+    assert len([name for name in os.listdir(directory) if name.endswith(".seg")]) > 5
+
+    # A crash mid-write leaves a torn index entry behind
+    sidecar = sorted(name for name in os.listdir(directory) if name.endswith(".idx"))[-1]
+    with open(os.path.join(directory, sidecar), "ab") as f:
+        f.write(b"\x00" * 17)
+
+    reopened = SnapshotArchive(directory)
+    assert len(reopened) == 20
+    assert all(reopened.get(url) == body for url, body in pages.items())
+    reopened.close()
+
+
+@with_archive
+def test_oldest_segments_are_pruned(directory):
+    # Roughly one record per segment, and room for about five of them
+    archive = SnapshotArchive(directory, segment_bytes=100, max_bytes=5 * 150)
+    pages = {f"https://example.com/{i}": os.urandom(60).hex() for i in range(20)}
+    for url, body in pages.items():
+        archive.put(url, body)
+    writing = os.path.basename(archive._segment[3])[:-len(".seg")]
+    sizes = [os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)
+             if not name.startswith(writing)]
+    assert 0 < sum(sizes) <= 5 * 150  # the limit, besides the segment being written
+    assert archive.get("https://example.com/19") == pages["https://example.com/19"]
+    assert "https://example.com/0" not in archive and archive.get("https://example.com/0") is None
+    kept = len(archive)
+    archive.close()
+    assert len(SnapshotArchive(directory)) == kept
+
+    # Segments past the age limit go when the archive is opened
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (0, 0))
+    aged = SnapshotArchive(directory, max_age=86400)
+    assert len(aged) == 0 and os.listdir(directory) == []
+    aged.close()
+
+
+def test_zlib_records_always_decode():
+    assert decompress(CODEC_ZLIB, zlib.compress(b"page"), 4) == b"page"
+
+
+@with_archive
+def test_fetched_pages_are_snapshotted(directory):
+    original = snapshots._archive
+    snapshots._archive = SnapshotArchive(directory)
+    try:
+        with CorpusServer() as server:
+            url = server.url_for("engineering_blog")
+            html = url_analyser.fetch_page(url)
+        assert snapshots._archive.get(url) == html
+    finally:
+        snapshots._archive.close()
+        snapshots._archive = original
+
+
+@with_archive
+def test_reanalyze_matches_live_analysis(directory):
+    archive = SnapshotArchive(os.path.join(directory, "snapshots"))
+    corpus = load_corpus()
+    for name, body in corpus.items():
+        archive.put(f"https://corpus.example.com/{name}", body)
+    archive.close()
+
+    before = os.path.join(directory, "before.jsonl")
+    after = os.path.join(directory, "after.jsonl")
+    args = ["--snapshots", os.path.join(directory, "snapshots"), "--processes", "2"]
+    assert reanalyze.main(["-o", before, *args]) == 0
+    with open(before, encoding="utf-8") as f:
+        records = {r["url"]: r for r in map(json.loads, f)}
+    assert len(records) == len(corpus)
+    live = url_analyser.analyze_html(corpus["engineering_blog"])
+    assert records["https://corpus.example.com/engineering_blog"]["title"] == live["title"]
+
+    # Same snapshots, same analyser: nothing changed
+    assert reanalyze.main(["-o", after, "--compare", before, *args]) == 0
+
+    # An earlier run that saw a different title is reported
+    with open(before, "w", encoding="utf-8") as f:
+        for record in records.values():
+            if record["url"].endswith("engineering_blog"):
+                record["title"] = "Old title"
+            f.write(json.dumps(record) + "\n")
+    assert reanalyze.main(["-o", after, "--compare", before, "--processes", "1", *args[:2]]) == 1
+
+
+@with_archive
+def test_reanalyze_survives_bad_records_and_never_prunes(directory):
+    archive = SnapshotArchive(directory, segment_bytes=1)  # one record per segment
+    corpus = load_corpus()
+    for name, body in corpus.items():
+        archive.put(f"https://corpus.example.com/{name}", body)
+    archive.close()
+    segments = sorted(name for name in os.listdir(directory) if name.endswith(".seg"))
+    # One record is damaged after it was indexed
+    with open(os.path.join(directory, segments[0]), "r+b") as f:
+        f.seek(64)
+        f.write(b"\xff" * 32)
+    # Everything is past the default age limit; a re-analysis must leave it alone
+    for name in os.listdir(directory):
+        os.utime(os.path.join(directory, name), (0, 0))
+
+    output = os.path.join(directory, "out.jsonl.tmp")
+    assert reanalyze.main(["-o", output, "--snapshots", directory, "--processes", "2"]) == 0
+    with open(output, encoding="utf-8") as f:
+        records = [json.loads(line) for line in f]
+    os.remove(output)
+    unreadable = [r for r in records if r["url"] is None]
+    assert len(records) == len(corpus) and len(unreadable) == 1
+    assert not unreadable[0]["success"] and "Unreadable snapshot" in unreadable[0]["error"]
+    assert sorted(name for name in os.listdir(directory) if name.endswith(".seg")) == segments
+
+    readonly = SnapshotArchive(os.path.join(directory, "missing"), read_only=True)
+    assert len(readonly) == 0 and not os.path.exists(os.path.join(directory, "missing"))
+    try:
+        readonly.put("https://example.com/", PAGE)
+        assert False, "read-only archives don't write"
+    except RuntimeError:
+        pass
+
+
+if __name__ == "__main__":
+    test_put_and_get()
+    test_reopened_archive_reads_the_sidecars()
+    test_oldest_segments_are_pruned()
+    test_zlib_records_always_decode()
+    test_fetched_pages_are_snapshotted()
+    test_reanalyze_matches_live_analysis()
+    test_reanalyze_survives_bad_records_and_never_prunes()
+    print("✅ Snapshot archive tests passed")
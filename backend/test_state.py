@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+Test script for the shared state backends used in multi-worker mode
+"""
+
+import os
+import tempfile
+import time
+from multiprocessing import Process
+
+from tools.state import MemoryStateBackend, SQLiteStateBackend, StateBackend
+
+
+def check_backend(state):
+    state.set("greeting", {"text": "hi"})
+    assert state.get("greeting") == {"text": "hi"}
+    assert state.get("missing", "default") == "default"
+
+    assert state.add("lock", 1) is True
+    assert state.add("lock", 2) is False
+    assert state.get("lock") == 1
+
+    assert state.incr("counter") == 1
+    assert state.incr("counter", 5) == 6
+
+    state.set("short-lived", "x", ttl=0.05)
+    time.sleep(0.1)
+    assert state.get("short-lived") is None
+    assert state.add("short-lived", "y") is True
+
+    state.push("jobs", {"id": 1})
+    state.push("jobs", {"id": 2})
+    assert state.queue_length("jobs") == 2
+    assert state.pop("jobs") == {"id": 1}
+    assert state.pop("jobs") == {"id": 2}
+    assert state.pop("jobs") is None
+
+    assert state.get_or_create("secret", lambda: "first") == "first"
+    assert state.get_or_create("secret", lambda: "second") == "first"
+
+
+def check_claims(state):
+    state.push("work", "a")
+    state.push("work", "b")
+    receipt, item = state.claim("work", lease=60)
+    assert item == "a"
+    assert state.claim("work", lease=60)[1] == "b"  # "a" is hidden while claimed
+    assert state.claim("work", lease=60) is None
+    assert state.queue_length("work") == 2
+
+    state.ack("work", receipt)
+    assert state.queue_length("work") == 1
+
+    # An unacknowledged claim whose lease runs out (the worker died) is redelivered
+    state.push("jobs", "c")
+    receipt, _ = state.claim("jobs", lease=0.05)
+    assert state.extend("jobs", receipt, 0.05)
+    assert state.claim("jobs", lease=60) is None
+    time.sleep(0.1)
+    receipt, item = state.claim("jobs", lease=60)
+    assert item == "c"
+    assert state.extend("jobs", receipt, 0)  # handing it back makes it visible at once
+    assert state.pop("jobs") == "c"
+    assert state.extend("jobs", receipt, 60) is False
+
+
+def check_purge(state):
+    state.purge_interval = 0  # only the explicit purges below
+    state.set("expired", 1, ttl=0.01)
+    state.set("kept", 2)
+    time.sleep(0.05)
+    assert state.purge_expired() == 1
+    assert state.purge_expired() == 0
+    assert state.get("kept") == 2
+
+    # Writes purge lazily once the interval has passed
+    state.purge_interval = 0.01
+    state.incr("quota:old", ttl=0.01)
+    time.sleep(0.05)
+    state.incr("quota:new", ttl=60)
+    assert state.purge_expired() == 0
+
+
+def test_backends_are_abstract():
+    try:
+        StateBackend()
+        assert False, "the interface shouldn't be instantiable"
+    except TypeError:
+        pass
+
+
+def test_memory_backend():
+    check_backend(MemoryStateBackend())
+    check_claims(MemoryStateBackend())
+    check_purge(MemoryStateBackend())
+
+
+def test_sqlite_backend():
+    with tempfile.TemporaryDirectory() as tmp:
+        check_backend(SQLiteStateBackend(os.path.join(tmp, "state.db")))
+        check_claims(SQLiteStateBackend(os.path.join(tmp, "claims.db")))
+        check_purge(SQLiteStateBackend(os.path.join(tmp, "purge.db")))
+
+
+def _increment_and_drain(path, n):
+    state = SQLiteStateBackend(path)
+    for _ in range(n):
+        state.incr("hits")
+    while state.pop("work") is not None:
+        state.incr("drained")
+
+
+def test_sqlite_backend_is_shared_across_processes():
+    """Counters and queues stay consistent when several workers use the same file"""
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "state.db")
+        state = SQLiteStateBackend(path)
+        for i in range(200):
+            state.push("work", i)
+
+        workers = [Process(target=_increment_and_drain, args=(path, 50)) for _ in range(4)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+
+        assert state.get("hits") == 200
+        # Every queued item was popped by exactly one worker
+        assert state.get("drained") == 200
+        assert state.queue_length("work") == 0
+
+
+if __name__ == "__main__":
+    test_backends_are_abstract()
+    test_memory_backend()
+    test_sqlite_backend()
+    test_sqlite_backend_is_shared_across_processes()
+    print("✅ State backend tests passed")
@@ -0,0 +1,49 @@
+#!/usr/bin/env python3
+"""
+Test script for multi-variant tweet generation and local ranking
+"""
+
+from benchmarks.stubs import StubChatModel
+from tools import url_analyser
+from tools.ranking import rank_tweets, hashtag_fit, length_fit
+
+PARAGRAPHS = ["Vectorly raised a $40 million Series B to make retrieval infrastructure boring and reliable."]
+CONTEXT = dict(tone="neutral", stats={}, structure={}, content_stats={})
+
+
+def test_variants_cost_three_model_calls():
+    """N alternatives take one summarize call (n=N) plus one batched review and reach call"""
+    stub = StubChatModel()
+    agent = url_analyser.create_agent(llm=stub)
+    variants = agent.generate_variants(4, PARAGRAPHS, **CONTEXT)
+    assert stub.calls == 3
+    assert len(variants) == 4
+    assert len(set(variants)) == 4
+
+    single = StubChatModel()
+    url_analyser.create_agent(llm=single).generate_tweet(PARAGRAPHS, **CONTEXT)
+    assert single.calls == 3
+
+
+def test_malformed_batch_keeps_candidates():
+    """If a batched response can't be split back into N tweets, the stage is skipped"""
+    assert url_analyser.parse_batch("one tweet\n---\ntwo tweets", 3) is None
+    assert url_analyser.parse_batch("Tweet 1: a\n---\nTweet 2: b", 2) == ["a", "b"]
+
+
+def test_ranking_prefers_tweet_shaped_text():
+    good = "We cut p99 latency in half by deleting a cache. The data changed twice a week, so we load it at startup instead. #Performance #Python"
+    too_long = good * 4
+    spammy = "Latency! #a #b #c #d #e #f #g"
+    ranked = rank_tweets([too_long, spammy, good])
+    assert ranked[0]["tweet"] == good
+    assert ranked[0]["score"] >= ranked[1]["score"] >= ranked[2]["score"]
+    assert hashtag_fit(spammy) < hashtag_fit(good)
+    assert length_fit(too_long) < length_fit(good)
+
+
+if __name__ == "__main__":
+    test_variants_cost_three_model_calls()
+    test_malformed_batch_keeps_candidates()
+    test_ranking_prefers_tweet_shaped_text()
+    print("✅ Variant generation tests passed")
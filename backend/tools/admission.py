@@ -0,0 +1,282 @@
+"""
+Admission control and load shedding for the generation pipeline.
+
+Two layers keep a burst from turning into slow responses for everyone:
+
+- Requests to /api/url-analysis are admitted by a `RequestGate`: at most
+  ADMISSION_CONCURRENCY run at once, and up to ADMISSION_QUEUE more wait
+  up to ADMISSION_MAX_WAIT seconds. Waiting requests are granted round-robin
+  across clients (the Twitter user, or the IP address) and no client holds
+  more than ADMISSION_CLIENT_CONCURRENCY slots. So one client's burst queues
+  behind its own requests, not in front of everyone else's. A request that
+  finds the queue full, or whose wait runs out, is answered with 503 and
+  Retry-After right away instead of adding to the backlog.
+- Inside the pipeline each stage (fetch, parse, llm) has its own
+  concurrency limit (`stage_slot`), so admitted requests can't pile more
+  calls on the fetcher, the CPU or the OpenAI client than they can serve.
+
+Clients are also held to ADMISSION_CLIENT_RPM requests per minute, counted
+in the state backend so the quota holds across workers (429 when
+exceeded). ADMISSION_ENABLED=0 turns all of it off.
+"""
+
+import asyncio
+import collections
+import math
+import os
+import threading
+import time
+from contextlib import asynccontextmanager, contextmanager
+
+from tools.metrics import REGISTRY
+from tools.state import get_state_backend
+
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "1") == "1"
+ADMISSION_CONCURRENCY = int(os.getenv("ADMISSION_CONCURRENCY", "8"))
+ADMISSION_QUEUE = int(os.getenv("ADMISSION_QUEUE", "16"))
+ADMISSION_MAX_WAIT = float(os.getenv("ADMISSION_MAX_WAIT", "2"))
+ADMISSION_CLIENT_CONCURRENCY = int(os.getenv("ADMISSION_CLIENT_CONCURRENCY", "2"))
+# Requests per client per minute (0 = no quota)
+ADMISSION_CLIENT_RPM = int(os.getenv("ADMISSION_CLIENT_RPM", "60"))
+# Concurrent calls per pipeline stage, e.g. "fetch=16,parse=4,llm=8"
+STAGE_LIMITS = {
+    stage: int(limit)
+    for stage, _, limit in (
+        item.partition("=") for item in os.getenv("ADMISSION_STAGE_LIMITS", "fetch=16,parse=4,llm=8").split(",")
+    )
+}
+STAGE_MAX_WAIT = float(os.getenv("ADMISSION_STAGE_MAX_WAIT", "5"))
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "tweetai_admission_queue_depth",
+    "Requests or stage calls waiting for a slot",
+    ("stage",),
+)
+IN_FLIGHT = REGISTRY.gauge(
+    "tweetai_admission_in_flight",
+    "Requests or stage calls holding a slot",
+    ("stage",),
+)
+SHED = REGISTRY.counter(
+    "tweetai_admission_shed_total",
+    "Requests or stage calls turned away, by reason",
+    ("stage", "reason"),
+)
+WAIT_SECONDS = REGISTRY.histogram(
+    "tweetai_admission_wait_seconds",
+    "Time spent waiting for a slot before running",
+    ("stage",),
+)
+
+
+class Overloaded(Exception):
+    """No capacity for the request; the client should retry after `retry_after` seconds"""
+
+    def __init__(self, stage, reason, retry_after):
+        self.stage = stage
+        self.reason = reason
+        self.retry_after = retry_after
+        super().__init__(f"Server is busy ({stage}: {reason}), retry in {retry_after}s")
+
+
+class QuotaExceeded(Exception):
+    def __init__(self, retry_after):
+        self.retry_after = retry_after
+        super().__init__(f"Request quota exceeded, retry in {retry_after}s")
+
+
+class RequestGate:
+    """
+    Fair, bounded admission for requests on one event loop. Waiters queue per
+    client; a freed slot goes to the next client in rotation that is under
+    its own concurrency limit.
+    """
+
+    def __init__(self, limit=ADMISSION_CONCURRENCY, queue=ADMISSION_QUEUE, max_wait=ADMISSION_MAX_WAIT,
+                 client_limit=ADMISSION_CLIENT_CONCURRENCY, name="request"):
+        self.limit = limit
+        self.queue = queue
+        self.max_wait = max_wait
+        self.client_limit = client_limit
+        self.name = name
+        self.active = 0
+        self.waiting = 0
+        self._by_client = collections.Counter()
+        self._waiters = collections.OrderedDict()  # client -> deque of futures, in rotation order
+        # Smoothed time a request holds its slot, for Retry-After
+        self._service_time = 1.0
+
+    def retry_after(self):
+        """Seconds until the queue ahead of a new request would likely have drained"""
+        return max(1, math.ceil(self._service_time * (self.waiting + 1) / max(self.limit, 1)))
+
+    def _shed(self, reason):
+        SHED.inc(stage=self.name, reason=reason)
+        raise Overloaded(self.name, reason, self.retry_after())
+
+    def _grant(self, client):
+        self.active += 1
+        self._by_client[client] += 1
+        IN_FLIGHT.set(self.active, stage=self.name)
+
+    def _dispatch(self):
+        while self.active < self.limit:
+            client = next((c for c in self._waiters if self._by_client[c] < self.client_limit), None)
+            if client is None:
+                return
+            waiters = self._waiters.pop(client)
+            future = waiters.popleft()
+            if waiters:
+                self._waiters[client] = waiters  # back of the rotation
+            self.waiting -= 1
+            QUEUE_DEPTH.set(self.waiting, stage=self.name)
+            self._grant(client)
+            future.set_result(True)
+
+    def _withdraw(self, client, future):
+        waiters = self._waiters.get(client)
+        if waiters is not None and future in waiters:
+            waiters.remove(future)
+            if not waiters:
+                del self._waiters[client]
+            self.waiting -= 1
+            QUEUE_DEPTH.set(self.waiting, stage=self.name)
+
+    async def acquire(self, client):
+        if self.active < self.limit and self._by_client[client] < self.client_limit:
+            self._grant(client)
+            WAIT_SECONDS.observe(0, stage=self.name)
+            return
+        if self.waiting >= self.queue:
+            self._shed("queue_full")
+        waiters = self._waiters.get(client)
+        if waiters is not None and len(waiters) >= self.client_limit:
+            # A client can't take over the shared queue with its own backlog
+            self._shed("client_queue_full")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(client, collections.deque()).append(future)
+        self.waiting += 1
+        QUEUE_DEPTH.set(self.waiting, stage=self.name)
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done():
+                # Granted just as the wait ended: hand the slot on
+                self.release(client)
+            else:
+                self._withdraw(client, future)
+                future.cancel()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._shed("wait_timeout")
+        WAIT_SECONDS.observe(time.perf_counter() - start, stage=self.name)
+
+    def release(self, client, held=None):
+        self.active -= 1
+        self._by_client[client] -= 1
+        if not self._by_client[client]:
+            del self._by_client[client]
+        IN_FLIGHT.set(self.active, stage=self.name)
+        if held is not None:
+            self._service_time += 0.2 * (held - self._service_time)
+        self._dispatch()
+
+    @asynccontextmanager
+    async def admit(self, client):
+        """Hold a request slot for the block; raises Overloaded if none frees up in time"""
+        await self.acquire(client)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.release(client, time.perf_counter() - start)
+
+
+class StageLimiter:
+    """At most `limit` concurrent calls to a stage from worker threads, with a bounded wait"""
+
+    def __init__(self, name, limit, queue=None, max_wait=STAGE_MAX_WAIT):
+        self.name = name
+        self.limit = limit
+        self.queue = limit * 4 if queue is None else queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self._cond = threading.Condition()
+
+    @contextmanager
+    def slot(self, timeout=None):
+        """Hold a slot for the block, waiting at most `timeout` (capped at max_wait) seconds for one"""
+        wait = self.max_wait if timeout is None else min(timeout, self.max_wait)
+        start = time.perf_counter()
+        with self._cond:
+            if self.active >= self.limit:
+                if self.waiting >= self.queue:
+                    SHED.inc(stage=self.name, reason="queue_full")
+                    raise Overloaded(self.name, "queue_full", max(1, math.ceil(self.max_wait)))
+                self.waiting += 1
+                QUEUE_DEPTH.set(self.waiting, stage=self.name)
+                try:
+                    admitted = self._cond.wait_for(lambda: self.active < self.limit, wait)
+                finally:
+                    self.waiting -= 1
+                    QUEUE_DEPTH.set(self.waiting, stage=self.name)
+                if not admitted:
+                    SHED.inc(stage=self.name, reason="wait_timeout")
+                    raise Overloaded(self.name, "wait_timeout", max(1, math.ceil(self.max_wait)))
+            self.active += 1
+            IN_FLIGHT.set(self.active, stage=self.name)
+        WAIT_SECONDS.observe(time.perf_counter() - start, stage=self.name)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self.active -= 1
+                IN_FLIGHT.set(self.active, stage=self.name)
+                self._cond.notify()
+
+
+_stages = {name: StageLimiter(name, limit) for name, limit in STAGE_LIMITS.items()}
+
+
+@contextmanager
+def stage_slot(stage, timeout=None):
+    """Run the block under `stage`'s concurrency limit (a no-op with admission off or no limit set)"""
+    limiter = _stages.get(stage) if ADMISSION_ENABLED else None
+    if limiter is None:
+        yield
+        return
+    with limiter.slot(timeout):
+        yield
+
+
+def set_stage_limit(stage, limiter):
+    """Replace a stage's limiter (None removes the limit); returns the previous one"""
+    previous = _stages.pop(stage, None)
+    if limiter is not None:
+        _stages[stage] = limiter
+    return previous
+
+
+def check_quota(client, per_minute=None):
+    """Count a request against the client's per-minute quota; raises QuotaExceeded past it"""
+    per_minute = ADMISSION_CLIENT_RPM if per_minute is None else per_minute
+    if not ADMISSION_ENABLED or not per_minute:
+        return
+    now = time.time()
+    count = get_state_backend().incr(f"quota:{client}:{int(now // 60)}", ttl=120)
+    if count > per_minute:
+        SHED.inc(stage="request", reason="quota")
+        raise QuotaExceeded(max(1, math.ceil(60 - now % 60)))
+
+
+_gate = None
+
+
+def get_request_gate():
+    """The process's gate for pipeline requests (it belongs to the event loop serving them)"""
+    global _gate
+    if _gate is None:
+        _gate = RequestGate()
+    return _gate
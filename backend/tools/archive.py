@@ -0,0 +1,199 @@
+"""
+Persistent archive of every feed entry the backend has seen.
+
+Feeds are ingested incrementally: entries are keyed by a hash of their GUID
+(or URL), so re-reading a feed only inserts what is new, and each feed's
+ETag / Last-Modified validators are kept so unchanged feeds cost a 304.
+Titles and descriptions are indexed with SQLite FTS5 and searched newest
+first with keyset pagination (`WHERE id < cursor`), which stays fast at any
+depth instead of slowing down like OFFSET.
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+
+DEFAULT_ARCHIVE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".state", "articles.db")
+ARTICLE_ARCHIVE_PATH = os.environ.get("ARTICLE_ARCHIVE_PATH", DEFAULT_ARCHIVE_PATH)
+
+COLUMNS = ("id", "source", "title", "url", "description", "published", "category")
+_TERM = re.compile(r"(\w+)(\*?)", re.UNICODE)
+
+
+def entry_uid(entry):
+    """Stable identity for a feed entry: its GUID if the feed has one, else its URL"""
+    key = entry.get("guid") or entry.get("url") or ""
+    return hashlib.sha1(key.encode("utf-8")).hexdigest()
+
+
+def match_expression(query):
+    """
+    Turn free text into a safe FTS5 query: every word must match, and a word
+    ending in `*` matches as a prefix. Prefixes are opt-in because a short
+    stem can expand to thousands of terms.
+    """
+    terms = _TERM.findall(query or "")
+    if not terms:
+        return None
+    return " AND ".join(f'"{word}"{star}' for word, star in terms)
+
+
+class ArticleArchive:
+    def __init__(self, path=ARTICLE_ARCHIVE_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS articles (
+                id INTEGER PRIMARY KEY,
+                uid TEXT NOT NULL UNIQUE,
+                source TEXT NOT NULL,
+                title TEXT NOT NULL,
+                url TEXT NOT NULL,
+                description TEXT NOT NULL DEFAULT '',
+                published TEXT NOT NULL DEFAULT '',
+                category TEXT NOT NULL DEFAULT '',
+                ingested_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS articles_source ON articles (source, id);
+            CREATE VIRTUAL TABLE IF NOT EXISTS articles_fts USING fts5(
+                title, description, content='articles', content_rowid='id', tokenize='porter unicode61'
+            );
+            CREATE TRIGGER IF NOT EXISTS articles_fts_insert AFTER INSERT ON articles BEGIN
+                INSERT INTO articles_fts (rowid, title, description) VALUES (new.id, new.title, new.description);
+            END;
+            CREATE TABLE IF NOT EXISTS feed_validators (
+                source TEXT PRIMARY KEY,
+                etag TEXT,
+                modified TEXT,
+                checked_at REAL
+            );
+            """
+        )
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def ingest(self, source, entries):
+        """
+        Insert the entries not archived yet; returns how many were new.
+        Feeds list newest first, so entries are inserted in reverse to give
+        the newest the highest id.
+        """
+        now = time.time()
+        rows = [
+            (
+                entry_uid(e), source, e.get("title", ""), e.get("url", ""), e.get("description", ""),
+                e.get("published", ""), e.get("category", ""), now,
+            )
+            for e in reversed(entries)
+            if e.get("url")
+        ]
+        if not rows:
+            return 0
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            inserted = conn.executemany(
+                "INSERT OR IGNORE INTO articles (uid, source, title, url, description, published, category, "
+                "ingested_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            ).rowcount
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return inserted
+
+    def _rows(self, sql, params):
+        return [dict(zip(COLUMNS, row)) for row in self._conn().execute(sql, params).fetchall()]
+
+    def latest(self, source, limit=3):
+        return self._rows(
+            "SELECT id, source, title, url, description, published, category FROM articles "
+            "WHERE source = ? ORDER BY id DESC LIMIT ?",
+            (source, limit),
+        )
+
+    def recent(self, limit=1000):
+        """The newest `limit` articles across every source"""
+        return self._rows(
+            "SELECT id, source, title, url, description, published, category FROM articles "
+            "ORDER BY id DESC LIMIT ?",
+            (limit,),
+        )
+
+    def search(self, query="", source=None, limit=20, cursor=None):
+        """
+        Return {"articles", "next_cursor"}, newest first. Pass `next_cursor`
+        back as `cursor` for the next page; it is None on the last page.
+        """
+        expression = match_expression(query)
+        cursor = cursor if cursor is not None else 2 ** 63 - 1
+        params = []
+        if expression:
+            sql = (
+                "SELECT a.id, a.source, a.title, a.url, a.description, a.published, a.category "
+                "FROM articles_fts JOIN articles a ON a.id = articles_fts.rowid "
+                "WHERE articles_fts MATCH ? AND articles_fts.rowid < ?"
+            )
+            params += [expression, cursor]
+            order = " ORDER BY articles_fts.rowid DESC"
+        else:
+            sql = (
+                "SELECT id, source, title, url, description, published, category FROM articles a "
+                "WHERE a.id < ?"
+            )
+            params.append(cursor)
+            order = " ORDER BY a.id DESC"
+        if source:
+            sql += " AND a.source = ?"
+            params.append(source)
+        # Fetch one extra row to know whether another page exists
+        articles = self._rows(sql + order + " LIMIT ?", params + [limit + 1])
+        next_cursor = articles[limit - 1]["id"] if len(articles) > limit else None
+        return {"articles": articles[:limit], "next_cursor": next_cursor}
+
+    def count(self):
+        return self._conn().execute("SELECT COUNT(*) FROM articles").fetchone()[0]
+
+    def validators(self, source):
+        """Return (etag, modified) saved from the last fetch of a feed"""
+        row = self._conn().execute(
+            "SELECT etag, modified FROM feed_validators WHERE source = ?", (source,)
+        ).fetchone()
+        return row if row else (None, None)
+
+    def save_validators(self, source, etag, modified):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO feed_validators (source, etag, modified, checked_at) VALUES (?, ?, ?, ?)",
+            (source, etag, modified, time.time()),
+        )
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_archive():
+    """Process-wide archive at ARTICLE_ARCHIVE_PATH"""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = ArticleArchive(ARTICLE_ARCHIVE_PATH)
+    return _archive
@@ -0,0 +1,209 @@
+"""
+Trending tech articles from RSS feeds and public APIs.
+
+Shared by the /api/tech-articles endpoint and the prefetch worker, which
+pre-analyzes exactly the articles the endpoint lists. Every entry read from
+a feed is also ingested into the article archive, and RSS feeds are fetched
+conditionally so an unchanged feed is answered from the archive.
+"""
+
+from datetime import datetime, timezone
+import html
+import os
+import re
+
+from tools.archive import get_archive
+from tools.feeds import CHUNK_SIZE, read_feed
+from tools.fetcher import get_fetcher
+from tools.log import get_logger
+
+log = get_logger("articles")
+
+ARTICLE_SOURCES = ("techcrunch", "theverge", "wired", "hackernews", "devto", "medium")
+
+# RSS sources: feed URL, category and display name
+RSS_FEEDS = {
+    "techcrunch": ("https://feeds.feedburner.com/TechCrunch", "Trending Tech", "TechCrunch"),
+    "theverge": ("https://www.theverge.com/rss/tech/index.xml", "Trending Reviews", "The Verge"),
+    "wired": ("https://www.wired.com/feed/rss", "Trending Science", "Wired"),
+    "medium": ("https://medium.com/feed/tag/technology", "Trending Blog", "Medium"),
+}
+# Entries read from the top of each feed; the listing shows 3, the rest go to the archive
+FEED_ENTRY_LIMIT = int(os.getenv("FEED_ENTRY_LIMIT", "10"))
+SOURCE_NAMES = {
+    **{source: name for source, (_, _, name) in RSS_FEEDS.items()},
+    "hackernews": "Hacker News",
+    "devto": "Dev.to",
+}
+
+
+# Any tag, and scripts and styles with their contents
+_MARKUP = re.compile(r"<(script|style)\b.*?</\1\s*>|<[^>]*>", re.IGNORECASE | re.DOTALL)
+_WHITESPACE = re.compile(r"\s+")
+
+
+def clean_html_content(html_content):
+    """Plain text of an HTML fragment: tags dropped, entities decoded, whitespace collapsed"""
+    if not html_content:
+        return ""
+    text = _MARKUP.sub("", html_content)
+    if "&" in text:
+        text = html.unescape(text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def _listing_description(source, description):
+    if source == "medium":
+        return f"📈 Trending: {description[:120]}..." if len(description) > 120 else f"📈 Trending: {description}"
+    if source in RSS_FEEDS:
+        return description[:150] + "..." if len(description) > 150 else description
+    return description
+
+
+def present(article):
+    """Shape an archived row like the entries /api/tech-articles returns"""
+    return {
+        "title": article["title"],
+        "url": article["url"],
+        "description": _listing_description(article["source"], article["description"]),
+        "published": article["published"],
+        "category": article["category"],
+        "source": SOURCE_NAMES.get(article["source"], article["source"]),
+    }
+
+
+def fetch_feed_entries(source, limit=None):
+    """
+    Download an RSS feed unless it is unchanged since the last fetch (ETag /
+    Last-Modified). Returns its first `limit` (FEED_ENTRY_LIMIT) entries,
+    newest first, and the response's (etag, modified) validators; ([], None)
+    on a 304. Reading stops once the entries have been parsed. The validators
+    aren't saved here: the caller saves them once the entries are archived.
+    """
+    url, category, _ = RSS_FEEDS[source]
+    try:
+        etag, modified = get_archive().validators(source)
+    except Exception as e:
+        # Without the archive the feed is just fetched unconditionally
+        log.warning("articles_archive_error", source=source, error=str(e))
+        etag = modified = None
+    headers = {}
+    if etag:
+        headers["If-None-Match"] = etag
+    if modified:
+        headers["If-Modified-Since"] = modified
+    response = get_fetcher().get(url, headers=headers, stream=True)
+    with response:
+        if response.status_code == 304:
+            return [], None
+        response.raise_for_status()
+        validators = (response.headers.get("ETag"), response.headers.get("Last-Modified"))
+        entries = read_feed(response.iter_content(chunk_size=CHUNK_SIZE), limit or FEED_ENTRY_LIMIT)
+    return [
+        {
+            "guid": entry.get("id") or entry.get("link"),
+            "title": clean_html_content(entry.get("title", "")),
+            "url": entry.get("link", ""),
+            "description": clean_html_content(entry.get("summary", "")),
+            "published": entry.get("published", ""),
+            "category": category,
+        }
+        for entry in entries
+    ], validators
+
+
+def _hackernews_entries():
+    entries = []
+    response = get_fetcher().get("https://hacker-news.firebaseio.com/v0/topstories.json")
+    if response.status_code == 200:
+        story_ids = response.json()[:5]  # Only top 5 trending stories
+        for story_id in story_ids:
+            story_response = get_fetcher().get(f"https://hacker-news.firebaseio.com/v0/item/{story_id}.json")
+            if story_response.status_code == 200:
+                story = story_response.json()
+                if story and "url" in story and story.get("score", 0) > 100:  # Only high-scoring trending stories
+                    entries.append({
+                        "guid": f"hn:{story_id}",
+                        "title": story.get("title", ""),
+                        "url": story.get("url", ""),
+                        "description": f"🔥 Trending: {story.get('score', 0)} points",
+                        "published": datetime.fromtimestamp(story.get("time", 0), tz=timezone.utc).strftime("%Y-%m-%d %H:%M"),
+                        "category": "Trending",
+                    })
+    return entries
+
+
+def _devto_entries():
+    entries = []
+    response = get_fetcher().get("https://dev.to/api/articles?top=1&per_page=3")
+    if response.status_code == 200:
+        for article in response.json()[:3]:  # Only top 3 trending articles
+            entries.append({
+                "title": article.get("title", ""),
+                "url": f"https://dev.to{article.get('path', '')}",
+                "description": f"🚀 Trending: {article.get('description', '')[:120]}...",
+                "published": article.get("published_at", ""),
+                "category": "Trending Dev",
+            })
+    return entries
+
+
+def _archive_entries(source, entries, validators=None):
+    """Ingest entries, then save the feed's validators; returns False if the archive couldn't be written"""
+    try:
+        archive = get_archive()
+        new = archive.ingest(source, entries)
+        if new:
+            log.debug("articles_archived", source=source, new=new)
+        if validators:
+            archive.save_validators(source, *validators)
+        return True
+    except Exception as e:
+        log.warning("articles_archive_error", source=source, error=str(e))
+        return False
+
+
+def fetch_tech_articles(source="techcrunch"):
+    """Scrape and return tech articles from various sources"""
+    articles = []
+
+    try:
+        if source in RSS_FEEDS:
+            # Latest 3 entries of the feed; an unchanged feed is served from the archive
+            entries, validators = fetch_feed_entries(source)
+            articles = None
+            if _archive_entries(source, entries, validators) or not entries:
+                try:
+                    articles = [present(a) for a in get_archive().latest(source, 3)]
+                except Exception as e:
+                    log.warning("articles_archive_error", source=source, error=str(e))
+            if articles is None:
+                # The archive can't be written or read: list what was just parsed
+                articles = [present({**e, "source": source}) for e in entries[:3]]
+
+        elif source in ("hackernews", "devto"):
+            # Ranked by the API rather than by recency, so list what it returns
+            entries = _hackernews_entries() if source == "hackernews" else _devto_entries()
+            _archive_entries(source, entries)
+            articles = [present({**e, "source": source}) for e in entries]
+
+        return {
+            "articles": articles,
+            "source": source,
+            "count": len(articles)
+        }
+
+    except Exception as e:
+        log.error("articles_fetch_error", source=source, error=str(e))
+        return {
+            "articles": [],
+            "source": source,
+            "error": str(e)
+        }
+
+
+def search_articles(q="", source=None, limit=20, cursor=None):
+    """Search the archive newest first; returns a page and the cursor for the next one"""
+    page = get_archive().search(q, source=source, limit=limit, cursor=cursor)
+    articles = [present(a) for a in page["articles"]]
+    return {"articles": articles, "count": len(articles), "next_cursor": page["next_cursor"]}
@@ -0,0 +1,168 @@
+"""
+Token-budgeted extractive compression of article text before the LLM stage.
+
+Every sentence of the article is scored with a TF-IDF centrality model
+(how similar a sentence is to the rest of the article, LexRank-style) plus a
+small lead bias, then the best sentences are packed greedily into a token
+budget while skipping near-duplicates. The selection is returned in article
+order so the prompt still reads naturally.
+"""
+
+import math
+import os
+import re
+
+from tools.lazy import lazy_import
+from tools.metrics import REGISTRY
+
+np = lazy_import("numpy")
+
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "350"))
+
+# Two sentences more similar than this are treated as saying the same thing
+REDUNDANCY_THRESHOLD = 0.75
+# Weight of the lead bias relative to centrality; news puts key facts first
+POSITION_WEIGHT = 0.15
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?])[\"')\]]*\s+(?=[\"'(\[]?[A-Z0-9])")
+_WORD = re.compile(r"[a-z0-9][a-z0-9'\-]*")
+# Rough BPE approximation: words, numbers and individual punctuation marks
+_TOKEN_PIECES = re.compile(r"\w+|[^\w\s]")
+
+STOPWORDS = frozenset(
+    """
+    a about above after again against all also am an and any are as at be because been before being below
+    between both but by can could did do does doing down during each few for from further had has have having
+    he her here hers him his how i if in into is it its itself just me more most my no nor not now of off on
+    once only or other our ours out over own same she should so some such than that the their theirs them then
+    there these they this those through to too under until up very was we were what when where which while who
+    whom why will with would you your yours said says one two new like
+    """.split()
+)
+
+PROMPT_TOKENS = REGISTRY.histogram(
+    "tweetai_prompt_content_tokens",
+    "Article tokens sent to the summarize stage after compression",
+    buckets=(100, 200, 300, 400, 500, 600, 800, 1000, 1500, 2000, 4000),
+)
+
+# Set by load_encoding(); until then (or if it fails) tokens are estimated locally
+_encoding = None
+
+
+def load_encoding():
+    """
+    Load tiktoken's cl100k_base encoding for count_tokens. The first load can
+    download the BPE file, so it runs at startup and never from a request.
+    Returns whether tiktoken is in use.
+    """
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # The encoding file can't be downloaded (or read from TIKTOKEN_CACHE_DIR)
+            _encoding = False
+    return bool(_encoding)
+
+
+def count_tokens(text):
+    """Count prompt tokens with tiktoken once load_encoding has run, else a local BPE estimate"""
+    if _encoding:
+        return len(_encoding.encode(text))
+    # Long words split into several BPE pieces; ~4 characters per piece
+    return sum(max(1, math.ceil(len(piece) / 4)) for piece in _TOKEN_PIECES.findall(text))
+
+
+def split_sentences(paragraph):
+    return [s.strip() for s in _SENTENCE_SPLIT.split(paragraph) if s.strip()]
+
+
+def _tfidf_matrix(sentences):
+    """Row-normalized TF-IDF matrix (sentences x vocabulary)"""
+    vocabulary = {}
+    rows, cols = [], []
+    for i, sentence in enumerate(sentences):
+        for word in _WORD.findall(sentence.lower()):
+            if word in STOPWORDS or len(word) < 2:
+                continue
+            rows.append(i)
+            cols.append(vocabulary.setdefault(word, len(vocabulary)))
+
+    tf = np.zeros((len(sentences), max(1, len(vocabulary))), dtype=np.float32)
+    if rows:
+        np.add.at(tf, (np.array(rows), np.array(cols)), 1.0)
+    tf = np.log1p(tf)
+
+    df = np.count_nonzero(tf, axis=0)
+    idf = np.log((1 + len(sentences)) / (1 + df)) + 1.0
+    matrix = tf * idf.astype(np.float32)
+
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def score_sentences(sentences):
+    """Return (scores, similarity matrix) for a list of sentences"""
+    matrix = _tfidf_matrix(sentences)
+    similarity = matrix @ matrix.T
+    np.fill_diagonal(similarity, 0.0)
+
+    centrality = similarity.sum(axis=1)
+    peak = centrality.max() if len(centrality) else 0.0
+    if peak > 0:
+        centrality = centrality / peak
+
+    position = 1.0 / np.sqrt(np.arange(1, len(sentences) + 1, dtype=np.float32))
+    return centrality + POSITION_WEIGHT * position, similarity
+
+
+def compress_paragraphs(paragraphs, token_budget=None):
+    """
+    Select the most informative sentences of `paragraphs` within `token_budget`.
+
+    Returns a dict with the selected text regrouped into paragraphs (in
+    article order) and bookkeeping about the selection.
+    """
+    token_budget = PROMPT_TOKEN_BUDGET if token_budget is None else token_budget
+
+    sentences, paragraph_index = [], []
+    for p, paragraph in enumerate(paragraphs):
+        for sentence in split_sentences(paragraph):
+            sentences.append(sentence)
+            paragraph_index.append(p)
+
+    result = {
+        "paragraphs": [],
+        "tokens": 0,
+        "token_budget": token_budget,
+        "sentences_total": len(sentences),
+        "sentences_selected": 0,
+    }
+    if not sentences:
+        return result
+
+    scores, similarity = score_sentences(sentences)
+    costs = np.array([count_tokens(s) for s in sentences])
+
+    selected = []
+    used = 0
+    for i in np.argsort(-scores, kind="stable"):
+        if used + costs[i] > token_budget:
+            continue
+        if selected and similarity[i, selected].max() > REDUNDANCY_THRESHOLD:
+            continue
+        selected.append(int(i))
+        used += int(costs[i])
+
+    grouped = {}
+    for i in sorted(selected):
+        grouped.setdefault(paragraph_index[i], []).append(sentences[i])
+
+    result["paragraphs"] = [" ".join(grouped[p]) for p in sorted(grouped)]
+    result["tokens"] = used
+    result["sentences_selected"] = len(selected)
+    return result
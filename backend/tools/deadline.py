@@ -0,0 +1,177 @@
+"""
+Request deadlines for the URL-to-tweet pipeline.
+
+A `Deadline` is created when a request arrives and made current for the
+thread doing its work (`with deadline.active(): ...`). Each stage runs under
+`deadline.stage(name)`, which refuses to start once the deadline has passed
+and records how the stage ended; network calls cap their timeouts to the
+time left with `deadline.timeout(...)`. Optional stages ask
+`deadline.allows(name)` first and are skipped when their recent durations
+say they wouldn't finish in time. `deadline.stages` is the per-request
+report of what ran.
+"""
+
+import contextvars
+import math
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from tools.metrics import REGISTRY
+
+# Default per-request deadline in seconds for the API (0 = no deadline)
+REQUEST_DEADLINE = float(os.getenv("REQUEST_DEADLINE", "45"))
+
+DEGRADED_STAGES = REGISTRY.counter(
+    "tweetai_degraded_stages_total",
+    "Pipeline stages skipped or cut short because of the request deadline or load shedding",
+    ("stage", "status"),
+)
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class StageEstimates:
+    """
+    Expected duration per stage, as a smoothed mean plus twice the smoothed
+    deviation (the way TCP estimates retransmission timeouts). Stages that
+    haven't been seen yet are estimated at 0, so they are always tried, and
+    each skip shrinks the estimate so a skipped stage is eventually retried.
+    """
+
+    def __init__(self, alpha=0.125, beta=0.25):
+        self.alpha = alpha
+        self.beta = beta
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            stats = self._stats.get(stage)
+            if stats is None:
+                self._stats[stage] = (seconds, seconds / 2)
+            else:
+                mean, deviation = stats
+                deviation += self.beta * (abs(seconds - mean) - deviation)
+                mean += self.alpha * (seconds - mean)
+                self._stats[stage] = (mean, deviation)
+
+    def decay(self, stage):
+        with self._lock:
+            stats = self._stats.get(stage)
+            if stats is not None:
+                self._stats[stage] = (stats[0] * (1 - self.alpha), stats[1] * (1 - self.beta))
+
+    def get(self, stage):
+        with self._lock:
+            mean, deviation = self._stats.get(stage, (0.0, 0.0))
+        return mean + 2 * deviation
+
+    def clear(self):
+        with self._lock:
+            self._stats.clear()
+
+
+ESTIMATES = StageEstimates()
+
+_current = contextvars.ContextVar("deadline", default=None)
+
+
+class Deadline:
+    """A point in time the request must finish by (none with `seconds` 0/None), plus its stage report"""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds or None
+        self.expires = time.monotonic() + seconds if seconds else None
+        self.stages = {}
+
+    def remaining(self):
+        if self.expires is None:
+            return math.inf
+        return self.expires - time.monotonic()
+
+    def expired(self):
+        return self.remaining() <= 0
+
+    def allows(self, stage):
+        """Whether `stage` is expected to finish before the deadline"""
+        return self.remaining() >= ESTIMATES.get(stage)
+
+    def timeout(self, limit=None):
+        """
+        `limit` (seconds, or a (connect, read) tuple) capped to the time left.
+        Without a deadline `limit` is returned unchanged.
+        """
+        if self.expires is None:
+            return limit
+        left = max(self.remaining(), 0.001)
+        if limit is None:
+            return left
+        if isinstance(limit, tuple):
+            return tuple(min(part, left) for part in limit)
+        return min(limit, left)
+
+    def skip(self, stage):
+        self.stages[stage] = "skipped"
+        DEGRADED_STAGES.inc(stage=stage, status="skipped")
+        ESTIMATES.decay(stage)
+
+    def shed(self, stage):
+        """Record `stage` as dropped because it had no capacity (see tools/admission.py)"""
+        self.stages[stage] = "shed"
+        DEGRADED_STAGES.inc(stage=stage, status="shed")
+
+    @property
+    def degraded(self):
+        return any(status in ("skipped", "timed_out", "shed") for status in self.stages.values())
+
+    def cut_short(self, stage):
+        """
+        Whether `stage` ended because of the deadline: it found the deadline
+        already passed when it started (after `allows()`, e.g. once it got a
+        model slot) or failed at the deadline.
+        """
+        return self.stages.get(stage) in ("skipped", "timed_out")
+
+    @contextmanager
+    def stage(self, name):
+        """
+        Run a stage: raises DeadlineExceeded if the deadline has already
+        passed, otherwise records "ok", "timed_out" (failed at the deadline)
+        or "failed" under `stages[name]`.
+        """
+        if self.expired():
+            self.skip(name)
+            raise DeadlineExceeded(f"Deadline reached before {name}")
+        start = time.perf_counter()
+        try:
+            yield
+        except Exception:
+            # A stage that fails once the deadline has passed was cut short by it
+            if self.expired():
+                self.stages[name] = "timed_out"
+                DEGRADED_STAGES.inc(stage=name, status="timed_out")
+            else:
+                self.stages[name] = "failed"
+            raise
+        # Only completed stages are observed; a duration cut off by the
+        # deadline says little about how long the stage normally takes
+        ESTIMATES.observe(name, time.perf_counter() - start)
+        self.stages[name] = "ok"
+
+    @contextmanager
+    def active(self):
+        """Make this the current deadline for the block"""
+        token = _current.set(self)
+        try:
+            yield self
+        finally:
+            _current.reset(token)
+
+
+def current_deadline():
+    """The active Deadline, or an unbounded one when none is set"""
+    return _current.get() or Deadline()
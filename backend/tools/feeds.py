@@ -0,0 +1,106 @@
+"""
+Streaming RSS / Atom reader.
+
+The trending listings only need the newest few entries of a feed, but
+feedparser downloads and parses the whole document, full article bodies
+included. `read_feed` feeds the response to an incremental XML parser chunk
+by chunk and stops reading as soon as it has `limit` entries with a link,
+so the rest of the feed is never downloaded or parsed.
+
+Entries carry the feedparser fields the article listings use (`id`,
+`title`, `link`, `summary`, `published`), filled the way feedparser fills
+them. A feed that isn't well-formed XML (undefined HTML entities are the
+usual culprit) is handed to feedparser, which is lenient about it.
+"""
+
+import xml.etree.ElementTree as ET
+
+from tools.lazy import lazy_import
+
+feedparser = lazy_import("feedparser")
+
+CHUNK_SIZE = 16 * 1024
+ENTRY_TAGS = {"item", "entry"}
+# Full-content elements, which stand in for a missing summary
+CONTENT_TAGS = {"content", "encoded", "fullitem"}
+HTML_TYPES = {"text", "html", "xhtml", "text/plain", "text/html", "application/xhtml+xml"}
+
+
+def _local(tag):
+    return tag.rsplit("}", 1)[-1]
+
+
+def _text(element):
+    return "".join(element.itertext()).strip()
+
+
+def parse_entry(element):
+    """feedparser-style fields of an RSS <item> or Atom <entry> element"""
+    entry = {}
+    guid_is_link = False
+    content = None
+    for child in element:
+        name = _local(child.tag)
+        if name in ("guid", "id"):
+            entry.setdefault("id", _text(child))
+            guid_is_link = child.get("isPermaLink", "true").lower() != "false"
+        elif name == "title":
+            entry.setdefault("title", _text(child))
+        elif name == "link":
+            href = child.get("href")
+            if href is None:
+                entry.setdefault("link", _text(child))
+            elif child.get("rel", "alternate") == "alternate":
+                entry.setdefault("link", href.strip())
+        elif name in ("description", "summary"):
+            entry.setdefault("summary", _text(child))
+        elif name in CONTENT_TAGS:
+            if content is None and child.get("type", "html") in HTML_TYPES:
+                content = _text(child)
+        elif name in ("pubDate", "published"):
+            entry.setdefault("published", _text(child))
+    if "summary" not in entry and content is not None:
+        entry["summary"] = content
+    if not entry.get("link") and guid_is_link and entry.get("id", "").startswith(("http://", "https://")):
+        entry["link"] = entry["id"]
+    return entry
+
+
+def read_feed(chunks, limit=None):
+    """
+    The first `limit` entries (all without a limit) with a link, from an
+    iterable of the feed's bytes. Stops consuming `chunks` once it has them.
+    """
+    chunks = iter(chunks)
+    parser = ET.XMLPullParser(events=("start", "end"))
+    received = []
+    entries = []
+    depth = 0  # nesting inside the current entry, so nested elements named "entry" don't end it early
+    try:
+        for chunk in chunks:
+            received.append(chunk)
+            parser.feed(chunk)
+            for event, element in parser.read_events():
+                if _local(element.tag) not in ENTRY_TAGS:
+                    continue
+                if event == "start":
+                    depth += 1
+                    continue
+                depth -= 1
+                if depth:
+                    continue
+                entry = parse_entry(element)
+                # Drop the entry's subtree now; only the first few are kept
+                element.clear()
+                if entry.get("link"):
+                    entries.append(entry)
+                    if limit is not None and len(entries) >= limit:
+                        return entries
+        parser.close()
+    except ET.ParseError:
+        # Read the rest and let feedparser make what it can of it
+        received.extend(chunks)
+        feed = feedparser.parse(b"".join(received))
+        entries = [dict(e) for e in feed.entries if e.get("link")]
+        return entries[:limit] if limit is not None else entries
+    return entries
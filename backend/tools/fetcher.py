@@ -0,0 +1,270 @@
+"""
+Polite, pooled HTTP fetching for article pages and feeds.
+
+Every outbound page or feed request goes through one `Fetcher`, which keeps
+per host:
+- a `requests.Session` with a pooled adapter, so repeat fetches reuse
+  keep-alive connections
+- a concurrency limit, so a burst of links to one publisher can't open
+  dozens of connections to it
+- a token bucket that paces requests to a steady rate after a small burst
+
+Host names are resolved through a shared DNS cache, and responses are
+decompressed transparently: gzip/deflate always, brotli when the `brotli`
+package is installed.
+"""
+
+import collections
+import ipaddress
+import os
+import socket
+import threading
+import time
+import urllib.parse
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection, HTTPSConnection
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util import make_headers
+
+from tools.metrics import REGISTRY
+
+FETCH_USER_AGENT = os.getenv(
+    "FETCH_USER_AGENT", "Mozilla/5.0 (compatible; TweetAI/1.0; +https://tweet-ai-ivory.vercel.app)"
+)
+# (connect, read) timeout in seconds
+FETCH_TIMEOUT = (float(os.getenv("FETCH_CONNECT_TIMEOUT", "5")), float(os.getenv("FETCH_READ_TIMEOUT", "20")))
+FETCH_HOST_CONCURRENCY = int(os.getenv("FETCH_HOST_CONCURRENCY", "4"))
+# Sustained requests per second per host (0 disables pacing) and the burst allowed on top
+FETCH_HOST_RATE = float(os.getenv("FETCH_HOST_RATE", "2"))
+FETCH_HOST_BURST = int(os.getenv("FETCH_HOST_BURST", "5"))
+FETCH_MAX_HOSTS = int(os.getenv("FETCH_MAX_HOSTS", "256"))
+DNS_CACHE_TTL = float(os.getenv("DNS_CACHE_TTL", "300"))
+
+FETCH_REQUESTS = REGISTRY.counter(
+    "tweetai_fetch_requests_total",
+    "Outbound page and feed requests by outcome",
+    ("outcome",),
+)
+FETCH_WAIT_SECONDS = REGISTRY.histogram(
+    "tweetai_fetch_politeness_wait_seconds",
+    "Time a fetch waited for a per-host slot or rate-limit token",
+    buckets=(0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0),
+)
+DNS_LOOKUPS = REGISTRY.counter(
+    "tweetai_dns_cache_lookups_total",
+    "Host name resolutions by DNS cache result",
+    ("result",),
+)
+
+
+class DNSCache:
+    """getaddrinfo results per (host, port), kept for `ttl` seconds"""
+
+    def __init__(self, ttl=DNS_CACHE_TTL, max_entries=1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def resolve(self, host, port):
+        """Return the IP addresses for `host` in getaddrinfo order; IP literals are returned as-is"""
+        try:
+            ipaddress.ip_address(host)
+            return [host]
+        except ValueError:
+            pass
+
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get((host, port))
+        if entry and entry[1] > now:
+            DNS_LOOKUPS.inc(result="hit")
+            return entry[0]
+
+        DNS_LOOKUPS.inc(result="miss")
+        infos = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)
+        addresses = list(dict.fromkeys(info[4][0] for info in infos))
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries.clear()
+            self._entries[(host, port)] = (addresses, now + self.ttl)
+        return addresses
+
+    def forget(self, host, port):
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+DNS_CACHE = DNSCache()
+
+
+class _CachedDNSMixin:
+    """
+    Connect to the cached addresses in turn, like socket.create_connection
+    does; TLS still verifies and sends SNI for the host name.
+    """
+
+    def _new_conn(self):
+        host = self._dns_host
+        error = None
+        for address in DNS_CACHE.resolve(host, self.port):
+            self._dns_host = address
+            try:
+                return super()._new_conn()
+            except Exception as e:
+                error = e
+            finally:
+                self._dns_host = host
+        # Every address failed and may be stale; resolve again on the next attempt
+        DNS_CACHE.forget(host, self.port)
+        raise error
+
+
+class _HTTPConnection(_CachedDNSMixin, HTTPConnection):
+    pass
+
+
+class _HTTPSConnection(_CachedDNSMixin, HTTPSConnection):
+    pass
+
+
+class _HTTPConnectionPool(HTTPConnectionPool):
+    ConnectionCls = _HTTPConnection
+
+
+class _HTTPSConnectionPool(HTTPSConnectionPool):
+    ConnectionCls = _HTTPSConnection
+
+
+class CachedDNSAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {"http": _HTTPConnectionPool, "https": _HTTPSConnectionPool}
+
+
+class TokenBucket:
+    """`rate` tokens per second with bursts of up to `burst`; rate 0 never waits"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self._tokens = float(burst)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Take a token and return how long to wait before using it"""
+        if not self.rate:
+            return 0.0
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            return max(0.0, -self._tokens / self.rate)
+
+
+class _Host:
+    def __init__(self, fetcher):
+        self.session = requests.Session()
+        self.session.headers.update({"User-Agent": fetcher.user_agent, **make_headers(accept_encoding=True)})
+        adapter = CachedDNSAdapter(pool_connections=1, pool_maxsize=fetcher.host_concurrency)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.adapter = adapter
+        self.slots = threading.BoundedSemaphore(fetcher.host_concurrency)
+        self.bucket = TokenBucket(fetcher.host_rate, fetcher.host_burst)
+
+    def close(self):
+        """
+        Close the idle pooled connections. urllib3 2 drops pools on clear()
+        without closing them, so they're closed here first. A request still
+        in flight keeps its checked-out connection, which is closed when it's
+        released to the closed pool.
+        """
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                pool.close()
+        self.session.close()
+
+
+def host_key(url):
+    parts = urllib.parse.urlsplit(url)
+    return f"{parts.scheme}://{(parts.hostname or '').lower()}:{parts.port or ''}"
+
+
+class Fetcher:
+    def __init__(self, host_concurrency=FETCH_HOST_CONCURRENCY, host_rate=FETCH_HOST_RATE,
+                 host_burst=FETCH_HOST_BURST, timeout=FETCH_TIMEOUT, user_agent=FETCH_USER_AGENT,
+                 max_hosts=FETCH_MAX_HOSTS):
+        self.host_concurrency = host_concurrency
+        self.host_rate = host_rate
+        self.host_burst = host_burst
+        self.timeout = timeout
+        self.user_agent = user_agent
+        self.max_hosts = max_hosts
+        self._hosts = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def _host(self, url):
+        key = host_key(url)
+        evicted = []
+        with self._lock:
+            host = self._hosts.get(key)
+            if host is None:
+                host = self._hosts[key] = _Host(self)
+                # Forget the least recently used hosts
+                while len(self._hosts) > self.max_hosts:
+                    evicted.append(self._hosts.popitem(last=False)[1])
+            else:
+                self._hosts.move_to_end(key)
+        for old in evicted:
+            old.close()
+        return host
+
+    def request(self, method, url, **kwargs):
+        """`requests.Session.request` under the host's concurrency limit and rate"""
+        host = self._host(url)
+        start = time.perf_counter()
+        with host.slots:
+            delay = host.bucket.reserve()
+            if delay:
+                time.sleep(delay)
+            FETCH_WAIT_SECONDS.observe(time.perf_counter() - start)
+            kwargs.setdefault("timeout", self.timeout)
+            try:
+                response = host.session.request(method, url, **kwargs)
+            except requests.RequestException:
+                FETCH_REQUESTS.inc(outcome="error")
+                raise
+        FETCH_REQUESTS.inc(outcome="ok" if response.status_code < 400 else "http_error")
+        return response
+
+    def get(self, url, **kwargs):
+        return self.request("GET", url, **kwargs)
+
+
+_fetcher = None
+_fetcher_lock = threading.Lock()
+
+
+def get_fetcher():
+    """Process-wide fetcher configured from the FETCH_* environment variables"""
+    global _fetcher
+    if _fetcher is None:
+        with _fetcher_lock:
+            if _fetcher is None:
+                _fetcher = Fetcher()
+    return _fetcher
+
+
+def set_fetcher(fetcher):
+    """Replace the process-wide fetcher (benchmarks turn pacing off); returns the previous one"""
+    global _fetcher
+    with _fetcher_lock:
+        previous, _fetcher = _fetcher, fetcher
+    return previous
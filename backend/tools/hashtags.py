@@ -0,0 +1,230 @@
+"""
+Local hashtag recommendation, a stand-in for the LLM reach stage.
+
+The index maps terms to hashtags. Every hashtag starts from a curated list
+of seed terms and learns more from recently archived feed articles: an
+article that mentions a tag's seed terms (or carries the tag itself) lends
+its other terms to that tag, weighted by TF-IDF. Hashtags that appear
+literally in enough articles join the index, and tags matched by many
+recent articles get a small trending boost.
+
+Scoring a tweet gathers the index rows for its terms and sums them in one
+NumPy product (cosine similarity against every tag at once), so picking
+hashtags takes microseconds instead of a model round trip. Set
+LOCAL_HASHTAGS=1 to use it in place of the reach stage.
+"""
+
+import collections
+import math
+import os
+import re
+import threading
+import time
+
+from tools.compressor import STOPWORDS
+from tools.lazy import lazy_import
+from tools.log import get_logger
+
+np = lazy_import("numpy")
+log = get_logger("hashtags")
+
+LOCAL_HASHTAGS = os.getenv("LOCAL_HASHTAGS", "0") == "1"
+# Rebuild the index from the archive this often (seconds), over this many recent articles
+HASHTAG_INDEX_TTL = int(os.getenv("HASHTAG_INDEX_TTL", "3600"))
+HASHTAG_INDEX_ARTICLES = int(os.getenv("HASHTAG_INDEX_ARTICLES", "5000"))
+MAX_HASHTAGS = 3
+
+SEED_HASHTAGS = {
+    "#AI": "ai artificial intelligence genai generative chatgpt openai anthropic gemini copilot",
+    "#MachineLearning": "machine learning ml training inference neural model models dataset fine-tuning",
+    "#LLM": "llm llms language model gpt claude llama transformer prompt prompts tokens rag embeddings",
+    "#DataScience": "data science analytics pandas notebook statistics visualization",
+    "#Python": "python django flask fastapi pip pypi",
+    "#JavaScript": "javascript node nodejs npm deno bun",
+    "#TypeScript": "typescript",
+    "#React": "react nextjs jsx hooks",
+    "#WebDev": "web frontend css html browser browsers websites",
+    "#Rust": "rust cargo crate crates borrow",
+    "#Golang": "go golang goroutines",
+    "#Java": "java jvm kotlin spring",
+    "#DevOps": "devops ci cd pipeline pipelines deployment deployments terraform ansible",
+    "#Kubernetes": "kubernetes k8s cluster clusters helm pods",
+    "#Docker": "docker container containers image images",
+    "#Cloud": "cloud aws azure gcp serverless lambda",
+    "#Database": "database databases sql postgres postgresql mysql sqlite query queries index indexes",
+    "#Caching": "cache caching caches redis memcached invalidation",
+    "#Performance": "performance latency throughput benchmark benchmarks optimization profiling",
+    "#Microservices": "microservices microservice distributed architecture",
+    "#API": "api apis rest graphql grpc endpoint endpoints",
+    "#OpenSource": "open-source opensource github license maintainers contributors",
+    "#Programming": "programming code coding developer developers software engineering",
+    "#CyberSecurity": "security cybersecurity vulnerability vulnerabilities exploit breach malware ransomware hackers",
+    "#Privacy": "privacy tracking gdpr surveillance encryption",
+    "#Startups": "startup startups founder founders",
+    "#VentureCapital": "funding raised raises series seed investors valuation venture",
+    "#Apple": "apple iphone ipad macos ios mac",
+    "#Android": "android google pixel",
+    "#Gaming": "gaming game games console xbox playstation nintendo steam",
+    "#Hardware": "hardware chip chips gpu gpus cpu nvidia amd intel",
+    "#Semiconductors": "semiconductor semiconductors tsmc fab foundry",
+    "#Robotics": "robot robots robotics humanoid automation",
+    "#EVs": "ev evs electric vehicle vehicles tesla battery batteries charging",
+    "#SpaceTech": "space spacex rocket launch satellite satellites nasa orbit",
+    "#Crypto": "crypto cryptocurrency bitcoin ethereum blockchain",
+    "#SocialMedia": "social twitter x meta facebook instagram tiktok threads bluesky",
+    "#Linux": "linux kernel ubuntu debian",
+}
+
+_WORD = re.compile(r"[a-z0-9][a-z0-9+#\-]*")
+_HASHTAG = re.compile(r"#(\w{2,30})")
+
+
+def terms(text):
+    """Lowercased content words; keeps terms like c++, c# and open-source whole"""
+    return [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS and len(w) > 1]
+
+
+class HashtagIndex:
+    """`weights` has one row per term and one unit-length column per tag"""
+
+    def __init__(self, tags, vocabulary, weights, boost):
+        self.tags = tags
+        self.vocabulary = vocabulary
+        self.weights = weights
+        self.boost = boost
+        self._keys = [tag.lower() for tag in tags]
+
+    @classmethod
+    def build(cls, documents=(), seeds=SEED_HASHTAGS, min_tag_articles=3, trend_weight=0.25):
+        documents = [(set(terms(text)), {f"#{t}" for t in _HASHTAG.findall(text)}) for text in documents]
+
+        # Seed tags, plus hashtags used literally in enough articles (in their most common spelling)
+        tags = {tag.lower(): tag for tag in seeds}
+        seed_terms = {tag.lower(): set(terms(words)) | {tag[1:].lower()} for tag, words in seeds.items()}
+        used = collections.Counter(tag for _, found in documents for tag in found)
+        spelling = {}
+        for tag, count in used.most_common():
+            spelling.setdefault(tag.lower(), tag)
+        for key, count in collections.Counter(tag.lower() for tag in used.elements()).items():
+            if key not in tags and count >= min_tag_articles:
+                tags[key] = spelling[key]
+                seed_terms[key] = {key[1:]}
+        keys = list(tags)
+        column = {key: i for i, key in enumerate(keys)}
+
+        # Each article lends its terms to every tag it matches
+        document_frequency = collections.Counter()
+        tag_articles = np.zeros(len(keys))
+        pairs = collections.Counter()
+        for words, found in documents:
+            document_frequency.update(words)
+            found = {tag.lower() for tag in found}
+            matched = [column[key] for key in keys if key in found or words & seed_terms[key]]
+            for col in matched:
+                tag_articles[col] += 1
+                pairs.update((word, col) for word in words)
+
+        vocabulary = {}
+        for key, words in seed_terms.items():
+            for word in words:
+                vocabulary.setdefault(word, len(vocabulary))
+        for word, df in document_frequency.items():
+            if df >= 2:
+                vocabulary.setdefault(word, len(vocabulary))
+
+        n = max(len(documents), 1)
+        weights = np.zeros((len(vocabulary), len(keys)), dtype=np.float32)
+        learned = [(vocabulary[w], c, k) for (w, c), k in pairs.items() if w in vocabulary]
+        if learned:
+            rows, cols, counts = (np.array(values) for values in zip(*learned))
+            idf = np.array([math.log(1 + n / max(document_frequency[w], 1)) for w in vocabulary], dtype=np.float32)
+            # Share of the tag's articles using the term, times how rare the term is overall
+            weights[rows, cols] = counts / tag_articles[cols] * idf[rows]
+        # Seed terms always count fully, whatever the archive holds
+        for key, words in seed_terms.items():
+            for word in words:
+                weights[vocabulary[word], column[key]] += 1.0
+        weights /= np.maximum(np.linalg.norm(weights, axis=0), 1e-9)
+
+        boost = 1 + trend_weight * tag_articles / max(tag_articles.max(initial=0), 1)
+        return cls([tags[key] for key in keys], vocabulary, weights, boost.astype(np.float32))
+
+    def scores(self, text):
+        """Cosine similarity of the text's terms to every tag, with the trending boost"""
+        ids = [self.vocabulary[t] for t in terms(text) if t in self.vocabulary]
+        if not ids:
+            return np.zeros(len(self.tags), dtype=np.float32)
+        ids, counts = np.unique(ids, return_counts=True)
+        counts = counts.astype(np.float32)
+        return (counts @ self.weights[ids]) / np.linalg.norm(counts) * self.boost
+
+    def recommend(self, text, k=MAX_HASHTAGS, min_score=0.15):
+        """Up to `k` hashtags for `text`, best first, leaving out any it already has"""
+        if k <= 0:
+            return []
+        present = {f"#{t}".lower() for t in _HASHTAG.findall(text)}
+        scores = self.scores(text)
+        best = np.argsort(-scores)[: k + len(present)]
+        picked = [self.tags[i] for i in best if scores[i] >= min_score and self._keys[i] not in present]
+        return picked[:k]
+
+
+def add_hashtags(tweet, index=None, k=MAX_HASHTAGS):
+    """`tweet` with hashtags appended, up to `k` counting the ones it already has"""
+    existing = len(_HASHTAG.findall(tweet))
+    tags = (index or get_hashtag_index()).recommend(tweet, k=k - existing)
+    return f"{tweet.rstrip()} {' '.join(tags)}" if tags else tweet
+
+
+def _archived_text(limit):
+    from tools.archive import get_archive
+
+    return [f"{a['title']}. {a['description']}" for a in get_archive().recent(limit)]
+
+
+_index = None
+_built_at = 0.0
+_build_lock = threading.Lock()
+
+
+def _build():
+    global _index, _built_at
+    start = time.perf_counter()
+    try:
+        documents = _archived_text(HASHTAG_INDEX_ARTICLES)
+    except Exception as e:
+        log.warning("hashtag_index_archive_error", error=str(e))
+        documents = []
+    index = HashtagIndex.build(documents)
+    _index, _built_at = index, time.monotonic()
+    log.info("hashtag_index_built", articles=len(documents), tags=len(index.tags),
+             terms=len(index.vocabulary), seconds=round(time.perf_counter() - start, 3))
+
+
+def _rebuild_in_background():
+    try:
+        _build()
+    except Exception as e:
+        log.error("hashtag_index_build_error", error=str(e))
+    finally:
+        _build_lock.release()
+
+
+def get_hashtag_index():
+    """
+    The process-wide index, built from the seeds and recent archived articles
+    and rebuilt every HASHTAG_INDEX_TTL seconds. Only the first build happens
+    in the caller; after that a stale index is rebuilt in a background thread
+    and keeps being served until the new one replaces it.
+    """
+    if _index is None:
+        with _build_lock:
+            if _index is None:
+                _build()
+        return _index
+    if time.monotonic() - _built_at >= HASHTAG_INDEX_TTL and _build_lock.acquire(blocking=False):
+        if time.monotonic() - _built_at >= HASHTAG_INDEX_TTL:
+            threading.Thread(target=_rebuild_in_background, name="hashtag-index", daemon=True).start()
+        else:
+            _build_lock.release()  # rebuilt while we were checking
+    return _index
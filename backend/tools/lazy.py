@@ -0,0 +1,47 @@
+"""
+Deferred imports for heavy optional dependencies.
+
+`lazy_import("bs4")` returns a proxy that imports the real module on first
+attribute access, so modules can keep a top-level name for a dependency
+without paying its import cost at startup.
+"""
+
+import importlib
+import threading
+
+
+class LazyModule:
+    def __init__(self, name):
+        self.__dict__["_name"] = name
+        self.__dict__["_module"] = None
+        self.__dict__["_lock"] = threading.Lock()
+
+    def _load(self):
+        module = self.__dict__["_module"]
+        if module is None:
+            with self.__dict__["_lock"]:
+                module = self.__dict__["_module"]
+                if module is None:
+                    module = importlib.import_module(self.__dict__["_name"])
+                    self.__dict__["_module"] = module
+        return module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def __setattr__(self, attr, value):
+        setattr(self._load(), attr, value)
+
+    def __repr__(self):
+        state = "loaded" if self.__dict__["_module"] is not None else "not loaded"
+        return f"<lazy module {self.__dict__['_name']!r} ({state})>"
+
+
+def lazy_import(name):
+    return LazyModule(name)
+
+
+def preload(*names):
+    """Import modules eagerly, e.g. from a warm-up hook"""
+    for name in names:
+        importlib.import_module(name)
@@ -0,0 +1,51 @@
+"""
+A local stand-in chat model for the "local" provider: no network, no API
+key and no cost. It answers extractively, so routing tests and offline
+development get tweet-shaped output:
+- prompts that end with a tweet ("Tweet:\\n...") get that tweet back, and
+  batched "Tweet 1: ... Tweet N:" prompts get theirs back `---`-separated
+- anything else gets the opening sentences of the prompt's last paragraph,
+  trimmed to fit a tweet
+It honours `n` by starting each completion one sentence further in.
+"""
+
+import re
+
+from langchain_core.language_models.chat_models import SimpleChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.outputs import ChatGeneration, ChatResult
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+")
+_BATCH_ITEM = re.compile(r"^Tweet \d+:\n", flags=re.M)
+
+
+class LocalChatModel(SimpleChatModel):
+    model_name: str = "extractive"
+    max_length: int = 270
+
+    @property
+    def _llm_type(self):
+        return "local"
+
+    def _reply(self, prompt, offset=0):
+        batch = _BATCH_ITEM.split(prompt)[1:]
+        if batch:
+            return "\n---\n".join(tweet.strip() for tweet in batch)
+        if "Tweet:\n" in prompt:
+            return prompt.rsplit("Tweet:\n", 1)[1].strip()
+        paragraphs = [p.strip() for p in prompt.split("\n\n") if p.strip()]
+        sentences = _SENTENCE_END.split(paragraphs[-1]) if paragraphs else []
+        reply = ""
+        for sentence in sentences[offset:] or sentences:
+            if reply and len(reply) + len(sentence) + 1 > self.max_length:
+                break
+            reply = f"{reply} {sentence}".strip()
+        return reply[: self.max_length]
+
+    def _call(self, messages, stop=None, run_manager=None, **kwargs):
+        return self._generate(messages, stop, run_manager, **kwargs).generations[0].message.content
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        prompt = "\n".join(str(m.content) for m in messages)
+        texts = [self._reply(prompt, offset) for offset in range(kwargs.get("n", 1))]
+        return ChatResult(generations=[ChatGeneration(message=AIMessage(content=t)) for t in texts])
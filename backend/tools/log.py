@@ -0,0 +1,86 @@
+"""
+Structured, level-gated logging.
+
+Events are emitted as a single logfmt-style line (`event key=value ...`).
+The level check happens before any formatting, so a disabled debug call
+costs one integer comparison; pass callables as field values for anything
+expensive to compute (e.g. dumping response headers) and they are only
+evaluated when the event is actually emitted.
+"""
+
+import logging
+import os
+import sys
+
+LOG_LEVEL = os.environ.get("LOG_LEVEL", "INFO").upper()
+
+# Field names whose values are never written out in full
+_SECRET_FIELDS = {"token", "access_token", "authorization", "auth_header", "secret", "code_verifier"}
+
+_configured = False
+
+
+def _configure():
+    global _configured
+    if _configured:
+        return
+    root = logging.getLogger("tweetai")
+    if not root.handlers:
+        handler = logging.StreamHandler(sys.stderr)
+        handler.setFormatter(logging.Formatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        root.addHandler(handler)
+    root.setLevel(getattr(logging, LOG_LEVEL, logging.INFO))
+    root.propagate = False
+    _configured = True
+
+
+def _render(value):
+    if callable(value):
+        value = value()
+    text = str(value)
+    if not text or any(c in text for c in ' "='):
+        text = '"' + text.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+    return text
+
+
+def redact(value, keep=6):
+    """Shorten a credential so it can be correlated in logs without leaking it"""
+    if not value:
+        return "None"
+    value = str(value)
+    return value[:keep] + "..." if len(value) > keep else "***"
+
+
+class StructuredLogger:
+    def __init__(self, name):
+        self._logger = logging.getLogger(f"tweetai.{name}")
+
+    def is_enabled(self, level):
+        return self._logger.isEnabledFor(level)
+
+    def _log(self, level, event, fields, exc_info=False):
+        if not self._logger.isEnabledFor(level):
+            return
+        parts = [event]
+        for key, value in fields.items():
+            if key in _SECRET_FIELDS:
+                value = redact(value() if callable(value) else value)
+            parts.append(f"{key}={_render(value)}")
+        self._logger.log(level, " ".join(parts), exc_info=exc_info)
+
+    def debug(self, event, **fields):
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event, **fields):
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event, **fields):
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event, exc_info=False, **fields):
+        self._log(logging.ERROR, event, fields, exc_info=exc_info)
+
+
+def get_logger(name):
+    _configure()
+    return StructuredLogger(name)
@@ -0,0 +1,149 @@
+"""
+Memory accounting for page analysis.
+
+Parsing is where a worker's memory goes: html.parser builds about 24 bytes
+of tree per character of markup, so a 5 MB page briefly costs over 100 MB.
+Pages whose estimated tree is larger than ANALYSIS_MEMORY_LIMIT_MB are
+refused before parsing (`check_budget`), and page bodies larger than
+MAX_PAGE_MB are refused while they are being downloaded (`read_capped`),
+before a worker ever holds them in full.
+
+With tracking on (MEMORY_TRACKING=1, or POST /api/admin/memory-tracking at
+runtime) the peak allocation of each tracked block is measured with
+tracemalloc and recorded in `tweetai_analysis_peak_bytes`. tracemalloc's
+peak is process-wide, so a peak measured while other requests were also
+allocating is an upper bound for the request. Tracing slows allocation-heavy
+code down noticeably, so it's off by default.
+"""
+
+import os
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from tools.log import get_logger
+from tools.metrics import REGISTRY
+
+log = get_logger("memory")
+
+MEMORY_TRACKING = os.getenv("MEMORY_TRACKING", "0") == "1"
+# Largest parse tree one analysis may build, in MB (0 = no limit)
+ANALYSIS_MEMORY_LIMIT = int(float(os.getenv("ANALYSIS_MEMORY_LIMIT_MB", "256")) * 1024 * 1024)
+# Bytes of BeautifulSoup tree per character of markup with html.parser (measured on article pages)
+TREE_BYTES_PER_CHAR = 24
+# Largest page body downloaded for analysis, in MB (0 = no limit). Scripts and styles are stripped
+# before the parse budget applies, so this is looser than ANALYSIS_MEMORY_LIMIT_MB alone implies
+MAX_PAGE_BYTES = int(float(os.getenv("MAX_PAGE_MB", "32")) * 1024 * 1024)
+
+PEAK_BYTES = REGISTRY.histogram(
+    "tweetai_analysis_peak_bytes",
+    "Peak memory allocated while analyzing a page (with memory tracking on)",
+    ("stage",),
+    buckets=tuple(mb * 1024 * 1024 for mb in (1, 2, 4, 8, 16, 32, 64, 128, 256, 512)),
+)
+OVER_BUDGET = REGISTRY.counter(
+    "tweetai_analysis_over_memory_limit_total",
+    "Pages not analyzed because their parse tree would exceed ANALYSIS_MEMORY_LIMIT_MB",
+)
+
+
+class MemoryLimitExceeded(Exception):
+    pass
+
+
+def estimate_tree_bytes(markup):
+    return len(markup) * TREE_BYTES_PER_CHAR
+
+
+def check_budget(markup, limit=None):
+    """Raise MemoryLimitExceeded if parsing `markup` is expected to take more than `limit` bytes"""
+    limit = ANALYSIS_MEMORY_LIMIT if limit is None else limit
+    estimate = estimate_tree_bytes(markup)
+    if limit and estimate > limit:
+        OVER_BUDGET.inc()
+        raise MemoryLimitExceeded(
+            f"Page is too large to analyze (~{estimate // 2 ** 20} MB to parse, limit {limit // 2 ** 20} MB)"
+        )
+
+
+def _too_large(limit):
+    return MemoryLimitExceeded(f"Page is too large to analyze (over {limit // 2 ** 20} MB to download)")
+
+
+def read_capped(response, limit=None):
+    """
+    Read the body of a `requests` response opened with stream=True, raising
+    MemoryLimitExceeded as soon as it passes `limit` bytes (after any
+    Content-Encoding is undone, so a compressed page can't get around it)
+    """
+    limit = MAX_PAGE_BYTES if limit is None else limit
+    declared = response.headers.get("Content-Length", "")
+    if limit and declared.isdigit() and int(declared) > limit:
+        raise _too_large(limit)
+    chunks = []
+    size = 0
+    for chunk in response.iter_content(64 * 1024):
+        size += len(chunk)
+        if limit and size > limit:
+            raise _too_large(limit)
+        chunks.append(chunk)
+    return b"".join(chunks)
+
+
+_lock = threading.Lock()
+_active = 0  # tracked blocks in progress
+_started = False  # whether tracemalloc was started here (and so may be stopped here)
+
+
+def set_tracking(enabled):
+    """Turn peak tracking on or off at runtime; returns whether it's on"""
+    global _started
+    with _lock:
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            _started = True
+        elif not enabled and _started and tracemalloc.is_tracing():
+            tracemalloc.stop()
+            _started = False
+    log.info("memory_tracking", enabled=tracking_enabled())
+    return tracking_enabled()
+
+
+def tracking_enabled():
+    return tracemalloc.is_tracing()
+
+
+class PeakUsage:
+    __slots__ = ("baseline", "peak_bytes")
+
+    def __init__(self, baseline):
+        self.baseline = baseline
+        self.peak_bytes = None
+
+
+@contextmanager
+def track_peak(stage):
+    """
+    Measure the peak allocation of the block while tracking is on; yields a
+    PeakUsage whose `peak_bytes` is set (and recorded) when the block exits.
+    """
+    global _active
+    if not tracemalloc.is_tracing():
+        yield PeakUsage(None)
+        return
+    with _lock:
+        if not _active:
+            # Overlapping blocks share the window; the first one opens it
+            tracemalloc.reset_peak()
+        _active += 1
+        usage = PeakUsage(tracemalloc.get_traced_memory()[0])
+    try:
+        yield usage
+    finally:
+        with _lock:
+            _active -= 1
+            tracing = tracemalloc.is_tracing()
+            peak = tracemalloc.get_traced_memory()[1] if tracing else 0
+        if tracing:
+            usage.peak_bytes = max(peak - usage.baseline, 0)
+            PEAK_BYTES.observe(usage.peak_bytes, stage=stage)
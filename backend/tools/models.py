@@ -0,0 +1,184 @@
+"""
+Per-stage model routing for the generation chain.
+
+Each chain stage (summarize, review, reach) has a route: an ordered list of
+models to try. A stage runs on the first model and falls back to the next
+one when a call errors or exceeds the model's `timeout`. Routes come from
+DEFAULT_ROUTES, overridden per stage by the MODEL_ROUTES environment
+variable (JSON), e.g.
+
+    MODEL_ROUTES='{"review": ["openai:gpt-4o-mini@0.3", "openai:gpt-3.5-turbo@0.3"],
+                   "reach": [{"provider": "openai", "model": "gpt-4o-mini", "temperature": 0.5, "timeout": 8}]}'
+
+A model is "provider:model@temperature" or an object with those keys plus an
+optional `timeout` in seconds. Providers are "openai" and "local" (an
+extractive stand-in that needs no API key); tests can register more with
+`register_provider`. Every call is recorded per stage and model: latency,
+outcome, fallbacks and cost in USD from MODEL_PRICES.
+"""
+
+import json
+import os
+import threading
+
+from tools.lazy import lazy_import
+from tools.metrics import REGISTRY
+
+langchain_openai = lazy_import("langchain_openai")
+local_model = lazy_import("tools.local_model")
+
+# Review and reach are simpler edits than writing the tweet, so they default
+# to a cheaper model; each stage falls back to the other model
+DEFAULT_ROUTES = {
+    "summarize": [
+        {"provider": "openai", "model": "gpt-3.5-turbo", "temperature": 0.7, "timeout": 20},
+        {"provider": "openai", "model": "gpt-4o-mini", "temperature": 0.7},
+    ],
+    "review": [
+        {"provider": "openai", "model": "gpt-4o-mini", "temperature": 0.3, "timeout": 10},
+        {"provider": "openai", "model": "gpt-3.5-turbo", "temperature": 0.3},
+    ],
+    "reach": [
+        {"provider": "openai", "model": "gpt-4o-mini", "temperature": 0.5, "timeout": 10},
+        {"provider": "openai", "model": "gpt-3.5-turbo", "temperature": 0.5},
+    ],
+}
+
+# USD per million (prompt, completion) tokens; MODEL_PRICES (JSON) adds or overrides models
+DEFAULT_PRICES = {
+    "gpt-3.5-turbo": (0.50, 1.50),
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1-nano": (0.10, 0.40),
+}
+
+MODEL_CALLS = REGISTRY.counter(
+    "tweetai_model_calls_total",
+    "Model calls by chain stage, model and outcome",
+    ("stage", "model", "outcome"),
+)
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    "tweetai_model_call_duration_seconds",
+    "Latency of single model calls by chain stage and model",
+    ("stage", "model"),
+)
+MODEL_FALLBACKS = REGISTRY.counter(
+    "tweetai_model_fallbacks_total",
+    "Stage calls that failed on a model and moved on to the next one in the route",
+    ("stage", "model"),
+)
+MODEL_COST = REGISTRY.counter(
+    "tweetai_llm_cost_usd_total",
+    "Estimated model spend in USD by chain stage and model",
+    ("stage", "model"),
+)
+
+
+class Route:
+    """One model in a stage's route"""
+
+    def __init__(self, provider, model, temperature=0.7, timeout=None):
+        self.provider = provider
+        self.model = model
+        self.temperature = temperature
+        self.timeout = timeout
+
+    @property
+    def name(self):
+        return f"{self.provider}:{self.model}"
+
+    @classmethod
+    def parse(cls, spec):
+        """A Route from "provider:model@temperature" or a dict with those keys"""
+        if isinstance(spec, dict):
+            return cls(spec["provider"], spec.get("model", ""), float(spec.get("temperature", 0.7)),
+                       spec.get("timeout"))
+        spec, _, temperature = spec.partition("@")
+        provider, _, model = spec.partition(":")
+        return cls(provider, model, float(temperature) if temperature else 0.7)
+
+    def __repr__(self):
+        return f"Route({self.name}@{self.temperature})"
+
+
+def _openai(route):
+    return langchain_openai.ChatOpenAI(
+        model=route.model,
+        api_key=os.getenv("OPENAI_API_KEY"),
+        temperature=route.temperature,
+    )
+
+
+def _local(route):
+    return local_model.LocalChatModel(model_name=route.model or "extractive")
+
+
+PROVIDERS = {"openai": _openai, "local": _local}
+
+
+def register_provider(name, factory):
+    """Make `factory(route) -> chat model` available as provider `name`"""
+    PROVIDERS[name] = factory
+
+
+def _load_json(name):
+    value = os.getenv(name)
+    return json.loads(value) if value else {}
+
+
+class ModelRouter:
+    def __init__(self, routes=None, prices=None):
+        routes = {**DEFAULT_ROUTES, **(routes or {})}
+        self.routes = {stage: [Route.parse(spec) for spec in specs] for stage, specs in routes.items()}
+        self.prices = {**DEFAULT_PRICES, **{model: tuple(p) for model, p in (prices or {}).items()}}
+        self._models = {}
+        self._lock = threading.Lock()
+
+    def candidates(self, stage):
+        """[(route, chat model)] to try in order for `stage`"""
+        return [(route, self.model(route)) for route in self.routes[stage]]
+
+    def model(self, route):
+        """The chat model for `route`; instances are shared so their HTTP connections are reused"""
+        key = (route.provider, route.model, route.temperature)
+        with self._lock:
+            model = self._models.get(key)
+            if model is None:
+                if route.provider not in PROVIDERS:
+                    raise ValueError(f"Unknown model provider: {route.provider}")
+                model = self._models[key] = PROVIDERS[route.provider](route)
+        return model
+
+    def cost(self, route, prompt_tokens, completion_tokens):
+        prompt_price, completion_price = self.prices.get(route.model, (0.0, 0.0))
+        return (prompt_tokens * prompt_price + completion_tokens * completion_price) / 1_000_000
+
+
+def record_model_call(stage, route, seconds, outcome, cost=0.0):
+    MODEL_CALLS.inc(stage=stage, model=route.name, outcome=outcome)
+    MODEL_CALL_SECONDS.observe(seconds, stage=stage, model=route.name)
+    if cost:
+        MODEL_COST.inc(cost, stage=stage, model=route.name)
+
+
+_router = None
+_router_lock = threading.Lock()
+
+
+def get_router():
+    """Process-wide router built from DEFAULT_ROUTES and the MODEL_ROUTES/MODEL_PRICES environment"""
+    global _router
+    if _router is None:
+        with _router_lock:
+            if _router is None:
+                _router = ModelRouter(_load_json("MODEL_ROUTES"), _load_json("MODEL_PRICES"))
+    return _router
+
+
+def set_router(router):
+    """Replace the process-wide router (tests route stages to stub models); returns the previous one"""
+    global _router
+    with _router_lock:
+        previous, _router = _router, router
+    return previous
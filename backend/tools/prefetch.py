@@ -0,0 +1,142 @@
+"""
+Background pre-generation for trending articles.
+
+The articles listed by /api/tech-articles are the ones users click
+"generate" on. The prefetch worker periodically takes the current trending
+set from each source, analyzes every article into the shared analysis cache
+and, within a daily LLM token budget, generates a draft tweet for it. A
+click on a listed article then only pays for cache lookups.
+
+With several workers sharing a state backend, only one of them runs each
+prefetch cycle.
+"""
+
+import os
+import threading
+import time
+
+from tools.articles import ARTICLE_SOURCES, fetch_tech_articles
+from tools.log import get_logger
+from tools.metrics import REGISTRY, track_tokens
+from tools.state import get_state_backend
+from tools import url_analyser
+
+log = get_logger("prefetch")
+
+PREFETCH_ENABLED = os.getenv("PREFETCH_ENABLED", "0") == "1"
+PREFETCH_INTERVAL = int(os.getenv("PREFETCH_INTERVAL", "900"))
+# Set PREFETCH_GENERATE=0 to only warm the analysis cache (no LLM spend)
+PREFETCH_GENERATE = os.getenv("PREFETCH_GENERATE", "1") == "1"
+# Prompt + completion tokens the worker may spend per UTC day, across all workers
+PREFETCH_TOKEN_BUDGET = int(os.getenv("PREFETCH_TOKEN_BUDGET", "200000"))
+PREFETCH_SOURCES = tuple(
+    s.strip() for s in os.getenv("PREFETCH_SOURCES", ",".join(ARTICLE_SOURCES)).split(",") if s.strip()
+)
+
+PREFETCHED = REGISTRY.counter(
+    "tweetai_prefetch_articles_total",
+    "Trending articles handled by the prefetch worker, by result",
+    ("result",),
+)
+PREFETCH_TOKENS = REGISTRY.counter(
+    "tweetai_prefetch_llm_tokens_total",
+    "LLM tokens spent generating prefetched drafts",
+)
+
+
+def _budget_key():
+    return "prefetch:tokens:" + time.strftime("%Y-%m-%d", time.gmtime())
+
+
+class PrefetchWorker:
+    def __init__(self, sources=PREFETCH_SOURCES, interval=PREFETCH_INTERVAL, generate=PREFETCH_GENERATE,
+                 token_budget=PREFETCH_TOKEN_BUDGET, fetch_articles=fetch_tech_articles):
+        self.sources = sources
+        self.interval = interval
+        self.generate = generate
+        self.token_budget = token_budget
+        self.fetch_articles = fetch_articles
+        self._stop = threading.Event()
+        self._thread = None
+
+    def tokens_spent(self):
+        return get_state_backend().get(_budget_key(), 0)
+
+    def _prefetch_article(self, url, stats):
+        state = get_state_backend()
+        if self.generate and state.get(url_analyser.draft_key(url)) is not None:
+            stats["fresh"] += 1
+            return
+
+        analysis = url_analyser.analyze_url_shared(url)
+        if not analysis.get("success"):
+            stats["errors"] += 1
+            PREFETCHED.inc(result="error")
+            return
+        stats["analyzed"] += 1
+        PREFETCHED.inc(result="analyzed")
+        if not self.generate:
+            return
+
+        if self.tokens_spent() >= self.token_budget:
+            stats["over_budget"] += 1
+            PREFETCHED.inc(result="over_budget")
+            return
+
+        with track_tokens() as usage:
+            result = url_analyser.tweet_from_url(url)
+        spent = usage["prompt"] + usage["completion"]
+        if spent:
+            state.incr(_budget_key(), spent, ttl=2 * 24 * 3600)
+            PREFETCH_TOKENS.inc(spent)
+        if not result or not result.get("tweet"):
+            stats["errors"] += 1
+            PREFETCHED.inc(result="error")
+            return
+
+        # Key the draft by the URL the listing shows as well as the page's canonical URL
+        url_analyser.store_draft(url, result["tweet"])
+        if result.get("canonical_url"):
+            url_analyser.store_draft(result["canonical_url"], result["tweet"])
+        stats["generated"] += 1
+        PREFETCHED.inc(result="generated")
+
+    def run_once(self):
+        """Prefetch the current trending set once; returns per-cycle counts"""
+        stats = {"articles": 0, "analyzed": 0, "generated": 0, "fresh": 0, "over_budget": 0, "errors": 0}
+        seen = set()
+        for source in self.sources:
+            listing = self.fetch_articles(source)
+            for article in listing.get("articles", []):
+                url = article.get("url")
+                if not url or url in seen:
+                    continue
+                seen.add(url)
+                stats["articles"] += 1
+                try:
+                    self._prefetch_article(url, stats)
+                except Exception as e:
+                    stats["errors"] += 1
+                    PREFETCHED.inc(result="error")
+                    log.warning("prefetch_article_failed", url=url, error=str(e))
+        log.info("prefetch_cycle", tokens_spent=self.tokens_spent(), **stats)
+        return stats
+
+    def _run(self):
+        while not self._stop.is_set():
+            # One worker per interval does the cycle; the others skip it
+            if get_state_backend().add("prefetch:leader", os.getpid(), ttl=self.interval):
+                try:
+                    self.run_once()
+                except Exception as e:
+                    log.error("prefetch_cycle_failed", error=str(e))
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="prefetch", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
@@ -0,0 +1,134 @@
+"""
+Opt-in sampling profiler for individual requests.
+
+A background thread samples the stack of the thread handling the request
+every few milliseconds and aggregates the samples into collapsed-stack
+format (`frame;frame;frame count`), which flamegraph.pl, speedscope and
+inferno all read directly.
+"""
+
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+
+PROFILE_DIR = os.environ.get("PROFILE_DIR", os.path.join(os.path.dirname(os.path.dirname(__file__)), "profiles"))
+DEFAULT_INTERVAL = float(os.environ.get("PROFILE_INTERVAL", "0.002"))
+# Only the newest PROFILE_KEEP artifacts are kept (0 keeps everything)
+PROFILE_KEEP = int(os.environ.get("PROFILE_KEEP", "100"))
+
+
+def _frame_label(frame):
+    code = frame.f_code
+    filename = os.path.basename(code.co_filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})".replace(";", ":")
+
+
+class SamplingProfiler:
+    """Samples one thread's call stack until stopped"""
+
+    def __init__(self, thread_id=None, interval=DEFAULT_INTERVAL):
+        self.thread_id = thread_id or threading.get_ident()
+        self.interval = interval
+        self.samples = Counter()
+        self.sample_count = 0
+        self.duration = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                stack.append(_frame_label(frame))
+                frame = frame.f_back
+            stack.reverse()
+            self.samples[";".join(stack)] += 1
+            self.sample_count += 1
+
+    def start(self):
+        self._started = time.perf_counter()
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self._started
+        return self
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def collapsed(self):
+        """Render samples as collapsed stacks, heaviest first"""
+        return "\n".join(f"{stack} {count}" for stack, count in self.samples.most_common()) + "\n"
+
+
+def save_profile(profiler, directory=None, keep=None):
+    """Persist a collapsed-stack artifact and return its id, pruning all but the newest `keep`"""
+    directory = directory or PROFILE_DIR
+    profile_id = uuid.uuid4().hex
+    os.makedirs(directory, exist_ok=True)
+    with open(os.path.join(directory, f"{profile_id}.collapsed"), "w", encoding="utf-8") as f:
+        f.write(profiler.collapsed())
+    prune_profiles(directory, PROFILE_KEEP if keep is None else keep)
+    return profile_id
+
+
+def prune_profiles(directory, keep):
+    """Delete all but the `keep` most recently written artifacts in `directory`"""
+    if not keep:
+        return 0
+    paths = []
+    for entry in os.scandir(directory):
+        if entry.name.endswith(".collapsed"):
+            try:
+                paths.append((entry.stat().st_mtime, entry.path))
+            except FileNotFoundError:
+                pass  # pruned by another request
+    removed = 0
+    for _, path in sorted(paths, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+            removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def load_profile(profile_id, directory=None):
+    """Return a stored collapsed-stack artifact, or None if it doesn't exist"""
+    directory = directory or PROFILE_DIR
+    # Ids are uuid4 hex; reject anything else so the id can't escape the directory
+    if len(profile_id) != 32 or not all(c in "0123456789abcdef" for c in profile_id):
+        return None
+    path = os.path.join(directory, f"{profile_id}.collapsed")
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding="utf-8") as f:
+        return f.read()
+
+
+def profile_call(fn, *args, **kwargs):
+    """Run `fn` under the sampling profiler; returns (result, profile summary)"""
+    with SamplingProfiler() as profiler:
+        result = fn(*args, **kwargs)
+    profile_id = save_profile(profiler)
+    summary = {
+        "id": profile_id,
+        "format": "collapsed",
+        "duration_ms": round(profiler.duration * 1000, 1),
+        "samples": profiler.sample_count,
+        "interval_ms": profiler.interval * 1000,
+        "collapsed": profiler.collapsed(),
+    }
+    return result, summary
@@ -0,0 +1,78 @@
+"""
+Cheap local ranking of alternative tweets.
+
+Each candidate is scored on three signals in [0, 1] -- how well its length
+fits a single tweet, whether it carries a sensible number of hashtags, and
+Flesch reading ease -- and the weighted sum orders the candidates.
+"""
+
+import math
+import re
+
+TWEET_LENGTH = 280
+WEIGHTS = {"length_fit": 0.4, "hashtags": 0.25, "readability": 0.35}
+
+_HASHTAG = re.compile(r"#\w+")
+_URL = re.compile(r"https?://\S+")
+_WORD = re.compile(r"[A-Za-z]+")
+_SENTENCE_END = re.compile(r"[.!?]+")
+_VOWEL_GROUPS = re.compile(r"[aeiouy]+")
+
+
+def _syllables(word):
+    word = word.lower()
+    count = len(_VOWEL_GROUPS.findall(word))
+    if word.endswith("e") and not word.endswith("le") and count > 1:
+        count -= 1
+    return max(1, count)
+
+
+def length_fit(text):
+    """1.0 between 70% and 100% of a tweet, decaying outside that window"""
+    length = len(text)
+    if length <= TWEET_LENGTH:
+        return min(1.0, length / (0.7 * TWEET_LENGTH))
+    # Longer text becomes a thread; each extra tweet costs engagement
+    return math.exp(-(length - TWEET_LENGTH) / TWEET_LENGTH)
+
+
+def hashtag_fit(text):
+    """Best with 1-3 hashtags; none is acceptable, more than 3 reads as spam"""
+    count = len(_HASHTAG.findall(text))
+    if 1 <= count <= 3:
+        return 1.0
+    if count == 0:
+        return 0.6
+    return max(0.0, 1.0 - 0.25 * (count - 3))
+
+
+def readability(text):
+    """Flesch reading ease mapped from [0, 100] onto [0, 1]"""
+    body = _URL.sub("", _HASHTAG.sub("", text))
+    words = _WORD.findall(body)
+    if not words:
+        return 0.0
+    sentences = max(1, len([s for s in _SENTENCE_END.split(body) if s.strip()]))
+    syllables = sum(_syllables(w) for w in words)
+    ease = 206.835 - 1.015 * (len(words) / sentences) - 84.6 * (syllables / len(words))
+    return min(1.0, max(0.0, ease / 100))
+
+
+def score_tweet(text):
+    signals = {
+        "length_fit": round(length_fit(text), 3),
+        "hashtags": round(hashtag_fit(text), 3),
+        "readability": round(readability(text), 3),
+    }
+    score = sum(WEIGHTS[name] * value for name, value in signals.items())
+    return round(score, 3), signals
+
+
+def rank_tweets(tweets):
+    """Return [{"tweet", "score", "signals"}] ordered best first"""
+    ranked = []
+    for tweet in tweets:
+        score, signals = score_tweet(tweet)
+        ranked.append({"tweet": tweet, "score": score, "signals": signals})
+    ranked.sort(key=lambda r: r["score"], reverse=True)
+    return ranked
@@ -0,0 +1,136 @@
+"""
+Response shaping for /api/url-analysis.
+
+The analysis dict is validated into typed models and serialized straight to
+JSON bytes by Pydantic's Rust core, skipping FastAPI's recursive
+`jsonable_encoder` pass. Callers that only need the tweet can ask for a
+subset of the top-level fields with `?fields=tweet,thread_tweets` or the
+`compact` preset, which also drops the image lists and sample paragraphs
+from the payload.
+"""
+
+import json
+
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class ParagraphStats(BaseModel):
+    count: int = 0
+    avg_sentences: float = 0
+    avg_words: float = 0
+
+
+class Structure(BaseModel):
+    sections: int = 0
+    lists: int = 0
+
+
+class ContentStats(BaseModel):
+    avg_word_length: float = 0
+
+
+class Compression(BaseModel):
+    tokens: int
+    token_budget: int
+    sentences_total: int
+    sentences_selected: int
+
+
+class CacheInfo(BaseModel):
+    hit: bool
+    kind: str
+    similarity: float | None = None
+
+
+class TweetVariant(BaseModel):
+    tweet: str
+    score: float
+    signals: dict[str, float] = {}
+    thread_tweets: list[str] = []
+    is_thread: bool = False
+
+
+class UrlAnalysisResponse(BaseModel):
+    """
+    A generated tweet plus the page analysis behind it. Fields the pipeline
+    didn't produce (variants, compression, cache, ...) stay out of the JSON.
+    """
+
+    success: bool
+    tweet: str | None = None
+    thread_tweets: list[str] | None = None
+    is_thread: bool | None = None
+    variants: list[TweetVariant] | None = None
+    title: str | None = None
+    canonical_url: str | None = None
+    author: str | None = None
+    pub_date: str | None = None
+    description: str | None = None
+    main_image: str | None = None
+    all_images: list[str] | None = None
+    paragraph_stats: ParagraphStats | None = None
+    structure: Structure | None = None
+    content_stats: ContentStats | None = None
+    tone_indicators: list[str] | None = None
+    sample_paragraphs: list[str] | None = None
+    compression: Compression | None = None
+    cache: CacheInfo | None = None
+    stages: dict[str, str] | None = None
+    profile: dict | None = None
+    error: str | None = None
+
+
+RESPONSE_FIELDS = frozenset(UrlAnalysisResponse.model_fields)
+FIELD_PRESETS = {
+    "full": None,
+    "compact": frozenset({"success", "tweet", "thread_tweets", "is_thread", "stages", "error"}),
+}
+
+
+def parse_fields(fields):
+    """
+    Turn a `fields=` value into the set of top-level fields to return (None
+    for all of them). Raises ValueError naming any unknown field.
+    """
+    if not fields:
+        return None
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    if len(names) == 1 and names[0] in FIELD_PRESETS:
+        return FIELD_PRESETS[names[0]]
+    unknown = sorted(set(names) - RESPONSE_FIELDS)
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    # `success` always comes back so callers can tell a failure from a projection
+    return frozenset(names) | {"success"}
+
+
+class FastJSONResponse(JSONResponse):
+    """
+    JSON response that renders Pydantic models with `model_dump_json` and
+    anything else with orjson when installed (compact json.dumps otherwise).
+    `include` limits a model to those top-level fields.
+    """
+
+    def __init__(self, content, include=None, **kwargs):
+        self.include = include
+        super().__init__(content, **kwargs)
+
+    def render(self, content):
+        if isinstance(content, BaseModel):
+            return content.model_dump_json(include=self.include, exclude_unset=True).encode()
+        if orjson is not None:
+            return orjson.dumps(content)
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def analysis_response(result, fields=None):
+    """Response for a tweet_from_url result; a failed analysis (None) stays a JSON null"""
+    if result is None:
+        return FastJSONResponse(None)
+    return FastJSONResponse(UrlAnalysisResponse.model_validate(result), include=fields)
@@ -0,0 +1,426 @@
+"""
+Scheduled posting: threads queued for publication at a chosen time.
+
+Schedules are stored in SQLite (`ScheduleStore`), one row per post with the
+token of the account it posts as, so any number of connected accounts can
+have posts pending. Access tokens expire after about two hours, so each
+account's offline.access refresh token is kept alongside (one row per
+account: Twitter rotates refresh tokens on every use) and a fresh access
+token is obtained when a post fires; without a refresh token a post can
+only be scheduled within the lifetime of the current access token.
+
+The `Scheduler` doesn't poll the table. It keeps the schedules due within
+the next SCHEDULE_WINDOW seconds in an in-memory min-heap, sleeps until the
+earliest one is due and loads the next window with one indexed range read
+when the current one runs out. Adding a schedule is a row insert plus an
+O(log n) heap push when it falls inside the window. A post scheduled through
+another process that isn't running a scheduler is picked up by the next
+window load, so SCHEDULE_WINDOW also bounds how late it can fire.
+
+Due posts are claimed in the store (so a schedule cancelled meanwhile, or
+fired by another process, is skipped) and handed to a bounded worker pool
+that queues them for the background publisher (tools.twitter). After a
+restart, schedules that were claimed but never handed over go back to
+pending, and everything overdue fires in the first window.
+"""
+
+import heapq
+import json
+import math
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from tools import twitter
+from tools.log import get_logger
+from tools.metrics import REGISTRY
+
+log = get_logger("scheduler")
+
+DEFAULT_SCHEDULE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".state", "schedule.db")
+SCHEDULE_DB_PATH = os.environ.get("SCHEDULE_DB_PATH", DEFAULT_SCHEDULE_PATH)
+SCHEDULER_ENABLED = os.environ.get("SCHEDULER_ENABLED", "1") == "1"
+# Schedules due within this many seconds are held in memory
+SCHEDULE_WINDOW = int(os.environ.get("SCHEDULE_WINDOW", "300"))
+SCHEDULER_WORKERS = int(os.environ.get("SCHEDULER_WORKERS", "4"))
+# How far ahead posts can be scheduled (days)
+MAX_SCHEDULE_DAYS = int(os.environ.get("MAX_SCHEDULE_DAYS", "365"))
+# Access tokens this close to expiry (seconds) are refreshed before a post fires
+TOKEN_REFRESH_MARGIN = int(os.environ.get("TOKEN_REFRESH_MARGIN", "300"))
+# How long one worker may hold an account's token refresh before another takes over (seconds)
+TOKEN_REFRESH_LEASE = 60
+
+SCHEDULED_POSTS = REGISTRY.counter(
+    "tweetai_scheduled_posts_total",
+    "Scheduled posts by what happened to them",
+    ("event",),
+)
+SCHEDULE_LAG = REGISTRY.histogram(
+    "tweetai_schedule_lag_seconds",
+    "How late scheduled posts were handed to the publisher",
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 5, 30, 60, 300, math.inf),
+)
+SCHEDULE_HEAP_SIZE = REGISTRY.gauge(
+    "tweetai_schedule_heap_size",
+    "Scheduled posts held in memory, due within the current window",
+)
+
+COLUMNS = ("id", "due", "status", "tweet_count", "publish_id", "error", "created", "updated")
+
+
+class ScheduleStore:
+    def __init__(self, path=SCHEDULE_DB_PATH):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS scheduled_posts (
+                id TEXT PRIMARY KEY,
+                owner TEXT NOT NULL,
+                authorization TEXT,
+                tweets TEXT NOT NULL,
+                tweet_count INTEGER NOT NULL,
+                due REAL NOT NULL,
+                status TEXT NOT NULL,
+                publish_id TEXT,
+                error TEXT,
+                created REAL NOT NULL,
+                updated REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS scheduled_posts_pending ON scheduled_posts (due) WHERE status = 'pending';
+            CREATE INDEX IF NOT EXISTS scheduled_posts_owner ON scheduled_posts (owner, due);
+            CREATE TABLE IF NOT EXISTS account_tokens (
+                owner TEXT PRIMARY KEY,
+                authorization TEXT NOT NULL,
+                refresh_token TEXT NOT NULL,
+                expires REAL NOT NULL,
+                refreshing_until REAL
+            );
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(account_tokens)")}
+        if "refreshing_until" not in columns:
+            # Databases created before refreshes were leased
+            conn.execute("ALTER TABLE account_tokens ADD COLUMN refreshing_until REAL")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def add(self, tweets, authorization, due, refresh_token=None, expires=None):
+        now = time.time()
+        schedule_id = uuid.uuid4().hex
+        owner = twitter.owner_key(authorization)
+        if refresh_token:
+            self.save_token(owner, authorization, refresh_token, expires or now)
+        self._conn().execute(
+            "INSERT INTO scheduled_posts (id, owner, authorization, tweets, tweet_count, due, status, created, "
+            "updated) VALUES (?, ?, ?, ?, ?, ?, 'pending', ?, ?)",
+            (schedule_id, owner, authorization, json.dumps(tweets), len(tweets), due, now, now),
+        )
+        return {"id": schedule_id, "due": due, "status": "pending", "tweet_count": len(tweets),
+                "publish_id": None, "error": None, "created": now, "updated": now}
+
+    def pending(self, before):
+        """[(due, id)] of pending schedules due before `before`, read from the partial index"""
+        return self._conn().execute(
+            "SELECT due, id FROM scheduled_posts WHERE status = 'pending' AND due < ?", (before,)
+        ).fetchall()
+
+    def save_token(self, owner, authorization, refresh_token, expires):
+        """Keep the account's refresh token, unless the stored one was issued later"""
+        self._conn().execute(
+            "INSERT INTO account_tokens (owner, authorization, refresh_token, expires) VALUES (?, ?, ?, ?) "
+            "ON CONFLICT (owner) DO UPDATE SET authorization = excluded.authorization, "
+            "refresh_token = excluded.refresh_token, expires = excluded.expires "
+            "WHERE excluded.expires > account_tokens.expires",
+            (owner, authorization, refresh_token, expires),
+        )
+
+    def authorization(self, owner, poll_interval=0.2):
+        """
+        A usable Authorization value for the account, refreshing its access
+        token if it's about to expire; None if the account kept no refresh
+        token. Refresh tokens are single-use, so one worker at a time takes a
+        short lease on the account's row and refreshes outside any
+        transaction; the others wait for the new token to appear.
+        """
+        conn = self._conn()
+        while True:
+            row = conn.execute(
+                "SELECT authorization, refresh_token, expires FROM account_tokens WHERE owner = ?", (owner,)
+            ).fetchone()
+            if row is None:
+                return None
+            authorization, refresh_token, expires = row
+            now = time.time()
+            if expires - TOKEN_REFRESH_MARGIN > now:
+                return authorization
+            leased = conn.execute(
+                "UPDATE account_tokens SET refreshing_until = ? WHERE owner = ? AND refresh_token = ? "
+                "AND (refreshing_until IS NULL OR refreshing_until < ?)",
+                (now + TOKEN_REFRESH_LEASE, owner, refresh_token, now),
+            ).rowcount
+            if leased:
+                break
+            time.sleep(poll_interval)
+
+        try:
+            authorization, new_refresh_token, expires = twitter.refresh_access_token(refresh_token)
+        except BaseException:
+            conn.execute(
+                "UPDATE account_tokens SET refreshing_until = NULL WHERE owner = ? AND refresh_token = ?",
+                (owner, refresh_token),
+            )
+            raise
+        # Only replaces the token that was spent, so a newer one saved meanwhile (a fresh sign-in) stays
+        conn.execute(
+            "UPDATE account_tokens SET authorization = ?, refresh_token = ?, expires = ?, refreshing_until = NULL "
+            "WHERE owner = ? AND refresh_token = ?",
+            (authorization, new_refresh_token, expires, owner, refresh_token),
+        )
+        return authorization
+
+    def claim(self, schedule_id):
+        """Move a pending schedule to `firing`; returns (tweets, authorization, owner), or None if it isn't pending"""
+        row = self._conn().execute(
+            "UPDATE scheduled_posts SET status = 'firing', updated = ? WHERE id = ? AND status = 'pending' "
+            "RETURNING tweets, authorization, owner",
+            (time.time(), schedule_id),
+        ).fetchone()
+        return None if row is None else (json.loads(row[0]), row[1], row[2])
+
+    def _forget_token(self, owner):
+        # The refresh token is kept only while the account has posts waiting
+        self._conn().execute(
+            "DELETE FROM account_tokens WHERE owner = ? AND NOT EXISTS (SELECT 1 FROM scheduled_posts "
+            "WHERE owner = ? AND status IN ('pending', 'firing'))",
+            (owner, owner),
+        )
+
+    def finish(self, schedule_id, status, publish_id=None, error=None):
+        # Posts are done with the token once they are handed over
+        row = self._conn().execute(
+            "UPDATE scheduled_posts SET status = ?, publish_id = ?, error = ?, authorization = NULL, updated = ? "
+            "WHERE id = ? RETURNING owner",
+            (status, publish_id, error, time.time(), schedule_id),
+        ).fetchone()
+        if row is not None:
+            self._forget_token(row[0])
+
+    def cancel(self, schedule_id, authorization):
+        """Cancel a pending schedule owned by `authorization`'s account; returns True if it was cancelled"""
+        owner = twitter.owner_key(authorization)
+        cursor = self._conn().execute(
+            "UPDATE scheduled_posts SET status = 'cancelled', authorization = NULL, updated = ? "
+            "WHERE id = ? AND owner = ? AND status = 'pending'",
+            (time.time(), schedule_id, owner),
+        )
+        if cursor.rowcount != 1:
+            return False
+        self._forget_token(owner)
+        return True
+
+    def recover(self, stale_after=60):
+        """
+        Return schedules claimed by a process that died before handing them
+        over to pending. A handover takes milliseconds, so anything claimed
+        `stale_after` seconds ago is stale.
+        """
+        now = time.time()
+        return self._conn().execute(
+            "UPDATE scheduled_posts SET status = 'pending', updated = ? WHERE status = 'firing' AND updated < ?",
+            (now, now - stale_after),
+        ).rowcount
+
+    def _rows(self, sql, params):
+        return [dict(zip(COLUMNS, row)) for row in self._conn().execute(sql, params).fetchall()]
+
+    def get(self, schedule_id, authorization):
+        rows = self._rows(
+            "SELECT id, due, status, tweet_count, publish_id, error, created, updated FROM scheduled_posts "
+            "WHERE id = ? AND owner = ?",
+            (schedule_id, twitter.owner_key(authorization)),
+        )
+        return rows[0] if rows else None
+
+    def list(self, authorization, limit=50):
+        """The account's schedules, soonest first"""
+        return self._rows(
+            "SELECT id, due, status, tweet_count, publish_id, error, created, updated FROM scheduled_posts "
+            "WHERE owner = ? ORDER BY due LIMIT ?",
+            (twitter.owner_key(authorization), limit),
+        )
+
+
+def parse_due(value):
+    """Epoch seconds or an ISO 8601 time (UTC unless it carries an offset)"""
+    try:
+        due = float(value)
+    except ValueError:
+        pass
+    else:
+        if not math.isfinite(due):
+            raise ValueError("Scheduled time must be a finite number")
+        return due
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+
+def _publish(tweets, authorization):
+    return twitter.submit(tweets, authorization)["publish_id"]
+
+
+class Scheduler:
+    def __init__(self, store=None, publish=_publish, workers=SCHEDULER_WORKERS, window=SCHEDULE_WINDOW):
+        self.store = store or get_schedule_store()
+        self.publish = publish
+        self.window = window
+        self._heap = []
+        self._queued = set()
+        # Every pending schedule due before the horizon is in the heap
+        self._horizon = -math.inf
+        self._cond = threading.Condition()
+        self._pool = ThreadPoolExecutor(workers, thread_name_prefix="schedule")
+        # Bounds the posts waiting for a worker, so a burst of due schedules stays in the heap
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._stopping = False
+        self._thread = None
+
+    def schedule(self, tweets, authorization, due, refresh_token=None, expires=None):
+        """
+        Store a post for `due` (epoch seconds) as the account whose access
+        token is `authorization`, expiring at `expires`; returns the schedule
+        """
+        twitter.validate_thread(tweets)
+        now = time.time()
+        if due < now - 60:
+            raise ValueError("Scheduled time is in the past")
+        if due > now + MAX_SCHEDULE_DAYS * 86400:
+            raise ValueError(f"Posts can be scheduled at most {MAX_SCHEDULE_DAYS} days ahead")
+        if not refresh_token and due > (expires or now) - TOKEN_REFRESH_MARGIN:
+            raise ValueError("Your Twitter session expires before then; sign in again to schedule posts further ahead")
+        # Inserting under the lock keeps a window load from missing the new row
+        with self._cond:
+            entry = self.store.add(list(tweets), authorization, due, refresh_token, expires)
+            if due < self._horizon:
+                self._push((due, entry["id"]))
+                if self._heap[0][1] == entry["id"]:
+                    self._cond.notify()
+        SCHEDULED_POSTS.inc(event="scheduled")
+        return entry
+
+    def _push(self, entry):
+        if entry[1] not in self._queued:
+            self._queued.add(entry[1])
+            heapq.heappush(self._heap, entry)
+            SCHEDULE_HEAP_SIZE.set(len(self._heap))
+
+    def _load_window(self, now):
+        """Move the horizon one window ahead and push every pending schedule due before it"""
+        self._horizon = now + self.window
+        for entry in self.store.pending(self._horizon):
+            self._push(entry)
+
+    def _next_due(self):
+        """Pop the next due schedule, waiting until one is; None once stopped"""
+        with self._cond:
+            while not self._stopping:
+                now = time.time()
+                if now >= self._horizon:
+                    self._load_window(now)
+                if self._heap and self._heap[0][0] <= now:
+                    entry = heapq.heappop(self._heap)
+                    self._queued.discard(entry[1])
+                    SCHEDULE_HEAP_SIZE.set(len(self._heap))
+                    return entry
+                wake = min(self._heap[0][0] if self._heap else math.inf, self._horizon)
+                self._cond.wait(wake - now)
+        return None
+
+    def _fire(self, due, schedule_id):
+        try:
+            claimed = self.store.claim(schedule_id)
+            if claimed is None:
+                return  # cancelled, or fired by another process
+            SCHEDULE_LAG.observe(max(time.time() - due, 0))
+            tweets, authorization, owner = claimed
+            try:
+                authorization = self.store.authorization(owner) or authorization
+                publish_id = self.publish(tweets, authorization)
+            except Exception as e:
+                log.warning("scheduled_post_failed", schedule_id=schedule_id, error=str(e))
+                self.store.finish(schedule_id, "failed", error=str(e))
+                SCHEDULED_POSTS.inc(event="failed")
+                return
+            self.store.finish(schedule_id, "submitted", publish_id=publish_id)
+            SCHEDULED_POSTS.inc(event="submitted")
+        finally:
+            self._slots.release()
+
+    def run(self):
+        """Fire due schedules until `stop()`"""
+        while True:
+            self._slots.acquire()
+            entry = self._next_due()
+            if entry is None:
+                self._slots.release()
+                return
+            self._pool.submit(self._fire, *entry)
+
+    def start(self):
+        recovered = self.store.recover()
+        if recovered:
+            log.info("schedules_recovered", count=recovered)
+        self._thread = threading.Thread(target=self.run, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=5):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self._pool.shutdown(wait=True)
+
+
+_store = None
+_store_lock = threading.Lock()
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_schedule_store():
+    """Process-wide store at SCHEDULE_DB_PATH"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = ScheduleStore(SCHEDULE_DB_PATH)
+    return _store
+
+
+def get_scheduler():
+    """Process-wide scheduler; `start()` it to fire schedules from this process"""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = Scheduler(get_schedule_store())
+    return _scheduler
@@ -0,0 +1,180 @@
+"""
+Semantic near-duplicate cache for tweet generations.
+
+Exact-key caching misses most repeats: the same article behind tracking
+parameters or an AMP URL, or instructions that differ only in case and
+whitespace. Entries here are keyed three ways:
+
+1. canonical URL + normalized instructions (exact, no embedding needed)
+2. the prompt content, embedded with a hashing vectorizer into a row of a
+   NumPy matrix and matched by cosine similarity above a threshold
+3. normalized instructions, which must match exactly for a semantic hit
+
+The matrix is a fixed-capacity ring buffer, so memory is bounded at
+`capacity * dim * 4` bytes and the oldest entries are overwritten first.
+"""
+
+import os
+import re
+import threading
+import time
+import zlib
+
+from tools.compressor import STOPWORDS
+from tools.lazy import lazy_import
+from tools.metrics import REGISTRY
+from tools.urls import canonicalize_url, normalize_text
+
+np = lazy_import("numpy")
+
+SEMANTIC_CACHE_ENABLED = os.getenv("SEMANTIC_CACHE", "1") == "1"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+SEMANTIC_CACHE_CAPACITY = int(os.getenv("SEMANTIC_CACHE_CAPACITY", "20000"))
+SEMANTIC_CACHE_TTL = float(os.getenv("SEMANTIC_CACHE_TTL", str(24 * 3600)))
+EMBEDDING_DIM = 256
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "tweetai_generation_cache_lookups_total",
+    "Generation cache lookups by result (exact, semantic or miss)",
+    ("result",),
+)
+CACHE_LOOKUP_SECONDS = REGISTRY.histogram(
+    "tweetai_generation_cache_lookup_seconds",
+    "Generation cache lookup latency",
+    buckets=(0.0001, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1),
+)
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+def _hash(token):
+    return zlib.crc32(token.encode("utf-8"))
+
+
+def embed(text, dim=EMBEDDING_DIM):
+    """
+    Hashing-vectorizer embedding: content unigrams and bigrams are hashed
+    into `dim` buckets with a sign bit to cancel collisions, counts are
+    dampened (sublinear TF) so frequent terms don't dominate, and the
+    result is L2-normalized.
+    """
+    words = [w for w in _WORD.findall(text.lower()) if w not in STOPWORDS]
+    tokens = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    if not tokens:
+        return np.zeros(dim, dtype=np.float32)
+    hashes = np.fromiter((_hash(t) for t in tokens), dtype=np.uint32, count=len(tokens))
+    signs = np.where(hashes & 0x80000000, -1.0, 1.0)
+    vector = np.bincount(hashes % dim, weights=signs, minlength=dim).astype(np.float32)
+    vector = np.sign(vector) * np.log1p(np.abs(vector))
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+def instruction_key(additional_text):
+    """Instructions that differ only in case or whitespace share a key"""
+    return zlib.crc32(normalize_text(additional_text).lower().encode("utf-8"))
+
+
+class SemanticCache:
+    def __init__(self, capacity=SEMANTIC_CACHE_CAPACITY, threshold=SEMANTIC_CACHE_THRESHOLD,
+                 ttl=SEMANTIC_CACHE_TTL, dim=EMBEDDING_DIM):
+        self.capacity = capacity
+        self.threshold = threshold
+        self.ttl = ttl
+        self.dim = dim
+        self._lock = threading.Lock()
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._instructions = np.zeros(capacity, dtype=np.int64)
+        self._stored_at = np.full(capacity, -np.inf)
+        self._values = [None] * capacity
+        self._urls = [None] * capacity
+        self._exact = {}
+        self._next = 0
+        self._size = 0
+
+    def __len__(self):
+        return self._size
+
+    def _live_mask(self, instruction, now):
+        mask = self._instructions[: self._size] == instruction
+        if self.ttl:
+            mask &= self._stored_at[: self._size] > now - self.ttl
+        return mask
+
+    def lookup(self, url, content, additional_text=""):
+        """
+        Return (value, info) for a cached generation, or (None, info) on a miss.
+        `info` reports the kind of hit and the best similarity seen.
+        """
+        start = time.perf_counter()
+        now = time.time()
+        canonical = canonicalize_url(url) if url else None
+        instruction = instruction_key(additional_text)
+        info = {"hit": False, "kind": "miss", "similarity": 0.0}
+
+        with self._lock:
+            slot = self._exact.get((canonical, instruction)) if canonical else None
+            if slot is not None and (not self.ttl or self._stored_at[slot] > now - self.ttl):
+                value = self._values[slot]
+                info.update(hit=True, kind="exact", similarity=1.0)
+            else:
+                value = None
+                if self._size:
+                    query = embed(content, self.dim)
+                    # One matrix-vector product over every slot, then mask out
+                    # other instructions and expired entries (no row copies)
+                    similarities = self._vectors[: self._size] @ query
+                    similarities[~self._live_mask(instruction, now)] = -1.0
+                    best = int(np.argmax(similarities))
+                    info["similarity"] = round(float(similarities[best]), 4)
+                    if similarities[best] >= self.threshold:
+                        value = self._values[best]
+                        info.update(hit=True, kind="semantic")
+
+        CACHE_LOOKUPS.inc(result=info["kind"])
+        CACHE_LOOKUP_SECONDS.observe(time.perf_counter() - start)
+        return value, info
+
+    def store(self, url, content, additional_text, value, vector=None):
+        vector = embed(content, self.dim) if vector is None else vector
+        canonical = canonicalize_url(url) if url else None
+        instruction = instruction_key(additional_text)
+        with self._lock:
+            slot = self._next
+            # Overwriting the oldest entry: drop its exact-key alias
+            old_url = self._urls[slot]
+            if old_url is not None and self._exact.get((old_url, int(self._instructions[slot]))) == slot:
+                del self._exact[(old_url, int(self._instructions[slot]))]
+
+            self._vectors[slot] = vector
+            self._instructions[slot] = instruction
+            self._stored_at[slot] = time.time()
+            self._values[slot] = value
+            self._urls[slot] = canonical
+            if canonical:
+                self._exact[(canonical, instruction)] = slot
+
+            self._next = (slot + 1) % self.capacity
+            self._size = min(self._size + 1, self.capacity)
+
+    def clear(self):
+        with self._lock:
+            self._exact.clear()
+            self._values = [None] * self.capacity
+            self._urls = [None] * self.capacity
+            self._stored_at[:] = -np.inf
+            self._next = self._size = 0
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_generation_cache():
+    """Process-wide cache, allocated on first use"""
+    global _cache
+    if _cache is None:
+        with _cache_lock:
+            if _cache is None:
+                _cache = SemanticCache()
+    return _cache
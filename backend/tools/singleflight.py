@@ -0,0 +1,123 @@
+"""
+Single-flight request coalescing.
+
+Concurrent calls with the same key share one execution: the first caller
+runs the function, everyone who arrives while it is in flight waits for and
+receives the same result (or exception). Sync callers wait on a thread
+event, async callers on a future, and both kinds can join the same flight.
+An async leader that is cancelled (its client went away) only stops waiting;
+the work itself carries on for the followers.
+"""
+
+import asyncio
+import threading
+
+from tools.metrics import REGISTRY
+
+COALESCED = REGISTRY.counter(
+    "tweetai_coalesced_calls_total",
+    "Calls that joined an in-flight execution instead of running their own",
+    ("flight",),
+)
+
+
+class _Call:
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = []
+
+
+def _outcome(done):
+    """(result, error) of a finished future"""
+    if done.cancelled():
+        return None, asyncio.CancelledError()
+    error = done.exception()
+    return (done.result(), None) if error is None else (None, error)
+
+
+def _resolve(future, result, error):
+    if future.done():
+        return
+    if error is not None:
+        future.set_exception(error)
+    else:
+        future.set_result(result)
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def in_flight(self):
+        with self._lock:
+            return len(self._calls)
+
+    def _join_or_lead(self, key, future=None):
+        """Return (call, is_leader); followers with a future are registered for wake-up"""
+        with self._lock:
+            call = self._calls.get(key)
+            if call is not None:
+                if future is not None:
+                    call.waiters.append((future.get_loop(), future))
+                COALESCED.inc(flight=self.name)
+                return call, False
+            call = self._calls[key] = _Call()
+            return call, True
+
+    def _finish(self, key, call, result, error):
+        with self._lock:
+            del self._calls[key]
+            call.result, call.error = result, error
+            waiters = list(call.waiters)
+        call.event.set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_resolve, future, result, error)
+
+    def do(self, key, fn, *args, **kwargs):
+        """Run `fn(*args, **kwargs)` unless a call for `key` is already in flight"""
+        call, leader = self._join_or_lead(key)
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        result, error = None, None
+        try:
+            result = fn(*args, **kwargs)
+            return result
+        except BaseException as e:
+            error = e
+            raise
+        finally:
+            self._finish(key, call, result, error)
+
+    async def do_async(self, key, fn, *args, timeout=None):
+        """
+        Async counterpart of `do`. A leading async caller runs `fn` in the
+        default executor (or as its own task if it's a coroutine function),
+        so the event loop is never blocked and followers cost no threads. The
+        leader awaits the work through `asyncio.shield`: cancelling it, or a
+        follower giving up after `timeout` seconds (TimeoutError), ends only
+        that caller's wait and the flight carries on for the others.
+        """
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        call, leader = self._join_or_lead(key, future)
+        if not leader:
+            return await asyncio.wait_for(future, timeout)
+
+        try:
+            if asyncio.iscoroutinefunction(fn):
+                work = asyncio.ensure_future(fn(*args))
+            else:
+                work = loop.run_in_executor(None, fn, *args)
+        except BaseException as e:
+            self._finish(key, call, None, e)
+            raise
+        work.add_done_callback(lambda done: self._finish(key, call, *_outcome(done)))
+        return await asyncio.shield(work)
@@ -0,0 +1,315 @@
+"""
+Archive of raw page bodies, for re-running the analyser without fetching
+pages again.
+
+Every page `fetch_page` downloads is appended, compressed, to a segment
+file. Each writer process appends to its own segments, so API workers never
+interleave writes, and starts a new one past SNAPSHOT_SEGMENT_BYTES. Every
+record has a fixed-size entry in the segment's `.idx` sidecar (URL hash,
+body digest, offset, size, fetch time). Opening the archive reads only the
+sidecars into a hash index of the newest snapshot per URL, and reads go
+straight to the record through a memory map of its segment. A page fetched
+again unchanged isn't stored twice.
+
+Segments are append-only and never rewritten. Retention works on whole
+segments: whenever a writer starts a new one, the oldest segments are
+deleted until the archive fits in SNAPSHOT_MAX_BYTES, along with any not
+written to for SNAPSHOT_MAX_AGE_DAYS. A page whose snapshot went with its
+segment is stored again the next time it is fetched. An archive opened
+read-only (as reanalyze.py does) never prunes or writes.
+
+Bodies are compressed with zstd when the `zstandard` package is installed
+and zlib otherwise. Every record names its codec, so an archive can hold
+both.
+"""
+
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from tools.log import get_logger
+from tools.urls import canonicalize_url
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+log = get_logger("snapshots")
+
+DEFAULT_SNAPSHOT_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".state", "snapshots")
+SNAPSHOT_DIR = os.environ.get("SNAPSHOT_DIR", DEFAULT_SNAPSHOT_DIR)
+SNAPSHOTS_ENABLED = os.environ.get("SNAPSHOTS_ENABLED", "1") == "1"
+SNAPSHOT_SEGMENT_BYTES = int(os.environ.get("SNAPSHOT_SEGMENT_BYTES", str(64 * 1024 * 1024)))
+# Total size the archive is kept under, segments and sidecars (0 for no limit)
+SNAPSHOT_MAX_BYTES = int(os.environ.get("SNAPSHOT_MAX_BYTES", str(1024 * 1024 * 1024)))
+# Segments not written to for this many days are deleted (0 keeps them forever)
+SNAPSHOT_MAX_AGE_DAYS = float(os.environ.get("SNAPSHOT_MAX_AGE_DAYS", "30"))
+
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+MAGIC = b"SNP1"
+# magic, codec, URL length, compressed length, raw length, CRC32 of the raw body, fetch time
+RECORD = struct.Struct("<4sBHIIId")
+# URL hash, body digest, record offset, record size, fetch time
+INDEX_ENTRY = struct.Struct("<20s8sQId")
+
+
+def url_key(url):
+    return hashlib.sha1(canonicalize_url(url).encode("utf-8")).digest()
+
+
+def body_digest(body):
+    return hashlib.blake2b(body, digest_size=8).digest()
+
+
+_codecs = threading.local()
+
+
+def compress(raw):
+    """(codec, compressed bytes)"""
+    if zstandard is not None:
+        # Compressor objects aren't thread-safe; keep one per thread
+        compressor = getattr(_codecs, "compressor", None)
+        if compressor is None:
+            compressor = _codecs.compressor = zstandard.ZstdCompressor(level=3)
+        return CODEC_ZSTD, compressor.compress(raw)
+    return CODEC_ZLIB, zlib.compress(raw, 6)
+
+
+def decompress(codec, data, size):
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise RuntimeError("Snapshot is zstd-compressed but the `zstandard` package is not installed")
+        decompressor = getattr(_codecs, "decompressor", None)
+        if decompressor is None:
+            decompressor = _codecs.decompressor = zstandard.ZstdDecompressor()
+        return decompressor.decompress(data, max_output_size=size)
+    raise ValueError(f"Unknown snapshot codec {codec}")
+
+
+def read_record(view, offset):
+    """(url, fetched_at, body bytes) of the record at `offset` in a segment's bytes"""
+    magic, codec, url_length, length, size, crc, fetched_at = RECORD.unpack_from(view, offset)
+    if magic != MAGIC:
+        raise ValueError(f"No snapshot record at offset {offset}")
+    start = offset + RECORD.size
+    url = bytes(view[start:start + url_length]).decode("utf-8", errors="replace")
+    start += url_length
+    body = decompress(codec, view[start:start + length], size)
+    if zlib.crc32(body) != crc:
+        raise ValueError(f"Snapshot of {url} is corrupt")
+    return url, fetched_at, body
+
+
+class SegmentReader:
+    """Memory maps of segment files, remapped when a segment being written has grown"""
+
+    def __init__(self):
+        self._maps = {}
+        self._lock = threading.Lock()
+
+    def view(self, path, end):
+        with self._lock:
+            view = self._maps.get(path)
+            if view is None or len(view) < end:
+                # A replaced map may still be in use by another reader; it's released once unreferenced
+                with open(path, "rb") as f:
+                    view = self._maps[path] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            return view
+
+    def read(self, path, offset, size):
+        return read_record(self.view(path, offset + size), offset)
+
+    def close(self):
+        with self._lock:
+            self._maps.clear()
+
+
+class SnapshotArchive:
+    def __init__(self, directory=SNAPSHOT_DIR, segment_bytes=SNAPSHOT_SEGMENT_BYTES, max_bytes=SNAPSHOT_MAX_BYTES,
+                 max_age=SNAPSHOT_MAX_AGE_DAYS * 86400, read_only=False):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.read_only = read_only
+        if not read_only:
+            os.makedirs(directory, exist_ok=True)
+        # URL hash -> (segment path, offset, size, fetch time, body digest) of its newest snapshot
+        self._index = {}
+        self._lock = threading.Lock()
+        self._reader = SegmentReader()
+        self._segment = None
+        self._pid = None
+        if not read_only:
+            self._prune()
+        self.reload()
+
+    def reload(self):
+        """Rebuild the in-memory index from every segment's sidecar"""
+        index = {}
+        names = os.listdir(self.directory) if os.path.isdir(self.directory) else []
+        for name in sorted(names):
+            if name.endswith(".idx"):
+                self._load_sidecar(os.path.join(self.directory, name), index)
+        with self._lock:
+            self._index = index
+
+    def _load_sidecar(self, path, index):
+        segment = path[:-len(".idx")] + ".seg"
+        if not os.path.exists(segment):
+            return
+        segment_size = os.path.getsize(segment)
+        with open(path, "rb") as f:
+            data = f.read()
+        # A torn final entry, or one whose record never made it to disk, is ignored
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        for key, digest, offset, size, fetched_at in INDEX_ENTRY.iter_unpack(data[:usable]):
+            if offset + size > segment_size:
+                break
+            current = index.get(key)
+            if current is None or current[3] <= fetched_at:
+                index[key] = (segment, offset, size, fetched_at, digest)
+
+    def _prune(self):
+        """Delete the oldest segments over max_bytes and those older than max_age; returns how many went"""
+        writing = self._segment[3] if self._segment is not None and self._pid == os.getpid() else None
+        segments = []
+        for name in os.listdir(self.directory):
+            if not name.endswith(".seg"):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+                size = stat.st_size + os.path.getsize(path[:-len(".seg")] + ".idx")
+            except FileNotFoundError:
+                continue  # pruned by another process meanwhile
+            segments.append((name, path, size, stat.st_mtime))
+        total = sum(segment[2] for segment in segments)
+        cutoff = time.time() - self.max_age if self.max_age else 0
+        removed = set()
+        # Segment names start with their creation time, so this is oldest first
+        for name, path, size, modified in sorted(segments):
+            if path == writing:
+                continue
+            if (self.max_bytes and total > self.max_bytes) or modified < cutoff:
+                for file in (path, path[:-len(".seg")] + ".idx"):
+                    try:
+                        os.remove(file)
+                    except FileNotFoundError:
+                        pass
+                total -= size
+                removed.add(path)
+        if removed:
+            self._index = {key: entry for key, entry in self._index.items() if entry[0] not in removed}
+            log.info("snapshots_pruned", segments=len(removed), archive_bytes=total)
+        return len(removed)
+
+    def prune(self):
+        """Apply the size and age limits now; returns the number of segments deleted"""
+        with self._lock:
+            return self._prune()
+
+    def _writable_segment(self, record_size):
+        pid = os.getpid()
+        segment = self._segment
+        if segment is None or self._pid != pid or segment[2] + record_size > self.segment_bytes and segment[2]:
+            if segment is not None and self._pid == pid:
+                segment[0].close()
+                segment[1].close()
+            base = os.path.join(self.directory, f"{time.time_ns()}-{pid}")
+            segment = self._segment = [open(base + ".seg", "ab"), open(base + ".idx", "ab"), 0, base + ".seg"]
+            self._pid = pid
+            self._prune()
+        return segment
+
+    def put(self, url, body, fetched_at=None):
+        """Append a snapshot of `body` (str or bytes) for `url`; returns False if it's unchanged"""
+        if self.read_only:
+            raise RuntimeError(f"Snapshot archive {self.directory} was opened read-only")
+        raw = body.encode("utf-8") if isinstance(body, str) else body
+        key, digest = url_key(url), body_digest(raw)
+        current = self._index.get(key)
+        if current is not None and current[4] == digest:
+            return False
+        fetched_at = fetched_at or time.time()
+        codec, data = compress(raw)
+        url_bytes = url.encode("utf-8")[:65535]
+        record = RECORD.pack(MAGIC, codec, len(url_bytes), len(data), len(raw), zlib.crc32(raw), fetched_at)
+        record += url_bytes + data
+        with self._lock:
+            seg_file, idx_file, offset, path = self._writable_segment(len(record))
+            seg_file.write(record)
+            seg_file.flush()
+            # The index entry goes after its record, so a crash can't index a record that isn't there
+            idx_file.write(INDEX_ENTRY.pack(key, digest, offset, len(record), fetched_at))
+            idx_file.flush()
+            self._segment[2] = offset + len(record)
+            self._index[key] = (path, offset, len(record), fetched_at, digest)
+        return True
+
+    def location(self, url):
+        """(segment path, offset, size) of the newest snapshot of `url`, or None"""
+        entry = self._index.get(url_key(url))
+        return None if entry is None else entry[:3]
+
+    def get(self, url):
+        """The newest snapshot of `url` as text, or None"""
+        location = self.location(url)
+        if location is None:
+            return None
+        try:
+            return self._reader.read(*location)[2].decode("utf-8", errors="replace")
+        except FileNotFoundError:
+            return None  # its segment was pruned by another process
+
+    def locations(self):
+        """(segment path, offset, size) of the newest snapshot of every URL, in file order"""
+        with self._lock:
+            entries = list(self._index.values())
+        return sorted(entry[:3] for entry in entries)
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, url):
+        return url_key(url) in self._index
+
+    def close(self):
+        with self._lock:
+            if self._segment is not None and self._pid == os.getpid():
+                self._segment[0].close()
+                self._segment[1].close()
+            self._segment = None
+        self._reader.close()
+
+
+_archive = None
+_archive_lock = threading.Lock()
+
+
+def get_snapshot_archive():
+    """Process-wide archive in SNAPSHOT_DIR"""
+    global _archive
+    if _archive is None:
+        with _archive_lock:
+            if _archive is None:
+                _archive = SnapshotArchive(SNAPSHOT_DIR)
+    return _archive
+
+
+def record_snapshot(url, body):
+    """Archive a fetched page body; failures are logged, never raised into the fetch"""
+    if not SNAPSHOTS_ENABLED:
+        return
+    try:
+        get_snapshot_archive().put(url, body)
+    except Exception as e:
+        log.warning("snapshot_write_failed", url=url, error=str(e))
@@ -0,0 +1,470 @@
+"""
+Shared state for running the API across several uvicorn workers or nodes.
+
+Anything that has to look the same from every worker -- caches, secrets,
+token stores, job queues -- goes through a `StateBackend` instead of a
+module-level dict. Values must be JSON-serializable.
+
+Backends are selected with STATE_BACKEND_URL:
+    sqlite:///path/to/state.db   (default; WAL mode, safe across local processes)
+    redis://host:6379/0          (Redis or any Redis-protocol server, needs `redis`)
+    memory://                    (single process only, used in tests)
+"""
+
+import itertools
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".state", "state.db")
+STATE_BACKEND_URL = os.environ.get("STATE_BACKEND_URL", f"sqlite:///{DEFAULT_SQLITE_PATH}")
+# Expired keys are deleted by the first write after this many seconds (0 = never)
+STATE_PURGE_INTERVAL = float(os.environ.get("STATE_PURGE_INTERVAL", "300"))
+
+
+class StateBackend(ABC):
+    """Interface shared by every backend"""
+
+    @abstractmethod
+    def get(self, key, default=None):
+        ...
+
+    @abstractmethod
+    def set(self, key, value, ttl=None):
+        ...
+
+    @abstractmethod
+    def add(self, key, value, ttl=None):
+        """Set `key` only if it doesn't exist; returns True if this call set it"""
+
+    @abstractmethod
+    def delete(self, key):
+        ...
+
+    @abstractmethod
+    def incr(self, key, amount=1, ttl=None):
+        """Atomically add to an integer counter and return the new value"""
+
+    @abstractmethod
+    def push(self, queue, item):
+        ...
+
+    @abstractmethod
+    def pop(self, queue):
+        """Remove and return the oldest visible item in `queue`, or None if there is none"""
+
+    @abstractmethod
+    def claim(self, queue, lease):
+        """
+        Hide the oldest visible item in `queue` for `lease` seconds and return
+        (receipt, item), or None. The item stays queued until `ack(receipt)`;
+        if that doesn't happen before the lease runs out (the worker died),
+        the item becomes visible again and the next claim redelivers it.
+        """
+
+    @abstractmethod
+    def ack(self, queue, receipt):
+        """Remove a claimed item for good"""
+
+    @abstractmethod
+    def extend(self, queue, receipt, lease):
+        """Keep a claimed item hidden for `lease` more seconds (0 releases it); False if it's gone"""
+
+    @abstractmethod
+    def queue_length(self, queue):
+        """Items in `queue` that haven't been popped or acknowledged, claimed ones included"""
+
+    def purge_expired(self):
+        """Delete expired keys and return how many; backends whose store expires keys itself return 0"""
+        return 0
+
+    def get_or_create(self, key, factory, ttl=None):
+        """Return the shared value for `key`, creating it once across all workers"""
+        value = self.get(key)
+        if value is None:
+            self.add(key, factory(), ttl=ttl)
+            value = self.get(key)
+        return value
+
+
+class _LazyPurge:
+    """Runs `purge_expired` from inside writes, at most once every STATE_PURGE_INTERVAL seconds"""
+
+    purge_interval = STATE_PURGE_INTERVAL
+    _next_purge = 0.0
+
+    def _maybe_purge(self):
+        now = time.monotonic()
+        if self.purge_interval and now >= self._next_purge:
+            self._next_purge = now + self.purge_interval
+            self.purge_expired()
+
+
+class MemoryStateBackend(_LazyPurge, StateBackend):
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = {}
+        # queue -> [[receipt, item, visible_at]] oldest first; visible_at is None until claimed
+        self._queues = {}
+        self._receipts = itertools.count(1)
+
+    def _live(self, key):
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and expires_at <= time.time():
+            del self._data[key]
+            return None
+        return entry
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._live(key)
+            return default if entry is None else json.loads(entry[0])
+
+    def set(self, key, value, ttl=None):
+        with self._lock:
+            self._data[key] = (json.dumps(value), time.time() + ttl if ttl else None)
+        self._maybe_purge()
+
+    def add(self, key, value, ttl=None):
+        with self._lock:
+            if self._live(key) is not None:
+                return False
+            self._data[key] = (json.dumps(value), time.time() + ttl if ttl else None)
+        self._maybe_purge()
+        return True
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def incr(self, key, amount=1, ttl=None):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                value, expires_at = amount, (time.time() + ttl if ttl else None)
+            else:
+                value, expires_at = json.loads(entry[0]) + amount, entry[1]
+            self._data[key] = (json.dumps(value), expires_at)
+        self._maybe_purge()
+        return value
+
+    def push(self, queue, item):
+        with self._lock:
+            self._queues.setdefault(queue, []).append([next(self._receipts), json.dumps(item), None])
+
+    def _visible(self, queue):
+        now = time.time()
+        return next((entry for entry in self._queues.get(queue, []) if entry[2] is None or entry[2] <= now), None)
+
+    def _entry(self, queue, receipt):
+        return next((entry for entry in self._queues.get(queue, []) if entry[0] == receipt), None)
+
+    def pop(self, queue):
+        with self._lock:
+            entry = self._visible(queue)
+            if entry is None:
+                return None
+            self._queues[queue].remove(entry)
+            return json.loads(entry[1])
+
+    def claim(self, queue, lease):
+        with self._lock:
+            entry = self._visible(queue)
+            if entry is None:
+                return None
+            entry[2] = time.time() + lease
+            return entry[0], json.loads(entry[1])
+
+    def ack(self, queue, receipt):
+        with self._lock:
+            entry = self._entry(queue, receipt)
+            if entry is not None:
+                self._queues[queue].remove(entry)
+
+    def extend(self, queue, receipt, lease):
+        with self._lock:
+            entry = self._entry(queue, receipt)
+            if entry is None:
+                return False
+            entry[2] = time.time() + lease
+            return True
+
+    def queue_length(self, queue):
+        with self._lock:
+            return len(self._queues.get(queue, []))
+
+    def purge_expired(self):
+        now = time.time()
+        with self._lock:
+            expired = [key for key, (_, expires_at) in self._data.items()
+                       if expires_at is not None and expires_at <= now]
+            for key in expired:
+                del self._data[key]
+        return len(expired)
+
+
+class SQLiteStateBackend(_LazyPurge, StateBackend):
+    """
+    SQLite in WAL mode: readers never block the writer, and every worker
+    process on the host shares the same file. Each thread gets its own
+    connection; writes that read-then-modify use BEGIN IMMEDIATE so they are
+    atomic across processes.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT NOT NULL,
+                expires_at REAL
+            );
+            CREATE TABLE IF NOT EXISTS queue_items (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                queue TEXT NOT NULL,
+                item TEXT NOT NULL,
+                visible_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS queue_items_queue ON queue_items (queue, id);
+            """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(queue_items)")}
+        if "visible_at" not in columns:
+            # Databases created before claims existed
+            conn.execute("ALTER TABLE queue_items ADD COLUMN visible_at REAL")
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Autocommit mode; transactions are opened explicitly where needed
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        return conn
+
+    def _transaction(self, fn):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = fn(conn)
+            conn.execute("COMMIT")
+            return result
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    @staticmethod
+    def _expiry(ttl):
+        return time.time() + ttl if ttl else None
+
+    def get(self, key, default=None):
+        row = self._conn().execute(
+            "SELECT value FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+            (key, time.time()),
+        ).fetchone()
+        return default if row is None else json.loads(row[0])
+
+    def set(self, key, value, ttl=None):
+        self._conn().execute(
+            "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+            (key, json.dumps(value), self._expiry(ttl)),
+        )
+        self._maybe_purge()
+
+    def add(self, key, value, ttl=None):
+        def run(conn):
+            conn.execute("DELETE FROM kv WHERE key = ? AND expires_at <= ?", (key, time.time()))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), self._expiry(ttl)),
+            )
+            return cursor.rowcount == 1
+
+        added = self._transaction(run)
+        self._maybe_purge()
+        return added
+
+    def delete(self, key):
+        self._conn().execute("DELETE FROM kv WHERE key = ?", (key,))
+
+    def incr(self, key, amount=1, ttl=None):
+        def run(conn):
+            row = conn.execute(
+                "SELECT value, expires_at FROM kv WHERE key = ? AND (expires_at IS NULL OR expires_at > ?)",
+                (key, time.time()),
+            ).fetchone()
+            if row is None:
+                value, expires_at = amount, self._expiry(ttl)
+            else:
+                value, expires_at = json.loads(row[0]) + amount, row[1]
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, json.dumps(value), expires_at),
+            )
+            return value
+
+        value = self._transaction(run)
+        self._maybe_purge()
+        return value
+
+    def push(self, queue, item):
+        self._conn().execute("INSERT INTO queue_items (queue, item) VALUES (?, ?)", (queue, json.dumps(item)))
+
+    _VISIBLE = (
+        "SELECT id FROM queue_items WHERE queue = ? AND (visible_at IS NULL OR visible_at <= ?) ORDER BY id LIMIT 1"
+    )
+
+    def pop(self, queue):
+        row = self._conn().execute(
+            f"DELETE FROM queue_items WHERE id = ({self._VISIBLE}) RETURNING item", (queue, time.time())
+        ).fetchone()
+        return None if row is None else json.loads(row[0])
+
+    def claim(self, queue, lease):
+        now = time.time()
+        # One statement, so two workers can't claim the same item
+        row = self._conn().execute(
+            f"UPDATE queue_items SET visible_at = ? WHERE id = ({self._VISIBLE}) RETURNING id, item",
+            (now + lease, queue, now),
+        ).fetchone()
+        return None if row is None else (row[0], json.loads(row[1]))
+
+    def ack(self, queue, receipt):
+        self._conn().execute("DELETE FROM queue_items WHERE id = ? AND queue = ?", (receipt, queue))
+
+    def extend(self, queue, receipt, lease):
+        return self._conn().execute(
+            "UPDATE queue_items SET visible_at = ? WHERE id = ? AND queue = ?", (time.time() + lease, receipt, queue)
+        ).rowcount == 1
+
+    def queue_length(self, queue):
+        return self._conn().execute("SELECT COUNT(*) FROM queue_items WHERE queue = ?", (queue,)).fetchone()[0]
+
+    def purge_expired(self):
+        return self._conn().execute(
+            "DELETE FROM kv WHERE expires_at IS NOT NULL AND expires_at <= ?", (time.time(),)
+        ).rowcount
+
+
+class RedisStateBackend(StateBackend):
+    """Redis-protocol backend for deployments spanning several hosts"""
+
+    def __init__(self, url, prefix="tweetai:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("STATE_BACKEND_URL points at Redis but the `redis` package is not installed")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def _k(self, key):
+        return self.prefix + key
+
+    def get(self, key, default=None):
+        raw = self.client.get(self._k(key))
+        return default if raw is None else json.loads(raw)
+
+    def set(self, key, value, ttl=None):
+        self.client.set(self._k(key), json.dumps(value), ex=int(ttl) if ttl else None)
+
+    def add(self, key, value, ttl=None):
+        return bool(self.client.set(self._k(key), json.dumps(value), ex=int(ttl) if ttl else None, nx=True))
+
+    def delete(self, key):
+        self.client.delete(self._k(key))
+
+    def incr(self, key, amount=1, ttl=None):
+        value = self.client.incrby(self._k(key), amount)
+        if ttl and value == amount:
+            # First increment created the key; start its expiry window
+            self.client.expire(self._k(key), int(ttl))
+        return value
+
+    def push(self, queue, item):
+        self.client.rpush(self._k(f"queue:{queue}"), json.dumps(item))
+
+    def pop(self, queue):
+        raw = self.client.lpop(self._k(f"queue:{queue}"))
+        return None if raw is None else json.loads(raw)
+
+    # Claimed items move from the list to a hash by receipt, with their
+    # visibility deadline in a sorted set; expired claims are redelivered first
+    _CLAIM = """
+    local expired = redis.call('ZRANGEBYSCORE', KEYS[2], '-inf', ARGV[1], 'LIMIT', 0, 1)
+    if #expired > 0 then
+        redis.call('ZADD', KEYS[2], ARGV[1] + ARGV[2], expired[1])
+        return {expired[1], redis.call('HGET', KEYS[3], expired[1])}
+    end
+    local item = redis.call('LPOP', KEYS[1])
+    if not item then
+        return nil
+    end
+    redis.call('ZADD', KEYS[2], ARGV[1] + ARGV[2], ARGV[3])
+    redis.call('HSET', KEYS[3], ARGV[3], item)
+    return {ARGV[3], item}
+    """
+
+    def _claim_keys(self, queue):
+        return [self._k(f"queue:{queue}"), self._k(f"claims:{queue}"), self._k(f"claimed:{queue}")]
+
+    def claim(self, queue, lease):
+        result = self.client.eval(self._CLAIM, 3, *self._claim_keys(queue), time.time(), lease, uuid.uuid4().hex)
+        if not result:
+            return None
+        receipt, raw = result
+        return receipt.decode() if isinstance(receipt, bytes) else receipt, json.loads(raw)
+
+    def ack(self, queue, receipt):
+        _, claims, claimed = self._claim_keys(queue)
+        self.client.zrem(claims, receipt)
+        self.client.hdel(claimed, receipt)
+
+    def extend(self, queue, receipt, lease):
+        _, claims, _ = self._claim_keys(queue)
+        if self.client.zscore(claims, receipt) is None:
+            return False
+        self.client.zadd(claims, {receipt: time.time() + lease}, xx=True)
+        return True
+
+    def queue_length(self, queue):
+        _, claims, _ = self._claim_keys(queue)
+        return self.client.llen(self._k(f"queue:{queue}")) + self.client.zcard(claims)
+
+
+def create_state_backend(url):
+    if url.startswith("sqlite:///"):
+        return SQLiteStateBackend(url[len("sqlite:///"):])
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisStateBackend(url)
+    if url.startswith("memory://"):
+        return MemoryStateBackend()
+    raise ValueError(f"Unsupported STATE_BACKEND_URL: {url}")
+
+
+_backend = None
+_backend_lock = threading.Lock()
+
+
+def get_state_backend():
+    """Return the process-wide backend configured by STATE_BACKEND_URL"""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = create_state_backend(STATE_BACKEND_URL)
+    return _backend
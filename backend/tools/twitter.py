@@ -0,0 +1,401 @@
+"""
+Publishing tweets and threads through the Twitter API v2.
+
+A thread is posted one tweet at a time, each a reply to the previous one, so
+it takes one API round trip per tweet. `publish_thread` does that in the
+caller's thread. For long threads `submit` persists the thread as a publish
+job in the state backend and returns its ID at once; a `PublishWorker` in
+any API worker process claims the job from the queue, posts it and records
+the ID of every tweet as it goes, so `get_job` can report progress while
+the thread is being published. The account's token is kept in the job only
+while it waits in the queue: the worker that claims it takes the token out.
+
+The claim is a lease renewed as tweets are posted. If the worker's process
+dies mid-thread, the job becomes visible again once the lease runs out, and
+the next worker marks it failed with what was posted, since the token went
+with the dead worker. Rate limits, 5xx responses and connection failures
+are retried after the API's Retry-After, or an exponential backoff, and the
+job resumes after its last posted tweet. A request that may have reached
+Twitter without an answer (a read timeout) is never sent again, so a tweet
+can't be posted twice.
+"""
+
+import hashlib
+import os
+import threading
+import time
+import uuid
+from email.utils import parsedate_to_datetime
+
+import requests
+
+from tools.log import get_logger
+from tools.metrics import REGISTRY, span
+from tools.state import get_state_backend
+
+log = get_logger("twitter")
+
+# Base URL for Twitter API v2 calls (overridable to point at a mock server)
+TWITTER_API_BASE = os.environ.get("TWITTER_API_BASE", "https://api.twitter.com")
+TWITTER_TIMEOUT = (5, 30)
+MAX_THREAD_TWEETS = int(os.getenv("MAX_THREAD_TWEETS", "25"))
+# Background publisher threads per process (0 leaves publishing to other processes)
+PUBLISH_WORKERS = int(os.getenv("PUBLISH_WORKERS", "1"))
+PUBLISH_RETRIES = int(os.getenv("PUBLISH_RETRIES", "3"))
+PUBLISH_RETRY_DELAY = float(os.getenv("PUBLISH_RETRY_DELAY", "2"))
+# Retries due later than this (seconds) go back to the queue instead of holding a worker thread
+PUBLISH_MAX_RETRY_WAIT = float(os.getenv("PUBLISH_MAX_RETRY_WAIT", "30"))
+# How long a claimed job stays hidden from other workers without progress (seconds)
+PUBLISH_LEASE = float(os.getenv("PUBLISH_LEASE", "120"))
+# How long finished jobs stay queryable (seconds)
+PUBLISH_JOB_TTL = int(os.getenv("PUBLISH_JOB_TTL", str(24 * 3600)))
+PUBLISH_QUEUE = "publish"
+
+PUBLISHED_TWEETS = REGISTRY.counter(
+    "tweetai_published_tweets_total",
+    "Tweets sent to the Twitter API, by outcome",
+    ("outcome",),
+)
+PUBLISH_JOBS = REGISTRY.counter(
+    "tweetai_publish_jobs_total",
+    "Background publish jobs by final status",
+    ("status",),
+)
+PUBLISH_JOB_SECONDS = REGISTRY.histogram(
+    "tweetai_publish_job_duration_seconds",
+    "Time from submitting a publish job to its last tweet being posted",
+)
+
+
+class PublishError(Exception):
+    """Posting tweet `index` (0-based) of a thread was rejected"""
+
+    def __init__(self, index, status, body, retry_after=None):
+        self.index = index
+        self.status = status
+        self.body = body
+        # Seconds the API asked us to wait before trying again, if it said
+        self.retry_after = retry_after
+        what = "first tweet" if index == 0 else f"tweet {index + 1}"
+        super().__init__(f"Failed to post {what}: {body}")
+
+    @property
+    def transient(self):
+        return self.status == 429 or self.status >= 500
+
+
+class AccessLevelError(PublishError):
+    """The app's API access level doesn't allow posting (Twitter error 453)"""
+
+
+class TokenRefreshError(Exception):
+    """The OAuth 2.0 token endpoint refused to refresh an access token"""
+
+
+def validate_thread(tweets):
+    """Raise ValueError unless `tweets` is a postable thread"""
+    if not tweets:
+        raise ValueError("No tweets provided")
+    if len(tweets) > MAX_THREAD_TWEETS:
+        raise ValueError(f"Threads are limited to {MAX_THREAD_TWEETS} tweets")
+    for i, tweet in enumerate(tweets):
+        if not isinstance(tweet, str) or not tweet.strip():
+            raise ValueError(f"Tweet {i + 1} is empty")
+
+
+def post_tweet(text, authorization, reply_to=None):
+    """POST one tweet; returns the `requests` response"""
+    payload = {"text": text}
+    if reply_to:
+        payload["reply"] = {"in_reply_to_tweet_id": reply_to}
+    with span("twitter_post"):
+        return requests.post(
+            f"{TWITTER_API_BASE}/2/tweets",
+            json=payload,
+            headers={"Authorization": authorization, "Content-Type": "application/json"},
+            timeout=TWITTER_TIMEOUT,
+        )
+
+
+def refresh_access_token(refresh_token):
+    """
+    Exchange an offline.access refresh token for a new access token. Returns
+    (authorization, refresh_token, expires); Twitter rotates refresh tokens,
+    so the one passed in is no longer valid afterwards.
+    """
+    # Read at call time: main loads .env after the tools are imported
+    client_id = os.environ.get("TWITTER_CLIENT_ID")
+    with span("twitter_token_refresh"):
+        response = requests.post(
+            f"{TWITTER_API_BASE}/2/oauth2/token",
+            data={"grant_type": "refresh_token", "refresh_token": refresh_token, "client_id": client_id},
+            auth=(client_id, os.environ.get("TWITTER_CLIENT_SECRET")),
+            timeout=TWITTER_TIMEOUT,
+        )
+    if response.status_code != 200:
+        log.warning("token_refresh_failed", status=response.status_code, body=lambda: response.text)
+        raise TokenRefreshError(f"Failed to refresh the Twitter token: {response.text}")
+    token = response.json()
+    return (
+        f"{token.get('token_type', 'Bearer')} {token['access_token']}",
+        token.get("refresh_token", refresh_token),
+        time.time() + token.get("expires_in", 7200),
+    )
+
+
+def retry_after(response):
+    """Seconds to wait from Retry-After (seconds or an HTTP date) or x-rate-limit-reset (epoch), else None"""
+    value = response.headers.get("Retry-After")
+    if value:
+        try:
+            return max(float(value), 0.0)
+        except ValueError:
+            try:
+                return max(parsedate_to_datetime(value).timestamp() - time.time(), 0.0)
+            except (TypeError, ValueError):
+                pass
+    reset = response.headers.get("x-rate-limit-reset")
+    if reset:
+        try:
+            return max(float(reset) - time.time(), 0.0)
+        except ValueError:
+            pass
+    return None
+
+
+def _rejected(index, response):
+    if response.status_code == 403:
+        try:
+            errors = response.json().get("errors", [])
+        except ValueError:
+            errors = []
+        if any("453" in str(error) for error in errors):
+            return AccessLevelError(index, response.status_code, response.text)
+    return PublishError(index, response.status_code, response.text, retry_after(response))
+
+
+def publish_thread(tweets, authorization, start=0, reply_to=None, on_posted=None):
+    """
+    Post `tweets[start:]` as a thread continuing from `reply_to`, calling
+    `on_posted(index, tweet_id)` after each one. Returns the new tweet IDs;
+    raises PublishError for the first tweet the API rejects.
+    """
+    tweet_ids = []
+    for index in range(start, len(tweets)):
+        log.debug("posting_tweet", index=index + 1, count=len(tweets), preview=lambda: tweets[index][:50])
+        response = post_tweet(tweets[index], authorization, reply_to)
+        log.debug("twitter_response", status=response.status_code, body=lambda: response.text)
+        if response.status_code != 201:  # v2 API returns 201 for successful creation
+            PUBLISHED_TWEETS.inc(outcome="rejected")
+            log.warning("post_failed", index=index + 1, status=response.status_code, body=lambda: response.text)
+            raise _rejected(index, response)
+        PUBLISHED_TWEETS.inc(outcome="posted")
+        reply_to = response.json()["data"]["id"]
+        tweet_ids.append(reply_to)
+        if on_posted:
+            on_posted(index, reply_to)
+    return tweet_ids
+
+
+def _job_key(publish_id):
+    return f"publish:{publish_id}"
+
+
+def owner_key(authorization):
+    """Jobs are visible to whoever holds the token that submitted them"""
+    return hashlib.sha256(authorization.encode("utf-8")).hexdigest()
+
+
+_wakeup = threading.Event()
+
+
+def submit(tweets, authorization):
+    """Persist `tweets` as a publish job and queue it; returns the job's public view"""
+    validate_thread(tweets)
+    now = time.time()
+    job = {
+        "id": uuid.uuid4().hex,
+        "status": "queued",
+        "tweets": list(tweets),
+        "tweet_ids": [],
+        "owner": owner_key(authorization),
+        "authorization": authorization,
+        "attempts": 0,
+        "error": None,
+        "simulated": False,
+        "created": now,
+        "updated": now,
+    }
+    state = get_state_backend()
+    state.set(_job_key(job["id"]), job, ttl=PUBLISH_JOB_TTL)
+    state.push(PUBLISH_QUEUE, job["id"])
+    _wakeup.set()
+    return public_view(job)
+
+
+def public_view(job):
+    """What the status endpoint shows: progress and IDs, never the token or the text"""
+    tweet_ids = job["tweet_ids"]
+    return {
+        "publish_id": job["id"],
+        "status": job["status"],
+        "tweet_count": len(job["tweets"]),
+        "posted": len(tweet_ids),
+        "tweet_ids": tweet_ids,
+        "first_tweet_id": tweet_ids[0] if tweet_ids else None,
+        "simulated": job["simulated"],
+        "error": job["error"],
+        "created": job["created"],
+        "updated": job["updated"],
+    }
+
+
+def get_job(publish_id, authorization):
+    """The public view of a job, or None if it doesn't exist or belongs to another token"""
+    job = get_state_backend().get(_job_key(publish_id))
+    if job is None or job["owner"] != owner_key(authorization):
+        return None
+    return public_view(job)
+
+
+class PublishWorker:
+    def __init__(self, threads=PUBLISH_WORKERS, retries=PUBLISH_RETRIES, retry_delay=PUBLISH_RETRY_DELAY,
+                 poll_interval=1.0, lease=PUBLISH_LEASE, max_retry_wait=PUBLISH_MAX_RETRY_WAIT):
+        self.threads = threads
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.poll_interval = poll_interval
+        self.lease = lease
+        self.max_retry_wait = max_retry_wait
+        self._stop = threading.Event()
+        self._threads = []
+
+    def _save(self, job, **changes):
+        job.update(changes, updated=time.time())
+        get_state_backend().set(_job_key(job["id"]), job, ttl=PUBLISH_JOB_TTL)
+
+    def _finish(self, job, status, **changes):
+        # Drop the token as soon as it's no longer needed
+        job.pop("authorization", None)
+        self._save(job, status=status, **changes)
+        PUBLISH_JOBS.inc(status=status)
+        PUBLISH_JOB_SECONDS.observe(job["updated"] - job["created"])
+        log.info("publish_job_done", publish_id=job["id"], status=status, posted=len(job["tweet_ids"]))
+
+    def _hand_back(self, job, authorization, receipt, delay):
+        """Requeue a claimed job with its token, hidden from every worker for `delay` seconds"""
+        self._save(job, status="queued", authorization=authorization)
+        job.pop("authorization")
+        get_state_backend().extend(PUBLISH_QUEUE, receipt, delay)
+
+    def process(self, job, authorization, receipt):
+        """
+        Publish one claimed job, resuming after its last posted tweet. Returns
+        True once the job is finished, False if it was handed back to the
+        queue to be retried later.
+        """
+        state = get_state_backend()
+
+        def posted(index, tweet_id):
+            self._save(job, tweet_ids=job["tweet_ids"] + [tweet_id])
+            state.extend(PUBLISH_QUEUE, receipt, self.lease)
+
+        while True:
+            posted_count = len(job["tweet_ids"])
+            reply_to = job["tweet_ids"][-1] if posted_count else None
+            try:
+                publish_thread(job["tweets"], authorization, start=posted_count, reply_to=reply_to,
+                               on_posted=posted)
+                self._finish(job, "published")
+                return True
+            except AccessLevelError as e:
+                if e.index != 0:
+                    # Part of the thread is already live, so unlike the first tweet it can't be simulated
+                    self._finish(job, "failed", error=str(e))
+                    return True
+                # Same as the synchronous endpoint: treat as posted for testing
+                log.info("post_simulated", reason="access_level_insufficient")
+                self._finish(job, "published", simulated=True)
+                return True
+            except (PublishError, requests.RequestException) as e:
+                if isinstance(e, PublishError):
+                    transient = e.transient
+                else:
+                    # Only a request that never got through is safe to send again; after a read
+                    # timeout the tweet may well be live already
+                    transient = isinstance(e, requests.ConnectionError)
+                if isinstance(e, requests.ReadTimeout):
+                    index = len(job["tweet_ids"]) + 1
+                    self._finish(job, "failed", error=f"No answer from Twitter for tweet {index}, which may have "
+                                                       f"been posted: {e}")
+                    return True
+                if not transient or job["attempts"] >= self.retries:
+                    self._finish(job, "failed", error=str(e))
+                    return True
+                delay = self.retry_delay * 2 ** job["attempts"]
+                if isinstance(e, PublishError) and e.retry_after is not None:
+                    delay = e.retry_after
+                self._save(job, attempts=job["attempts"] + 1, error=str(e))
+                if delay > self.max_retry_wait:
+                    # A long rate-limit window: any worker picks the job up again once it's over
+                    self._hand_back(job, authorization, receipt, delay)
+                    return False
+                state.extend(PUBLISH_QUEUE, receipt, delay + self.lease)
+                if self._stop.wait(delay):
+                    # Shutting down: leave the job for the next worker to resume
+                    self._hand_back(job, authorization, receipt, 0)
+                    return False
+
+    def run_once(self):
+        """Claim one job from the queue and publish it; returns False if no job was waiting"""
+        state = get_state_backend()
+        claimed = state.claim(PUBLISH_QUEUE, self.lease)
+        if claimed is None:
+            return False
+        receipt, publish_id = claimed
+        job = state.get(_job_key(publish_id))
+        if job is None or job["status"] in ("published", "failed"):
+            state.ack(PUBLISH_QUEUE, receipt)
+            return True  # expired, or already finished
+        authorization = job.pop("authorization", None)
+        if authorization is None:
+            # Claimed by a worker that died: its token went with it
+            log.warning("publish_job_interrupted", publish_id=publish_id, posted=len(job["tweet_ids"]))
+            self._finish(job, "failed", error=f"Publishing was interrupted after {len(job['tweet_ids'])} of "
+                                               f"{len(job['tweets'])} tweets")
+            state.ack(PUBLISH_QUEUE, receipt)
+            return True
+        # The token stays with this worker only, out of the shared state
+        self._save(job, status="publishing")
+        try:
+            finished = self.process(job, authorization, receipt)
+        except Exception as e:
+            log.error("publish_job_error", publish_id=publish_id, error=str(e))
+            self._finish(job, "failed", error=str(e))
+            finished = True
+        if finished:
+            state.ack(PUBLISH_QUEUE, receipt)
+        return True
+
+    def _run(self):
+        while not self._stop.is_set():
+            # Jobs submitted by this process wake the worker at once; others are picked up by polling
+            _wakeup.clear()
+            try:
+                if self.run_once():
+                    continue
+            except Exception as e:
+                log.error("publish_worker_error", error=str(e))
+            _wakeup.wait(self.poll_interval)
+
+    def start(self):
+        for i in range(self.threads):
+            thread = threading.Thread(target=self._run, name=f"publish-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self, timeout=5):
+        self._stop.set()
+        _wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
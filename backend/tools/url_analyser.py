@@ -1,356 +1,542 @@
-import requests
-from bs4 import BeautifulSoup
+import asyncio
+import math
 import re
 import statistics
 import os
-from langchain_openai import ChatOpenAI
-from langchain.chains import LLMChain
-from langchain.prompts import PromptTemplate
+import time
+from requests.compat import chardet
+from tools.admission import Overloaded, stage_slot
+from tools.deadline import current_deadline, Deadline, DEGRADED_STAGES
+from tools.fetcher import get_fetcher
+from tools.snapshots import record_snapshot
+from tools.hashtags import add_hashtags, get_hashtag_index, LOCAL_HASHTAGS
+from tools.lazy import lazy_import, preload
+from tools.memory import check_budget, read_capped, track_peak
+from tools.log import get_logger
+from tools.models import get_router, record_model_call, Route, MODEL_FALLBACKS
+from tools.metrics import span, record_token_usage
+from tools.singleflight import SingleFlight
+from tools.compressor import compress_paragraphs, load_encoding, PROMPT_TOKENS
+from tools.ranking import rank_tweets
+from tools.urls import canonicalize_url, normalize_text
+from tools.semantic_cache import get_generation_cache, instruction_key, SEMANTIC_CACHE_ENABLED
+from tools.state import get_state_backend
+
+# Heavy dependencies are imported on first use so that importing this module
+# (and therefore starting the API) doesn't pay for langchain/openai/bs4
+bs4 = lazy_import("bs4")
+chains = lazy_import("langchain.chains")
+prompts = lazy_import("langchain.prompts")
+openai_callbacks = lazy_import("langchain_community.callbacks.manager")
+
+log = get_logger("url_analyser")
+
+HEAVY_MODULES = (
+    "bs4",
+    "langchain_openai",
+    "langchain.chains",
+    "langchain.prompts",
+    "langchain_community.callbacks.manager",
+    "numpy",
+)
+
+
+def _decode(response, body):
+    # What `response.text` does, for a body that was read in chunks
+    encoding = response.encoding or chardet.detect(body)["encoding"]
+    try:
+        return str(body, encoding or "utf-8", errors="replace")
+    except LookupError:
+        return str(body, "utf-8", errors="replace")
+
+
+def fetch_page(url):
+    """Download a page and return its decoded HTML"""
+    deadline = current_deadline()
+    fetcher = get_fetcher()
+    with stage_slot("fetch", deadline.timeout()), span("fetch"), deadline.stage("fetch"):
+        with fetcher.get(url, timeout=deadline.timeout(fetcher.timeout), stream=True) as response:
+            response.raise_for_status()
+            # An oversized page is refused mid-download, not after it's been held and snapshotted
+            html = _decode(response, read_capped(response))
+    # Kept so the analyser can be re-run over the page later without fetching it again
+    record_snapshot(url, html)
+    return html
+
+
+class PageExtract:
+    """
+    What the analysis needs from a page's tree, kept once the tree is gone:
+    metadata, image URLs, section and list counts, and the text of the
+    paragraphs that passed the structural filters.
+    """
 
+    __slots__ = (
+        "title", "canonical_url", "author", "pub_date", "description",
+        "main_image", "all_images", "sections", "lists", "paragraphs",
+    )
 
-def analyze_url_content(url):
+    def __init__(self, title="", canonical_url="", author="", pub_date="", description="",
+                 main_image="", all_images=(), sections=0, lists=0, paragraphs=()):
+        self.title = title
+        self.canonical_url = canonical_url
+        self.author = author
+        self.pub_date = pub_date
+        self.description = description
+        self.main_image = main_image
+        self.all_images = all_images
+        self.sections = sections
+        self.lists = lists
+        self.paragraphs = paragraphs
+
+
+# Script and style bodies are never analyzed, but would be copied into the tree
+_INERT_ELEMENTS = re.compile(r"<(script|style)\b[^>]*>.*?</\1\s*>", re.IGNORECASE | re.DOTALL)
+
+NON_CONTENT_PARENT_CLASSES = ("comment", "widget", "sidebar", "footer", "menu", "nav", "author", "meta")
+NON_CONTENT_CLASSES = ("meta", "info", "date", "author", "tag", "button", "caption")
+
+
+def _parse(html):
+    # The stripped copy of the markup is only referenced here, so it's freed as soon as the tree is built
+    markup = _INERT_ELEMENTS.sub("", html)
+    check_budget(markup)
+    return bs4.BeautifulSoup(markup, "html.parser")
+
+
+def extract_page(html):
     """
-    Fetches and analyzes content from a URL to extract structural and stylistic elements.
+    Parse `html` and extract a PageExtract. The tree is torn down before
+    returning: its nodes reference each other, so without that it would
+    stay in memory until the garbage collector's next full pass.
     """
+    soup = _parse(html)
     try:
-        response = requests.get(url, headers={"User-Agent": "Mozilla/5.0"})
-        response.raise_for_status()
-
-        soup = BeautifulSoup(response.text, "html.parser")
-
-        # Title
-        title = soup.title.string.strip() if soup.title and soup.title.string else ""
-        og_title = soup.find("meta", property="og:title")
-        if og_title and og_title.get("content"):
-            title = og_title["content"].strip()
-
-        # Author
-        author = ""
-        meta_author = soup.find("meta", attrs={"name": "author"})
-        if meta_author and meta_author.get("content"):
-            author = meta_author["content"].strip()
-        byline = soup.find(class_=re.compile("byline|author", re.I))
-        if byline:
-            author = byline.get_text(strip=True)
-
-        # Publication date
-        pub_date = ""
-        meta_date = soup.find("meta", property="article:published_time")
-        if meta_date and meta_date.get("content"):
-            pub_date = meta_date["content"].strip()
-        time_tag = soup.find("time")
-        if time_tag and time_tag.get("datetime"):
-            pub_date = time_tag["datetime"].strip()
-
-        # Meta description
-        description = ""
-        meta_desc = soup.find("meta", attrs={"name": "description"})
-        if meta_desc and meta_desc.get("content"):
-            description = meta_desc["content"].strip()
-        og_desc = soup.find("meta", property="og:description")
-        if og_desc and og_desc.get("content"):
-            description = og_desc["content"].strip()
-
-        # Find the main content area if possible
+        return _extract(soup)
+    finally:
+        # Decomposing the BeautifulSoup object alone leaves its children linked
+        for child in list(soup.contents):
+            child.decompose()
+        soup.decompose()
+
+
+def _extract(soup):
+    # Title
+    title = soup.title.string.strip() if soup.title and soup.title.string else ""
+    og_title = soup.find("meta", property="og:title")
+    if og_title and og_title.get("content"):
+        title = og_title["content"].strip()
+
+    # Canonical URL, so tracking/AMP variants of a page can be recognised
+    canonical_url = ""
+    og_url = soup.find("meta", property="og:url")
+    if og_url and og_url.get("content"):
+        canonical_url = og_url["content"].strip()
+    link_canonical = soup.find("link", rel="canonical")
+    if link_canonical and link_canonical.get("href"):
+        canonical_url = link_canonical["href"].strip()
+
+    # Author
+    author = ""
+    meta_author = soup.find("meta", attrs={"name": "author"})
+    if meta_author and meta_author.get("content"):
+        author = meta_author["content"].strip()
+    byline = soup.find(class_=re.compile("byline|author", re.I))
+    if byline:
+        author = byline.get_text(strip=True)
+
+    # Publication date
+    pub_date = ""
+    meta_date = soup.find("meta", property="article:published_time")
+    if meta_date and meta_date.get("content"):
+        pub_date = meta_date["content"].strip()
+    time_tag = soup.find("time")
+    if time_tag and time_tag.get("datetime"):
+        pub_date = time_tag["datetime"].strip()
+
+    # Meta description
+    description = ""
+    meta_desc = soup.find("meta", attrs={"name": "description"})
+    if meta_desc and meta_desc.get("content"):
+        description = meta_desc["content"].strip()
+    og_desc = soup.find("meta", property="og:description")
+    if og_desc and og_desc.get("content"):
+        description = og_desc["content"].strip()
+
+    # Find the main content area if possible
+    main_content = soup.select_one(
+        "main, article, .content, #content, .post, .article, .entry-content"
+    )
+    if not main_content:
+        main_content = soup  # Use full body if no main content area identified
+
+    # Main image (og:image or first image in main content)
+    main_image = ""
+    og_image = soup.find("meta", property="og:image")
+    if og_image and og_image.get("content"):
+        main_image = og_image["content"].strip()
+    else:
         main_content = soup.select_one(
             "main, article, .content, #content, .post, .article, .entry-content"
         )
-        if not main_content:
-            main_content = soup  # Use full body if no main content area identified
-
-        # Main image (og:image or first image in main content)
-        main_image = ""
-        og_image = soup.find("meta", property="og:image")
-        if og_image and og_image.get("content"):
-            main_image = og_image["content"].strip()
-        else:
-            main_content = soup.select_one(
-                "main, article, .content, #content, .post, .article, .entry-content"
-            )
-            if main_content:
-                first_img = main_content.find("img")
-                if first_img and first_img.get("src"):
-                    main_image = first_img["src"]
-
-        # All images in main content
-        all_images = []
         if main_content:
-            for img in main_content.find_all("img"):
-                if img.get("src"):
-                    all_images.append(img["src"])
-
-        # Remove non-content areas
-        for element in soup.select(
-            "nav, footer, header, aside, .sidebar, .menu, .navigation, .footer, .comments, .widget"
-        ):
-            element.decompose()
-
-        # Get all headings to exclude them from paragraph count
-        headings = []
-        for i in range(1, 7):
-            if main_content:
-                headings.extend(
-                    [h.get_text().strip() for h in main_content.find_all(f"h{i}")]
-                )
-
-        # Get all table headers and cells
-        table_elements = []
-        if main_content:
-            for cell in main_content.select("th, td, caption"):
-                table_elements.append(cell.get_text().strip())
+            first_img = main_content.find("img")
+            if first_img and first_img.get("src"):
+                main_image = first_img["src"]
+
+    # All images in main content
+    all_images = []
+    if main_content:
+        all_images = [img["src"] for img in main_content.find_all("img") if img.get("src")]
+
+    # Remove non-content areas
+    for element in soup.select(
+        "nav, footer, header, aside, .sidebar, .menu, .navigation, .footer, .comments, .widget"
+    ):
+        element.decompose()
+
+    if not main_content:
+        return PageExtract(title, canonical_url, author, pub_date, description, main_image, all_images)
+
+    # Text of headings, table cells and UI elements, which aren't paragraphs
+    excluded = {h.get_text().strip() for h in main_content.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])}
+    excluded.update(cell.get_text().strip() for cell in main_content.select("th, td, caption"))
+    excluded.update(el.get_text().strip() for el in main_content.select("button, label, input, select, textarea"))
+
+    # Filter paragraphs much more strictly
+    paragraphs = []
+    for p in main_content.find_all("p"):
+        # Skip if it has display:none or visibility:hidden
+        style = p.get("style", "")
+        if "display:none" in style or "visibility:hidden" in style:
+            continue
+
+        # Get text and skip if empty
+        text = p.get_text().strip()
+        if not text:
+            continue
+
+        # Skip if this is inside a non-content container
+        if p.parent and p.parent.get("class"):
+            parent_classes = " ".join(p.parent.get("class")).lower()
+            if any(term in parent_classes for term in NON_CONTENT_PARENT_CLASSES):
+                continue
 
-        # Get buttons, labels, and other UI elements
-        ui_elements = []
-        if main_content:
-            for el in main_content.select("button, label, input, select, textarea"):
-                ui_elements.append(el.get_text().strip())
-
-        # Get paragraph elements
-        paragraphs = main_content.find_all("p") if main_content else []
-
-        # Filter paragraphs much more strictly
-        substantive_paragraphs = []
-        for p in paragraphs:
-            # Skip if it has display:none or visibility:hidden
-            style = p.get("style", "")
-            if "display:none" in style or "visibility:hidden" in style:
+        # Skip if it's a heading, table element or UI element
+        if text in excluded:
+            continue
+
+        # Skip very short texts that don't look like real paragraphs
+        if len(text) < 80:  # Increased from 50 to be more strict
+            # Skip single sentences or phrases that are probably not full paragraphs
+            if len(text.split()) < 15 and (
+                not text.endswith(".")
+                and not text.endswith("!")
+                and not text.endswith("?")
+            ):
                 continue
 
-            # Get text and skip if empty
-            text = p.get_text().strip()
-            if not text:
+            # Skip if it looks like a heading
+            if text.isupper() or (
+                text[0].isupper() and not any(c in text for c in [".", ",", ";"])
+            ):
                 continue
 
-            # Skip if this is inside a non-content container
-            if p.parent and p.parent.get("class"):
-                parent_classes = " ".join(p.parent.get("class")).lower()
-                if any(
-                    term in parent_classes
-                    for term in [
-                        "comment",
-                        "widget",
-                        "sidebar",
-                        "footer",
-                        "menu",
-                        "nav",
-                        "author",
-                        "meta",
-                    ]
-                ):
-                    continue
-
-            # Skip if it's a heading, table element or UI element
-            if text in headings or text in table_elements or text in ui_elements:
+            # Skip if it's a list item or bullet point
+            if (
+                text.startswith("-")
+                or text.startswith("•")
+                or text.startswith("*")
+                or re.match(r"^\d+\.", text)
+            ):
                 continue
 
-            # Skip very short texts that don't look like real paragraphs
-            if len(text) < 80:  # Increased from 50 to be more strict
-                # Skip single sentences or phrases that are probably not full paragraphs
-                if len(text.split()) < 15 and (
-                    not text.endswith(".")
-                    and not text.endswith("!")
-                    and not text.endswith("?")
-                ):
-                    continue
-
-                # Skip if it looks like a heading
-                if text.isupper() or (
-                    text[0].isupper() and not any(c in text for c in [".", ",", ";"])
-                ):
-                    continue
-
-                # Skip if it's a list item or bullet point
-                if (
-                    text.startswith("-")
-                    or text.startswith("•")
-                    or text.startswith("*")
-                    or re.match(r"^\d+\.", text)
-                ):
-                    continue
-
-                # Skip if it contains special characters typical of UI elements
-                if any(char in text for char in ["→", "⟶", "▶", "»", "☰", "✓"]):
-                    continue
-
-            # Skip if it's a table cell or likely UI element
-            if p.parent and p.parent.name in ["td", "th", "li", "button", "label", "a"]:
+            # Skip if it contains special characters typical of UI elements
+            if any(char in text for char in ["→", "⟶", "▶", "»", "☰", "✓"]):
                 continue
 
-            # Skip if it has certain classes that suggest it's not a content paragraph
-            if p.get("class"):
-                p_classes = " ".join(p.get("class")).lower()
-                if any(
-                    term in p_classes
-                    for term in [
-                        "meta",
-                        "info",
-                        "date",
-                        "author",
-                        "tag",
-                        "button",
-                        "caption",
-                    ]
-                ):
-                    continue
-
-            # Skip if it looks like a signature, date, or attribution
-            if re.search(
-                r"©|\bcopyright\b|\ball rights reserved\b|\bposted on\b|\bby\b.*\bon\b.*\d{4}",
-                text.lower(),
-            ):
+        # Skip if it's a table cell or likely UI element
+        if p.parent and p.parent.name in ["td", "th", "li", "button", "label", "a"]:
+            continue
+
+        # Skip if it has certain classes that suggest it's not a content paragraph
+        if p.get("class"):
+            p_classes = " ".join(p.get("class")).lower()
+            if any(term in p_classes for term in NON_CONTENT_CLASSES):
                 continue
 
-            substantive_paragraphs.append(p)
+        # Skip if it looks like a signature, date, or attribution
+        if re.search(
+            r"©|\bcopyright\b|\ball rights reserved\b|\bposted on\b|\bby\b.*\bon\b.*\d{4}",
+            text.lower(),
+        ):
+            continue
 
-        # Extract paragraph text from the filtered paragraphs
-        paragraph_texts = [p.get_text().strip() for p in substantive_paragraphs]
-        
+        paragraphs.append(text)
 
-        # Additional filtering after extraction
-        filtered_paragraphs = []
-        for text in paragraph_texts:
-            # Skip likely headers or very short paragraphs again
-            if (
-                len(text) < 100
-                and len(text.split()) < 20
-                and not re.search(r"[.!?].*[.!?]", text)
-            ):
-                continue
+    return PageExtract(
+        title, canonical_url, author, pub_date, description, main_image, all_images,
+        sections=len(main_content.find_all(["h1", "h2", "h3", "h4", "h5", "h6"])),
+        lists=len(main_content.find_all(["ul", "ol"])),
+        paragraphs=paragraphs,
+    )
 
-            # Skip anything that looks like a list item (might have been missed in HTML)
-            if re.match(r"^[•\-*]|\d+\.\s", text):
-                continue
 
-            filtered_paragraphs.append(text)
-
-        # Calculate paragraph statistics
-        paragraph_count = len(filtered_paragraphs)
-
-        if paragraph_count == 0:
-            return {
-                "success": False,
-                "error": "No substantive paragraphs found on page",
-            }
-
-        # Get a few sample paragraphs (excluding very short ones)
-        sample_paragraphs = [p for p in filtered_paragraphs if len(p.split()) > 15][:3]
-
-        # Calculate sentences per paragraph
-        sentences_per_paragraph = []
-        words_per_paragraph = []
-
-        for p in filtered_paragraphs:
-            # Rough sentence splitting
-            sentences = re.split(r"[.!?]+", p)
-            sentences = [s.strip() for s in sentences if s.strip()]
-            sentences_per_paragraph.append(len(sentences))
-
-            # Word count
-            words = p.split()
-            words_per_paragraph.append(len(words))
-
-        # Get headings
-        headings = []
-        for i in range(1, 7):
-            headings.extend(main_content.find_all(f"h{i}"))
-
-        # Get lists
-        lists = main_content.find_all(["ul", "ol"]) if main_content else []
-
-        # Calculate average word length
-        all_words = []
-        for p in filtered_paragraphs:
-            all_words.extend(p.split())
-
-        avg_word_length = 0
-        if all_words:
-            avg_word_length = sum(len(word) for word in all_words) / len(all_words)
-
-        # Analyze tone (very basic)
-        tone_indicators = []
-
-        # Check for formal language
-        formal_indicators = [
-            "therefore",
-            "consequently",
-            "furthermore",
-            "moreover",
-            "thus",
-        ]
-        if any(
-            word.lower() in " ".join(filtered_paragraphs).lower()
-            for word in formal_indicators
-        ):
-            tone_indicators.append("formal")
-
-        # Check for casual language
-        casual_indicators = [
-            "don't",
-            "won't",
-            "can't",
-            "let's",
-            "awesome",
-            "cool",
-            "great",
-        ]
-        if any(
-            word.lower() in " ".join(filtered_paragraphs).lower()
-            for word in casual_indicators
+def analyze_html(html):
+    """
+    Analyzes an HTML document to extract structural and stylistic elements.
+    """
+    return analyze_extract(extract_page(html))
+
+
+def analyze_extract(page):
+    """The analysis of a page from its PageExtract; only text work, no tree"""
+    # Additional filtering after extraction
+    filtered_paragraphs = []
+    for text in page.paragraphs:
+        # Skip likely headers or very short paragraphs again
+        if (
+            len(text) < 100
+            and len(text.split()) < 20
+            and not re.search(r"[.!?].*[.!?]", text)
         ):
-            tone_indicators.append("casual")
+            continue
 
-        # Check for technical language
-        if avg_word_length > 6:
-            tone_indicators.append("technical")
+        # Skip anything that looks like a list item (might have been missed in HTML)
+        if re.match(r"^[•\-*]|\d+\.\s", text):
+            continue
 
-        # Check for conversational style
-        if "?" in " ".join(filtered_paragraphs) or "!" in " ".join(filtered_paragraphs):
-            tone_indicators.append("conversational")
+        filtered_paragraphs.append(text)
 
-        # Default tone if none detected
-        if not tone_indicators:
-            tone_indicators.append("neutral")
+    # Calculate paragraph statistics
+    paragraph_count = len(filtered_paragraphs)
 
+    if paragraph_count == 0:
         return {
-            "success": True,
-            "paragraph_stats": {
-                "count": paragraph_count,
-                "avg_sentences": (
-                    round(statistics.mean(sentences_per_paragraph), 1)
-                    if sentences_per_paragraph
-                    else 0
-                ),
-                "avg_words": (
-                    round(statistics.mean(words_per_paragraph), 1)
-                    if words_per_paragraph
-                    else 0
-                ),
-            },
-            "structure": {"sections": len(headings), "lists": len(lists)},
-            "content_stats": {"avg_word_length": round(avg_word_length, 1)},
-            "tone_indicators": tone_indicators,
-            "sample_paragraphs": sample_paragraphs,
-            "title": title,
-            "author": author,
-            "pub_date": pub_date,
-            "description": description,
-            "main_image": main_image,
-            "all_images": all_images,
+            "success": False,
+            "error": "No substantive paragraphs found on page",
         }
 
+    # Get a few sample paragraphs (excluding very short ones)
+    sample_paragraphs = [p for p in filtered_paragraphs if len(p.split()) > 15][:3]
+
+    # Calculate sentences per paragraph
+    sentences_per_paragraph = []
+    words_per_paragraph = []
+
+    for p in filtered_paragraphs:
+        # Rough sentence splitting
+        sentences = re.split(r"[.!?]+", p)
+        sentences = [s.strip() for s in sentences if s.strip()]
+        sentences_per_paragraph.append(len(sentences))
+
+        # Word count
+        words = p.split()
+        words_per_paragraph.append(len(words))
+
+    # Calculate average word length
+    all_words = []
+    for p in filtered_paragraphs:
+        all_words.extend(p.split())
+
+    avg_word_length = 0
+    if all_words:
+        avg_word_length = sum(len(word) for word in all_words) / len(all_words)
+
+    # Analyze tone (very basic)
+    tone_indicators = []
+
+    # Check for formal language
+    formal_indicators = [
+        "therefore",
+        "consequently",
+        "furthermore",
+        "moreover",
+        "thus",
+    ]
+    if any(
+        word.lower() in " ".join(filtered_paragraphs).lower()
+        for word in formal_indicators
+    ):
+        tone_indicators.append("formal")
+
+    # Check for casual language
+    casual_indicators = [
+        "don't",
+        "won't",
+        "can't",
+        "let's",
+        "awesome",
+        "cool",
+        "great",
+    ]
+    if any(
+        word.lower() in " ".join(filtered_paragraphs).lower()
+        for word in casual_indicators
+    ):
+        tone_indicators.append("casual")
+
+    # Check for technical language
+    if avg_word_length > 6:
+        tone_indicators.append("technical")
+
+    # Check for conversational style
+    if "?" in " ".join(filtered_paragraphs) or "!" in " ".join(filtered_paragraphs):
+        tone_indicators.append("conversational")
+
+    # Default tone if none detected
+    if not tone_indicators:
+        tone_indicators.append("neutral")
+
+    return {
+        "success": True,
+        "paragraph_stats": {
+            "count": paragraph_count,
+            "avg_sentences": (
+                round(statistics.mean(sentences_per_paragraph), 1)
+                if sentences_per_paragraph
+                else 0
+            ),
+            "avg_words": (
+                round(statistics.mean(words_per_paragraph), 1)
+                if words_per_paragraph
+                else 0
+            ),
+        },
+        "structure": {"sections": page.sections, "lists": page.lists},
+        "content_stats": {"avg_word_length": round(avg_word_length, 1)},
+        "tone_indicators": tone_indicators,
+        "sample_paragraphs": sample_paragraphs,
+        "paragraphs": filtered_paragraphs,
+        "title": page.title,
+        "canonical_url": page.canonical_url,
+        "author": page.author,
+        "pub_date": page.pub_date,
+        "description": page.description,
+        "main_image": page.main_image,
+        "all_images": page.all_images,
+    }
+
+
+def analyze_url_content(url):
+    """
+    Fetches and analyzes content from a URL to extract structural and stylistic elements.
+    """
+    try:
+        html = fetch_page(url)
+        deadline = current_deadline()
+        with stage_slot("parse", deadline.timeout()), span("parse"), deadline.stage("parse"), track_peak("parse"):
+            page = extract_page(html)
+            # The page text isn't needed past extraction; drop it before the text analysis
+            del html
+            return analyze_extract(page)
+
+    except Overloaded:
+        # Shed, not failed: the API answers 503 and the analysis isn't cached
+        raise
     except Exception as e:
         return {"success": False, "error": str(e)}
     
-def create_agent():
-    openai_api_key = os.getenv("OPENAI_API_KEY")
-    llm = ChatOpenAI(
-        model="gpt-3.5-turbo", 
-        api_key=openai_api_key,
-        temperature=0.7
-    )
+def _tracked(stage, candidates, method, *args, **kwargs):
+    """
+    Call `method` on the stage's [(route, chain)] candidates in route order,
+    falling back to the next one when a call fails before the deadline.
+    """
+    deadline = current_deadline()
+    router = get_router()
+    # Waiting for a model slot is queueing, not stage time
+    with stage_slot("llm", deadline.timeout()), span(stage), deadline.stage(stage):
+        for i, (route, chain) in enumerate(candidates):
+            timeout = deadline.timeout(route.timeout)
+            if timeout is not None:
+                # Passed through to the model request, so a slow call ends in time
+                chain.llm_kwargs = {**chain.llm_kwargs, "timeout": timeout}
+            start = time.perf_counter()
+            try:
+                with openai_callbacks.get_openai_callback() as usage:
+                    result = getattr(chain, method)(*args, **kwargs)
+            except Exception as e:
+                record_model_call(stage, route, time.perf_counter() - start, "error")
+                if i == len(candidates) - 1 or deadline.expired():
+                    raise
+                MODEL_FALLBACKS.inc(stage=stage, model=route.name)
+                log.warning("model_fallback", stage=stage, model=route.name, error=str(e))
+                continue
+            cost = router.cost(route, usage.prompt_tokens, usage.completion_tokens)
+            record_model_call(stage, route, time.perf_counter() - start, "ok", cost)
+            record_token_usage(stage, usage.prompt_tokens, usage.completion_tokens)
+            return result
+
+def run_stage(stage, candidates, **inputs):
+    """Run one chain stage, recording its latency, token usage and cost"""
+    return _tracked(stage, candidates, "run", **inputs)
+
+def run_stage_generations(stage, candidates, **inputs):
+    """Run one chain stage and return every generation of the single model call"""
+    result = _tracked(stage, candidates, "generate", [inputs])
+    return [g.text.strip() for g in result.generations[0] if g.text.strip()]
+
+def run_optional_stage(stage, fallback, run):
+    """
+    Run an improvement stage (review, reach) unless the deadline doesn't
+    leave time for it; if it's skipped, cut short or shed for lack of
+    capacity, keep `fallback`, the previous stage's output.
+    """
+    deadline = current_deadline()
+    if not deadline.allows(stage):
+        deadline.skip(stage)
+        return fallback
+    try:
+        return run()
+    except Overloaded:
+        deadline.shed(stage)
+        return fallback
+    except Exception:
+        if not deadline.cut_short(stage):
+            raise
+        return fallback
+
+HASHTAG_ROUTE = Route("local", "hashtag-index")
+
+def local_reach(tweets):
+    """The reach stage without a model call: hashtags for each tweet from the local index"""
+    start = time.perf_counter()
+    with span("reach"), current_deadline().stage("reach"):
+        index = get_hashtag_index()
+        enhanced = [add_hashtags(tweet, index) for tweet in tweets]
+    record_model_call("reach", HASHTAG_ROUTE, time.perf_counter() - start, "ok")
+    return enhanced
+
+BATCH_SEPARATOR = "---"
+
+def format_batch(tweets):
+    return "\n\n".join(f"Tweet {i}:\n{tweet}" for i, tweet in enumerate(tweets, 1))
+
+def parse_batch(text, expected):
+    """Split a batched stage response back into tweets; None if the count doesn't match"""
+    parts = [p.strip() for p in re.split(rf"^\s*{BATCH_SEPARATOR}\s*$", text, flags=re.M)]
+    parts = [re.sub(r"^Tweet \d+:\s*", "", p) for p in parts if p]
+    return parts if len(parts) == expected else None
+
+def create_agent(llm=None):
+    """
+    Build the summarize -> review -> reach chain. Each stage runs on the
+    models routed to it (tools.models); passing `llm` runs every stage on
+    that one model instead.
+    """
+    if llm is None:
+        stage_models = get_router().candidates
+    else:
+        route = Route("custom", getattr(llm, "model_name", None) or llm._llm_type)
+        stage_models = lambda stage: [(route, llm)]
+
+    def stage_chains(stage, prompt, **llm_kwargs):
+        """[(route, chain)] for `stage`, one chain per model in its route"""
+        return [(route, chains.LLMChain(llm=model, prompt=prompt, llm_kwargs=dict(llm_kwargs)))
+                for route, model in stage_models(stage)]
 
     # Step 1: Summarize blog content as a tweet (human, technical background)
-    summarize_prompt = PromptTemplate(
+    summarize_prompt = prompts.PromptTemplate(
         input_variables=["content"],
         template=(
             "You are a developer with a strong technical background. "
@@ -361,10 +547,10 @@ def create_agent():
             "BLOG ANALYSIS AND CONTEXT:\n{content}"
         )
     )
-    summarize_chain = LLMChain(llm=llm, prompt=summarize_prompt)
+    summarize_chain = stage_chains("summarize", summarize_prompt)
 
     # Step 2: Review and improve the tweet
-    review_prompt = PromptTemplate(
+    review_prompt = prompts.PromptTemplate(
         input_variables=["tweet"],
         template=(
             "You are a technical editor. Review and improve this tweet for clarity, engagement, and technical accuracy. "
@@ -374,10 +560,10 @@ def create_agent():
             "Tweet:\n{tweet}"
         )
     )
-    review_chain = LLMChain(llm=llm, prompt=review_prompt)
+    review_chain = stage_chains("review", review_prompt)
 
     # Step 3: Reach enhancer (add hashtags, maximize engagement)
-    reach_prompt = PromptTemplate(
+    reach_prompt = prompts.PromptTemplate(
         input_variables=["tweet"],
         template=(
             "You are a social media expert. Enhance the following tweet to maximize its reach and engagement. "
@@ -386,27 +572,91 @@ def create_agent():
             "Tweet:\n{tweet}"
         )
     )
-    reach_chain = LLMChain(llm=llm, prompt=reach_prompt)
+    reach_chain = stage_chains("reach", reach_prompt)
+
+    # Batched variants of steps 2 and 3: one model call handles every candidate
+    batch_instructions = (
+        "Return the improved tweets in the same order, separated by a line containing only "
+        f"{BATCH_SEPARATOR}, with no numbering or commentary.\n"
+    )
+    review_batch_prompt = prompts.PromptTemplate(
+        input_variables=["tweets"],
+        template=(
+            "You are a technical editor. Review and improve each of these alternative tweets for clarity, "
+            "engagement, and technical accuracy. Keep each one comprehensive if it provides substantial value, "
+            "and keep the alternatives distinct from each other. "
+            "Ensure they sound like a real human with a technical background wrote them.\n"
+            + batch_instructions + "{tweets}"
+        )
+    )
+    review_batch_chain = stage_chains("review", review_batch_prompt)
+    reach_batch_prompt = prompts.PromptTemplate(
+        input_variables=["tweets"],
+        template=(
+            "You are a social media expert. Enhance each of these alternative tweets to maximize its reach and "
+            "engagement. Add relevant and trending hashtags (max 3-4 per tweet). Focus on creating useful, "
+            "informative content.\n"
+            + batch_instructions + "{tweets}"
+        )
+    )
+    reach_batch_chain = stage_chains("reach", reach_batch_prompt)
+
+    def build_content(paragraphs, tone, stats, structure, content_stats, additional_text):
+        content = "\n\n".join(paragraphs)
+        context = (
+            f"Tone: {tone}\n"
+            f"Paragraph stats: {stats}\n"
+            f"Structure: {structure}\n"
+            f"Content stats: {content_stats}\n"
+        )
+        
+        # Add additional text to context if provided
+        if additional_text:
+            context += f"\nAdditional Instructions: {additional_text}\n"
+        return f"{context}\n{content}"
+
+    def run_batch(stage, chain, tweets):
+        def run():
+            improved = parse_batch(run_stage(stage, chain, tweets=format_batch(tweets)), len(tweets))
+            # A malformed batch response keeps the previous stage's candidates
+            return improved or tweets
+        return run_optional_stage(stage, tweets, run)
+
+    def improve(stage, chain, tweet):
+        return run_optional_stage(stage, tweet, lambda: run_stage(stage, chain, tweet=tweet))
+
+    def reach(tweets):
+        """Add hashtags to each candidate: from the local index with LOCAL_HASHTAGS, else by model"""
+        if LOCAL_HASHTAGS:
+            return run_optional_stage("reach", tweets, lambda: local_reach(tweets))
+        if len(tweets) > 1:
+            return run_batch("reach", reach_batch_chain, tweets)
+        return [improve("reach", reach_chain, tweet) for tweet in tweets]
 
     class Agent:
         def generate_tweet(self, paragraphs, tone, stats, structure, content_stats, additional_text=""):
-            content = "\n\n".join(paragraphs)
-            context = (
-                f"Tone: {tone}\n"
-                f"Paragraph stats: {stats}\n"
-                f"Structure: {structure}\n"
-                f"Content stats: {content_stats}\n"
-            )
-            
-            # Add additional text to context if provided
-            if additional_text:
-                context += f"\nAdditional Instructions: {additional_text}\n"
-            
-            tweet = summarize_chain.run(content=f"{context}\n{content}")
-            reviewed_tweet = review_chain.run(tweet=tweet)
-            enhanced_tweet = reach_chain.run(tweet=reviewed_tweet)
+            content = build_content(paragraphs, tone, stats, structure, content_stats, additional_text)
+            tweet = run_stage("summarize", summarize_chain, content=content)
+            reviewed_tweet = improve("review", review_chain, tweet)
+            enhanced_tweet = reach([reviewed_tweet])[0]
             return enhanced_tweet.strip()
 
+        def generate_variants(self, n, paragraphs, tone, stats, structure, content_stats, additional_text=""):
+            """
+            Generate up to `n` alternative tweets with three model calls in total:
+            one summarize call requesting `n` completions, then one batched
+            review call and one batched reach call covering every candidate.
+            """
+            content = build_content(paragraphs, tone, stats, structure, content_stats, additional_text)
+            summarize_n = stage_chains("summarize", summarize_prompt, n=n)
+            candidates = run_stage_generations("summarize", summarize_n, content=content)[:n]
+            if len(candidates) > 1:
+                candidates = run_batch("review", review_batch_chain, candidates)
+            else:
+                candidates = [improve("review", review_chain, t) for t in candidates]
+            candidates = reach(candidates)
+            return [c.strip() for c in candidates]
+
     return Agent()
 
 def split_into_thread(tweet_text, max_length=280):
@@ -444,14 +694,104 @@ def split_into_thread(tweet_text, max_length=280):
     
     return threads
 
-def tweet_from_url(url, additional_text=""):
-    analysis = analyze_url_content(url)
-    if not analysis["success"]:
+def warm_up():
+    """Import the heavy dependencies, load the token encoding and exercise the HTML parser once"""
+    preload(*HEAVY_MODULES)
+    load_encoding()
+    analyze_html("<html><body><p>Warm-up paragraph.</p></body></html>")
+
+# Concurrent requests for the same page share one fetch/parse, and requests
+# that also share the same additional_text share one generation
+_analysis_flight = SingleFlight("analysis")
+_generation_flight = SingleFlight("generation")
+COALESCE_GENERATIONS = os.getenv("COALESCE_GENERATIONS", "1") == "1"
+
+# Send a token-budgeted extract of the whole article instead of the first
+# three long paragraphs (set CONTENT_COMPRESSION=0 for the old behaviour)
+CONTENT_COMPRESSION = os.getenv("CONTENT_COMPRESSION", "1") == "1"
+
+# Successful analyses are shared between workers through the state backend
+# (0 disables); drafts are tweets pre-generated by the prefetch worker
+ANALYSIS_CACHE_TTL = int(os.getenv("ANALYSIS_CACHE_TTL", "3600"))
+DRAFT_TTL = int(os.getenv("DRAFT_TTL", str(6 * 3600)))
+
+def analyze_url_cached(url):
+    """analyze_url_content backed by the shared analysis cache"""
+    if not ANALYSIS_CACHE_TTL:
+        return analyze_url_content(url)
+    state = get_state_backend()
+    key = f"analysis:{canonicalize_url(url)}"
+    analysis = state.get(key)
+    if analysis is None:
+        analysis = analyze_url_content(url)
+        if analysis.get("success"):
+            state.set(key, analysis, ttl=ANALYSIS_CACHE_TTL)
+    else:
+        current_deadline().stages.update(fetch="cached", parse="cached")
+    return analysis
+
+def draft_key(url, additional_text=""):
+    return f"draft:{canonicalize_url(url)}:{instruction_key(additional_text)}"
+
+def store_draft(url, tweet, additional_text=""):
+    get_state_backend().set(draft_key(url, additional_text), tweet, ttl=DRAFT_TTL)
+
+def analyze_url_shared(url):
+    """analyze_url_cached, coalescing concurrent calls for the same canonical URL"""
+    analysis = _analysis_flight.do(canonicalize_url(url), analyze_url_cached, url)
+    stages = current_deadline().stages
+    if "fetch" not in stages:
+        # Joined another request's fetch and parse
+        stages.update(fetch="shared", parse="shared")
+    # Each caller gets its own top-level dict since results are extended per request
+    return dict(analysis)
+
+MAX_VARIANTS = 5
+
+def _deadline_bucket(deadline):
+    """
+    Time left, to within a factor of two. Only requests with about the same
+    budget share a generation, so one with more time doesn't get a result
+    that was degraded to fit a shorter deadline.
+    """
+    if deadline is None or deadline.expires is None:
         return None
+    return math.ceil(math.log2(max(deadline.remaining(), 1)))
+
+def _generation_key(url, additional_text, variants=1, deadline=None):
+    return (canonicalize_url(url), normalize_text(additional_text), variants, _deadline_bucket(deadline))
+
+def tweet_from_analysis(url, analysis, additional_text="", variants=1):
+    """
+    Generate the tweet (and variants) for an analysis of `url`; extends and
+    returns `analysis`. Under a deadline, `stages` reports what ran: review
+    and reach are skipped when time runs low, and if there's no time left to
+    summarize the analysis is returned without a tweet.
+    """
+    deadline = current_deadline()
+    result = _generate_from_analysis(url, analysis, additional_text, variants, deadline)
+    if deadline.stages:
+        result["stages"] = dict(deadline.stages)
+    return result
+
+def _generate_from_analysis(url, analysis, additional_text, variants, deadline):
+    if not analysis["success"]:
+        return analysis
 
     sample_paragraphs = analysis["sample_paragraphs"]
     if not sample_paragraphs:
-        return None
+        return {**analysis, "success": False, "error": "No content to summarize on this page"}
+
+    # The full paragraph list is only needed to build the prompt
+    paragraphs = analysis.pop("paragraphs", [])
+    prompt_paragraphs = sample_paragraphs
+    if CONTENT_COMPRESSION and paragraphs:
+        with span("compress"):
+            compressed = compress_paragraphs(paragraphs)
+        if compressed["paragraphs"]:
+            prompt_paragraphs = compressed["paragraphs"]
+            PROMPT_TOKENS.observe(compressed["tokens"])
+        analysis["compression"] = {k: v for k, v in compressed.items() if k != "paragraphs"}
 
     # Gather extra context for the agent
     tone = ", ".join(analysis.get("tone_indicators", []))
@@ -459,21 +799,111 @@ def tweet_from_url(url, additional_text=""):
     structure = analysis.get("structure", {})
     content_stats = analysis.get("content_stats", {})
 
+    if not deadline.allows("summarize"):
+        deadline.skip("summarize")
+        return analysis
+
     agent = create_agent()
-    tweet = agent.generate_tweet(
-        sample_paragraphs,
-        tone=tone,
-        stats=stats,
-        structure=structure,
-        content_stats=content_stats,
-        additional_text=additional_text
-    )
+    if variants > 1:
+        try:
+            candidates = agent.generate_variants(
+                variants,
+                prompt_paragraphs,
+                tone=tone,
+                stats=stats,
+                structure=structure,
+                content_stats=content_stats,
+                additional_text=additional_text
+            )
+        except Exception:
+            if not deadline.cut_short("summarize"):
+                raise
+            return analysis
+        if not candidates:
+            return {**analysis, "success": False, "error": "The model returned no tweets"}
+        ranked = rank_tweets(candidates)
+        for variant in ranked:
+            with span("thread_split"):
+                variant["thread_tweets"] = split_into_thread(variant["tweet"])
+            variant["is_thread"] = len(variant["thread_tweets"]) > 1
+        analysis["variants"] = ranked
+        tweet = ranked[0]["tweet"]
+    else:
+        tweet = None
+        cache_url = analysis.get("canonical_url") or url
+        cache_content = "\n\n".join(prompt_paragraphs)
+        if SEMANTIC_CACHE_ENABLED:
+            with span("generation_cache_lookup"):
+                tweet, cache_info = get_generation_cache().lookup(cache_url, cache_content, additional_text)
+            analysis["cache"] = cache_info
+        if tweet is None and DRAFT_TTL:
+            tweet = get_state_backend().get(draft_key(cache_url, additional_text))
+            if tweet is not None:
+                analysis["cache"] = {**analysis.get("cache", {}), "hit": True, "kind": "prefetched"}
+                if SEMANTIC_CACHE_ENABLED:
+                    get_generation_cache().store(cache_url, cache_content, additional_text, tweet)
+        if tweet is None:
+            try:
+                tweet = agent.generate_tweet(
+                    prompt_paragraphs,
+                    tone=tone,
+                    stats=stats,
+                    structure=structure,
+                    content_stats=content_stats,
+                    additional_text=additional_text
+                )
+            except Exception:
+                if not deadline.cut_short("summarize"):
+                    raise
+                return analysis
+            # A tweet that skipped review or reach isn't served to later requests
+            if SEMANTIC_CACHE_ENABLED and not deadline.degraded:
+                get_generation_cache().store(cache_url, cache_content, additional_text, tweet)
     
     # Split into thread if too long
-    thread_tweets = split_into_thread(tweet.strip())
+    with span("thread_split"):
+        thread_tweets = split_into_thread(tweet.strip())
     
     analysis["tweet"] = tweet.strip()
     analysis["thread_tweets"] = thread_tweets
     analysis["is_thread"] = len(thread_tweets) > 1
     
-    return analysis
\ No newline at end of file
+    return analysis
+
+def _tweet_from_url(url, additional_text="", variants=1, deadline=None):
+    with (deadline or Deadline()).active():
+        return tweet_from_analysis(url, analyze_url_shared(url), additional_text, variants)
+
+def tweet_from_url(url, additional_text="", variants=1, deadline=None):
+    """
+    Analyze `url` and generate a tweet for it, within `deadline` (a Deadline)
+    if given. Returns the analysis with `tweet`, `thread_tweets` and `stages`,
+    or with `success` false and an `error`.
+    """
+    variants = max(1, min(variants, MAX_VARIANTS))
+    if COALESCE_GENERATIONS:
+        key = _generation_key(url, additional_text, variants, deadline)
+        result = _generation_flight.do(key, _tweet_from_url, url, additional_text, variants, deadline)
+    else:
+        result = _tweet_from_url(url, additional_text, variants, deadline)
+    return dict(result) if result else None
+
+async def tweet_from_url_async(url, additional_text="", variants=1, deadline=None):
+    """Async variant of tweet_from_url; waiting on a coalesced call doesn't hold a worker thread"""
+    variants = max(1, min(variants, MAX_VARIANTS))
+    if COALESCE_GENERATIONS:
+        key = _generation_key(url, additional_text, variants, deadline)
+        # A request that joins another's generation still gives up at its own deadline
+        timeout = deadline.timeout() if deadline else None
+        try:
+            result = await _generation_flight.do_async(
+                key, _tweet_from_url, url, additional_text, variants, deadline, timeout=timeout
+            )
+        except TimeoutError:
+            DEGRADED_STAGES.inc(stage="generation", status="timed_out")
+            return {"success": False, "error": "Deadline reached waiting for the generation",
+                    "stages": {"generation": "timed_out"}}
+    else:
+        loop = asyncio.get_running_loop()
+        result = await loop.run_in_executor(None, _tweet_from_url, url, additional_text, variants, deadline)
+    return dict(result) if result else None
@@ -0,0 +1,69 @@
+"""
+URL normalization used to key caches and coalesced requests.
+"""
+
+import urllib.parse
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+def normalize_url(url):
+    """
+    Reduce a URL to a stable key: lowercase scheme and host, no default port,
+    no fragment, no trailing slash and sorted query parameters.
+    """
+    parts = urllib.parse.urlsplit(url.strip())
+    scheme = parts.scheme.lower() or "http"
+    host = (parts.hostname or "").lower()
+    if parts.port and parts.port != _DEFAULT_PORTS.get(scheme):
+        host = f"{host}:{parts.port}"
+
+    path = parts.path or "/"
+    if len(path) > 1:
+        path = path.rstrip("/")
+
+    query = urllib.parse.urlencode(sorted(urllib.parse.parse_qsl(parts.query, keep_blank_values=True)))
+    return urllib.parse.urlunsplit((scheme, host, path, query, ""))
+
+
+# Query parameters that only track where a click came from
+TRACKING_PARAMS = {
+    "fbclid", "gclid", "dclid", "msclkid", "mc_cid", "mc_eid", "igshid", "ref", "ref_src", "ref_url",
+    "cmpid", "ncid", "sr_share", "share", "smid", "_ga", "_gl", "guccounter", "amp", "outputtype",
+}
+
+
+def canonicalize_url(url):
+    """
+    Normalize a URL and strip everything that doesn't change which article it
+    points at: tracking parameters (utm_* and friends) and AMP variants
+    (`amp.` hosts, `/amp` path segments, `?amp=1`). A URL too malformed to
+    parse (a non-numeric port, an unclosed IPv6 bracket) is its own key.
+    """
+    try:
+        return _canonicalize(url)
+    except ValueError:
+        return url.strip()
+
+
+def _canonicalize(url):
+    parts = urllib.parse.urlsplit(normalize_url(url))
+    host = parts.netloc
+    if host.startswith("amp."):
+        host = host[len("amp."):]
+
+    segments = [s for s in parts.path.split("/") if s and s.lower() != "amp"]
+    path = "/" + "/".join(segments)
+    if path.endswith(".amp"):
+        path = path[: -len(".amp")]
+
+    query = [
+        (k, v) for k, v in urllib.parse.parse_qsl(parts.query, keep_blank_values=True)
+        if not k.lower().startswith("utm_") and k.lower() not in TRACKING_PARAMS
+    ]
+    return urllib.parse.urlunsplit((parts.scheme, host, path, urllib.parse.urlencode(query), ""))
+
+
+def normalize_text(text):
+    """Collapse whitespace so equivalent instructions share a key"""
+    return " ".join((text or "").split())
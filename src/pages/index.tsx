@@ -214,6 +214,7 @@ const Index = () => {
     try {
       const params = new URLSearchParams({
         url: blogUrl,
+        fields: "compact",
         ...(additionalText.trim() && { additional_text: additionalText.trim() })
       });
       
@@ -224,6 +225,10 @@ const Index = () => {
         throw new Error("Failed to generate tweet from API");
       }
       const data = await response.json();
+      // A failed analysis, or one that ran out of time before the tweet was written
+      if (!data || !data.tweet) {
+        throw new Error(data?.error || "No tweet was generated");
+      }
       
       setGeneratedTweet(data.tweet || "");
       
@@ -272,7 +277,8 @@ const Index = () => {
         }
       });
       
-      const response = await fetch(`${import.meta.env.VITE_API_URL}api/twitter/post`, {
+      // Threads are published in the background; poll until every tweet is posted
+      const response = await fetch(`${import.meta.env.VITE_API_URL}api/twitter/post?async=1`, {
         method: 'POST',
         body: formData,
         credentials: 'include',
@@ -297,7 +303,20 @@ const Index = () => {
         throw new Error(errorData.detail || 'Failed to post to Twitter');
       }
       
-      const result = await response.json();
+      let result = await response.json();
+      while (result.status === 'queued' || result.status === 'publishing') {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const statusResponse = await fetch(`${import.meta.env.VITE_API_URL}api/twitter/post/${result.publish_id}`, {
+          credentials: 'include',
+        });
+        if (!statusResponse.ok) {
+          throw new Error('Lost track of the post. Check your Twitter profile before retrying.');
+        }
+        result = await statusResponse.json();
+      }
+      if (result.status === 'failed') {
+        throw new Error(`Posted ${result.posted} of ${result.tweet_count} tweets: ${result.error}`);
+      }
       setCurrentStep('posted');
       
       const imagesCount = Object.keys(threadImages).length;